@@ -1,321 +1,970 @@
-import { MongoClient } from 'mongodb';
 import { v4 as uuidv4 } from 'uuid';
+import { connectToDatabase } from '@/lib/mongodb';
+import { EMISSION_FACTORS } from '@/lib/emission-factors';
+import {
+  calculateForDate,
+  createFactorVersion,
+  loadFactorVersions,
+  validateFactorVersion,
+  versionForDate
+} from '@/lib/factor-versions';
+import {
+  createRecalculationJob,
+  getRecalculationJob,
+  listRecalculationJobs,
+  runRecalculationJob,
+  validateRecalculationScope,
+  versionScope
+} from '@/lib/recalculation';
+import {
+  InvalidEmissionChangeError,
+  applyEmissionChanges,
+  dedupeKey,
+  emissionChanges,
+  emissionUpdatePipeline,
+  parseBatchOperations,
+  parseEmissionValue,
+  runEmissionBatch,
+  runEmissionUpsert,
+  validateEmissionChanges
+} from '@/lib/emission-updates';
+import { emissionStore } from '@/lib/emission-store';
+import {
+  DEFAULT_CHANGES_LIMIT,
+  MAX_CHANGES_LIMIT,
+  beginWrite,
+  changeHead,
+  endWrite,
+  readChanges,
+  readSnapshot,
+  recordChanges,
+  recordReset
+} from '@/lib/change-feed';
+import { ROLLUP_COLLECTION, applyRollupDeltas, rebuildRollups } from '@/lib/rollups';
+import {
+  SAMPLES_COLLECTION,
+  applySampleDeltas,
+  confidenceInterval,
+  estimateStrata,
+  rebuildSamples
+} from '@/lib/emission-samples';
+import { parseCsvStream } from '@/lib/csv';
+import { ARROW_CONTENT_TYPE, DEFAULT_ARROW_FIELDS, arrowResponse } from '@/lib/arrow-export';
+import {
+  IngestBufferFullError,
+  ingestBufferEnabled,
+  ingestStats,
+  ingestWriteConcern,
+  sharedIngestBuffer
+} from '@/lib/ingest-buffer';
+import { cacheKey, etagMatches, responseCache, strongEtag, syncDataVersion } from '@/lib/cache';
+import { measureSync, renderMetrics, withMetrics } from '@/lib/metrics';
+
+// Run `write(handle)`, which changes emission records, as one write of the
+// change feed: started before it touches data and ended by the hook it calls
+// (or here, when it records nothing), so GET /api/dashboard can tell a load
+// that overlapped it
+async function trackedWrite(db, write) {
+  const handle = await beginWrite(db);
+  try {
+    return await write(handle);
+  } finally {
+    // An entry left behind expires after the feed's gap grace; the write
+    // itself has already succeeded or failed
+    await endWrite(db, handle).catch(error => console.error('Ending a tracked write failed:', error));
+  }
+}
+
+// Keep derived data in step with every write to the emissions collection.
+// `updated` entries are { before, after } pairs; `write` is the trackedWrite
+// handle.
+async function onEmissionsChanged(db, { inserted = [], updated = [], deleted = [] }, write) {
+  const deltas = {
+    added: [...inserted, ...updated.map(u => u.after)],
+    removed: [...deleted, ...updated.map(u => u.before)]
+  };
+  await Promise.all([applyRollupDeltas(db, deltas), applySampleDeltas(db, deltas)]);
+  // Only after derived data is updated: the new feed head is also the new
+  // cache version, so a cached result never mixes versions
+  await recordChanges(db, { inserted, updated, deleted }, write);
+}
+
+// For writes whose exact effect is unknown: recompute the months they touched
+// and tell change feed readers to reload
+async function onEmissionsRebuilt(db, months, reason, write) {
+  const sorted = [...months].sort();
+  await Promise.all([rebuildRollups(db, { months: sorted }), rebuildSamples(db, { months: sorted })]);
+  await recordReset(db, reason, write);
+}
+
+// One group-commit batch of single-record POSTs (lib/ingest-buffer.js):
+// a durable insertMany, then one derived-data update for the records stored.
+// Only a failed insert fails the batch's requests.
+function insertEmissionBatch(db, docs) {
+  return trackedWrite(db, async write => {
+    const failed = new Map();
+    try {
+      await emissionStore(db).insertMany(docs, { ordered: false, writeConcern: ingestWriteConcern() });
+    } catch (error) {
+      if (!error.writeErrors) throw error;
+      const writeErrors = Array.isArray(error.writeErrors) ? error.writeErrors : [error.writeErrors];
+      writeErrors.forEach(e => failed.set(e.index, e.errmsg || 'Write failed'));
+    }
+    const inserted = docs.filter((_, index) => !failed.has(index));
+    try {
+      await onEmissionsChanged(db, { inserted }, write);
+    } catch (error) {
+      // The records are durable, so they are acknowledged either way; derived
+      // data whose deltas failed part-way is recomputed for their months
+      console.error('Ingest batch deltas failed; rebuilding its months:', error);
+      const months = new Set(inserted.map(emission => emission.date.substring(0, 7)));
+      await onEmissionsRebuilt(db, months, 'ingest', write)
+        .catch(rebuildError => console.error('Ingest batch rebuild failed:', rebuildError));
+    }
+    return failed;
+  });
+}
+
+// Recalculation jobs run in the background of this server process; clients
+// poll GET /api/recalculations/:id for progress. Rollups are rebuilt by the
+// job itself, so only cached responses and feed readers need telling here.
+function startRecalculation(db, id) {
+  runRecalculationJob(db, id)
+    .then(async job => {
+      if (!job) return;
+      await recordReset(db, 'recalculation');
+    })
+    .catch(error => console.error(`Recalculation job ${id} failed:`, error));
+}
+
+const DEFAULT_PAGE_SIZE = 100;
+const MAX_PAGE_SIZE = 1000;
+
+// Fields a client may request with ?fields= on GET /api/emissions
+const EMISSION_FIELDS = [
+  'id', 'date', 'category', 'subcategory', 'value', 'unit', 'department', 'notes',
+  'co2Lbs', 'co2Kg', 'emissionFactor', 'factorVersion', 'externalId', 'createdAt', 'updatedAt'
+];
+
+// Keyset cursors are the (date, id) of the last row served, base64url encoded
+function encodeCursor(emission) {
+  return Buffer.from(JSON.stringify([emission.date, emission.id])).toString('base64url');
+}
+
+function decodeCursor(cursor) {
+  try {
+    const [date, id] = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'));
+    if (typeof date === 'string' && typeof id === 'string') return { date, id };
+  } catch (e) {
+    // fall through
+  }
+  return null;
+}
+
+// Filters, keyset position, projection and page size of an emissions list
+// request (GET /api/emissions and the dashboard's emissions panel). Returns
+// { error } when a parameter is invalid; limit is 0 when not paginated.
+function parseEmissionsQuery(searchParams, { paginated }) {
+  const department = searchParams.get('department');
+  const category = searchParams.get('category');
+  const startDate = searchParams.get('startDate');
+  const endDate = searchParams.get('endDate');
+
+  const query = {};
+  if (department && department !== 'all') query.department = department;
+  if (category && category !== 'all') query.category = category;
+  if (startDate || endDate) {
+    query.date = {};
+    if (startDate) query.date.$gte = startDate;
+    if (endDate) query.date.$lte = endDate;
+  }
 
-const MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
-const DB_NAME = process.env.DB_NAME || 'carbon_footprint_db';
+  const limitParam = searchParams.get('limit');
+  const cursorParam = searchParams.get('cursor');
+  const fieldsParam = searchParams.get('fields');
 
-let cachedClient = null;
-let cachedDb = null;
+  let projection;
+  if (fieldsParam) {
+    const fields = fieldsParam.split(',').map(f => f.trim()).filter(Boolean);
+    const unknown = fields.filter(f => !EMISSION_FIELDS.includes(f));
+    if (unknown.length > 0) {
+      return { error: `Unknown fields: ${unknown.join(', ')}` };
+    }
+    // id and date are always returned because the page cursor is built from them
+    projection = { _id: 0, id: 1, date: 1 };
+    fields.forEach(f => { projection[f] = 1; });
+  }
 
-async function connectToDatabase() {
-  if (cachedClient && cachedDb) {
-    return { client: cachedClient, db: cachedDb };
+  if (cursorParam) {
+    const after = decodeCursor(cursorParam);
+    if (!after) {
+      return { error: 'Invalid cursor' };
+    }
+    query.$or = [
+      { date: { $lt: after.date } },
+      { date: after.date, id: { $lt: after.id } }
+    ];
   }
 
-  const client = await MongoClient.connect(MONGO_URL);
-  const db = client.db(DB_NAME);
-
-  cachedClient = client;
-  cachedDb = db;
-
-  return { client, db };
-}
-
-// EPA Emission Factors (lbs CO2 per unit)
-const EMISSION_FACTORS = {
-  electricity: {
-    grid: { factor: 0.92, unit: 'kWh', name: 'Grid Electricity' },
-    solar: { factor: 0, unit: 'kWh', name: 'Solar Energy' },
-    wind: { factor: 0, unit: 'kWh', name: 'Wind Energy' }
-  },
-  transportation: {
-    gasoline: { factor: 19.6, unit: 'gallon', name: 'Gasoline Vehicle' },
-    diesel: { factor: 22.4, unit: 'gallon', name: 'Diesel Vehicle' },
-    electric: { factor: 0.36, unit: 'mile', name: 'Electric Vehicle' },
-    hybrid: { factor: 0.5, unit: 'mile', name: 'Hybrid Vehicle' },
-    publicTransit: { factor: 0.14, unit: 'mile', name: 'Public Transit' },
-    flight: { factor: 0.4, unit: 'mile', name: 'Air Travel' }
-  },
-  heating: {
-    naturalGas: { factor: 117, unit: 'therm', name: 'Natural Gas' },
-    heatingOil: { factor: 22.4, unit: 'gallon', name: 'Heating Oil' },
-    propane: { factor: 12.7, unit: 'gallon', name: 'Propane' },
-    electric: { factor: 3.412, unit: 'kWh', name: 'Electric Heating' }
-  },
-  waste: {
-    landfill: { factor: 2072, unit: 'ton', name: 'Landfill Waste' },
-    recycled: { factor: 0, unit: 'ton', name: 'Recycled' },
-    composted: { factor: 0, unit: 'ton', name: 'Composted' }
+  let limit = 0;
+  if (paginated) {
+    limit = parseInt(limitParam || String(DEFAULT_PAGE_SIZE));
+    if (!Number.isInteger(limit) || limit < 1) {
+      return { error: 'limit must be a positive integer' };
+    }
+    limit = Math.min(limit, MAX_PAGE_SIZE);
+  }
+
+  return { query, projection, limit };
+}
+
+// A page from rows fetched with limit + 1: the extra row only says whether
+// another page exists
+function pageFromRows(rows, limit) {
+  const data = rows.slice(0, limit);
+  return { data, nextCursor: rows.length > limit ? encodeCursor(data[data.length - 1]) : null };
+}
+
+// Stream documents from a Mongo cursor as newline-delimited JSON. Each pull
+// drains only what the driver already buffered, so memory stays at roughly
+// one cursor batch no matter how many documents match.
+function ndjsonResponse(cursor) {
+  const encoder = new TextEncoder();
+  const stream = new ReadableStream({
+    async pull(controller) {
+      try {
+        let doc = await cursor.next();
+        if (doc === null) {
+          controller.close();
+          return;
+        }
+        let chunk = '';
+        while (doc !== null) {
+          chunk += JSON.stringify(doc) + '\n';
+          doc = cursor.bufferedCount() > 0 && chunk.length < 65536 ? await cursor.next() : null;
+        }
+        controller.enqueue(encoder.encode(chunk));
+      } catch (error) {
+        controller.error(error);
+        await cursor.close();
+      }
+    },
+    async cancel() {
+      await cursor.close();
+    }
+  });
+
+  return new Response(stream, { headers: { 'Content-Type': 'application/x-ndjson' } });
+}
+
+// Rollup rows for a department filter ('all' or missing means every one)
+function rollupMatch(department) {
+  const match = { count: { $gt: 0 } };
+  if (department && department !== 'all') match.department = department;
+  return match;
+}
+
+// The summary's one emissions aggregation. The outer $match admits the
+// selected period plus the two comparison months, and each facet narrows to
+// the range it reports on.
+function summaryPlan(searchParams) {
+  const department = searchParams.get('department');
+  const startDate = searchParams.get('startDate');
+  const endDate = searchParams.get('endDate');
+
+  // Calculate previous period for comparison
+  const currentDate = new Date();
+  const lastMonthStart = new Date(currentDate.getFullYear(), currentDate.getMonth() - 1, 1).toISOString().split('T')[0];
+  const lastMonthEnd = new Date(currentDate.getFullYear(), currentDate.getMonth(), 0).toISOString().split('T')[0];
+
+  // Calculate two months ago for trend
+  const twoMonthsAgoStart = new Date(currentDate.getFullYear(), currentDate.getMonth() - 2, 1).toISOString().split('T')[0];
+  const twoMonthsAgoEnd = new Date(currentDate.getFullYear(), currentDate.getMonth() - 1, 0).toISOString().split('T')[0];
+
+  const lastMonthRange = { $gte: lastMonthStart, $lte: lastMonthEnd };
+  const twoMonthsAgoRange = { $gte: twoMonthsAgoStart, $lte: twoMonthsAgoEnd };
+
+  const dateRange = {};
+  if (startDate) dateRange.$gte = startDate;
+  if (endDate) dateRange.$lte = endDate;
+  const hasDateRange = Boolean(startDate || endDate);
+
+  const match = {};
+  if (department && department !== 'all') match.department = department;
+  if (hasDateRange) {
+    match.$or = [{ date: dateRange }, { date: lastMonthRange }, { date: twoMonthsAgoRange }];
+  }
+  const inRange = hasDateRange ? [{ $match: { date: dateRange } }] : [];
+  const co2Kg = { $ifNull: ['$co2Kg', 0] };
+
+  const facets = {
+    totals: [...inRange, { $group: { _id: null, total: { $sum: co2Kg }, count: { $sum: 1 } } }],
+    categories: [...inRange, { $group: { _id: '$category', total: { $sum: co2Kg } } }],
+    departments: [...inRange, { $group: { _id: '$department', total: { $sum: co2Kg } } }],
+    lastMonth: [{ $match: { date: lastMonthRange } }, { $group: { _id: null, total: { $sum: co2Kg } } }],
+    twoMonthsAgo: [{ $match: { date: twoMonthsAgoRange } }, { $group: { _id: null, total: { $sum: co2Kg } } }]
+  };
+  if (hasDateRange) {
+    facets.months = [
+      ...inRange,
+      { $group: { _id: { $substrCP: ['$date', 0, 7] }, total: { $sum: co2Kg } } }, // YYYY-MM
+      { $sort: { _id: 1 } }
+    ];
   }
-};
 
-function calculateEmissions(category, subcategory, value) {
-  const factor = EMISSION_FACTORS[category]?.[subcategory]?.factor || 0;
-  const co2Lbs = value * factor;
-  const co2Kg = co2Lbs * 0.453592; // Convert lbs to kg
   return {
-    co2Lbs: Math.round(co2Lbs * 100) / 100,
-    co2Kg: Math.round(co2Kg * 100) / 100,
-    factor,
-    unit: EMISSION_FACTORS[category]?.[subcategory]?.unit || ''
+    department,
+    hasDateRange,
+    match,
+    inRange,
+    facets,
+    periods: {
+      lastMonth: { start: lastMonthStart, end: lastMonthEnd },
+      twoMonthsAgo: { start: twoMonthsAgoStart, end: twoMonthsAgoEnd }
+    }
   };
 }
 
-export async function GET(request) {
-  const url = new URL(request.url);
-  const path = url.pathname.replace('/api/', '');
+// `monthlyRollups` are whole-history [{ _id: month, total }] rows, used when
+// no date range is selected
+function summaryFromResults({ hasDateRange, periods }, result, monthlyRollups) {
+  const totalEmissions = result.totals[0]?.total || 0;
+  const totalRecords = result.totals[0]?.count || 0;
+  const categoryBreakdown = Object.fromEntries(result.categories.map(row => [row._id, row.total]));
+  const departmentBreakdown = Object.fromEntries(result.departments.map(row => [row._id, row.total]));
+  const monthlyData = Object.fromEntries(
+    (hasDateRange ? result.months : monthlyRollups).map(row => [row._id, row.total])
+  );
+  const lastMonthTotal = result.lastMonth[0]?.total || 0;
+  const twoMonthsAgoTotal = result.twoMonthsAgo[0]?.total || 0;
+
+  const monthOverMonthChange = twoMonthsAgoTotal > 0 
+    ? ((lastMonthTotal - twoMonthsAgoTotal) / twoMonthsAgoTotal * 100).toFixed(1)
+    : 0;
 
-  try {
-    const { db } = await connectToDatabase();
+  return {
+    totalEmissions: Math.round(totalEmissions * 100) / 100,
+    totalRecords,
+    categoryBreakdown,
+    departmentBreakdown,
+    monthlyData,
+    lastMonthTotal: Math.round(lastMonthTotal * 100) / 100,
+    twoMonthsAgoTotal: Math.round(twoMonthsAgoTotal * 100) / 100,
+    monthOverMonthChange: parseFloat(monthOverMonthChange),
+    // The comparison months, so clients can apply change feed deltas
+    periods
+  };
+}
 
-    // GET /api/emissions - Get all emissions with filters
-    if (path === 'emissions' || path === 'emissions/') {
-      const department = url.searchParams.get('department');
-      const category = url.searchParams.get('category');
-      const startDate = url.searchParams.get('startDate');
-      const endDate = url.searchParams.get('endDate');
+// GET /api/analytics/summary
+async function computeSummary(db, searchParams) {
+  const plan = summaryPlan(searchParams);
+
+  // Whole-history monthly totals are read from the rollups instead
+  const monthlyPipeline = plan.hasDateRange
+    ? null
+    : db.collection(ROLLUP_COLLECTION).aggregate([
+      { $match: rollupMatch(plan.department) },
+      { $group: { _id: '$month', total: { $sum: '$co2Kg' } } },
+      { $sort: { _id: 1 } }
+    ]).toArray();
+
+  const [[result], monthlyRollups] = await Promise.all([
+    emissionStore(db).aggregate([{ $match: plan.match }, { $facet: plan.facets }]).toArray(),
+    monthlyPipeline
+  ]);
+  return summaryFromResults(plan, result, monthlyRollups);
+}
 
-      const query = {};
-      if (department && department !== 'all') query.department = department;
-      if (category && category !== 'all') query.category = category;
-      if (startDate || endDate) {
-        query.date = {};
-        if (startDate) query.date.$gte = startDate;
-        if (endDate) query.date.$lte = endDate;
-      }
+const ANALYTICS_MODES = ['exact', 'approx'];
+// Ranges with fewer records than this are answered exactly even in approx mode
+const DEFAULT_APPROX_MIN_RECORDS = 100000;
 
-      const emissions = await db.collection('emissions')
-        .find(query)
-        .sort({ date: -1 })
-        .toArray();
+function approxMinRecords() {
+  return parseInt(process.env.APPROX_MIN_RECORDS || String(DEFAULT_APPROX_MIN_RECORDS));
+}
 
-      return Response.json({ success: true, data: emissions });
-    }
+// ?mode=exact (the default) or ?mode=approx
+function parseAnalyticsMode(searchParams) {
+  const mode = searchParams.get('mode') || 'exact';
+  if (!ANALYTICS_MODES.includes(mode)) {
+    return { error: `mode must be one of ${ANALYTICS_MODES.join(', ')}` };
+  }
+  return { mode };
+}
 
-    // GET /api/departments - Get all departments
-    if (path === 'departments' || path === 'departments/') {
-      const departments = await db.collection('departments').find({}).toArray();
-      return Response.json({ success: true, data: departments });
+function lastDayOfMonth(month) {
+  const [year, m] = month.split('-').map(Number);
+  return new Date(Date.UTC(year, m, 0)).getUTCDate();
+}
+
+// Months of [startDate, endDate] that the range covers only in part
+function partialMonths(startDate, endDate) {
+  const months = new Set();
+  if (startDate && startDate.substring(8) !== '01') months.add(startDate.substring(0, 7));
+  if (endDate && parseInt(endDate.substring(8)) < lastDayOfMonth(endDate.substring(0, 7))) {
+    months.add(endDate.substring(0, 7));
+  }
+  return [...months];
+}
+
+// Sums of estimates and their variances per key; exact parts add no variance
+function estimateTotals() {
+  const totals = new Map();
+  return {
+    add(key, value, variance = 0) {
+      const [v, w] = totals.get(key) || [0, 0];
+      totals.set(key, [v + value, w + variance]);
+    },
+    value: key => totals.get(key)?.[0] || 0,
+    interval: key => confidenceInterval(...(totals.get(key) || [0, 0])),
+    keys: prefix => [...totals.keys()].filter(k => k.startsWith(prefix)).map(k => k.substring(prefix.length))
+  };
+}
+
+// GET /api/analytics/summary?mode=approx
+//
+// Whole months of the range are read from the rollups, which are exact; the
+// partial months at its edges are estimated from the stratified samples
+// (lib/emission-samples.js). The response is the exact summary's shape plus an
+// `approximation` block with 95% intervals and the sample size behind them.
+// Ranges under APPROX_MIN_RECORDS records fall back to the exact summary.
+async function computeApproxSummary(db, searchParams) {
+  const plan = summaryPlan(searchParams);
+  const startDate = searchParams.get('startDate');
+  const endDate = searchParams.get('endDate');
+  const comparison = {
+    lastMonth: plan.periods.lastMonth.end.substring(0, 7),
+    twoMonthsAgo: plan.periods.twoMonthsAgo.end.substring(0, 7)
+  };
+  const startMonth = startDate?.substring(0, 7);
+  const endMonth = endDate?.substring(0, 7);
+  const inRangeMonth = month => (!startMonth || month >= startMonth) && (!endMonth || month <= endMonth);
+
+  const match = rollupMatch(plan.department);
+  if (plan.hasDateRange) {
+    const months = {};
+    if (startMonth) months.$gte = startMonth;
+    if (endMonth) months.$lte = endMonth;
+    match.$or = [{ month: months }, { month: { $in: Object.values(comparison) } }];
+  }
+  const rollups = await db.collection(ROLLUP_COLLECTION).aggregate([
+    { $match: match },
+    {
+      $group: {
+        _id: { month: '$month', department: '$department', category: '$category' },
+        co2Kg: { $sum: '$co2Kg' },
+        count: { $sum: '$count' }
+      }
     }
+  ]).toArray();
+
+  const inRange = rollups.filter(row => inRangeMonth(row._id.month));
+  const candidates = inRange.reduce((sum, row) => sum + row.count, 0);
+  if (candidates < approxMinRecords()) {
+    const summary = await computeSummary(db, searchParams);
+    const point = value => [value, value];
+    const pointMap = map => Object.fromEntries(Object.entries(map).map(([k, v]) => [k, point(v)]));
+    return {
+      ...summary,
+      approximation: {
+        method: 'exact',
+        confidence: 0.95,
+        sampleSize: 0,
+        sampledRecords: 0,
+        intervals: {
+          totalEmissions: point(summary.totalEmissions),
+          totalRecords: point(summary.totalRecords),
+          categoryBreakdown: pointMap(summary.categoryBreakdown),
+          departmentBreakdown: pointMap(summary.departmentBreakdown),
+          monthlyData: pointMap(summary.monthlyData)
+        }
+      }
+    };
+  }
 
-    // GET /api/analytics/summary - Get summary analytics
-    if (path === 'analytics/summary') {
-      const department = url.searchParams.get('department');
-      const startDate = url.searchParams.get('startDate');
-      const endDate = url.searchParams.get('endDate');
+  const partial = partialMonths(startDate, endDate);
+  const strataQuery = { month: { $in: partial } };
+  if (plan.department && plan.department !== 'all') strataQuery.department = plan.department;
+  const strata = partial.length > 0
+    ? await db.collection(SAMPLES_COLLECTION).find(strataQuery, { projection: { _id: 0 } }).toArray()
+    : [];
+
+  const co2 = estimateTotals();
+  const counts = estimateTotals();
+  const add = ({ month, department, category }, co2Kg, count, co2KgVariance = 0, countVariance = 0) => {
+    ['total', `category:${category}`, `department:${department}`, `month:${month}`].forEach(key => {
+      co2.add(key, co2Kg, co2KgVariance);
+      counts.add(key, count, countVariance);
+    });
+  };
+  inRange.filter(row => !partial.includes(row._id.month)).forEach(row => add(row._id, row.co2Kg, row.count));
+  const estimates = estimateStrata(strata, { startDate, endDate });
+  estimates.forEach(e => add(e, e.co2Kg, e.count, e.co2KgVariance, e.countVariance));
+
+  const comparisonTotal = month => rollups
+    .filter(row => row._id.month === month)
+    .reduce((sum, row) => sum + row.co2Kg, 0);
+  const lastMonthTotal = comparisonTotal(comparison.lastMonth);
+  const twoMonthsAgoTotal = comparisonTotal(comparison.twoMonthsAgo);
+  const round = value => Math.round(value * 100) / 100;
+  const breakdown = prefix => Object.fromEntries(co2.keys(prefix).map(k => [k, round(co2.value(prefix + k))]));
+  const intervals = prefix => Object.fromEntries(co2.keys(prefix).map(k => [k, co2.interval(prefix + k)]));
+  const sortedMonths = map => Object.fromEntries(Object.entries(map).sort(([a], [b]) => a.localeCompare(b)));
 
-      const query = {};
-      if (department && department !== 'all') query.department = department;
-      if (startDate || endDate) {
-        query.date = {};
-        if (startDate) query.date.$gte = startDate;
-        if (endDate) query.date.$lte = endDate;
+  return {
+    totalEmissions: round(co2.value('total')),
+    totalRecords: Math.round(counts.value('total')),
+    categoryBreakdown: breakdown('category:'),
+    departmentBreakdown: breakdown('department:'),
+    monthlyData: sortedMonths(breakdown('month:')),
+    lastMonthTotal: round(lastMonthTotal),
+    twoMonthsAgoTotal: round(twoMonthsAgoTotal),
+    monthOverMonthChange: twoMonthsAgoTotal > 0
+      ? parseFloat(((lastMonthTotal - twoMonthsAgoTotal) / twoMonthsAgoTotal * 100).toFixed(1))
+      : 0,
+    periods: plan.periods,
+    approximation: {
+      method: partial.length > 0 ? 'sampled' : 'rollups',
+      confidence: 0.95,
+      // Sampled records inside the range, and the records they stand in for
+      sampleSize: estimates.reduce((sum, e) => sum + e.sampleSize, 0),
+      sampledRecords: inRange
+        .filter(row => partial.includes(row._id.month))
+        .reduce((sum, row) => sum + row.count, 0),
+      intervals: {
+        totalEmissions: co2.interval('total'),
+        totalRecords: counts.interval('total').map(Math.round),
+        categoryBreakdown: intervals('category:'),
+        departmentBreakdown: intervals('department:'),
+        monthlyData: sortedMonths(intervals('month:'))
       }
+    }
+  };
+}
 
-      const emissions = await db.collection('emissions').find(query).toArray();
+// Rollup totals per (month, category), which trends, recommendations and the
+// whole-history monthly series can all be derived from
+function monthCategoryRollups(db, department) {
+  return db.collection(ROLLUP_COLLECTION).aggregate([
+    { $match: rollupMatch(department) },
+    { $group: { _id: { month: '$month', category: '$category' }, co2Kg: { $sum: '$co2Kg' } } }
+  ]).toArray();
+}
 
-      const totalEmissions = emissions.reduce((sum, e) => sum + (e.co2Kg || 0), 0);
-      const categoryBreakdown = {};
-      const departmentBreakdown = {};
-      const monthlyData = {};
+// GET /api/analytics/trends
+async function computeTrends(db, searchParams) {
+  const months = parseInt(searchParams.get('months') || '12');
+  return trendsFromRollups(await monthCategoryRollups(db, searchParams.get('department')), months);
+}
 
-      emissions.forEach(emission => {
-        // Category breakdown
-        if (!categoryBreakdown[emission.category]) {
-          categoryBreakdown[emission.category] = 0;
-        }
-        categoryBreakdown[emission.category] += emission.co2Kg || 0;
+function trendsFromRollups(rollups, months) {
+  // Group by month
+  const monthlyTrends = {};
+  rollups.forEach(({ _id: { month, category }, co2Kg }) => {
+    if (!monthlyTrends[month]) {
+      monthlyTrends[month] = {
+        month,
+        electricity: 0,
+        transportation: 0,
+        heating: 0,
+        waste: 0,
+        total: 0
+      };
+    }
+    monthlyTrends[month][category] = (monthlyTrends[month][category] || 0) + co2Kg;
+    monthlyTrends[month].total += co2Kg;
+  });
 
-        // Department breakdown
-        if (!departmentBreakdown[emission.department]) {
-          departmentBreakdown[emission.department] = 0;
-        }
-        departmentBreakdown[emission.department] += emission.co2Kg || 0;
+  // Sort by month and get last N months
+  const sortedTrends = Object.values(monthlyTrends)
+    .sort((a, b) => a.month.localeCompare(b.month))
+    .slice(-months);
 
-        // Monthly data
-        const month = emission.date.substring(0, 7); // YYYY-MM
-        if (!monthlyData[month]) {
-          monthlyData[month] = 0;
-        }
-        monthlyData[month] += emission.co2Kg || 0;
-      });
+  return sortedTrends;
+}
 
-      // Calculate previous period for comparison
-      const currentDate = new Date();
-      const lastMonthStart = new Date(currentDate.getFullYear(), currentDate.getMonth() - 1, 1).toISOString().split('T')[0];
-      const lastMonthEnd = new Date(currentDate.getFullYear(), currentDate.getMonth(), 0).toISOString().split('T')[0];
-      
-      const lastMonthQuery = {
-        date: { $gte: lastMonthStart, $lte: lastMonthEnd }
-      };
-      if (department && department !== 'all') lastMonthQuery.department = department;
-      
-      const lastMonthEmissions = await db.collection('emissions').find(lastMonthQuery).toArray();
-      const lastMonthTotal = lastMonthEmissions.reduce((sum, e) => sum + (e.co2Kg || 0), 0);
+// GET /api/recommendations
+async function computeRecommendations(db, searchParams) {
+  const rollups = await db.collection(ROLLUP_COLLECTION).aggregate([
+    { $match: rollupMatch(searchParams.get('department')) },
+    { $group: { _id: '$category', co2Kg: { $sum: '$co2Kg' } } }
+  ]).toArray();
+  
+  const categoryTotals = {};
+  rollups.forEach(row => {
+    categoryTotals[row._id] = row.co2Kg;
+  });
+  return recommendationsFromTotals(categoryTotals);
+}
+
+function recommendationsFromTotals(categoryTotals) {
+  const recommendations = [];
 
-      // Calculate two months ago for trend
-      const twoMonthsAgoStart = new Date(currentDate.getFullYear(), currentDate.getMonth() - 2, 1).toISOString().split('T')[0];
-      const twoMonthsAgoEnd = new Date(currentDate.getFullYear(), currentDate.getMonth() - 1, 0).toISOString().split('T')[0];
+  // Generate recommendations based on highest emissions
+  const sortedCategories = Object.entries(categoryTotals)
+    .sort(([, a], [, b]) => b - a);
+
+  sortedCategories.forEach(([category, total], index) => {
+    if (index < 3) { // Top 3 categories
+      const percentage = ((total / Object.values(categoryTotals).reduce((a, b) => a + b, 0)) * 100).toFixed(1);
       
-      const twoMonthsAgoQuery = {
-        date: { $gte: twoMonthsAgoStart, $lte: twoMonthsAgoEnd }
-      };
-      if (department && department !== 'all') twoMonthsAgoQuery.department = department;
+      let recommendation = {};
       
-      const twoMonthsAgoEmissions = await db.collection('emissions').find(twoMonthsAgoQuery).toArray();
-      const twoMonthsAgoTotal = twoMonthsAgoEmissions.reduce((sum, e) => sum + (e.co2Kg || 0), 0);
+      if (category === 'electricity') {
+        recommendation = {
+          id: uuidv4(),
+          category,
+          priority: 'high',
+          title: 'Switch to Renewable Energy',
+          description: `Electricity accounts for ${percentage}% of your emissions (${Math.round(total)} kg CO2). Consider installing solar panels or switching to a renewable energy provider.`,
+          potentialReduction: `${Math.round(total * 0.7)} kg CO2/year`,
+          estimatedCost: '$15,000 - $25,000 (solar installation)',
+          paybackPeriod: '7-10 years'
+        };
+      } else if (category === 'transportation') {
+        recommendation = {
+          id: uuidv4(),
+          category,
+          priority: 'high',
+          title: 'Optimize Fleet & Promote EVs',
+          description: `Transportation represents ${percentage}% of emissions (${Math.round(total)} kg CO2). Transition to electric or hybrid vehicles and encourage carpooling.`,
+          potentialReduction: `${Math.round(total * 0.5)} kg CO2/year`,
+          estimatedCost: '$30,000 - $50,000 per EV',
+          paybackPeriod: '5-8 years'
+        };
+      } else if (category === 'heating') {
+        recommendation = {
+          id: uuidv4(),
+          category,
+          priority: 'medium',
+          title: 'Improve Insulation & Upgrade HVAC',
+          description: `Heating/cooling is ${percentage}% of your footprint (${Math.round(total)} kg CO2). Improve building insulation and upgrade to energy-efficient HVAC systems.`,
+          potentialReduction: `${Math.round(total * 0.3)} kg CO2/year`,
+          estimatedCost: '$5,000 - $15,000',
+          paybackPeriod: '3-5 years'
+        };
+      } else if (category === 'waste') {
+        recommendation = {
+          id: uuidv4(),
+          category,
+          priority: 'medium',
+          title: 'Implement Recycling & Composting Program',
+          description: `Waste contributes ${percentage}% to emissions (${Math.round(total)} kg CO2). Start comprehensive recycling and composting programs.`,
+          potentialReduction: `${Math.round(total * 0.8)} kg CO2/year`,
+          estimatedCost: '$2,000 - $5,000',
+          paybackPeriod: '2-3 years'
+        };
+      }
+      
+      recommendations.push(recommendation);
+    }
+  });
+
+  // Add general recommendations
+  if (recommendations.length < 3) {
+    recommendations.push({
+      id: uuidv4(),
+      category: 'general',
+      priority: 'low',
+      title: 'Conduct Energy Audit',
+      description: 'Perform a comprehensive energy audit to identify additional reduction opportunities.',
+      potentialReduction: 'Variable',
+      estimatedCost: '$500 - $2,000',
+      paybackPeriod: 'Immediate insights'
+    });
+  }
 
-      const monthOverMonthChange = twoMonthsAgoTotal > 0 
-        ? ((lastMonthTotal - twoMonthsAgoTotal) / twoMonthsAgoTotal * 100).toFixed(1)
-        : 0;
+  return recommendations;
+}
 
-      return Response.json({
-        success: true,
-        data: {
-          totalEmissions: Math.round(totalEmissions * 100) / 100,
-          totalRecords: emissions.length,
-          categoryBreakdown,
-          departmentBreakdown,
-          monthlyData,
-          lastMonthTotal: Math.round(lastMonthTotal * 100) / 100,
-          monthOverMonthChange: parseFloat(monthOverMonthChange)
-        }
-      });
+const DASHBOARD_PANELS = ['summary', 'trends', 'recommendations', 'emissions'];
+
+// ?panels=summary,trends (default: all of DASHBOARD_PANELS)
+function parseDashboardPanels(searchParams) {
+  const param = searchParams.get('panels');
+  const panels = param ? param.split(',').map(p => p.trim()).filter(Boolean) : DASHBOARD_PANELS;
+  const unknown = panels.filter(p => !DASHBOARD_PANELS.includes(p));
+  if (unknown.length > 0 || panels.length === 0) {
+    return { error: `panels must be a comma-separated subset of ${DASHBOARD_PANELS.join(', ')}` };
+  }
+  return { panels: new Set(panels) };
+}
+
+// GET /api/dashboard
+//
+// The panels the dashboard shows, from at most two queries run in parallel:
+//
+//   - one emissions aggregation: the summary $facet, with the first page of
+//     records as one more facet over the same $match;
+//   - one rollup aggregation per (month, category), from which trends,
+//     recommendations and the whole-history monthly series are all derived.
+//
+// Later pages (a cursor) and a category filter on the records are served by
+// the same keyset query as GET /api/emissions instead of a facet.
+async function computeDashboard(db, searchParams, panels, page) {
+  const department = searchParams.get('department');
+  const category = searchParams.get('category');
+  const plan = summaryPlan(searchParams);
+  const facetPage = panels.has('emissions') && panels.has('summary')
+    && !searchParams.get('cursor') && (!category || category === 'all');
+  const pageProjection = page.projection || { _id: 0 };
+
+  let emissionsQuery = null;
+  if (panels.has('summary')) {
+    const facets = { ...plan.facets };
+    if (facetPage) {
+      facets.page = [
+        ...plan.inRange,
+        { $sort: { date: -1, id: -1 } },
+        { $limit: page.limit + 1 },
+        { $project: pageProjection }
+      ];
     }
+    emissionsQuery = emissionStore(db).aggregate([{ $match: plan.match }, { $facet: facets }]).toArray();
+  }
 
-    // GET /api/analytics/trends - Get trend data for charts
-    if (path === 'analytics/trends') {
-      const department = url.searchParams.get('department');
-      const months = parseInt(url.searchParams.get('months') || '12');
-
-      const query = {};
-      if (department && department !== 'all') query.department = department;
-
-      const emissions = await db.collection('emissions').find(query).toArray();
-
-      // Group by month
-      const monthlyTrends = {};
-      emissions.forEach(emission => {
-        const month = emission.date.substring(0, 7);
-        if (!monthlyTrends[month]) {
-          monthlyTrends[month] = {
-            month,
-            electricity: 0,
-            transportation: 0,
-            heating: 0,
-            waste: 0,
-            total: 0
-          };
-        }
-        const category = emission.category;
-        monthlyTrends[month][category] = (monthlyTrends[month][category] || 0) + (emission.co2Kg || 0);
-        monthlyTrends[month].total += emission.co2Kg || 0;
+  const pageQuery = panels.has('emissions') && !facetPage
+    ? emissionStore(db).find(page.query, {
+      projection: pageProjection,
+      sort: { date: -1, id: -1 },
+      limit: page.limit + 1
+    }).toArray()
+    : null;
+  const needsRollups = panels.has('trends') || panels.has('recommendations')
+    || (panels.has('summary') && !plan.hasDateRange);
+
+  const [facetResults, pageRows, rollups] = await Promise.all([
+    emissionsQuery,
+    pageQuery,
+    needsRollups ? monthCategoryRollups(db, department) : null
+  ]);
+
+  const data = {};
+  if (panels.has('summary')) {
+    const monthly = new Map();
+    (rollups || []).forEach(({ _id: { month }, co2Kg }) => monthly.set(month, (monthly.get(month) || 0) + co2Kg));
+    const monthlyRollups = [...monthly.entries()].sort(([a], [b]) => a.localeCompare(b)).map(([_id, total]) => ({ _id, total }));
+    data.summary = summaryFromResults(plan, facetResults[0], monthlyRollups);
+  }
+  if (panels.has('trends')) {
+    data.trends = trendsFromRollups(rollups, parseInt(searchParams.get('months') || '12'));
+  }
+  if (panels.has('recommendations')) {
+    const categoryTotals = {};
+    rollups.forEach(({ _id: { category }, co2Kg }) => {
+      categoryTotals[category] = (categoryTotals[category] || 0) + co2Kg;
+    });
+    data.recommendations = recommendationsFromTotals(categoryTotals);
+  }
+  if (panels.has('emissions')) {
+    data.emissions = pageFromRows(facetPage ? facetResults[0].page : pageRows, page.limit);
+  }
+  return data;
+}
+
+// Response.json with the encoding time recorded as the serialize phase
+function jsonResponse(payload, init) {
+  return measureSync('serialize', () => Response.json(payload, init));
+}
+
+// Serve a JSON payload from the response cache, computing it on a miss.
+// Responses carry a strong ETag so unchanged results come back as 304.
+async function cachedJson(db, request, path, searchParams, compute) {
+  const key = cacheKey(path, searchParams);
+  const version = await syncDataVersion(db);
+  let entry = responseCache.get(key);
+  const hit = Boolean(entry);
+
+  if (!entry) {
+    const data = await compute();
+    const body = measureSync('serialize', () => JSON.stringify({ success: true, data }));
+    entry = { body, etag: strongEtag(body), version };
+    responseCache.set(key, entry);
+  }
+
+  const headers = { ETag: entry.etag, 'Cache-Control': 'no-cache', 'X-Cache': hit ? 'HIT' : 'MISS' };
+  if (etagMatches(request.headers.get('if-none-match'), entry.etag)) {
+    responseCache.counters.notModified += 1;
+    return new Response(null, { status: 304, headers });
+  }
+  return new Response(entry.body, { headers: { ...headers, 'Content-Type': 'application/json' } });
+}
+
+async function handleGet(request) {
+  const url = new URL(request.url);
+  const path = url.pathname.replace('/api/', '');
+
+  // GET /api/metrics - Prometheus text format; works without a database
+  if (path === 'metrics') {
+    const cache = responseCache.stats();
+    const ingest = ingestStats();
+    const body = renderMetrics([
+      ['carbon_response_cache_hits', 'Response cache hits since start', cache.hits],
+      ['carbon_response_cache_misses', 'Response cache misses since start', cache.misses],
+      ['carbon_response_cache_entries', 'Entries in the response cache', cache.entries],
+      ['carbon_response_cache_bytes', 'Bytes held by the response cache', cache.bytes],
+      ['carbon_data_version', 'Writes seen by this process', cache.dataVersion],
+      ...(ingest ? [
+        ['carbon_ingest_pending_records', 'Records queued in the ingest buffer', ingest.pending],
+        ['carbon_ingest_batches', 'Ingest buffer batches written since start', ingest.batches],
+        ['carbon_ingest_records', 'Records written by the ingest buffer since start', ingest.records],
+        ['carbon_ingest_rejected', 'Records refused by a full ingest buffer since start', ingest.rejected]
+      ] : [])
+    ]);
+    return new Response(body, { headers: { 'Content-Type': 'text/plain; version=0.0.4; charset=utf-8' } });
+  }
+
+  try {
+    const { db } = await connectToDatabase();
+
+    // GET /api/emissions - Get all emissions with filters
+    if (path === 'emissions' || path === 'emissions/') {
+      const paginated = url.searchParams.get('limit') !== null || url.searchParams.get('cursor') !== null;
+      const { query, projection, limit, error } = parseEmissionsQuery(url.searchParams, { paginated });
+      if (error) {
+        return Response.json({ error }, { status: 400 });
+      }
+
+      const accept = request.headers.get('accept') || '';
+      // Columnar export of every matching record (lib/arrow-export.js)
+      if (accept.includes(ARROW_CONTENT_TYPE)) {
+        const fields = projection ? Object.keys(projection).filter(f => f !== '_id') : DEFAULT_ARROW_FIELDS;
+        const cursor = emissionStore(db).find(query, {
+          projection: { _id: 0, ...Object.fromEntries(fields.map(f => [f, 1])) },
+          sort: { date: -1, id: -1 },
+          limit
+        });
+        return arrowResponse(cursor.batchSize(10000), fields);
+      }
+
+      const ndjson = accept.includes('application/x-ndjson');
+      // JSON pages fetch one extra row to learn whether another page exists
+      const cursor = emissionStore(db).find(query, {
+        projection,
+        sort: { date: -1, id: -1 },
+        limit: paginated && !ndjson ? limit + 1 : limit
       });
 
-      // Sort by month and get last N months
-      const sortedTrends = Object.values(monthlyTrends)
-        .sort((a, b) => a.month.localeCompare(b.month))
-        .slice(-months);
+      if (ndjson) {
+        return ndjsonResponse(cursor.batchSize(1000));
+      }
+
+      if (!paginated) {
+        const emissions = await cursor.toArray();
+        return jsonResponse({ success: true, data: emissions });
+      }
 
-      return Response.json({ success: true, data: sortedTrends });
+      const { data, nextCursor } = pageFromRows(await cursor.toArray(), limit);
+      return jsonResponse({ success: true, data, nextCursor });
     }
 
-    // GET /api/recommendations - Get AI recommendations
-    if (path === 'recommendations' || path === 'recommendations/') {
-      const department = url.searchParams.get('department');
-      
-      const query = {};
-      if (department && department !== 'all') query.department = department;
-      
-      const emissions = await db.collection('emissions').find(query).toArray();
-      
-      const categoryTotals = {};
-      emissions.forEach(e => {
-        categoryTotals[e.category] = (categoryTotals[e.category] || 0) + e.co2Kg;
+    // GET /api/emissions/changes?since=<token> - Record changes after a
+    // token, oldest first (lib/change-feed.js). Without `since` only the
+    // current token is returned; a full load takes its token from
+    // GET /api/dashboard instead.
+    if (path === 'emissions/changes') {
+      const sinceParam = url.searchParams.get('since');
+      if (sinceParam === null) {
+        return Response.json({ success: true, data: { changes: [], token: String(await changeHead(db)) } });
+      }
+      if (!/^\d+$/.test(sinceParam)) {
+        return Response.json({ error: 'since must be a token from a previous response' }, { status: 400 });
+      }
+      const limit = parseInt(url.searchParams.get('limit') || String(DEFAULT_CHANGES_LIMIT));
+      if (!Number.isInteger(limit) || limit < 1 || limit > MAX_CHANGES_LIMIT) {
+        return Response.json({ error: `limit must be an integer between 1 and ${MAX_CHANGES_LIMIT}` }, { status: 400 });
+      }
+
+      const { changes, token, hasMore, reset } = await readChanges(db, parseInt(sinceParam), { limit });
+      return jsonResponse({
+        success: true,
+        data: { changes, token: String(token), hasMore, reset }
       });
+    }
 
-      const recommendations = [];
-
-      // Generate recommendations based on highest emissions
-      const sortedCategories = Object.entries(categoryTotals)
-        .sort(([, a], [, b]) => b - a);
-
-      sortedCategories.forEach(([category, total], index) => {
-        if (index < 3) { // Top 3 categories
-          const percentage = ((total / Object.values(categoryTotals).reduce((a, b) => a + b, 0)) * 100).toFixed(1);
-          
-          let recommendation = {};
-          
-          if (category === 'electricity') {
-            recommendation = {
-              id: uuidv4(),
-              category,
-              priority: 'high',
-              title: 'Switch to Renewable Energy',
-              description: `Electricity accounts for ${percentage}% of your emissions (${Math.round(total)} kg CO2). Consider installing solar panels or switching to a renewable energy provider.`,
-              potentialReduction: `${Math.round(total * 0.7)} kg CO2/year`,
-              estimatedCost: '$15,000 - $25,000 (solar installation)',
-              paybackPeriod: '7-10 years'
-            };
-          } else if (category === 'transportation') {
-            recommendation = {
-              id: uuidv4(),
-              category,
-              priority: 'high',
-              title: 'Optimize Fleet & Promote EVs',
-              description: `Transportation represents ${percentage}% of emissions (${Math.round(total)} kg CO2). Transition to electric or hybrid vehicles and encourage carpooling.`,
-              potentialReduction: `${Math.round(total * 0.5)} kg CO2/year`,
-              estimatedCost: '$30,000 - $50,000 per EV',
-              paybackPeriod: '5-8 years'
-            };
-          } else if (category === 'heating') {
-            recommendation = {
-              id: uuidv4(),
-              category,
-              priority: 'medium',
-              title: 'Improve Insulation & Upgrade HVAC',
-              description: `Heating/cooling is ${percentage}% of your footprint (${Math.round(total)} kg CO2). Improve building insulation and upgrade to energy-efficient HVAC systems.`,
-              potentialReduction: `${Math.round(total * 0.3)} kg CO2/year`,
-              estimatedCost: '$5,000 - $15,000',
-              paybackPeriod: '3-5 years'
-            };
-          } else if (category === 'waste') {
-            recommendation = {
-              id: uuidv4(),
-              category,
-              priority: 'medium',
-              title: 'Implement Recycling & Composting Program',
-              description: `Waste contributes ${percentage}% to emissions (${Math.round(total)} kg CO2). Start comprehensive recycling and composting programs.`,
-              potentialReduction: `${Math.round(total * 0.8)} kg CO2/year`,
-              estimatedCost: '$2,000 - $5,000',
-              paybackPeriod: '2-3 years'
-            };
-          }
-          
-          recommendations.push(recommendation);
-        }
+    // GET /api/departments - Get all departments
+    if (path === 'departments' || path === 'departments/') {
+      const departments = await db.collection('departments').find({}).toArray();
+      return jsonResponse({ success: true, data: departments });
+    }
+
+    // GET /api/analytics/summary?mode=exact|approx - Get summary analytics
+    if (path === 'analytics/summary') {
+      const { mode, error } = parseAnalyticsMode(url.searchParams);
+      if (error) {
+        return Response.json({ error }, { status: 400 });
+      }
+      const compute = mode === 'approx' ? computeApproxSummary : computeSummary;
+      return cachedJson(db, request, path, url.searchParams, () => compute(db, url.searchParams));
+    }
+
+    // GET /api/dashboard?panels=summary,trends,recommendations,emissions - All
+    // dashboard panels for one filter in one response; the emissions panel
+    // takes limit, cursor and fields as GET /api/emissions does. `changeToken`
+    // is the change feed position the panels reflect (null when every read
+    // overlapped a write).
+    if (path === 'dashboard' || path === 'dashboard/') {
+      const { panels, error } = parseDashboardPanels(url.searchParams);
+      const page = panels?.has('emissions') ? parseEmissionsQuery(url.searchParams, { paginated: true }) : {};
+      if (error || page.error) {
+        return Response.json({ error: error || page.error }, { status: 400 });
+      }
+      return cachedJson(db, request, path, url.searchParams, async () => {
+        const { value, token } = await readSnapshot(db, () => computeDashboard(db, url.searchParams, panels, page));
+        return { ...value, changeToken: token === null ? null : String(token) };
       });
+    }
 
-      // Add general recommendations
-      if (recommendations.length < 3) {
-        recommendations.push({
-          id: uuidv4(),
-          category: 'general',
-          priority: 'low',
-          title: 'Conduct Energy Audit',
-          description: 'Perform a comprehensive energy audit to identify additional reduction opportunities.',
-          potentialReduction: 'Variable',
-          estimatedCost: '$500 - $2,000',
-          paybackPeriod: 'Immediate insights'
-        });
+    // GET /api/analytics/trends - Get trend data for charts. Trends are read
+    // from the monthly rollups, so ?mode=approx is accepted but already exact.
+    if (path === 'analytics/trends') {
+      const { error } = parseAnalyticsMode(url.searchParams);
+      if (error) {
+        return Response.json({ error }, { status: 400 });
       }
+      return cachedJson(db, request, path, url.searchParams, () => computeTrends(db, url.searchParams));
+    }
 
-      return Response.json({ success: true, data: recommendations });
+    // GET /api/recommendations - Get AI recommendations
+    if (path === 'recommendations' || path === 'recommendations/') {
+      return cachedJson(db, request, path, url.searchParams, () => computeRecommendations(db, url.searchParams));
     }
 
-    // GET /api/emission-factors - Get all emission factors
+    // GET /api/cache/stats - Response cache hit/miss counters
+    if (path === 'cache/stats') {
+      return Response.json({ success: true, data: responseCache.stats() });
+    }
+
+    // GET /api/ingest/stats - Group-commit buffer counters (INGEST_BUFFER=on)
+    if (path === 'ingest/stats') {
+      return Response.json({ success: true, data: { enabled: ingestBufferEnabled(), ...ingestStats() } });
+    }
+
+    // GET /api/emission-factors - Get the emission factors in effect today
     if (path === 'emission-factors' || path === 'emission-factors/') {
-      return Response.json({ success: true, data: EMISSION_FACTORS });
+      const versions = await loadFactorVersions(db);
+      const today = new Date().toISOString().substring(0, 10);
+      return Response.json({ success: true, data: versionForDate(versions, today).factors });
+    }
+
+    // GET /api/emission-factors/versions - Get every dated factor version
+    if (path === 'emission-factors/versions') {
+      return Response.json({ success: true, data: await loadFactorVersions(db) });
+    }
+
+    // GET /api/recalculations - Get recent recalculation jobs
+    if (path === 'recalculations' || path === 'recalculations/') {
+      return Response.json({ success: true, data: await listRecalculationJobs(db) });
+    }
+
+    // GET /api/recalculations/:id - Get a recalculation job's progress
+    if (path.startsWith('recalculations/')) {
+      const job = await getRecalculationJob(db, path.split('/')[1]);
+      if (!job) {
+        return Response.json({ error: 'Recalculation job not found' }, { status: 404 });
+      }
+      return Response.json({ success: true, data: job });
     }
 
     return Response.json({ error: 'Endpoint not found' }, { status: 404 });
@@ -326,50 +975,237 @@ export async function GET(request) {
   }
 }
 
-export async function POST(request) {
+const IMPORT_REQUIRED_COLUMNS = ['date', 'category', 'subcategory', 'value', 'department'];
+const DEFAULT_IMPORT_BATCH_SIZE = 1000;
+const MAX_IMPORT_BATCH_SIZE = 10000;
+const MAX_REPORTED_IMPORT_ERRORS = 1000;
+
+function validateImportRow(row) {
+  const missing = IMPORT_REQUIRED_COLUMNS.filter(column => row[column] === undefined || row[column] === null || row[column] === '');
+  if (missing.length > 0) return `Missing required fields: ${missing.join(', ')}`;
+  if (!/^\d{4}-\d{2}-\d{2}$/.test(row.date)) return `Invalid date "${row.date}", expected YYYY-MM-DD`;
+  if (!Number.isFinite(parseEmissionValue(row.value))) return `Invalid value "${row.value}"`;
+  if (!EMISSION_FACTORS[row.category]?.[row.subcategory]) {
+    return `Unknown category/subcategory "${row.category}/${row.subcategory}"`;
+  }
+  return null;
+}
+
+// Rows of a bulk upload that cannot be stored, as { index, error }. Derived
+// data is keyed on every row's date, category and department, so one bad row
+// rejects the whole upload before anything is written.
+function invalidBulkRows(emissions) {
+  return emissions
+    .map((row, index) => ({
+      index,
+      error: row && typeof row === 'object' ? validateImportRow(row) : 'Row must be an object'
+    }))
+    .filter(({ error }) => error);
+}
+
+// Parse a CSV body incrementally and insert it in unordered batches. Parsing
+// pauses while a batch is in flight, so at most two batches are held in
+// memory whatever the size of the upload.
+async function importEmissionsCsv(db, stream, batchSize) {
+  const startedAt = Date.now();
+  const versions = await loadFactorVersions(db);
+  const errors = [];
+  let failed = 0;
+  let imported = 0;
+  let rows = 0;
+  let headers = null;
+  let batch = [];
+  let batchRows = [];
+  let inFlight = null;
+
+  const reportError = (row, error) => {
+    failed += 1;
+    if (errors.length < MAX_REPORTED_IMPORT_ERRORS) errors.push({ row, error });
+  };
+
+  const writeBatch = (docs, rowNumbers) => trackedWrite(db, async write => {
+    let failedIndexes = new Set();
+    try {
+      await emissionStore(db).insertMany(docs, { ordered: false });
+    } catch (error) {
+      if (!error.writeErrors) throw error;
+      const writeErrors = Array.isArray(error.writeErrors) ? error.writeErrors : [error.writeErrors];
+      failedIndexes = new Set(writeErrors.map(e => e.index));
+      writeErrors.forEach(e => reportError(rowNumbers[e.index], e.errmsg || 'Write failed'));
+    }
+    const inserted = docs.filter((_, index) => !failedIndexes.has(index));
+    imported += inserted.length;
+    await onEmissionsChanged(db, { inserted }, write);
+  });
+
+  const flush = async () => {
+    if (inFlight) await inFlight;
+    inFlight = batch.length > 0 ? writeBatch(batch, batchRows) : null;
+    // Failures surface when the batch is awaited; don't report them as unhandled meanwhile
+    inFlight?.catch(() => {});
+    batch = [];
+    batchRows = [];
+  };
+
+  for await (const record of parseCsvStream(stream)) {
+    if (!headers) {
+      headers = record.map(h => h.trim().toLowerCase());
+      const missing = IMPORT_REQUIRED_COLUMNS.filter(column => !headers.includes(column));
+      if (missing.length > 0) {
+        return { error: `CSV header is missing columns: ${missing.join(', ')}` };
+      }
+      continue;
+    }
+
+    rows += 1;
+    const rowNumber = rows + 1; // 1-based, counting the header line
+    const row = {};
+    headers.forEach((header, index) => {
+      row[header] = (record[index] ?? '').trim();
+    });
+
+    const error = validateImportRow(row);
+    if (error) {
+      reportError(rowNumber, error);
+      continue;
+    }
+
+    const value = parseEmissionValue(row.value);
+    const calculation = calculateForDate(versions, { ...row, value });
+    batch.push({
+      id: uuidv4(),
+      date: row.date,
+      category: row.category,
+      subcategory: row.subcategory,
+      value,
+      unit: row.unit || calculation.unit,
+      department: row.department,
+      notes: row.notes || '',
+      co2Lbs: calculation.co2Lbs,
+      co2Kg: calculation.co2Kg,
+      emissionFactor: calculation.factor,
+      factorVersion: calculation.version,
+      createdAt: new Date().toISOString()
+    });
+    batchRows.push(rowNumber);
+
+    if (batch.length >= batchSize) await flush();
+  }
+
+  if (!headers) return { error: 'CSV file is empty' };
+
+  await flush();
+  if (inFlight) await inFlight;
+
+  const durationMs = Date.now() - startedAt;
+  return {
+    rows,
+    imported,
+    failed,
+    errors,
+    errorsTruncated: failed > errors.length,
+    durationMs,
+    rowsPerSecond: durationMs > 0 ? Math.round(rows / (durationMs / 1000)) : rows
+  };
+}
+
+async function handlePost(request) {
   const url = new URL(request.url);
   const path = url.pathname.replace('/api/', '');
 
   try {
     const { db } = await connectToDatabase();
+
+    // POST /api/emissions/import - Stream a CSV body (text/csv) into the emissions collection
+    if (path === 'emissions/import') {
+      if (!request.body) {
+        return Response.json({ error: 'CSV body is required' }, { status: 400 });
+      }
+
+      const requestedBatchSize = parseInt(url.searchParams.get('batchSize') || '') || DEFAULT_IMPORT_BATCH_SIZE;
+      const batchSize = Math.max(1, Math.min(requestedBatchSize, MAX_IMPORT_BATCH_SIZE));
+      const result = await importEmissionsCsv(db, request.body, batchSize);
+
+      if (result.error) {
+        return Response.json({ error: result.error }, { status: 400 });
+      }
+
+      return Response.json({ success: true, data: result }, { status: 201 });
+    }
+
+    // POST /api/recalculations/:id/resume - Resume a failed or abandoned job
+    if (path.startsWith('recalculations/') && path.endsWith('/resume')) {
+      const id = path.split('/')[1];
+      const job = await getRecalculationJob(db, id);
+      if (!job) {
+        return Response.json({ error: 'Recalculation job not found' }, { status: 404 });
+      }
+      if (job.status === 'completed') {
+        return Response.json({ error: 'Recalculation job already completed' }, { status: 409 });
+      }
+
+      startRecalculation(db, id);
+
+      return Response.json({ success: true, data: job }, { status: 202 });
+    }
+
     const body = await request.json();
 
     // POST /api/emissions - Create new emission record
     if (path === 'emissions' || path === 'emissions/') {
-      const { date, category, subcategory, value, unit, department, notes } = body;
-
-      if (!date || !category || !subcategory || value === undefined || !department) {
-        return Response.json(
-          { error: 'Missing required fields: date, category, subcategory, value, department' },
-          { status: 400 }
-        );
+      // Checked as a bulk row is: a non-numeric value would poison the rollups
+      const error = body && typeof body === 'object' ? validateImportRow(body) : 'Body must be an object';
+      if (error) {
+        return Response.json({ error }, { status: 400 });
       }
+      const { date, category, subcategory, value, unit, department, notes } = body;
 
-      const calculation = calculateEmissions(category, subcategory, parseFloat(value));
+      const versions = await loadFactorVersions(db);
+      const calculation = calculateForDate(versions, { category, subcategory, value: parseEmissionValue(value), date });
 
       const emission = {
         id: uuidv4(),
         date,
         category,
         subcategory,
-        value: parseFloat(value),
+        value: parseEmissionValue(value),
         unit: unit || calculation.unit,
         department,
         notes: notes || '',
         co2Lbs: calculation.co2Lbs,
         co2Kg: calculation.co2Kg,
         emissionFactor: calculation.factor,
+        factorVersion: calculation.version,
         createdAt: new Date().toISOString()
       };
 
-      await db.collection('emissions').insertOne(emission);
+      if (ingestBufferEnabled()) {
+        try {
+          await sharedIngestBuffer(docs => insertEmissionBatch(db, docs)).add(emission);
+        } catch (error) {
+          if (!(error instanceof IngestBufferFullError)) throw error;
+          return Response.json(
+            { error: error.message },
+            { status: 503, headers: { 'Retry-After': String(error.retryAfterSeconds) } }
+          );
+        }
+      } else {
+        await trackedWrite(db, async write => {
+          await emissionStore(db).insertOne(emission);
+          await onEmissionsChanged(db, { inserted: [emission] }, write);
+        });
+      }
 
       return Response.json({ success: true, data: emission }, { status: 201 });
     }
 
-    // POST /api/emissions/bulk - Bulk upload emissions
+    // POST /api/emissions/bulk - Bulk upload emissions. With ?mode=upsert each
+    // record is keyed on its externalId (or a hash of its reading), so a
+    // retried upload updates the records it already stored instead of
+    // duplicating them.
     if (path === 'emissions/bulk') {
       const { emissions } = body;
+      const mode = url.searchParams.get('mode') || 'insert';
 
       if (!Array.isArray(emissions) || emissions.length === 0) {
         return Response.json(
@@ -377,26 +1213,87 @@ export async function POST(request) {
           { status: 400 }
         );
       }
+      if (mode !== 'insert' && mode !== 'upsert') {
+        return Response.json({ error: 'mode must be "insert" or "upsert"' }, { status: 400 });
+      }
+      const invalid = invalidBulkRows(emissions);
+      if (invalid.length > 0) {
+        return Response.json(
+          {
+            error: `${invalid.length} of ${emissions.length} rows are invalid; nothing was written`,
+            errors: invalid.slice(0, MAX_REPORTED_IMPORT_ERRORS)
+          },
+          { status: 400 }
+        );
+      }
+
+      const versions = await loadFactorVersions(db);
+
+      if (mode === 'upsert') {
+        const docs = emissions.map(e => {
+          const value = parseEmissionValue(e.value);
+          const calculation = calculateForDate(versions, { ...e, value });
+          const doc = {
+            date: e.date,
+            category: e.category,
+            subcategory: e.subcategory,
+            value,
+            unit: e.unit || calculation.unit,
+            department: e.department,
+            notes: e.notes || '',
+            co2Lbs: calculation.co2Lbs,
+            co2Kg: calculation.co2Kg,
+            emissionFactor: calculation.factor,
+            factorVersion: calculation.version
+          };
+          if (e.externalId !== undefined && e.externalId !== null && e.externalId !== '') {
+            doc.externalId = String(e.externalId);
+          }
+          doc.dedupeKey = dedupeKey(doc);
+          return doc;
+        });
+
+        const result = await trackedWrite(db, async write => {
+          const { changes, exact, ...counts } = await runEmissionUpsert(db, docs);
+          if (exact) {
+            await onEmissionsChanged(db, changes, write);
+          } else {
+            const months = new Set([...docs, ...changes.updated.map(u => u.before)]
+              .map(emission => emission.date.substring(0, 7)));
+            await onEmissionsRebuilt(db, months, 'upsert', write);
+          }
+          return counts;
+        });
+
+        return Response.json(
+          { success: true, data: { imported: result.inserted + result.updated + result.unchanged, ...result } },
+          { status: result.inserted > 0 ? 201 : 200 }
+        );
+      }
 
       const processedEmissions = emissions.map(e => {
-        const calculation = calculateEmissions(e.category, e.subcategory, parseFloat(e.value));
+        const calculation = calculateForDate(versions, { ...e, value: parseEmissionValue(e.value) });
         return {
           id: uuidv4(),
           date: e.date,
           category: e.category,
           subcategory: e.subcategory,
-          value: parseFloat(e.value),
+          value: parseEmissionValue(e.value),
           unit: e.unit || calculation.unit,
           department: e.department,
           notes: e.notes || '',
           co2Lbs: calculation.co2Lbs,
           co2Kg: calculation.co2Kg,
           emissionFactor: calculation.factor,
+          factorVersion: calculation.version,
           createdAt: new Date().toISOString()
         };
       });
 
-      await db.collection('emissions').insertMany(processedEmissions);
+      await trackedWrite(db, async write => {
+        await emissionStore(db).insertMany(processedEmissions);
+        await onEmissionsChanged(db, { inserted: processedEmissions }, write);
+      });
 
       return Response.json(
         { success: true, data: { imported: processedEmissions.length } },
@@ -404,6 +1301,76 @@ export async function POST(request) {
       );
     }
 
+    // POST /api/emissions/batch - Update and delete records by id or filter.
+    // Operations apply in order; each result lists the records it matched.
+    if (path === 'emissions/batch') {
+      const { operations, error } = parseBatchOperations(body);
+      if (error) {
+        return Response.json({ error }, { status: 400 });
+      }
+
+      const versions = await loadFactorVersions(db);
+      const batch = await trackedWrite(db, async write => {
+        const batch = await runEmissionBatch(db, versions, operations);
+        if (batch.error) return batch;
+        const { updated, deleted, exact } = batch;
+        if (!exact) {
+          // Some records changed again after the write, so the deltas of this
+          // batch are not known exactly; recompute the months it touched
+          const months = new Set([...updated.flatMap(u => [u.before, u.after]), ...deleted]
+            .map(emission => emission.date.substring(0, 7)));
+          await onEmissionsRebuilt(db, months, 'batch', write);
+        } else if (updated.length > 0 || deleted.length > 0) {
+          await onEmissionsChanged(db, { updated, deleted }, write);
+        }
+        return batch;
+      });
+      if (batch.error) {
+        return Response.json({ error: batch.error }, { status: 400 });
+      }
+
+      const { results, updated, deleted, conflicts } = batch;
+
+      return Response.json({
+        success: true,
+        data: { results, updated: updated.length, deleted: deleted.length, conflicts }
+      });
+    }
+
+    // POST /api/emission-factors/versions - Add a dated factor version;
+    // { recalculate: true } also restates the records it applies to
+    if (path === 'emission-factors/versions') {
+      const versions = await loadFactorVersions(db);
+      const error = validateFactorVersion(body, versions);
+      if (error) {
+        return Response.json({ error }, { status: 400 });
+      }
+
+      const version = await createFactorVersion(db, body);
+      let job = null;
+      if (body.recalculate) {
+        const scope = versionScope(await loadFactorVersions(db), version.version);
+        job = await createRecalculationJob(db, scope);
+        startRecalculation(db, job.id);
+      }
+
+      return Response.json({ success: true, data: { version, job } }, { status: 201 });
+    }
+
+    // POST /api/recalculations - Restate stored CO2 values with the factor
+    // versions in effect for each record's date
+    if (path === 'recalculations' || path === 'recalculations/') {
+      const error = validateRecalculationScope(body);
+      if (error) {
+        return Response.json({ error }, { status: 400 });
+      }
+
+      const job = await createRecalculationJob(db, body);
+      startRecalculation(db, job.id);
+
+      return Response.json({ success: true, data: job }, { status: 202 });
+    }
+
     // POST /api/departments - Create new department
     if (path === 'departments' || path === 'departments/') {
       const { name, description } = body;
@@ -432,7 +1399,7 @@ export async function POST(request) {
   }
 }
 
-export async function DELETE(request) {
+async function handleDelete(request) {
   const url = new URL(request.url);
   const path = url.pathname.replace('/api/', '');
 
@@ -443,9 +1410,13 @@ export async function DELETE(request) {
     if (path.startsWith('emissions/')) {
       const id = path.split('/')[1];
       
-      const result = await db.collection('emissions').deleteOne({ id });
+      const deleted = await trackedWrite(db, async write => {
+        const deleted = await emissionStore(db).deleteById(id);
+        if (deleted) await onEmissionsChanged(db, { deleted: [deleted] }, write);
+        return deleted;
+      });
 
-      if (result.deletedCount === 0) {
+      if (!deleted) {
         return Response.json({ error: 'Emission record not found' }, { status: 404 });
       }
 
@@ -460,7 +1431,7 @@ export async function DELETE(request) {
   }
 }
 
-export async function PUT(request) {
+async function handlePut(request) {
   const url = new URL(request.url);
   const path = url.pathname.replace('/api/', '');
 
@@ -471,48 +1442,59 @@ export async function PUT(request) {
     // PUT /api/emissions/:id - Update emission record
     if (path.startsWith('emissions/')) {
       const id = path.split('/')[1];
-      const { date, category, subcategory, value, unit, department, notes } = body;
-
-      const updateData = {};
-      if (date) updateData.date = date;
-      if (category) updateData.category = category;
-      if (subcategory) updateData.subcategory = subcategory;
-      if (department) updateData.department = department;
-      if (notes !== undefined) updateData.notes = notes;
-      
-      if (value !== undefined) {
-        const calculation = calculateEmissions(
-          category || body.category,
-          subcategory || body.subcategory,
-          parseFloat(value)
-        );
-        updateData.value = parseFloat(value);
-        updateData.co2Lbs = calculation.co2Lbs;
-        updateData.co2Kg = calculation.co2Kg;
-        updateData.emissionFactor = calculation.factor;
-        if (unit) updateData.unit = unit;
+      const changes = emissionChanges(body);
+      const error = validateEmissionChanges(changes);
+      if (error) {
+        return Response.json({ error }, { status: 400 });
       }
 
-      updateData.updatedAt = new Date().toISOString();
-
-      const result = await db.collection('emissions').updateOne(
-        { id },
-        { $set: updateData }
-      );
+      // One round trip: the pipeline restates CO2 from the record as stored
+      // (so a value-only change keeps its category and date), and the
+      // pre-image moves the record's totals between rollup rows. Time-series
+      // storage applies the same change in JS instead (lib/emission-store.js).
+      const versions = await loadFactorVersions(db);
+      const updatedAt = new Date().toISOString();
+
+      // A category or subcategory alone must pair with the other as stored,
+      // which takes a read first
+      if ((changes.category === undefined) !== (changes.subcategory === undefined)) {
+        const [stored] = await emissionStore(db).find({ id }, { projection: { _id: 0 }, limit: 1 }).toArray();
+        if (!stored) {
+          return Response.json({ error: 'Emission record not found' }, { status: 404 });
+        }
+        applyEmissionChanges(versions, stored, changes, updatedAt);
+      }
+      const updated = await trackedWrite(db, async write => {
+        const before = await emissionStore(db).updateById(
+          id,
+          emissionUpdatePipeline(versions, changes, updatedAt),
+          doc => applyEmissionChanges(versions, doc, changes, updatedAt)
+        );
+        if (!before) return null;
+        const after = applyEmissionChanges(versions, before, changes, updatedAt);
+        await onEmissionsChanged(db, { updated: [{ before, after }] }, write);
+        return after;
+      });
 
-      if (result.matchedCount === 0) {
+      if (!updated) {
         return Response.json({ error: 'Emission record not found' }, { status: 404 });
       }
 
-      const updated = await db.collection('emissions').findOne({ id });
-
       return Response.json({ success: true, data: updated });
     }
 
     return Response.json({ error: 'Endpoint not found' }, { status: 404 });
 
   } catch (error) {
+    if (error instanceof InvalidEmissionChangeError) {
+      return Response.json({ error: error.message }, { status: 400 });
+    }
     console.error('PUT Error:', error);
     return Response.json({ error: error.message }, { status: 500 });
   }
-}
\ No newline at end of file
+}
+
+export const GET = withMetrics('GET', handleGet);
+export const POST = withMetrics('POST', handlePost);
+export const PUT = withMetrics('PUT', handlePut);
+export const DELETE = withMetrics('DELETE', handleDelete);
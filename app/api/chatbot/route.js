@@ -2,24 +2,34 @@ import { GoogleGenerativeAI } from '@google/generative-ai';
 import fs from 'fs/promises';
 import path from 'path';
 import vm from 'vm';
-import { MongoClient } from 'mongodb';
+import { connectToDatabase } from '@/lib/mongodb';
+import { getChatContext, summarizeRows } from '@/lib/chat-context';
 
 const genAI = new GoogleGenerativeAI(process.env.GEMINI_API_KEY);
 
-async function getSeedData() {
+// Parsed once per process; the seed file does not change at runtime
+let seedContext = null;
+
+async function getDataContext() {
   try {
-    // Prefer reading from the live database if available — this is more reliable
-    // than parsing the seed file.
+    // Prefer the live database: the snapshot comes from the monthly rollups
+    // over the shared connection pool and is cached between messages.
     if (process.env.MONGO_URL) {
-      const client = new MongoClient(process.env.MONGO_URL);
-      await client.connect();
-      const db = client.db(process.env.DB_NAME || 'carbon_footprint_db');
-      const departments = await db.collection('departments').find({}).toArray();
-      const emissions = await db.collection('emissions').find({}).sort({ createdAt: -1 }).limit(200).toArray();
-      await client.close();
-      return { departments, emissions };
+      const { db } = await connectToDatabase();
+      return await getChatContext(db);
     }
 
+    if (!seedContext) seedContext = await readSeedContext();
+    return seedContext;
+  } catch (error) {
+    console.error('Error building chat context:', error);
+    return summarizeRows([], []);
+  }
+}
+
+async function readSeedContext() {
+  try {
+
     // Fallback: attempt a safer, sandboxed evaluation of array literals
     const filePath = path.join(process.cwd(), 'seed_data.js');
     const fileContent = await fs.readFile(filePath, 'utf-8');
@@ -57,28 +67,47 @@ async function getSeedData() {
       }
     }
 
-    return { departments, emissions };
+    const rows = emissions
+      .filter(e => typeof e.date === 'string')
+      .map(e => ({
+        month: e.date.substring(0, 7),
+        department: e.department,
+        category: e.category,
+        co2Kg: e.co2Kg || 0,
+        count: 1
+      }));
+    return summarizeRows(departments, rows);
   } catch (error) {
     console.error('Error reading seed data:', error);
-    return { departments: [], emissions: [] };
+    return summarizeRows([], []);
   }
 }
 
 export async function POST(req) {
   try {
     const { history = [], message } = await req.json();
-    const { departments, emissions } = await getSeedData();
+    const dataContext = await getDataContext();
 
     const context = `
       You are a carbon footprint analyst. Your role is to provide feedback and recommendations based on the user's data.
       Please provide a summary of the user's carbon footprint data in 100 words or less, formatted as a list of points.
-      Here is the data for the company:
-      Departments: ${JSON.stringify(departments, null, 2)}
-      Emissions: ${JSON.stringify(emissions.slice(-20), null, 2)} // Last 20 for brevity
+      Here is a summary of the company's emissions (kg CO2; changePct is month over month):
+      ${JSON.stringify(dataContext)}
     `;
 
     const fullMessage = `${context}\n\nUser message: ${message}`;
 
+    // Local testing without a model: report what would have been sent
+    if (process.env.CHATBOT_STUB === '1') {
+      return new Response(JSON.stringify({
+        text: `Stubbed reply to: ${message}`,
+        promptChars: fullMessage.length,
+        context: dataContext
+      }), {
+        headers: { 'Content-Type': 'application/json' },
+      });
+    }
+
     if (!process.env.GEMINI_API_KEY) {
       return new Response(JSON.stringify({ text: 'Generative AI not configured. Set GEMINI_API_KEY in .env.' }), {
         status: 400,
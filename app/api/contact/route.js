@@ -1,4 +1,7 @@
 import { NextResponse } from 'next/server';
+import { getContactLog, readContacts } from '@/lib/contact-log';
+
+const MAX_READ_LIMIT = 1000;
 
 export async function POST(request) {
   try {
@@ -9,32 +12,39 @@ export async function POST(request) {
       return NextResponse.json({ success: false, error: 'Missing required fields' }, { status: 400 });
     }
 
-    // For now, store to a simple file or in-memory store could be used.
-    // As we don't have a backend DB here, we'll append to a local file (server-side only).
-    // NOTE: This will only work in Node (won't persist on some serverless environments).
-    try {
-      const fs = await import('fs');
-      const path = await import('path');
-      const dataPath = path.join(process.cwd(), 'contacts.json');
-      const entry = { id: Date.now(), name, email, subject: subject || '', message, createdAt: new Date().toISOString() };
-      let arr = [];
-      try {
-        if (fs.existsSync(dataPath)) {
-          const raw = fs.readFileSync(dataPath, 'utf8');
-          arr = JSON.parse(raw || '[]');
-        }
-      } catch (e) {
-        // ignore
-      }
-      arr.push(entry);
-      fs.writeFileSync(dataPath, JSON.stringify(arr, null, 2), 'utf8');
-    } catch (err) {
-      // If filesystem access not available, just log
-      console.warn('Could not write contact to file:', err?.message || err);
-    }
+    // Appended to the contact log (lib/contact-log.js); resolves once on disk.
+    // NOTE: This needs a persistent filesystem (not available on some serverless environments).
+    const entry = await getContactLog().append({ name, email, subject: subject || '', message });
 
-    return NextResponse.json({ success: true, data: { received: true } });
+    return NextResponse.json({ success: true, data: { received: true, id: entry.id } });
   } catch (err) {
     return NextResponse.json({ success: false, error: err.message || 'Server error' }, { status: 500 });
   }
 }
+
+// GET /api/contact?limit=100&cursor=... - newest submissions first. Entries
+// hold personal data, so reading them requires CONTACT_ADMIN_TOKEN as a bearer
+// token and is disabled when it is not set.
+export async function GET(request) {
+  const token = process.env.CONTACT_ADMIN_TOKEN;
+  if (!token || request.headers.get('authorization') !== `Bearer ${token}`) {
+    return NextResponse.json({ success: false, error: 'Unauthorized' }, { status: 401 });
+  }
+
+  try {
+    const url = new URL(request.url);
+    const limit = parseInt(url.searchParams.get('limit') || '100');
+    if (!Number.isInteger(limit) || limit < 1 || limit > MAX_READ_LIMIT) {
+      return NextResponse.json(
+        { success: false, error: `limit must be an integer between 1 and ${MAX_READ_LIMIT}` },
+        { status: 400 }
+      );
+    }
+
+    const { entries, nextCursor } = await readContacts({ limit, cursor: url.searchParams.get('cursor') || undefined });
+    return NextResponse.json({ success: true, data: entries, nextCursor });
+  } catch (err) {
+    const status = err.message === 'Invalid cursor' ? 400 : 500;
+    return NextResponse.json({ success: false, error: err.message || 'Server error' }, { status });
+  }
+}
@@ -1,6 +1,7 @@
 'use client';
 
-import { useState, useEffect } from 'react';
+import { Profiler, useState, useEffect, useRef } from 'react';
+import dynamic from 'next/dynamic';
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from '@/components/ui/card';
 import { Tabs, TabsContent, TabsList, TabsTrigger } from '@/components/ui/tabs';
 import { Button } from '@/components/ui/button';
@@ -8,19 +9,40 @@ import { Input } from '@/components/ui/input';
 import { Label } from '@/components/ui/label';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Textarea } from '@/components/ui/textarea';
-import { LineChart, Line, PieChart, Pie, BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer, Cell } from 'recharts';
 import { Calendar, TrendingDown, TrendingUp, AlertCircle, Upload, Plus, Trash2, FileDown, Lightbulb, Calculator as CalcIcon, Home, Car, ShoppingBag, Repeat, Leaf, Droplet } from 'lucide-react';
 // framer-motion removed to avoid deployment peer dependency conflicts
 import { useToast } from '@/hooks/use-toast';
-import ThreeScene from '@/components/ui/three-scene';
-import { jsPDF } from 'jspdf';
-import * as XLSX from 'xlsx';
 import Calculator from '@/components/ui/calculator';
-import Chatbot from '@/components/ui/chatbot';
 import ContactForm from '@/components/ui/contact-form';
 import { Toaster } from '@/components/ui/toaster';
-
-const COLORS = ['#10b981', '#059669', '#3b82f6', '#06b6d4', '#f59e0b', '#f97316', '#ef4444', '#8b5cf6', '#a78bfa'];
+import { Skeleton } from '@/components/ui/skeleton';
+import VirtualList from '@/components/ui/virtual-list';
+import { applyChangesToRows, applyChangesToSummary, applyChangesToTrends } from '@/lib/emission-deltas';
+import { recordRender } from '@/lib/render-timing';
+
+// recharts, three.js and the chatbot are split out of the page bundle and
+// fetched after first paint; jspdf and xlsx load when a report is downloaded
+const chartPlaceholder = height => function ChartPlaceholder() {
+  return <Skeleton className="w-full" style={{ height }} />;
+};
+const CategoryPieChart = dynamic(() => import('@/components/ui/dashboard-charts').then(m => m.CategoryPieChart), { ssr: false, loading: chartPlaceholder(300) });
+const DepartmentBarChart = dynamic(() => import('@/components/ui/dashboard-charts').then(m => m.DepartmentBarChart), { ssr: false, loading: chartPlaceholder(300) });
+const TrendsLineChart = dynamic(() => import('@/components/ui/dashboard-charts').then(m => m.TrendsLineChart), { ssr: false, loading: chartPlaceholder(400) });
+const ThreeScene = dynamic(() => import('@/components/ui/three-scene'), { ssr: false });
+const Chatbot = dynamic(() => import('@/components/ui/chatbot'), { ssr: false, loading: chartPlaceholder(400) });
+
+// Recent records are loaded a page at a time with only the fields the table shows
+const EMISSIONS_PAGE_SIZE = 25;
+const EMISSION_TABLE_FIELDS = 'id,date,category,subcategory,value,unit,department,co2Kg';
+const TREND_MONTHS = 12;
+// The records list mounts only the rows in view; scrolling near the end loads the next page
+const EMISSION_ROW_HEIGHT = 96;
+const EMISSION_LIST_HEIGHT = 600;
+
+// After a write the dashboard applies the change feed instead of reloading;
+// past this many changes a full reload is cheaper
+const CHANGES_PAGE_SIZE = 1000;
+const MAX_SYNC_PAGES = 5;
 
 export default function App() {
   const { toast } = useToast();
@@ -29,6 +51,7 @@ export default function App() {
   
   // Data states
   const [emissions, setEmissions] = useState([]);
+  const [emissionsCursor, setEmissionsCursor] = useState(null);
   const [departments, setDepartments] = useState([]);
   const [analytics, setAnalytics] = useState(null);
   const [trends, setTrends] = useState([]);
@@ -51,19 +74,20 @@ export default function App() {
   const [newDepartment, setNewDepartment] = useState({ name: '', description: '' });
   const [csvFile, setCsvFile] = useState(null);
 
+  // Change feed position of the loaded data, and the sync in progress
+  const changeToken = useRef(null);
+  const syncing = useRef(Promise.resolve());
+  const loadingMore = useRef(false);
+
   // Fetch initial data
   useEffect(() => {
     fetchDepartments();
-    fetchEmissions();
   }, []);
 
+  // All panels for the current filters come from one request
   useEffect(() => {
-    if (departments.length > 0) {
-      fetchAnalytics();
-      fetchTrends();
-      fetchRecommendations();
-    }
-  }, [selectedDepartment, dateRange, departments]);
+    enqueue(reloadAll);
+  }, [selectedDepartment, dateRange]);
 
   const fetchDepartments = async () => {
     try {
@@ -80,71 +104,115 @@ export default function App() {
     }
   };
 
-  const fetchEmissions = async () => {
+  // Pass the cursor from the previous page to append; omit it to reload from the top
+  const fetchEmissions = async (cursor = null) => {
     try {
       const params = new URLSearchParams();
       if (selectedDepartment !== 'all') params.append('department', selectedDepartment);
       if (dateRange.start) params.append('startDate', dateRange.start);
       if (dateRange.end) params.append('endDate', dateRange.end);
+      params.append('limit', String(EMISSIONS_PAGE_SIZE));
+      params.append('fields', EMISSION_TABLE_FIELDS);
+      if (cursor) params.append('cursor', cursor);
       
       const res = await fetch(`/api/emissions?${params}`);
       const data = await res.json();
       if (data.success) {
-        setEmissions(data.data);
+        setEmissions(prev => (cursor ? [...prev, ...data.data] : data.data));
+        setEmissionsCursor(data.nextCursor);
       }
     } catch (error) {
       console.error('Error fetching emissions:', error);
     }
   };
 
-  const fetchAnalytics = async () => {
+  // Next page of records, once at a time however often the list reaches its
+  // end. Queued behind any sync, so a page never races a change being applied.
+  const loadMoreEmissions = async () => {
+    if (!emissionsCursor || loadingMore.current) return;
+    loadingMore.current = true;
     try {
-      const params = new URLSearchParams();
-      if (selectedDepartment !== 'all') params.append('department', selectedDepartment);
-      if (dateRange.start) params.append('startDate', dateRange.start);
-      if (dateRange.end) params.append('endDate', dateRange.end);
-      
-      const res = await fetch(`/api/analytics/summary?${params}`);
-      const data = await res.json();
-      if (data.success) {
-        setAnalytics(data.data);
-      }
-    } catch (error) {
-      console.error('Error fetching analytics:', error);
+      await enqueue(() => fetchEmissions(emissionsCursor));
+    } finally {
+      loadingMore.current = false;
     }
   };
 
-  const fetchTrends = async () => {
+  // Summary, trends, recommendations and the first page of records for the
+  // current filters in one request
+  const fetchDashboard = async () => {
     try {
       const params = new URLSearchParams();
       if (selectedDepartment !== 'all') params.append('department', selectedDepartment);
-      params.append('months', '12');
-      
-      const res = await fetch(`/api/analytics/trends?${params}`);
+      if (dateRange.start) params.append('startDate', dateRange.start);
+      if (dateRange.end) params.append('endDate', dateRange.end);
+      params.append('months', String(TREND_MONTHS));
+      params.append('limit', String(EMISSIONS_PAGE_SIZE));
+      params.append('fields', EMISSION_TABLE_FIELDS);
+
+      const res = await fetch(`/api/dashboard?${params}`);
       const data = await res.json();
       if (data.success) {
-        setTrends(data.data);
+        const { summary, trends, recommendations, emissions, changeToken: token } = data.data;
+        // The feed position these panels reflect; null makes the next sync reload
+        changeToken.current = token;
+        setAnalytics(summary);
+        setTrends(trends);
+        setRecommendations(recommendations);
+        setEmissions(emissions.data);
+        setEmissionsCursor(emissions.nextCursor);
       }
     } catch (error) {
-      console.error('Error fetching trends:', error);
+      console.error('Error fetching dashboard:', error);
     }
   };
 
-  const fetchRecommendations = async () => {
+  // The dashboard payload carries the change feed position it reflects, so a
+  // write that lands while it loads is applied by the next sync exactly once
+  const reloadAll = fetchDashboard;
+
+  // Bring the table, summary and trends up to date by applying only what
+  // changed since the last sync. The feed asks for a full reload after
+  // changes it cannot describe record by record.
+  const applyChanges = async () => {
+    if (changeToken.current === null) return reloadAll();
+
+    const changes = [];
+    let token = changeToken.current;
     try {
-      const params = new URLSearchParams();
-      if (selectedDepartment !== 'all') params.append('department', selectedDepartment);
-      
-      const res = await fetch(`/api/recommendations?${params}`);
-      const data = await res.json();
-      if (data.success) {
-        setRecommendations(data.data);
+      for (let page = 0; ; page += 1) {
+        const res = await fetch(`/api/emissions/changes?since=${token}&limit=${CHANGES_PAGE_SIZE}`);
+        const data = await res.json();
+        if (!data.success || data.data.reset) return reloadAll();
+        changes.push(...data.data.changes);
+        token = data.data.token;
+        if (!data.data.hasMore) break;
+        if (page === MAX_SYNC_PAGES - 1) return reloadAll();
       }
     } catch (error) {
-      console.error('Error fetching recommendations:', error);
+      console.error('Error fetching changes:', error);
+      return reloadAll();
     }
+
+    changeToken.current = token;
+    if (changes.length === 0) return;
+    const filters = { department: selectedDepartment, startDate: dateRange.start, endDate: dateRange.end };
+    setEmissions(prev => applyChangesToRows(prev, changes, filters, {
+      fields: EMISSION_TABLE_FIELDS.split(','),
+      complete: emissionsCursor === null
+    }));
+    setAnalytics(prev => (prev ? applyChangesToSummary(prev, changes, filters) : prev));
+    setTrends(prev => applyChangesToTrends(prev, changes, { department: selectedDepartment, months: TREND_MONTHS }));
+  };
+
+  // Loads and syncs run one at a time, so no change is applied twice
+  const enqueue = task => {
+    syncing.current = syncing.current.then(task, task);
+    return syncing.current;
   };
 
+  const syncChanges = () => enqueue(applyChanges);
+
   const handleSubmitEmission = async (e) => {
     e.preventDefault();
     setLoading(true);
@@ -171,9 +239,7 @@ export default function App() {
           department: formData.department,
           notes: ''
         });
-        fetchEmissions();
-        fetchAnalytics();
-        fetchTrends();
+        syncChanges();
       } else {
         toast({
           title: 'Error',
@@ -231,52 +297,30 @@ export default function App() {
     setLoading(true);
     
     try {
-      const text = await csvFile.text();
-      const lines = text.split('\n').filter(line => line.trim());
-      const headers = lines[0].split(',').map(h => h.trim());
-      
-      const emissionsData = [];
-      
-      for (let i = 1; i < lines.length; i++) {
-        const values = lines[i].split(',').map(v => v.trim());
-        const emission = {};
-        
-        headers.forEach((header, index) => {
-          emission[header.toLowerCase()] = values[index];
-        });
-        
-        if (emission.date && emission.category && emission.subcategory && emission.value && emission.department) {
-          emissionsData.push(emission);
-        }
-      }
-      
-      if (emissionsData.length === 0) {
-        toast({
-          title: 'Error',
-          description: 'No valid data found in CSV file',
-          variant: 'destructive'
-        });
-        setLoading(false);
-        return;
-      }
-      
-      const res = await fetch('/api/emissions/bulk', {
+      // The server parses the file as it streams in, so the browser never reads it into memory
+      const res = await fetch('/api/emissions/import', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ emissions: emissionsData })
+        headers: { 'Content-Type': 'text/csv' },
+        body: csvFile
       });
       
       const data = await res.json();
       
       if (data.success) {
+        const { imported, failed } = data.data;
         toast({
-          title: 'Success',
-          description: `Imported ${data.data.imported} emission records`,
+          title: imported > 0 ? 'Success' : 'Error',
+          description: `Imported ${imported} emission records` + (failed > 0 ? `, ${failed} rows skipped` : ''),
+          variant: imported > 0 ? 'default' : 'destructive'
         });
         setCsvFile(null);
-        fetchEmissions();
-        fetchAnalytics();
-        fetchTrends();
+        syncChanges();
+      } else {
+        toast({
+          title: 'Error',
+          description: data.error || 'Failed to import CSV file',
+          variant: 'destructive'
+        });
       }
     } catch (error) {
       toast({
@@ -299,9 +343,7 @@ export default function App() {
           title: 'Success',
           description: 'Emission record deleted',
         });
-        fetchEmissions();
-        fetchAnalytics();
-        fetchTrends();
+        syncChanges();
       }
     } catch (error) {
       toast({
@@ -334,6 +376,7 @@ export default function App() {
 
     try {
       if (format === 'pdf') {
+        const { jsPDF } = await import('jspdf');
         const doc = new jsPDF();
         doc.setFontSize(16);
         doc.text('Carbon Footprint Report', 14, 20);
@@ -390,6 +433,7 @@ export default function App() {
           { Key: 'Month-over-Month Change (%)', Value: analytics.monthOverMonthChange }
         ];
 
+        const XLSX = await import('xlsx');
         const wb = XLSX.utils.book_new();
         const wsSummary = XLSX.utils.json_to_sheet(summaryArr, { header: ['Key', 'Value'] });
         XLSX.utils.book_append_sheet(wb, wsSummary, 'Summary');
@@ -621,137 +665,100 @@ export default function App() {
 
           {/* Dashboard Tab */}
           <TabsContent value="dashboard" className="space-y-6">
-            {/* Key Metrics */}
-            <div className="grid grid-cols-1 md:grid-cols-4 gap-4">
-              <Card className="stat-card border-emerald-100 card-stunning">
-                <CardHeader className="pb-2">
-                  <CardTitle className="text-sm font-medium text-gray-600">Total Emissions</CardTitle>
-                </CardHeader>
-                <CardContent>
-                    <div className="stat-number text-emerald-600">
-                      {analytics ? `${Math.round(analytics.totalEmissions).toLocaleString()}` : '0'}
+            <Profiler id="dashboard" onRender={recordRender}>
+              {/* Key Metrics */}
+              <div className="grid grid-cols-1 md:grid-cols-4 gap-4">
+                <Card className="stat-card border-emerald-100 card-stunning">
+                  <CardHeader className="pb-2">
+                    <CardTitle className="text-sm font-medium text-gray-600">Total Emissions</CardTitle>
+                  </CardHeader>
+                  <CardContent>
+                      <div className="stat-number text-emerald-600">
+                        {analytics ? `${Math.round(analytics.totalEmissions).toLocaleString()}` : '0'}
+                      </div>
+                    <p className="text-xs text-gray-500 mt-1">kg CO2e</p>
+                  </CardContent>
+                </Card>
+
+                <Card className="border-blue-100 card-stunning">
+                  <CardHeader className="pb-2">
+                    <CardTitle className="text-sm font-medium text-gray-600">Last Month</CardTitle>
+                  </CardHeader>
+                  <CardContent>
+                      <div className="stat-number text-blue-600">
+                        {analytics ? `${Math.round(analytics.lastMonthTotal).toLocaleString()}` : '0'}
+                      </div>
+                    <p className="text-xs text-gray-500 mt-1">kg CO2e</p>
+                  </CardContent>
+                </Card>
+
+                <Card className="stat-card border-orange-100 card-stunning">
+                  <CardHeader className="pb-2">
+                    <CardTitle className="text-sm font-medium text-gray-600">Month-over-Month</CardTitle>
+                  </CardHeader>
+                  <CardContent>
+                    <div className={`flex items-center gap-2`}> 
+                      {analytics?.monthOverMonthChange > 0 ? (
+                        <TrendingUp className="h-6 w-6 text-red-600" />
+                      ) : (
+                        <TrendingDown className="h-6 w-6 text-green-600" />
+                      )}
+                      <div className={`stat-number ${analytics?.monthOverMonthChange > 0 ? 'positive' : 'negative'}`}>
+                        {analytics ? `${Math.abs(analytics.monthOverMonthChange)}%` : '0%'}
+                      </div>
                     </div>
-                  <p className="text-xs text-gray-500 mt-1">kg CO2e</p>
-                </CardContent>
-              </Card>
-
-              <Card className="border-blue-100 card-stunning">
-                <CardHeader className="pb-2">
-                  <CardTitle className="text-sm font-medium text-gray-600">Last Month</CardTitle>
-                </CardHeader>
-                <CardContent>
-                    <div className="stat-number text-blue-600">
-                      {analytics ? `${Math.round(analytics.lastMonthTotal).toLocaleString()}` : '0'}
+                  </CardContent>
+                </Card>
+
+                <Card className="stat-card border-purple-100 card-stunning">
+                  <CardHeader className="pb-2">
+                    <CardTitle className="text-sm font-medium text-gray-600">Total Records</CardTitle>
+                  </CardHeader>
+                  <CardContent>
+                    <div className="stat-number text-purple-600">
+                      {analytics ? analytics.totalRecords.toLocaleString() : 0}
                     </div>
-                  <p className="text-xs text-gray-500 mt-1">kg CO2e</p>
-                </CardContent>
-              </Card>
-
-              <Card className="stat-card border-orange-100 card-stunning">
-                <CardHeader className="pb-2">
-                  <CardTitle className="text-sm font-medium text-gray-600">Month-over-Month</CardTitle>
-                </CardHeader>
-                <CardContent>
-                  <div className={`flex items-center gap-2`}> 
-                    {analytics?.monthOverMonthChange > 0 ? (
-                      <TrendingUp className="h-6 w-6 text-red-600" />
-                    ) : (
-                      <TrendingDown className="h-6 w-6 text-green-600" />
-                    )}
-                    <div className={`stat-number ${analytics?.monthOverMonthChange > 0 ? 'positive' : 'negative'}`}>
-                      {analytics ? `${Math.abs(analytics.monthOverMonthChange)}%` : '0%'}
-                    </div>
-                  </div>
-                </CardContent>
-              </Card>
+                    <p className="text-xs text-gray-500 mt-1">data points</p>
+                  </CardContent>
+                </Card>
+              </div>
 
-              <Card className="stat-card border-purple-100 card-stunning">
-                <CardHeader className="pb-2">
-                  <CardTitle className="text-sm font-medium text-gray-600">Total Records</CardTitle>
-                </CardHeader>
-                <CardContent>
-                  <div className="stat-number text-purple-600">
-                    {analytics ? analytics.totalRecords.toLocaleString() : 0}
-                  </div>
-                  <p className="text-xs text-gray-500 mt-1">data points</p>
-                </CardContent>
-              </Card>
-            </div>
+              {/* Charts */}
+              <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
+                {/* Category Breakdown */}
+                <Card className="border-emerald-100">
+                  <CardHeader>
+                    <CardTitle>Emissions by Category</CardTitle>
+                    <CardDescription>Distribution across emission sources</CardDescription>
+                  </CardHeader>
+                  <CardContent>
+                    <CategoryPieChart data={getCategoryBreakdownChart()} />
+                  </CardContent>
+                </Card>
+
+                {/* Department Comparison */}
+                <Card className="border-blue-100">
+                  <CardHeader>
+                    <CardTitle>Department Comparison</CardTitle>
+                    <CardDescription>Emissions by department</CardDescription>
+                  </CardHeader>
+                  <CardContent>
+                    <DepartmentBarChart data={getDepartmentComparisonChart()} />
+                  </CardContent>
+                </Card>
+              </div>
 
-            {/* Charts */}
-            <div className="grid grid-cols-1 lg:grid-cols-2 gap-6">
-              {/* Category Breakdown */}
+              {/* Trends Over Time */}
               <Card className="border-emerald-100">
                 <CardHeader>
-                  <CardTitle>Emissions by Category</CardTitle>
-                  <CardDescription>Distribution across emission sources</CardDescription>
+                  <CardTitle>Emissions Trends (Last 12 Months)</CardTitle>
+                  <CardDescription>Monthly breakdown by category</CardDescription>
                 </CardHeader>
                 <CardContent>
-                  <ResponsiveContainer width="100%" height={300}>
-                    <PieChart>
-                      <Pie
-                        data={getCategoryBreakdownChart()}
-                        cx="50%"
-                        cy="50%"
-                        labelLine={false}
-                        label={({ name, percent }) => `${name}: ${(percent * 100).toFixed(0)}%`}
-                        outerRadius={100}
-                        fill="#8884d8"
-                        dataKey="value"
-                      >
-                        {getCategoryBreakdownChart().map((entry, index) => (
-                          <Cell key={`cell-${index}`} fill={COLORS[index % COLORS.length]} />
-                        ))}
-                      </Pie>
-                      <Tooltip />
-                    </PieChart>
-                  </ResponsiveContainer>
+                  <TrendsLineChart data={trends} />
                 </CardContent>
               </Card>
-
-              {/* Department Comparison */}
-              <Card className="border-blue-100">
-                <CardHeader>
-                  <CardTitle>Department Comparison</CardTitle>
-                  <CardDescription>Emissions by department</CardDescription>
-                </CardHeader>
-                <CardContent>
-                  <ResponsiveContainer width="100%" height={300}>
-                    <BarChart data={getDepartmentComparisonChart()}>
-                      <CartesianGrid strokeDasharray="3 3" />
-                      <XAxis dataKey="name" />
-                      <YAxis />
-                      <Tooltip />
-                      <Bar dataKey="emissions" fill="#3b82f6" />
-                    </BarChart>
-                  </ResponsiveContainer>
-                </CardContent>
-              </Card>
-            </div>
-
-            {/* Trends Over Time */}
-            <Card className="border-emerald-100">
-              <CardHeader>
-                <CardTitle>Emissions Trends (Last 12 Months)</CardTitle>
-                <CardDescription>Monthly breakdown by category</CardDescription>
-              </CardHeader>
-              <CardContent>
-                <ResponsiveContainer width="100%" height={400}>
-                  <LineChart data={trends}>
-                    <CartesianGrid strokeDasharray="3 3" />
-                    <XAxis dataKey="month" />
-                    <YAxis />
-                    <Tooltip />
-                    <Legend />
-                    <Line type="monotone" dataKey="total" stroke="#10b981" strokeWidth={2} name="Total" />
-                    <Line type="monotone" dataKey="electricity" stroke="#3b82f6" name="Electricity" />
-                    <Line type="monotone" dataKey="transportation" stroke="#f59e0b" name="Transportation" />
-                    <Line type="monotone" dataKey="heating" stroke="#ef4444" name="Heating" />
-                    <Line type="monotone" dataKey="waste" stroke="#8b5cf6" name="Waste" />
-                  </LineChart>
-                </ResponsiveContainer>
-              </CardContent>
-            </Card>
+            </Profiler>
           </TabsContent>
 
           {/* Data Entry Tab */}
@@ -913,45 +920,60 @@ export default function App() {
             <Card className="border-emerald-100">
               <CardHeader>
                 <CardTitle>Recent Emission Records</CardTitle>
-                <CardDescription>Last 10 entries</CardDescription>
+                <CardDescription>Most recent entries first</CardDescription>
               </CardHeader>
               <CardContent>
                 <div className="space-y-2">
-                  {emissions.slice(0, 10).map(emission => {
-                    const dept = departments.find(d => d.id === emission.department);
-                    return (
-                      <div key={emission.id} className="flex items-center justify-between p-4 bg-gray-50 rounded-lg border">
-                        <div className="flex-1">
-                          <div className="flex items-center gap-2">
-                            <span className="font-medium">{emission.category}</span>
-                            <span className="text-sm text-gray-500">({emission.subcategory})</span>
-                          </div>
-                          <div className="text-sm text-gray-600 mt-1">
-                            {emission.value} {emission.unit} • {dept?.name || 'Unknown'} • {emission.date}
+                  <Profiler id="emission-records" onRender={recordRender}>
+                    <VirtualList
+                      items={emissions}
+                      rowHeight={EMISSION_ROW_HEIGHT}
+                      height={EMISSION_LIST_HEIGHT}
+                      onEndReached={loadMoreEmissions}
+                      renderRow={emission => {
+                        const dept = departments.find(d => d.id === emission.department);
+                        return (
+                          <div className="h-full pb-2">
+                            <div className="h-full flex items-center justify-between p-4 bg-gray-50 rounded-lg border">
+                              <div className="flex-1">
+                                <div className="flex items-center gap-2">
+                                  <span className="font-medium">{emission.category}</span>
+                                  <span className="text-sm text-gray-500">({emission.subcategory})</span>
+                                </div>
+                                <div className="text-sm text-gray-600 mt-1">
+                                  {emission.value} {emission.unit} • {dept?.name || 'Unknown'} • {emission.date}
+                                </div>
+                              </div>
+                              <div className="flex items-center gap-4">
+                                <div className="text-right">
+                                  <div className="font-bold text-emerald-600">{emission.co2Kg.toFixed(2)} kg</div>
+                                  <div className="text-xs text-gray-500">CO2e</div>
+                                </div>
+                                <Button
+                                  variant="ghost"
+                                  size="sm"
+                                  onClick={() => handleDeleteEmission(emission.id)}
+                                  className="text-red-600 hover:text-red-700 hover:bg-red-50"
+                                >
+                                  <Trash2 className="h-4 w-4" />
+                                </Button>
+                              </div>
+                            </div>
                           </div>
-                        </div>
-                        <div className="flex items-center gap-4">
-                          <div className="text-right">
-                            <div className="font-bold text-emerald-600">{emission.co2Kg.toFixed(2)} kg</div>
-                            <div className="text-xs text-gray-500">CO2e</div>
-                          </div>
-                          <Button
-                            variant="ghost"
-                            size="sm"
-                            onClick={() => handleDeleteEmission(emission.id)}
-                            className="text-red-600 hover:text-red-700 hover:bg-red-50"
-                          >
-                            <Trash2 className="h-4 w-4" />
-                          </Button>
-                        </div>
-                      </div>
-                    );
-                  })}
+                        );
+                      }}
+                    />
+                  </Profiler>
                   {emissions.length === 0 && (
                     <div className="text-center py-8 text-gray-500">
                       No emission records yet. Add your first entry above.
                     </div>
                   )}
+                  {emissionsCursor && (
+                    <Button variant="outline" className="w-full" onClick={loadMoreEmissions}>
+                      Load more
+                    </Button>
+                  )}
                 </div>
               </CardContent>
             </Card>
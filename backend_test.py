@@ -5,17 +5,42 @@ Tests all backend APIs for the Carbon Footprint Analytics Dashboard
 """
 
 import requests
+import argparse
 import json
+import math
+import os
+import random
 import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import uuid
 
+from carbon_client import CarbonAPIError, CarbonClient
+from carbon_client import analytics
+
 # Configuration
-BASE_URL = "https://green-analytics-1.preview.emergentagent.com/api"
-HEADERS = {"Content-Type": "application/json"}
+BASE_URL = os.environ.get("BASE_URL", "https://green-analytics-1.preview.emergentagent.com/api")
+
+# Endpoint mix replayed by the load mode: (name, method, path, weight)
+LOAD_MIX = [
+    ("GET /api/analytics/summary", "GET", "/analytics/summary", 4),
+    ("GET /api/emissions", "GET", "/emissions", 4),
+    ("GET /api/emissions (category filter)", "GET", "/emissions?category=electricity", 1),
+    ("GET /api/analytics/trends", "GET", "/analytics/trends?months=12", 2),
+    ("GET /api/recommendations", "GET", "/recommendations", 2),
+    ("GET /api/departments", "GET", "/departments", 1),
+    ("GET /api/dashboard", "GET", "/dashboard?months=12&limit=25", 2),
+]
+WRITE_MIX = [
+    ("POST /api/emissions", "POST", "/emissions", 1),
+]
 
 class BackendTester:
-    def __init__(self):
+    def __init__(self, client=None):
+        self.client = client or CarbonClient(BASE_URL, timeout=10)
         self.test_results = []
         self.department_ids = []
         self.emission_ids = []
@@ -37,27 +62,16 @@ class BackendTester:
     def test_get_departments(self):
         """Test GET /api/departments"""
         try:
-            response = requests.get(f"{BASE_URL}/departments", headers=HEADERS, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success") and "data" in data:
-                    departments = data["data"]
-                    if len(departments) >= 4:
-                        # Store department IDs for later tests
-                        self.department_ids = [dept["id"] for dept in departments]
-                        self.log_test("GET /api/departments", True, 
-                                    f"Retrieved {len(departments)} departments successfully")
-                        return True
-                    else:
-                        self.log_test("GET /api/departments", False, 
-                                    f"Expected at least 4 departments, got {len(departments)}")
-                else:
-                    self.log_test("GET /api/departments", False, 
-                                "Invalid response format", data)
+            departments = self.client.list_departments()
+            if len(departments) >= 4:
+                # Store department IDs for later tests
+                self.department_ids = [dept["id"] for dept in departments]
+                self.log_test("GET /api/departments", True, 
+                            f"Retrieved {len(departments)} departments successfully")
+                return True
             else:
                 self.log_test("GET /api/departments", False, 
-                            f"HTTP {response.status_code}", response.text)
+                            f"Expected at least 4 departments, got {len(departments)}")
         except Exception as e:
             self.log_test("GET /api/departments", False, f"Request failed: {str(e)}")
         return False
@@ -65,33 +79,16 @@ class BackendTester:
     def test_post_departments(self):
         """Test POST /api/departments"""
         try:
-            new_dept = {
-                "name": "Marketing",
-                "description": "Marketing department for testing"
-            }
-            
-            response = requests.post(f"{BASE_URL}/departments", 
-                                   json=new_dept, headers=HEADERS, timeout=10)
-            
-            if response.status_code == 201:
-                data = response.json()
-                if data.get("success") and "data" in data:
-                    created_dept = data["data"]
-                    if created_dept.get("id") and created_dept.get("name") == "Marketing":
-                        self.department_ids.append(created_dept["id"])
-                        self.log_test("POST /api/departments", True, 
-                                    "Department created successfully", 
-                                    f"ID: {created_dept['id']}")
-                        return True
-                    else:
-                        self.log_test("POST /api/departments", False, 
-                                    "Created department missing required fields", created_dept)
-                else:
-                    self.log_test("POST /api/departments", False, 
-                                "Invalid response format", data)
+            created_dept = self.client.create_department("Marketing", "Marketing department for testing")
+            if created_dept.get("id") and created_dept.get("name") == "Marketing":
+                self.department_ids.append(created_dept["id"])
+                self.log_test("POST /api/departments", True, 
+                            "Department created successfully", 
+                            f"ID: {created_dept['id']}")
+                return True
             else:
                 self.log_test("POST /api/departments", False, 
-                            f"HTTP {response.status_code}", response.text)
+                            "Created department missing required fields", created_dept)
         except Exception as e:
             self.log_test("POST /api/departments", False, f"Request failed: {str(e)}")
         return False
@@ -99,26 +96,15 @@ class BackendTester:
     def test_get_emissions(self):
         """Test GET /api/emissions"""
         try:
-            response = requests.get(f"{BASE_URL}/emissions", headers=HEADERS, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success") and "data" in data:
-                    emissions = data["data"]
-                    if len(emissions) > 0:
-                        # Store some emission IDs for later tests
-                        self.emission_ids = [e["id"] for e in emissions[:5]]
-                        self.log_test("GET /api/emissions", True, 
-                                    f"Retrieved {len(emissions)} emission records")
-                        return True
-                    else:
-                        self.log_test("GET /api/emissions", False, "No emission records found")
-                else:
-                    self.log_test("GET /api/emissions", False, 
-                                "Invalid response format", data)
+            emissions = self.client.list_emissions()
+            if len(emissions) > 0:
+                # Store some emission IDs for later tests
+                self.emission_ids = [e["id"] for e in emissions[:5]]
+                self.log_test("GET /api/emissions", True, 
+                            f"Retrieved {len(emissions)} emission records")
+                return True
             else:
-                self.log_test("GET /api/emissions", False, 
-                            f"HTTP {response.status_code}", response.text)
+                self.log_test("GET /api/emissions", False, "No emission records found")
         except Exception as e:
             self.log_test("GET /api/emissions", False, f"Request failed: {str(e)}")
         return False
@@ -132,36 +118,62 @@ class BackendTester:
         try:
             # Test department filter
             dept_id = self.department_ids[0]
-            response = requests.get(f"{BASE_URL}/emissions?department={dept_id}", 
-                                  headers=HEADERS, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success"):
-                    self.log_test("GET /api/emissions (department filter)", True, 
-                                f"Department filter working")
-                else:
-                    self.log_test("GET /api/emissions (department filter)", False, 
-                                "Invalid response format", data)
+            emissions = self.client.list_emissions(department=dept_id)
+            if all(e["department"] == dept_id for e in emissions):
+                self.log_test("GET /api/emissions (department filter)", True, 
+                            f"Department filter working")
+            else:
+                self.log_test("GET /api/emissions (department filter)", False, 
+                            "Records from other departments returned")
             
             # Test category filter
-            response = requests.get(f"{BASE_URL}/emissions?category=electricity", 
-                                  headers=HEADERS, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success"):
-                    self.log_test("GET /api/emissions (category filter)", True, 
-                                "Category filter working")
-                    return True
-                else:
-                    self.log_test("GET /api/emissions (category filter)", False, 
-                                "Invalid response format", data)
+            emissions = self.client.list_emissions(category="electricity")
+            if all(e["category"] == "electricity" for e in emissions):
+                self.log_test("GET /api/emissions (category filter)", True, 
+                            "Category filter working")
+                return True
+            else:
+                self.log_test("GET /api/emissions (category filter)", False, 
+                            "Records from other categories returned")
             
         except Exception as e:
             self.log_test("GET /api/emissions (filters)", False, f"Request failed: {str(e)}")
         return False
     
+    def test_get_emissions_paginated(self):
+        """Test GET /api/emissions keyset pagination, projection and NDJSON streaming"""
+        try:
+            first, cursor = self.client.get_emissions_page(2, fields=["co2Kg"])
+            if len(first) > 2:
+                self.log_test("GET /api/emissions (pagination)", False, "Invalid first page", first)
+                return False
+            if any(set(row) != {"id", "date", "co2Kg"} for row in first):
+                self.log_test("GET /api/emissions (pagination)", False,
+                            "fields= projection not applied", first[:1])
+                return False
+
+            rows = list(first)
+            if cursor:
+                second, _ = self.client.get_emissions_page(2, cursor=cursor, fields=["co2Kg"])
+                rows.extend(second)
+
+            keys = [(row["date"], row["id"]) for row in rows]
+            if keys != sorted(keys, reverse=True) or len(set(keys)) != len(keys):
+                self.log_test("GET /api/emissions (pagination)", False,
+                            "Pages overlap or are out of (date, id) order", keys)
+                return False
+            self.log_test("GET /api/emissions (pagination)", True,
+                        f"Read {len(rows)} rows across pages in (date, id) order")
+
+            lines = list(self.client.stream_emissions(limit=5))
+            if 0 < len(lines) <= 5 and all("id" in line for line in lines):
+                self.log_test("GET /api/emissions (NDJSON)", True, f"Streamed {len(lines)} records")
+                return True
+            self.log_test("GET /api/emissions (NDJSON)", False, f"Unexpected stream: {len(lines)} lines")
+        except Exception as e:
+            self.log_test("GET /api/emissions (pagination)", False, f"Request failed: {str(e)}")
+        return False
+    
     def test_post_emissions(self):
         """Test POST /api/emissions"""
         if not self.department_ids:
@@ -178,41 +190,85 @@ class BackendTester:
                 "notes": "Office electricity usage for testing"
             }
             
-            response = requests.post(f"{BASE_URL}/emissions", 
-                                   json=new_emission, headers=HEADERS, timeout=10)
+            # A record the rollups cannot total is refused
+            try:
+                self.client.create_emission(dict(new_emission, value="lots"))
+                self.log_test("POST /api/emissions", False, "Non-numeric value was accepted")
+                return False
+            except CarbonAPIError as e:
+                if e.status != 400:
+                    self.log_test("POST /api/emissions", False, f"Non-numeric value got {e.status}", e.body)
+                    return False
+
+            created_emission = self.client.create_emission(new_emission)
             
-            if response.status_code == 201:
-                data = response.json()
-                if data.get("success") and "data" in data:
-                    created_emission = data["data"]
-                    
-                    # Verify CO2 calculations
-                    expected_co2_lbs = 1500 * 0.92  # 1380 lbs
-                    expected_co2_kg = expected_co2_lbs * 0.453592  # ~625.96 kg
-                    
-                    actual_co2_lbs = created_emission.get("co2Lbs")
-                    actual_co2_kg = created_emission.get("co2Kg")
-                    
-                    if (abs(actual_co2_lbs - expected_co2_lbs) < 0.1 and 
-                        abs(actual_co2_kg - expected_co2_kg) < 0.1):
-                        self.emission_ids.append(created_emission["id"])
-                        self.log_test("POST /api/emissions", True, 
-                                    "Emission created with correct CO2 calculations",
-                                    f"CO2: {actual_co2_kg:.2f} kg, {actual_co2_lbs:.2f} lbs")
-                        return True
-                    else:
-                        self.log_test("POST /api/emissions", False, 
-                                    f"CO2 calculation error. Expected: {expected_co2_kg:.2f} kg, Got: {actual_co2_kg:.2f} kg")
-                else:
-                    self.log_test("POST /api/emissions", False, 
-                                "Invalid response format", data)
+            # Verify CO2 calculations
+            expected_co2_lbs = 1500 * 0.92  # 1380 lbs
+            expected_co2_kg = expected_co2_lbs * 0.453592  # ~625.96 kg
+            
+            actual_co2_lbs = created_emission.get("co2Lbs")
+            actual_co2_kg = created_emission.get("co2Kg")
+            
+            if (abs(actual_co2_lbs - expected_co2_lbs) < 0.1 and 
+                abs(actual_co2_kg - expected_co2_kg) < 0.1):
+                self.emission_ids.append(created_emission["id"])
+                self.log_test("POST /api/emissions", True, 
+                            "Emission created with correct CO2 calculations",
+                            f"CO2: {actual_co2_kg:.2f} kg, {actual_co2_lbs:.2f} lbs")
+                return True
             else:
                 self.log_test("POST /api/emissions", False, 
-                            f"HTTP {response.status_code}", response.text)
+                            f"CO2 calculation error. Expected: {expected_co2_kg:.2f} kg, Got: {actual_co2_kg:.2f} kg")
         except Exception as e:
             self.log_test("POST /api/emissions", False, f"Request failed: {str(e)}")
         return False
     
+    def test_post_emissions_concurrent(self):
+        """Concurrent single-record POSTs, coalesced into batches when INGEST_BUFFER is on"""
+        if not self.department_ids:
+            self.log_test("POST /api/emissions (concurrent)", False, "No department IDs available")
+            return False
+
+        count = 40
+        try:
+            before = self.client.ingest_stats()
+            readings = [{
+                "date": "2024-06-16",
+                "category": "electricity",
+                "subcategory": "grid",
+                "value": 100 + i,
+                "department": self.department_ids[0],
+                "notes": "Concurrent ingest test"
+            } for i in range(count)]
+            with ThreadPoolExecutor(max_workers=count) as pool:
+                created = list(pool.map(self.client.create_emission, readings))
+
+            ids = {e["id"] for e in created}
+            values = sorted(e["value"] for e in created)
+            if len(ids) != count or values != [100 + i for i in range(count)]:
+                self.log_test("POST /api/emissions (concurrent)", False,
+                              f"Expected {count} distinct records, got {len(ids)}")
+                return False
+
+            after = self.client.ingest_stats()
+            if not after.get("enabled"):
+                self.log_test("POST /api/emissions (concurrent)", True,
+                              f"{count} records created one write each (ingest buffer off)")
+                return True
+            records = after["records"] - before.get("records", 0)
+            batches = after["batches"] - before.get("batches", 0)
+            if records < count or batches < 1:
+                self.log_test("POST /api/emissions (concurrent)", False,
+                              f"Ingest buffer wrote {records} records in {batches} batches", after)
+                return False
+            self.log_test("POST /api/emissions (concurrent)", True,
+                          f"{count} records acknowledged after {batches} group commits",
+                          f"mean batch {after['meanBatchSize']}, {after['flushMs']} ms per batch")
+            return True
+        except Exception as e:
+            self.log_test("POST /api/emissions (concurrent)", False, f"Request failed: {str(e)}")
+        return False
+
     def test_post_emissions_bulk(self):
         """Test POST /api/emissions/bulk"""
         if not self.department_ids:
@@ -220,148 +276,466 @@ class BackendTester:
             return False
         
         try:
-            bulk_emissions = {
-                "emissions": [
-                    {
-                        "date": "2024-07-01",
-                        "category": "transportation",
-                        "subcategory": "gasoline",
-                        "value": 10,
-                        "department": self.department_ids[0],
-                        "notes": "Fleet fuel consumption"
-                    },
-                    {
-                        "date": "2024-07-02",
-                        "category": "heating",
-                        "subcategory": "naturalGas",
-                        "value": 50,
-                        "department": self.department_ids[1] if len(self.department_ids) > 1 else self.department_ids[0],
-                        "notes": "Office heating"
-                    }
-                ]
-            }
-            
-            response = requests.post(f"{BASE_URL}/emissions/bulk", 
-                                   json=bulk_emissions, headers=HEADERS, timeout=10)
+            bulk_emissions = [
+                {
+                    "date": "2024-07-01",
+                    "category": "transportation",
+                    "subcategory": "gasoline",
+                    "value": 10,
+                    "department": self.department_ids[0],
+                    "notes": "Fleet fuel consumption"
+                },
+                {
+                    "date": "2024-07-02",
+                    "category": "heating",
+                    "subcategory": "naturalGas",
+                    "value": 50,
+                    "department": self.department_ids[1] if len(self.department_ids) > 1 else self.department_ids[0],
+                    "notes": "Office heating"
+                }
+            ]
             
-            if response.status_code == 201:
-                data = response.json()
-                if data.get("success") and data.get("data", {}).get("imported") == 2:
-                    self.log_test("POST /api/emissions/bulk", True, 
-                                "Bulk emissions created successfully", 
-                                f"Imported {data['data']['imported']} records")
-                    return True
-                else:
-                    self.log_test("POST /api/emissions/bulk", False, 
-                                "Invalid response or import count", data)
+            # A row without a date is refused up front, and the valid row with it is not written
+            invalid = [dict(bulk_emissions[0], notes="Rejected bulk row"), dict(bulk_emissions[1])]
+            del invalid[1]["date"]
+            try:
+                self.client.bulk_create_emissions(invalid)
+                self.log_test("POST /api/emissions/bulk", False, "Row without a date was accepted")
+                return False
+            except CarbonAPIError as e:
+                errors = json.loads(e.body).get("errors", [])
+                if e.status != 400 or [row["index"] for row in errors] != [1]:
+                    self.log_test("POST /api/emissions/bulk", False, "Invalid row not reported", e.body)
+                    return False
+            same_day = self.client.iter_emissions(start_date="2024-07-01", end_date="2024-07-01")
+            if any(r.get("notes") == "Rejected bulk row" for r in same_day):
+                self.log_test("POST /api/emissions/bulk", False, "Rows of a rejected upload were written")
+                return False
+
+            result = self.client.bulk_create_emissions(bulk_emissions)
+            if result.get("imported") == 2:
+                self.log_test("POST /api/emissions/bulk", True, 
+                            "Bulk emissions created successfully", 
+                            f"Imported {result['imported']} records")
+                return True
             else:
                 self.log_test("POST /api/emissions/bulk", False, 
-                            f"HTTP {response.status_code}", response.text)
+                            "Invalid import count", result)
         except Exception as e:
             self.log_test("POST /api/emissions/bulk", False, f"Request failed: {str(e)}")
         return False
     
+    def test_bulk_upload_chunked(self):
+        """Test CarbonClient.bulk_upload splits a payload into concurrent size-bounded requests"""
+        if not self.department_ids:
+            self.log_test("Bulk upload (chunked)", False, "No department IDs available")
+            return False
+        
+        try:
+            records = [{
+                "date": "2024-07-10",
+                "category": "electricity",
+                "subcategory": "grid",
+                "value": 1 + i,
+                "department": self.department_ids[i % len(self.department_ids)],
+                "notes": "Chunked bulk upload"
+            } for i in range(25)]
+            
+            result = self.client.bulk_upload(records, max_records=10, concurrency=3)
+            if result == {"imported": 25, "chunks": 3}:
+                self.log_test("Bulk upload (chunked)", True, "25 records uploaded in 3 concurrent chunks")
+                return True
+            self.log_test("Bulk upload (chunked)", False, "Unexpected upload result", result)
+        except Exception as e:
+            self.log_test("Bulk upload (chunked)", False, f"Request failed: {str(e)}")
+        return False
+    
+    def test_bulk_upsert_idempotent(self):
+        """Test POST /api/emissions/bulk?mode=upsert: a retried upload stores nothing twice"""
+        try:
+            department = self.client.create_department(f"upsert-{uuid.uuid4().hex[:8]}", "Bulk upsert test")["id"]
+            records = [{
+                "date": f"2024-08-{1 + i % 28:02d}",
+                "category": "transportation",
+                "subcategory": "diesel",
+                "value": 10 + i,
+                "department": department,
+                # Half keyed by the client, half by the hash of the reading
+                **({"externalId": f"meter-{i}"} if i % 2 == 0 else {})
+            } for i in range(20)]
+
+            first = self.client.bulk_create_emissions(records + records[:3], mode="upsert")
+            retry = self.client.bulk_create_emissions(records, mode="upsert")
+            corrected = dict(records[0], value=99)
+            correction = self.client.bulk_create_emissions([corrected], mode="upsert")
+            stored = self.client.list_emissions(department=department)
+            self.client.batch_emissions([{"op": "delete", "filter": {"department": department}}])
+
+            checks = [
+                ("first upload", (first["inserted"], first["duplicates"]) == (20, 3)),
+                ("retry", (retry["inserted"], retry["updated"], retry["unchanged"]) == (0, 0, 20)),
+                ("correction", (correction["inserted"], correction["updated"]) == (0, 1)),
+                ("stored once", len(stored) == 20),
+                ("corrected value", any(e.get("externalId") == "meter-0" and e["value"] == 99 for e in stored)),
+            ]
+            failed = [name for name, ok in checks if not ok]
+            if failed:
+                self.log_test("POST /api/emissions/bulk?mode=upsert", False, f"Failed checks: {', '.join(failed)}",
+                              {"first": first, "retry": retry, "correction": correction})
+                return False
+            self.log_test("POST /api/emissions/bulk?mode=upsert", True,
+                          "Retried upload left 20 records unchanged; a corrected reading updated in place")
+            return True
+        except Exception as e:
+            self.log_test("POST /api/emissions/bulk?mode=upsert", False, f"Request failed: {str(e)}")
+        return False
+
+    def test_post_emissions_import(self):
+        """Test POST /api/emissions/import with a streamed CSV body"""
+        if not self.department_ids:
+            self.log_test("POST /api/emissions/import", False, "No department IDs available")
+            return False
+        
+        try:
+            dept_id = self.department_ids[0]
+            csv_body = (
+                "date,category,subcategory,value,department,notes\r\n"
+                f"2024-07-03,electricity,grid,100,{dept_id},\"Quoted, with comma\"\r\n"
+                f"2024-07-04,heating,naturalGas,10,{dept_id},\"Multi\nline \"\"note\"\"\"\r\n"
+                f"2024-07-05,electricity,grid,not-a-number,{dept_id},bad row\r\n"
+            )
+            
+            result = self.client.import_csv(csv_body.encode("utf-8"))
+            errors = result.get("errors", [])
+            if (result.get("imported") == 2 and result.get("failed") == 1
+                    and errors and errors[0].get("row") == 4):
+                self.log_test("POST /api/emissions/import", True, 
+                            "CSV streamed with quoting and per-row errors",
+                            f"{result.get('rowsPerSecond')} rows/s")
+                return True
+            else:
+                self.log_test("POST /api/emissions/import", False, 
+                            "Unexpected import report", result)
+        except Exception as e:
+            self.log_test("POST /api/emissions/import", False, f"Request failed: {str(e)}")
+        return False
+    
     def test_get_analytics_summary(self):
         """Test GET /api/analytics/summary"""
         try:
-            response = requests.get(f"{BASE_URL}/analytics/summary", headers=HEADERS, timeout=10)
+            summary = self.client.analytics_summary()
+            required_fields = ["totalEmissions", "totalRecords", "categoryBreakdown", 
+                             "departmentBreakdown", "monthlyData", "lastMonthTotal", 
+                             "monthOverMonthChange"]
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success") and "data" in data:
-                    summary = data["data"]
-                    required_fields = ["totalEmissions", "totalRecords", "categoryBreakdown", 
-                                     "departmentBreakdown", "monthlyData", "lastMonthTotal", 
-                                     "monthOverMonthChange"]
-                    
-                    missing_fields = [field for field in required_fields if field not in summary]
-                    
-                    if not missing_fields:
-                        self.log_test("GET /api/analytics/summary", True, 
-                                    "Summary analytics retrieved successfully",
-                                    f"Total emissions: {summary['totalEmissions']} kg CO2")
-                        return True
-                    else:
-                        self.log_test("GET /api/analytics/summary", False, 
-                                    f"Missing required fields: {missing_fields}")
-                else:
-                    self.log_test("GET /api/analytics/summary", False, 
-                                "Invalid response format", data)
+            missing_fields = [field for field in required_fields if field not in summary]
+            
+            if not missing_fields:
+                self.log_test("GET /api/analytics/summary", True, 
+                            "Summary analytics retrieved successfully",
+                            f"Total emissions: {summary['totalEmissions']} kg CO2")
+                return True
             else:
                 self.log_test("GET /api/analytics/summary", False, 
-                            f"HTTP {response.status_code}", response.text)
+                            f"Missing required fields: {missing_fields}")
         except Exception as e:
             self.log_test("GET /api/analytics/summary", False, f"Request failed: {str(e)}")
         return False
     
+    def expected_summary(self, emissions, start_date=None, end_date=None):
+        """Recompute the summary totals from raw emission records"""
+        selected = [e for e in emissions
+                    if (not start_date or e["date"] >= start_date) and (not end_date or e["date"] <= end_date)]
+        summary = {
+            "totalEmissions": round(sum(e.get("co2Kg") or 0 for e in selected), 2),
+            "totalRecords": len(selected),
+            "categoryBreakdown": {},
+            "departmentBreakdown": {},
+            "monthlyData": {}
+        }
+        for e in selected:
+            co2 = e.get("co2Kg") or 0
+            for field, key in (("categoryBreakdown", e["category"]),
+                               ("departmentBreakdown", e["department"]),
+                               ("monthlyData", e["date"][:7])):
+                summary[field][key] = summary[field].get(key, 0) + co2
+        return summary
+
+    def test_analytics_summary_consistency(self):
+        """Test GET /api/analytics/summary totals match the raw emission records"""
+        cases = [("all data", {})]
+        if self.department_ids:
+            cases.append(("department filter", {"department": self.department_ids[0]}))
+        cases.append(("date range", {"start_date": "2024-06-01", "end_date": "2024-07-31"}))
+
+        all_passed = True
+        for label, params in cases:
+            test_name = f"GET /api/analytics/summary consistency ({label})"
+            try:
+                emissions = self.client.list_emissions(department=params.get("department"))
+                summary = self.client.analytics_summary(**params)
+                expected = self.expected_summary(emissions, params.get("start_date"), params.get("end_date"))
+
+                mismatches = []
+                if summary["totalRecords"] != expected["totalRecords"]:
+                    mismatches.append(f"totalRecords {summary['totalRecords']} != {expected['totalRecords']}")
+                if abs(summary["totalEmissions"] - expected["totalEmissions"]) > 0.01:
+                    mismatches.append(f"totalEmissions {summary['totalEmissions']} != {expected['totalEmissions']}")
+                for field in ("categoryBreakdown", "departmentBreakdown", "monthlyData"):
+                    if set(summary[field]) != set(expected[field]):
+                        mismatches.append(f"{field} keys differ")
+                        continue
+                    for key, value in expected[field].items():
+                        if abs(summary[field][key] - value) > 0.01:
+                            mismatches.append(f"{field}[{key}] {summary[field][key]} != {value}")
+
+                if mismatches:
+                    self.log_test(test_name, False, "Summary differs from raw records", "; ".join(mismatches[:5]))
+                    all_passed = False
+                else:
+                    self.log_test(test_name, True,
+                                f"Summary matches {expected['totalRecords']} raw records")
+            except Exception as e:
+                self.log_test(test_name, False, f"Request failed: {str(e)}")
+                all_passed = False
+        return all_passed
+
+    def test_analytics_summary_approx(self):
+        """Test GET /api/analytics/summary?mode=approx stays within its reported intervals"""
+        cases = [("all data", {}), ("date range", {"start_date": "2024-06-10", "end_date": "2024-07-20"})]
+        all_passed = True
+        for label, params in cases:
+            test_name = f"GET /api/analytics/summary?mode=approx ({label})"
+            try:
+                exact = self.client.analytics_summary(**params)
+                approx = self.client.analytics_summary(mode="approx", **params)
+                info = approx.get("approximation") or {}
+                intervals = info.get("intervals") or {}
+                low, high = intervals.get("totalEmissions", [None, None])
+
+                checks = [
+                    ("approximation block", info.get("method") in ("exact", "rollups", "sampled")
+                     and info.get("confidence") == 0.95 and isinstance(info.get("sampleSize"), int)),
+                    ("interval brackets estimate", low is not None and low - 0.01 <= approx["totalEmissions"] <= high + 0.01),
+                    # The exact total may fall outside a 95% interval by chance, but
+                    # not by more than the interval is wide
+                    ("exact total near interval", low is not None
+                     and low - (high - low) - 0.01 <= exact["totalEmissions"] <= high + (high - low) + 0.01),
+                    ("exact fallback matches", info.get("method") != "exact"
+                     or abs(approx["totalEmissions"] - exact["totalEmissions"]) < 0.01),
+                ]
+                failed = [name for name, ok in checks if not ok]
+                if failed:
+                    self.log_test(test_name, False, f"Failed checks: {', '.join(failed)}", info)
+                    all_passed = False
+                else:
+                    self.log_test(test_name, True,
+                                  f"{info['method']}: {approx['totalEmissions']} kg in [{low}, {high}], "
+                                  f"exact {exact['totalEmissions']} kg, {info['sampleSize']} samples")
+            except Exception as e:
+                self.log_test(test_name, False, f"Request failed: {str(e)}")
+                all_passed = False
+
+        try:
+            self.client.analytics_summary(mode="fast")
+            self.log_test("GET /api/analytics/summary?mode=fast", False, "Unknown mode accepted")
+            all_passed = False
+        except CarbonAPIError as e:
+            self.log_test("GET /api/analytics/summary?mode=fast", e.status == 400, f"HTTP {e.status}")
+            all_passed = all_passed and e.status == 400
+        return all_passed
+
+    def test_snapshot_oracle(self):
+        """Test summary and trends against a NumPy snapshot of the Arrow export"""
+        if analytics.np is None or analytics.pa is None:
+            self.log_test("Arrow export oracle", True, "Skipped: needs numpy and pyarrow")
+            return True
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                arrow_path = os.path.join(directory, "emissions.arrow")
+                started = time.perf_counter()
+                size = self.client.export_arrow(arrow_path)
+                snapshot = analytics.Snapshot.convert(arrow_path, os.path.join(directory, "snapshot"))
+                export_s = time.perf_counter() - started
+
+                cases = [("all data", {})]
+                if self.department_ids:
+                    cases.append(("department filter", {"department": self.department_ids[0]}))
+                cases.append(("date range", {"start_date": "2024-06-01", "end_date": "2024-07-31"}))
+                mismatches = []
+                for label, params in cases:
+                    mismatches += [f"summary ({label}): {m}" for m in analytics.compare_summaries(
+                        snapshot.summary(**params), self.client.analytics_summary(**params))]
+                mismatches += [f"trends: {m}" for m in analytics.compare_trends(
+                    snapshot.trends(months=12), self.client.analytics_trends(months=12))]
+
+            if mismatches:
+                self.log_test("Arrow export oracle", False, "Endpoints differ from the snapshot", mismatches[:5])
+                return False
+            self.log_test("Arrow export oracle", True,
+                          f"{snapshot.rows} records ({size // 1024} KB) exported and checked in {export_s:.2f}s")
+            return True
+        except Exception as e:
+            self.log_test("Arrow export oracle", False, f"Request failed: {str(e)}")
+        return False
+
+    def test_analytics_cache_etag(self):
+        """Test analytics responses carry ETags, revalidate with 304 and change after a write"""
+        try:
+            first = self.client.request("GET", "/analytics/summary")
+            etag = first.headers.get("ETag")
+            if not etag:
+                self.log_test("Analytics cache (ETag)", False, f"HTTP {first.status_code}, ETag {etag}")
+                return False
+
+            revalidated = self.client.request("GET", "/analytics/summary", headers={"If-None-Match": etag})
+            if revalidated.status_code != 304:
+                self.log_test("Analytics cache (ETag)", False,
+                            f"Expected 304 for matching If-None-Match, got {revalidated.status_code}")
+                return False
+
+            if self.department_ids:
+                self.client.create_emission({
+                    "date": "2024-06-16", "category": "electricity", "subcategory": "grid",
+                    "value": 10, "department": self.department_ids[0], "notes": "Cache invalidation check"
+                })
+                after_write = self.client.request("GET", "/analytics/summary", headers={"If-None-Match": etag})
+                if after_write.status_code != 200 or after_write.headers.get("ETag") == etag:
+                    self.log_test("Analytics cache (ETag)", False, "Cached summary survived a write")
+                    return False
+
+            stats = self.client.cache_stats()
+            self.log_test("Analytics cache (ETag)", True, "304 on revalidation, invalidated by writes",
+                        f"hits {stats['hits']}, misses {stats['misses']}, 304s {stats['notModified']}")
+            return True
+        except Exception as e:
+            self.log_test("Analytics cache (ETag)", False, f"Request failed: {str(e)}")
+        return False
+    
     def test_get_analytics_trends(self):
         """Test GET /api/analytics/trends"""
         try:
-            response = requests.get(f"{BASE_URL}/analytics/trends?months=6", 
-                                  headers=HEADERS, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success") and "data" in data:
-                    trends = data["data"]
-                    if isinstance(trends, list) and len(trends) > 0:
-                        # Check if trend data has required fields
-                        sample_trend = trends[0]
-                        required_fields = ["month", "electricity", "transportation", "heating", "waste", "total"]
-                        missing_fields = [field for field in required_fields if field not in sample_trend]
-                        
-                        if not missing_fields:
-                            self.log_test("GET /api/analytics/trends", True, 
-                                        f"Trend data retrieved successfully ({len(trends)} months)")
-                            return True
-                        else:
-                            self.log_test("GET /api/analytics/trends", False, 
-                                        f"Missing required fields in trend data: {missing_fields}")
-                    else:
-                        self.log_test("GET /api/analytics/trends", False, 
-                                    "No trend data returned")
+            trends = self.client.analytics_trends(months=6)
+            if isinstance(trends, list) and len(trends) > 0:
+                # Check if trend data has required fields
+                sample_trend = trends[0]
+                required_fields = ["month", "electricity", "transportation", "heating", "waste", "total"]
+                missing_fields = [field for field in required_fields if field not in sample_trend]
+                
+                if not missing_fields:
+                    self.log_test("GET /api/analytics/trends", True, 
+                                f"Trend data retrieved successfully ({len(trends)} months)")
+                    return True
                 else:
                     self.log_test("GET /api/analytics/trends", False, 
-                                "Invalid response format", data)
+                                f"Missing required fields in trend data: {missing_fields}")
             else:
                 self.log_test("GET /api/analytics/trends", False, 
-                            f"HTTP {response.status_code}", response.text)
+                            "No trend data returned")
         except Exception as e:
             self.log_test("GET /api/analytics/trends", False, f"Request failed: {str(e)}")
         return False
     
+    def test_dashboard(self):
+        """Test GET /api/dashboard matches the individual panel endpoints"""
+        try:
+            dashboard = self.client.dashboard(months=6, limit=10)
+            summary = self.client.analytics_summary()
+            trends = self.client.analytics_trends(months=6)
+            recommendations = self.client.recommendations()
+            records, cursor = self.client.get_emissions_page(10)
+            partial = self.client.dashboard(panels=["trends"], months=6)
+
+            checks = [
+                ("summary totals", abs(dashboard["summary"]["totalEmissions"] - summary["totalEmissions"]) < 0.01
+                 and dashboard["summary"]["totalRecords"] == summary["totalRecords"]),
+                ("category breakdown", dashboard["summary"]["categoryBreakdown"].keys()
+                 == summary["categoryBreakdown"].keys()),
+                ("trends", [t["month"] for t in dashboard["trends"]] == [t["month"] for t in trends]
+                 and all(abs(a["total"] - b["total"]) < 0.01 for a, b in zip(dashboard["trends"], trends))),
+                ("recommendations", [r["id"] for r in dashboard["recommendations"]]
+                 == [r["id"] for r in recommendations]),
+                ("emissions page", [r["id"] for r in dashboard["emissions"]["data"]] == [r["id"] for r in records]
+                 and dashboard["emissions"]["nextCursor"] == cursor),
+                ("panels option", set(partial) == {"trends", "changeToken"}),
+            ]
+
+            try:
+                self.client.dashboard(panels=["summary", "nope"])
+                checks.append(("unknown panel rejected", False))
+            except CarbonAPIError as e:
+                checks.append(("unknown panel rejected", e.status == 400))
+
+            failed = [name for name, ok in checks if not ok]
+            if failed:
+                self.log_test("GET /api/dashboard", False, f"Failed checks: {', '.join(failed)}")
+                return False
+            self.log_test("GET /api/dashboard", True, "All panels match their individual endpoints")
+            return True
+        except Exception as e:
+            self.log_test("GET /api/dashboard", False, f"Request failed: {str(e)}")
+        return False
+
+    def test_dashboard_change_token(self):
+        """Test a write between reading the feed head and loading the dashboard is applied once"""
+        try:
+            marker = f"dashboard-token-{uuid.uuid4().hex[:8]}"
+            department = self.client.create_department(marker, "Dashboard change token test")["id"]
+            head = self.client.get_changes()["token"]
+            created = self.client.create_emission({
+                "date": "2024-08-01",
+                "category": "electricity",
+                "subcategory": "grid",
+                "value": 100,
+                "department": department
+            })
+            dashboard = self.client.dashboard(department=department, months=6, limit=10)
+            token = dashboard["changeToken"]
+
+            since_head = self.client.get_changes(since=head)["changes"]
+            seq = next((c["seq"] for c in since_head if c["id"] == created["id"]), None)
+            replay = self.client.get_changes(since=token)["changes"] if token is not None else []
+            self.client.delete_emission(created["id"])
+
+            checks = [
+                ("token returned", token is not None),
+                ("load reflects the write", dashboard["summary"]["totalRecords"] == 1),
+                ("write is in the feed after the head", seq is not None),
+                ("write is behind the token", token is not None and seq is not None and int(token) >= seq),
+                ("write not replayed", created["id"] not in {c["id"] for c in replay}),
+            ]
+            failed = [name for name, ok in checks if not ok]
+            if failed:
+                self.log_test("GET /api/dashboard changeToken", False, f"Failed checks: {', '.join(failed)}")
+                return False
+            self.log_test("GET /api/dashboard changeToken", True,
+                          f"Write at seq {seq} is covered by token {token}")
+            return True
+        except Exception as e:
+            self.log_test("GET /api/dashboard changeToken", False, f"Request failed: {str(e)}")
+        return False
+
     def test_get_recommendations(self):
         """Test GET /api/recommendations"""
         try:
-            response = requests.get(f"{BASE_URL}/recommendations", headers=HEADERS, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success") and "data" in data:
-                    recommendations = data["data"]
-                    if isinstance(recommendations, list) and len(recommendations) > 0:
-                        # Check if recommendations have required fields
-                        sample_rec = recommendations[0]
-                        required_fields = ["id", "category", "priority", "title", "description", 
-                                         "potentialReduction", "estimatedCost", "paybackPeriod"]
-                        missing_fields = [field for field in required_fields if field not in sample_rec]
-                        
-                        if not missing_fields:
-                            self.log_test("GET /api/recommendations", True, 
-                                        f"Recommendations retrieved successfully ({len(recommendations)} items)")
-                            return True
-                        else:
-                            self.log_test("GET /api/recommendations", False, 
-                                        f"Missing required fields in recommendations: {missing_fields}")
-                    else:
-                        self.log_test("GET /api/recommendations", False, 
-                                    "No recommendations returned")
+            recommendations = self.client.recommendations()
+            if isinstance(recommendations, list) and len(recommendations) > 0:
+                # Check if recommendations have required fields
+                sample_rec = recommendations[0]
+                required_fields = ["id", "category", "priority", "title", "description", 
+                                 "potentialReduction", "estimatedCost", "paybackPeriod"]
+                missing_fields = [field for field in required_fields if field not in sample_rec]
+                
+                if not missing_fields:
+                    self.log_test("GET /api/recommendations", True, 
+                                f"Recommendations retrieved successfully ({len(recommendations)} items)")
+                    return True
                 else:
                     self.log_test("GET /api/recommendations", False, 
-                                "Invalid response format", data)
+                                f"Missing required fields in recommendations: {missing_fields}")
             else:
                 self.log_test("GET /api/recommendations", False, 
-                            f"HTTP {response.status_code}", response.text)
+                            "No recommendations returned")
         except Exception as e:
             self.log_test("GET /api/recommendations", False, f"Request failed: {str(e)}")
         return False
@@ -381,36 +755,167 @@ class BackendTester:
                 "notes": "Updated electricity usage"
             }
             
-            response = requests.put(f"{BASE_URL}/emissions/{emission_id}", 
-                                  json=update_data, headers=HEADERS, timeout=10)
+            updated_emission = self.client.update_emission(emission_id, update_data)
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success") and "data" in data:
-                    updated_emission = data["data"]
-                    
-                    # Verify CO2 recalculation
-                    expected_co2_lbs = 2000 * 0.92  # 1840 lbs
-                    actual_co2_lbs = updated_emission.get("co2Lbs")
-                    
-                    if abs(actual_co2_lbs - expected_co2_lbs) < 0.1:
-                        self.log_test("PUT /api/emissions/{id}", True, 
-                                    "Emission updated with correct CO2 recalculation",
-                                    f"New CO2: {actual_co2_lbs} lbs")
-                        return True
-                    else:
-                        self.log_test("PUT /api/emissions/{id}", False, 
-                                    f"CO2 recalculation error. Expected: {expected_co2_lbs}, Got: {actual_co2_lbs}")
-                else:
-                    self.log_test("PUT /api/emissions/{id}", False, 
-                                "Invalid response format", data)
+            # Verify CO2 recalculation
+            expected_co2_lbs = 2000 * 0.92  # 1840 lbs
+            actual_co2_lbs = updated_emission.get("co2Lbs")
+            
+            if abs(actual_co2_lbs - expected_co2_lbs) < 0.1:
+                self.log_test("PUT /api/emissions/{id}", True, 
+                            "Emission updated with correct CO2 recalculation",
+                            f"New CO2: {actual_co2_lbs} lbs")
+                return True
             else:
                 self.log_test("PUT /api/emissions/{id}", False, 
-                            f"HTTP {response.status_code}", response.text)
+                            f"CO2 recalculation error. Expected: {expected_co2_lbs}, Got: {actual_co2_lbs}")
         except Exception as e:
             self.log_test("PUT /api/emissions/{id}", False, f"Request failed: {str(e)}")
         return False
     
+    def test_put_emissions_value_only(self):
+        """A value-only PUT restates CO2 with the record's stored category and date"""
+        if not self.department_ids:
+            self.log_test("PUT /api/emissions/{id} (value only)", False, "No department IDs available")
+            return False
+
+        try:
+            created = self.client.create_emission({
+                "date": "2024-06-20",
+                "category": "heating",
+                "subcategory": "naturalGas",
+                "value": 10,
+                "department": self.department_ids[0],
+                "notes": "Value-only update test"
+            })
+            updated = self.client.update_emission(created["id"], {"value": 20})
+            self.client.delete_emission(created["id"])
+
+            expected_co2_lbs = round(20 * created["emissionFactor"], 2)
+            if (updated.get("category") == "heating" and updated.get("emissionFactor") == created["emissionFactor"]
+                    and abs(updated.get("co2Lbs", 0) - expected_co2_lbs) < 0.01):
+                self.log_test("PUT /api/emissions/{id} (value only)", True,
+                              f"CO2 restated with the stored heating/naturalGas factor: {updated['co2Lbs']} lbs")
+                return True
+            self.log_test("PUT /api/emissions/{id} (value only)", False,
+                          f"Expected {expected_co2_lbs} lbs at factor {created['emissionFactor']}", updated)
+        except Exception as e:
+            self.log_test("PUT /api/emissions/{id} (value only)", False, f"Request failed: {str(e)}")
+        return False
+
+    def test_batch_operations(self):
+        """Test POST /api/emissions/batch with updates and deletes by id and by filter"""
+        if not self.department_ids:
+            self.log_test("POST /api/emissions/batch", False, "No department IDs available")
+            return False
+
+        try:
+            marker = f"batch-{uuid.uuid4().hex[:8]}"
+            department = self.client.create_department(marker, "Batch operations test")["id"]
+            created = [self.client.create_emission({
+                "date": f"2024-07-{day:02d}",
+                "category": "electricity",
+                "subcategory": "grid",
+                "value": 100,
+                "department": department
+            }) for day in (1, 2, 3)]
+            summary_before = self.client.analytics_summary(department=department)
+
+            result = self.client.batch_emissions([
+                {"op": "update", "id": created[0]["id"], "set": {"value": 300}},
+                {"op": "update", "filter": {"department": department, "startDate": "2024-07-02"},
+                 "set": {"subcategory": "solar"}},
+                {"op": "delete", "id": created[2]["id"]},
+                {"op": "delete", "id": str(uuid.uuid4())},
+            ])
+            results = result["results"]
+            rows = {e["id"]: e for e in self.client.list_emissions(department=department)}
+            summary_after = self.client.analytics_summary(department=department)
+
+            checks = [
+                ("per-operation matches", [r["matched"] for r in results] == [1, 2, 1, 0]),
+                ("missing id reported", results[3].get("error") == "Emission record not found"),
+                ("counts", (result["updated"], result["deleted"]) == (2, 1)),
+                ("value restated", abs(rows[created[0]["id"]]["co2Lbs"] - 300 * created[0]["emissionFactor"]) < 0.01),
+                ("subcategory restated", rows[created[1]["id"]]["co2Lbs"] == 0
+                 and rows[created[1]["id"]]["subcategory"] == "solar"),
+                ("record deleted", created[2]["id"] not in rows),
+                ("summary follows", summary_after["totalRecords"] == summary_before["totalRecords"] - 1),
+                # monthlyData comes from the rollups, which the batch updates by delta
+                ("rollups follow", abs(summary_after["monthlyData"].get("2024-07", 0)
+                                       - sum(r["co2Kg"] for r in rows.values())) < 0.1),
+            ]
+            self.client.batch_emissions([{"op": "delete", "filter": {"department": department}}])
+
+            failed = [name for name, ok in checks if not ok]
+            if failed:
+                self.log_test("POST /api/emissions/batch", False, f"Failed checks: {', '.join(failed)}", result)
+                return False
+            self.log_test("POST /api/emissions/batch", True,
+                          "Updates and deletes by id and filter applied in order with CO2 restated")
+            return True
+        except Exception as e:
+            self.log_test("POST /api/emissions/batch", False, f"Request failed: {str(e)}")
+        return False
+
+    def test_change_feed(self):
+        """Test GET /api/emissions/changes reports puts and tombstones after a token"""
+        try:
+            marker = f"changes-{uuid.uuid4().hex[:8]}"
+            department = self.client.create_department(marker, "Change feed test")["id"]
+            start = self.client.get_changes()["token"]
+            summary_before = self.client.analytics_summary(department=department)
+
+            created = [self.client.create_emission({
+                "date": f"2024-08-{day:02d}",
+                "category": "electricity",
+                "subcategory": "grid",
+                "value": 100,
+                "department": department
+            }) for day in (1, 2)]
+            self.client.update_emission(created[0]["id"], {"value": 250})
+            self.client.delete_emission(created[1]["id"])
+
+            feed = self.client.get_changes(since=start)
+            changes = [c for c in feed["changes"]
+                       if department in ((c.get("after") or {}).get("department"), (c.get("before") or {}).get("department"))]
+            summary_after = self.client.analytics_summary(department=department)
+            # The summary moves by exactly the sum of the deltas the feed reports
+            delta = sum((c.get("after") or {}).get("co2Kg", 0) if c["op"] == "put" else 0 for c in changes) \
+                - sum((c.get("before") or {}).get("co2Kg", 0) for c in changes)
+            replay = self.client.get_changes(since=feed["token"])
+
+            checks = [
+                ("ops in order", [c["op"] for c in changes] == ["put", "put", "put", "delete"]),
+                ("sequence increases", [c["seq"] for c in changes] == sorted(c["seq"] for c in changes)),
+                ("inserts have no before", changes[0]["before"] is None and changes[1]["before"] is None),
+                ("update carries before and after", changes[2]["before"]["value"] == 100
+                 and changes[2]["after"]["value"] == 250),
+                ("tombstone", changes[3]["id"] == created[1]["id"] and "after" not in changes[3]),
+                ("token advances", int(feed["token"]) > int(start) and not feed["reset"]),
+                ("replay is empty", not [c for c in replay["changes"] if c["id"] in {e["id"] for e in created}]),
+                ("deltas match summary", abs(summary_before["totalEmissions"] + delta
+                                             - summary_after["totalEmissions"]) < 0.01),
+            ]
+            self.client.delete_emission(created[0]["id"])
+
+            try:
+                self.client.get_changes(since="not-a-token")
+                checks.append(("bad token rejected", False))
+            except CarbonAPIError as e:
+                checks.append(("bad token rejected", e.status == 400))
+
+            failed = [name for name, ok in checks if not ok]
+            if failed:
+                self.log_test("GET /api/emissions/changes", False, f"Failed checks: {', '.join(failed)}", changes)
+                return False
+            self.log_test("GET /api/emissions/changes", True,
+                          f"{len(changes)} changes after token {start}, deltas match the summary")
+            return True
+        except Exception as e:
+            self.log_test("GET /api/emissions/changes", False, f"Request failed: {str(e)}")
+        return False
+
     def test_delete_emissions(self):
         """Test DELETE /api/emissions/{id}"""
         if not self.emission_ids or len(self.emission_ids) < 2:
@@ -420,33 +925,29 @@ class BackendTester:
         try:
             emission_id = self.emission_ids[-1]  # Use last ID
             
-            response = requests.delete(f"{BASE_URL}/emissions/{emission_id}", 
-                                     headers=HEADERS, timeout=10)
+            result = self.client.delete_emission(emission_id)
+            if not result.get("success"):
+                self.log_test("DELETE /api/emissions/{id}", False, 
+                            "Invalid response format", result)
+                return False
+            self.log_test("DELETE /api/emissions/{id}", True, 
+                        "Emission deleted successfully")
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get("success"):
-                    self.log_test("DELETE /api/emissions/{id}", True, 
-                                "Emission deleted successfully")
-                    
-                    # Test 404 for non-existent ID
-                    fake_id = str(uuid.uuid4())
-                    response = requests.delete(f"{BASE_URL}/emissions/{fake_id}", 
-                                             headers=HEADERS, timeout=10)
-                    
-                    if response.status_code == 404:
-                        self.log_test("DELETE /api/emissions/{id} (404 test)", True, 
-                                    "Correctly returns 404 for non-existent ID")
-                        return True
-                    else:
-                        self.log_test("DELETE /api/emissions/{id} (404 test)", False, 
-                                    f"Expected 404, got {response.status_code}")
-                else:
-                    self.log_test("DELETE /api/emissions/{id}", False, 
-                                "Invalid response format", data)
+            # Test 404 for non-existent ID
+            fake_id = str(uuid.uuid4())
+            try:
+                self.client.delete_emission(fake_id)
+                status = 200
+            except CarbonAPIError as e:
+                status = e.status
+            
+            if status == 404:
+                self.log_test("DELETE /api/emissions/{id} (404 test)", True, 
+                            "Correctly returns 404 for non-existent ID")
+                return True
             else:
-                self.log_test("DELETE /api/emissions/{id}", False, 
-                            f"HTTP {response.status_code}", response.text)
+                self.log_test("DELETE /api/emissions/{id} (404 test)", False, 
+                            f"Expected 404, got {status}")
         except Exception as e:
             self.log_test("DELETE /api/emissions/{id}", False, f"Request failed: {str(e)}")
         return False
@@ -486,29 +987,19 @@ class BackendTester:
                     "notes": f"Testing {test_case['category']} calculation"
                 }
                 
-                response = requests.post(f"{BASE_URL}/emissions", 
-                                       json=emission_data, headers=HEADERS, timeout=10)
+                emission = self.client.create_emission(emission_data)
+                actual_lbs = emission.get("co2Lbs", 0)
+                actual_kg = emission.get("co2Kg", 0)
+                
+                lbs_diff = abs(actual_lbs - test_case["expected_lbs"])
+                kg_diff = abs(actual_kg - test_case["expected_kg"])
                 
-                if response.status_code == 201:
-                    data = response.json()
-                    if data.get("success"):
-                        emission = data["data"]
-                        actual_lbs = emission.get("co2Lbs", 0)
-                        actual_kg = emission.get("co2Kg", 0)
-                        
-                        lbs_diff = abs(actual_lbs - test_case["expected_lbs"])
-                        kg_diff = abs(actual_kg - test_case["expected_kg"])
-                        
-                        if lbs_diff < 0.1 and kg_diff < 0.1:
-                            self.log_test(f"Emission calculation ({test_case['category']})", True,
-                                        f"Calculation accurate: {actual_kg:.2f} kg CO2")
-                        else:
-                            self.log_test(f"Emission calculation ({test_case['category']})", False,
-                                        f"Expected: {test_case['expected_kg']:.2f} kg, Got: {actual_kg:.2f} kg")
-                            all_passed = False
-                    else:
-                        all_passed = False
+                if lbs_diff < 0.1 and kg_diff < 0.1:
+                    self.log_test(f"Emission calculation ({test_case['category']})", True,
+                                f"Calculation accurate: {actual_kg:.2f} kg CO2")
                 else:
+                    self.log_test(f"Emission calculation ({test_case['category']})", False,
+                                f"Expected: {test_case['expected_kg']:.2f} kg, Got: {actual_kg:.2f} kg")
                     all_passed = False
             
             return all_passed
@@ -517,6 +1008,38 @@ class BackendTester:
             self.log_test("Emission calculations", False, f"Request failed: {str(e)}")
             return False
     
+    def test_recalculation_job(self):
+        """Test POST /api/recalculations restates a narrow scope and reports progress"""
+        try:
+            before = {e["id"]: e for e in self.client.list_emissions(
+                category="electricity", start_date="2024-06-01", end_date="2024-06-30")}
+            job = self.client.start_recalculation("2024-06-01", "2024-06-30", ["electricity/grid"])
+            
+            deadline = time.time() + 60
+            while job["status"] in ("pending", "running") and time.time() < deadline:
+                time.sleep(0.5)
+                job = self.client.recalculation(job["id"])
+            
+            if job["status"] != "completed" or job["progress"] != 1:
+                self.log_test("Recalculation job", False, f"Job ended as {job['status']}", job.get("error"))
+                return False
+            
+            # With no new factor version the restated values must not change
+            after = {e["id"]: e for e in self.client.list_emissions(
+                category="electricity", start_date="2024-06-01", end_date="2024-06-30")}
+            changed = [i for i, e in before.items()
+                       if i in after and abs((after[i].get("co2Kg") or 0) - (e.get("co2Kg") or 0)) > 0.001]
+            if changed:
+                self.log_test("Recalculation job", False, f"{len(changed)} records changed value", changed[:5])
+                return False
+            
+            self.log_test("Recalculation job", True,
+                        f"{job['totalChunks']} chunks, {job['modified']} records restated, values unchanged")
+            return True
+        except Exception as e:
+            self.log_test("Recalculation job", False, f"Request failed: {str(e)}")
+        return False
+    
     def run_all_tests(self):
         """Run all backend tests"""
         print("🧪 Starting Carbon Footprint Analytics Dashboard Backend Tests")
@@ -531,20 +1054,35 @@ class BackendTester:
             ("Emissions API", [
                 self.test_get_emissions,
                 self.test_get_emissions_with_filters,
+                self.test_get_emissions_paginated,
                 self.test_post_emissions,
+                self.test_post_emissions_concurrent,
                 self.test_post_emissions_bulk,
+                self.test_bulk_upload_chunked,
+                self.test_bulk_upsert_idempotent,
+                self.test_post_emissions_import,
                 self.test_put_emissions,
+                self.test_put_emissions_value_only,
+                self.test_batch_operations,
+                self.test_change_feed,
                 self.test_delete_emissions
             ]),
             ("Analytics API", [
                 self.test_get_analytics_summary,
-                self.test_get_analytics_trends
+                self.test_analytics_summary_consistency,
+                self.test_analytics_summary_approx,
+                self.test_snapshot_oracle,
+                self.test_analytics_cache_etag,
+                self.test_get_analytics_trends,
+                self.test_dashboard,
+                self.test_dashboard_change_token
             ]),
             ("Recommendations API", [
                 self.test_get_recommendations
             ]),
             ("Calculations", [
-                self.test_emission_calculations
+                self.test_emission_calculations,
+                self.test_recalculation_job
             ])
         ]
         
@@ -576,7 +1114,244 @@ class BackendTester:
             print(f"\n⚠️  {total_tests - passed_tests} tests failed. Check the details above.")
             return False
 
+class LoadTester:
+    """Replays the BackendTester endpoint mix from concurrent workers and reports latency percentiles"""
+
+    def __init__(self, workers=50, rate=None, duration=30, include_writes=False, seed=None, profile="mixed"):
+        self.workers = workers
+        self.rate = rate
+        self.duration = duration
+        self.profile = profile
+        # The ingest profile sends only single-record writes, like meter gateways
+        if profile == "ingest":
+            self.mix = WRITE_MIX
+        else:
+            self.mix = LOAD_MIX + (WRITE_MIX if include_writes else [])
+        self.random = random.Random(seed)
+        self.department_ids = []
+        self.samples = {name: [] for name, _, _, _ in self.mix}
+        self.errors = {name: 0 for name, _, _, _ in self.mix}
+        # 503s from a full ingest buffer: backpressure, not failures
+        self.rejected = {name: 0 for name, _, _, _ in self.mix}
+        self.ingest_enabled = False
+        self.lock = threading.Lock()
+        # One keep-alive pool sized to the workers; no retries so failures count as errors
+        self.client = CarbonClient(BASE_URL, timeout=30, retries=0, pool_size=workers)
+
+    def pick(self):
+        """Pick the next endpoint according to the mix weights"""
+        with self.lock:
+            return self.random.choices(self.mix, weights=[w for _, _, _, w in self.mix])[0]
+
+    def emission_payload(self):
+        """Request body for the write mix, shaped like test_post_emissions"""
+        with self.lock:
+            department = self.random.choice(self.department_ids)
+            value = round(self.random.uniform(500, 2500), 2)
+        return {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "category": "electricity",
+            "subcategory": "grid",
+            "value": value,
+            "department": department,
+            "notes": "Load test reading"
+        }
+
+    def send(self, scheduled_at=None):
+        """Send one request from the mix and record its latency.
+
+        In fixed-rate mode latency is measured from the scheduled send time, so
+        queueing behind busy workers counts against the endpoint.
+        """
+        name, method, path, _ = self.pick()
+        started = scheduled_at if scheduled_at is not None else time.perf_counter()
+        ok = False
+        try:
+            body = self.emission_payload() if method == "POST" else None
+            self.client.request(method, path, json_body=body)
+            ok = True
+        except CarbonAPIError as e:
+            if self.is_backpressure(method, e):
+                with self.lock:
+                    self.rejected[name] += 1
+                return
+        except requests.RequestException:
+            ok = False
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self.lock:
+            self.samples[name].append(elapsed_ms)
+            if not ok:
+                self.errors[name] += 1
+
+    def is_backpressure(self, method, error):
+        """A 503 from a full ingest buffer, which always carries Retry-After; any other 503 is an error"""
+        return (self.ingest_enabled and method == "POST" and error.status == 503
+                and "Retry-After" in error.headers)
+
+    def closed_loop(self, deadline):
+        """Worker loop used when no target rate is set: send as fast as responses return"""
+        while time.perf_counter() < deadline:
+            self.send()
+
+    def run(self):
+        """Run the load test and return the JSON report"""
+        if any(method == "POST" for _, method, _, _ in self.mix):
+            self.department_ids = [d["id"] for d in self.client.list_departments()]
+            if not self.department_ids:
+                raise RuntimeError("Write mix needs at least one department")
+
+        ingest_before = None
+        if any(method == "POST" for _, method, _, _ in self.mix):
+            ingest_before = self.client.ingest_stats()
+            self.ingest_enabled = bool(ingest_before.get("enabled"))
+
+        print(f"🚀 Load test ({self.profile}): {self.workers} workers, "
+              f"{f'{self.rate} req/s' if self.rate else 'closed loop'}, {self.duration}s against {BASE_URL}")
+
+        started = time.perf_counter()
+        deadline = started + self.duration
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            if self.rate:
+                interval = 1.0 / self.rate
+                sent = 0
+                while True:
+                    scheduled_at = started + sent * interval
+                    if scheduled_at >= deadline:
+                        break
+                    delay = scheduled_at - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    pool.submit(self.send, scheduled_at)
+                    sent += 1
+            else:
+                for _ in range(self.workers):
+                    pool.submit(self.closed_loop, deadline)
+        elapsed = time.perf_counter() - started
+
+        report = self.report(elapsed)
+        if self.profile == "ingest":
+            report["ingest"] = self.ingest_report(ingest_before, self.client.ingest_stats())
+        return report
+
+    @staticmethod
+    def ingest_report(before, after):
+        """Server-side group-commit counters over the run; None when the buffer is off"""
+        if not after.get("enabled"):
+            return None
+        delta = {key: after.get(key, 0) - before.get(key, 0)
+                 for key in ("batches", "records", "failed", "rejected")}
+        delta["mean_batch_size"] = round(delta["records"] / delta["batches"], 1) if delta["batches"] else 0.0
+        delta["flush_ms"] = after.get("flushMs")
+        return delta
+
+    @staticmethod
+    def percentile(sorted_values, pct):
+        """Nearest-rank percentile of an already sorted list"""
+        if not sorted_values:
+            return None
+        rank = min(len(sorted_values), max(1, math.ceil(pct / 100.0 * len(sorted_values))))
+        return sorted_values[rank - 1]
+
+    def report(self, elapsed):
+        """Build the per-endpoint latency / throughput / error report"""
+        endpoints = {}
+        total_requests = 0
+        total_errors = 0
+        for name, samples in self.samples.items():
+            values = sorted(samples)
+            errors = self.errors[name]
+            total_requests += len(values)
+            total_errors += errors
+            endpoints[name] = {
+                "requests": len(values),
+                "errors": errors,
+                "rejected": self.rejected[name],
+                "error_rate": round(errors / len(values), 4) if values else 0.0,
+                "throughput_rps": round(len(values) / elapsed, 2),
+                "latency_ms": {
+                    "min": round(values[0], 2) if values else None,
+                    "p50": round(self.percentile(values, 50), 2) if values else None,
+                    "p95": round(self.percentile(values, 95), 2) if values else None,
+                    "p99": round(self.percentile(values, 99), 2) if values else None,
+                    "max": round(values[-1], 2) if values else None,
+                    "mean": round(sum(values) / len(values), 2) if values else None
+                }
+            }
+
+        return {
+            "base_url": BASE_URL,
+            "generated_at": datetime.now().isoformat(),
+            "profile": self.profile,
+            "workers": self.workers,
+            "target_rate_rps": self.rate,
+            "duration_s": round(elapsed, 2),
+            "total_requests": total_requests,
+            "throughput_rps": round(total_requests / elapsed, 2),
+            "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+            "endpoints": endpoints
+        }
+
+    def run_load_test(self, output=None):
+        """Run the load test, print a table and optionally write the JSON report"""
+        report = self.run()
+
+        print("\n" + "=" * 70)
+        print("📈 LOAD TEST SUMMARY")
+        print("=" * 70)
+        print(f"{'Endpoint':<42}{'req/s':>8}{'p50':>8}{'p95':>8}{'p99':>8}{'err%':>7}")
+        for name, stats in report["endpoints"].items():
+            latency = stats["latency_ms"]
+            if not stats["requests"]:
+                continue
+            print(f"{name:<42}{stats['throughput_rps']:>8.1f}{latency['p50']:>8.0f}"
+                  f"{latency['p95']:>8.0f}{latency['p99']:>8.0f}{stats['error_rate'] * 100:>7.1f}")
+        print(f"\nTotal: {report['total_requests']} requests, {report['throughput_rps']} req/s, "
+              f"{report['error_rate'] * 100:.1f}% errors")
+        rejected = sum(stats["rejected"] for stats in report["endpoints"].values())
+        if rejected:
+            print(f"Backpressure: {rejected} writes refused with 503 by a full ingest buffer")
+        ingest = report.get("ingest")
+        if ingest:
+            print(f"Ingest buffer: {ingest['records']} records in {ingest['batches']} batches "
+                  f"(mean {ingest['mean_batch_size']}, {ingest['flush_ms']} ms per batch)")
+        elif self.profile == "ingest":
+            print("Ingest buffer: off (start the server with INGEST_BUFFER=on to batch writes)")
+
+        if output:
+            with open(output, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"📝 Report written to {output}")
+        else:
+            print(json.dumps(report, indent=2))
+
+        return report["error_rate"] == 0.0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Carbon Footprint Analytics backend tests")
+    parser.add_argument("--load", action="store_true",
+                        help="Run the concurrent load mode instead of the functional tests")
+    parser.add_argument("--workers", type=int, default=50, help="Concurrent workers (load mode)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Target requests per second; omit for closed-loop (load mode)")
+    parser.add_argument("--duration", type=float, default=30, help="Test duration in seconds (load mode)")
+    parser.add_argument("--include-writes", action="store_true",
+                        help="Add POST /api/emissions to the endpoint mix (load mode)")
+    parser.add_argument("--profile", choices=("mixed", "ingest"), default="mixed",
+                        help="mixed: the read mix (plus --include-writes); "
+                             "ingest: only single-record POST /api/emissions (load mode)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for the endpoint picker (load mode)")
+    parser.add_argument("--report", default=None, help="Write the JSON report to this file (load mode)")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    tester = BackendTester()
-    success = tester.run_all_tests()
+    args = parse_args()
+    if args.load:
+        load_tester = LoadTester(workers=args.workers, rate=args.rate, duration=args.duration,
+                                 include_writes=args.include_writes, seed=args.seed, profile=args.profile)
+        success = load_tester.run_load_test(output=args.report)
+    else:
+        tester = BackendTester()
+        success = tester.run_all_tests()
     sys.exit(0 if success else 1)
\ No newline at end of file
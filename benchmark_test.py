@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Carbon Footprint Analytics Endpoint Benchmarks
+Loads synthetic datasets of increasing size, measures cold and warm latency of
+every route in app/api/[[...path]]/route.js plus the server's memory, and fails
+when a route regresses past the recorded baseline or the approximate summary
+drifts too far from the exact one.
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+
+from carbon_client import CarbonAPIError, CarbonClient, parse_server_timing
+
+# Configuration
+BASE_URL = os.environ.get("BASE_URL", "http://localhost:3000/api")
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(ROOT, "benchmark_baseline.json")
+DEFAULT_SIZES = [10000, 100000, 1000000]
+BULK_BATCH = 100
+# Marks the bulk route's records; the bulk response carries no ids, so cleanup
+# finds them by this note
+BULK_NOTES = "Benchmark bulk write"
+# Most operations POST /api/emissions/batch accepts in one request
+BATCH_OPERATIONS = 1000
+APPROX_RUNS = 5
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = min(len(sorted_values), max(1, math.ceil(pct / 100.0 * len(sorted_values))))
+    return sorted_values[rank - 1]
+
+
+def median_timings(samples):
+    """Per-phase median of a list of parsed Server-Timing headers"""
+    phases = sorted({phase for sample in samples for phase in sample})
+    return {phase: round(statistics.median(s.get(phase, 0.0) for s in samples), 2) for phase in phases}
+
+
+def read_memory_kb(pid):
+    """Current (VmRSS) and peak (VmHWM) resident memory of a process, from /proc"""
+    if not pid:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None
+    return {
+        "rss_kb": int(fields["VmRSS"].split()[0]),
+        "peak_rss_kb": int(fields["VmHWM"].split()[0])
+    }
+
+
+def run_node(script, *args):
+    """Run one of the Node maintenance scripts from the repo root"""
+    subprocess.run(["node", os.path.join(ROOT, "scripts", script), *args], cwd=ROOT, check=True)
+
+
+class BenchmarkTester:
+    def __init__(self, client, baseline, repeat=20, threshold=0.25, min_delta_ms=5.0,
+                 server_pid=None, full_list_max=100000, approx_max_error=0.05):
+        self.client = client
+        self.baseline = baseline
+        self.repeat = repeat
+        self.threshold = threshold
+        self.min_delta_ms = min_delta_ms
+        self.server_pid = server_pid
+        self.full_list_max = full_list_max
+        self.approx_max_error = approx_max_error
+        self.test_results = []
+        self.measured = {}
+
+    def log_test(self, test_name, success, message, details=None):
+        """Log test results"""
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status} {test_name}: {message}")
+        if details:
+            print(f"   Details: {details}")
+
+        self.test_results.append({
+            "test": test_name,
+            "success": success,
+            "message": message,
+            "details": details
+        })
+
+    def emission_payload(self, department, value=1000, notes="Benchmark write"):
+        return {
+            "date": datetime.now().strftime("%Y-%m-%d"),
+            "category": "electricity",
+            "subcategory": "grid",
+            "value": value,
+            "department": department,
+            "notes": notes
+        }
+
+    def routes(self, size, department):
+        """(name, request factory) per route; each factory returns (method, path, params, body).
+
+        Read routes get a fresh `_bench` parameter for the cold request. The API
+        ignores unknown parameters, but the response cache keys on them, so the
+        cold request is always computed rather than served from cache.
+        Returns the routes, the ids of records created one at a time and the
+        dates of the bulk route's records.
+        """
+        created = []
+        bulk_dates = set()
+
+        def read(path, **params):
+            return lambda: ("GET", path, params, None)
+
+        def create():
+            return "POST", "/emissions", {}, self.emission_payload(department)
+
+        def bulk():
+            emissions = [self.emission_payload(department, 100 + i, BULK_NOTES) for i in range(BULK_BATCH)]
+            bulk_dates.update(e["date"] for e in emissions)
+            return "POST", "/emissions/bulk", {}, {"emissions": emissions}
+
+        def update():
+            return "PUT", f"/emissions/{created[-1]}", {}, {
+                "value": 1500, "category": "electricity", "subcategory": "grid"}
+
+        def delete():
+            return "DELETE", f"/emissions/{created.pop()}", {}, None
+
+        routes = [
+            ("GET /api/emissions?limit=100", read("/emissions", limit=100)),
+            ("GET /api/emissions?department&limit=100", read("/emissions", department=department, limit=100)),
+            ("GET /api/emissions?category&limit=100", read("/emissions", category="electricity", limit=100)),
+            ("GET /api/emissions?startDate&endDate&limit=100",
+             read("/emissions", startDate="2025-01-01", endDate="2025-03-31", limit=100)),
+            ("GET /api/analytics/summary", read("/analytics/summary")),
+            ("GET /api/analytics/summary?department", read("/analytics/summary", department=department)),
+            ("GET /api/analytics/summary?mode=approx", read("/analytics/summary", mode="approx")),
+            ("GET /api/analytics/trends", read("/analytics/trends", months=12)),
+            ("GET /api/recommendations", read("/recommendations")),
+            ("GET /api/departments", read("/departments")),
+            ("POST /api/emissions", create),
+            (f"POST /api/emissions/bulk ({BULK_BATCH} records)", bulk),
+            ("PUT /api/emissions/:id", update),
+            ("DELETE /api/emissions/:id", delete),
+        ]
+        if size <= self.full_list_max:
+            routes.insert(0, ("GET /api/emissions (full list)", read("/emissions")))
+        return routes, created, bulk_dates
+
+    def remove_bulk_records(self, department, dates):
+        """Delete the records the bulk route added, found by their notes; returns how many"""
+        ids = [e["id"] for date in sorted(dates)
+               for e in self.client.iter_emissions(fields=["id", "notes"], department=department,
+                                                   start_date=date, end_date=date)
+               if e.get("notes") == BULK_NOTES]
+        for start in range(0, len(ids), BATCH_OPERATIONS):
+            self.client.batch_emissions([{"op": "delete", "id": emission_id}
+                                         for emission_id in ids[start:start + BATCH_OPERATIONS]])
+        return len(ids)
+
+    def timed(self, method, path, params, body):
+        """One request; returns (elapsed ms, response)"""
+        started = time.perf_counter()
+        response = self.client.request(method, path, params=params, json_body=body)
+        return (time.perf_counter() - started) * 1000, response
+
+    def measure(self, factory, created):
+        """Cold (first) request plus `repeat` warm requests of the same shape"""
+        method, path, params, body = factory()
+        cold_params = {**params, "_bench": uuid.uuid4().hex} if method == "GET" else params
+        cold_ms, response = self.timed(method, path, cold_params, body)
+        cold_cache = response.headers.get("X-Cache")
+        cold_timing = parse_server_timing(response.headers.get("Server-Timing"))
+        if method == "POST" and path == "/emissions":
+            created.append(response.json()["data"]["id"])
+
+        warm = []
+        warm_timings = []
+        for _ in range(self.repeat):
+            if method == "DELETE" and not created:
+                break
+            method, path, params, body = factory()
+            elapsed, response = self.timed(method, path, params, body)
+            warm.append(elapsed)
+            warm_timings.append(parse_server_timing(response.headers.get("Server-Timing")))
+            if method == "POST" and path == "/emissions":
+                created.append(response.json()["data"]["id"])
+        warm.sort()
+
+        return {
+            "cold_ms": round(cold_ms, 2),
+            "warm_p50_ms": round(percentile(warm, 50), 2) if warm else None,
+            "warm_p95_ms": round(percentile(warm, 95), 2) if warm else None,
+            "warm_mean_ms": round(statistics.mean(warm), 2) if warm else None,
+            "samples": len(warm),
+            "cold_cache": cold_cache,
+            # Server-side split of each request (db / compute / serialize / total)
+            "server_timing": {
+                "cold": cold_timing,
+                "warm_p50": median_timings(warm_timings) if warm_timings else {}
+            }
+        }
+
+    def summary_ms(self, params):
+        """Median latency of uncached summary requests, and the last response"""
+        elapsed = []
+        for _ in range(APPROX_RUNS):
+            started = time.perf_counter()
+            response = self.client.request("GET", "/analytics/summary",
+                                           params={**params, "_bench": uuid.uuid4().hex})
+            elapsed.append((time.perf_counter() - started) * 1000)
+        return statistics.median(elapsed), response.json()["data"]
+
+    def check_approximation(self, label, department):
+        """Compare mode=approx with the exact summary over multi-year ranges.
+
+        The ranges start and end mid-month, so the approximate answer uses
+        samples for its edge months. Fails when the total is off by more than
+        approx_max_error; also reports interval coverage and the speedup.
+        """
+        months = sorted(self.client.analytics_summary(mode="approx")["monthlyData"])
+        if not months:
+            return True, {}
+        bounds = {"startDate": f"{months[0]}-10", "endDate": f"{months[-1]}-20"}
+        cases = [("all departments", bounds), ("one department", {**bounds, "department": department})]
+
+        results = {}
+        all_passed = True
+        for name, params in cases:
+            test_name = f"[{label}] GET /api/analytics/summary?mode=approx accuracy ({name})"
+            try:
+                exact_ms, exact = self.summary_ms(params)
+                approx_ms, approx = self.summary_ms({**params, "mode": "approx"})
+            except Exception as e:
+                self.log_test(test_name, False, f"Request failed: {str(e)}")
+                all_passed = False
+                continue
+
+            info = approx["approximation"]
+            low, high = info["intervals"]["totalEmissions"]
+            error = abs(approx["totalEmissions"] - exact["totalEmissions"]) / max(exact["totalEmissions"], 1e-9)
+            results[name] = {
+                "method": info["method"],
+                "sample_size": info["sampleSize"],
+                "relative_error": round(error, 5),
+                "covered": low <= exact["totalEmissions"] <= high,
+                "exact_ms": round(exact_ms, 2),
+                "approx_ms": round(approx_ms, 2),
+                "speedup": round(exact_ms / approx_ms, 1) if approx_ms else None
+            }
+            summary = (f"{info['method']}, error {error:.3%}, exact total "
+                       f"{'inside' if results[name]['covered'] else 'outside'} the 95% interval, "
+                       f"{exact_ms:.1f}ms exact vs {approx_ms:.1f}ms approx ({results[name]['speedup']}x)")
+            passed = error <= self.approx_max_error
+            self.log_test(test_name, passed, summary, None if passed else results[name])
+            all_passed = all_passed and passed
+        return all_passed, results
+
+    def regressed(self, current, previous, key):
+        """True when `key` grew past the threshold and the absolute slack"""
+        if not previous or previous.get(key) is None or current.get(key) is None:
+            return False
+        limit = max(previous[key] * (1 + self.threshold), previous[key] + self.min_delta_ms)
+        return current[key] > limit
+
+    def run_size(self, label, size):
+        """Benchmark every route against the dataset currently loaded"""
+        print(f"\n📋 Dataset: {label}")
+        print("-" * 70)
+        departments = self.client.list_departments()
+        if not departments:
+            self.log_test(f"[{label}] dataset", False, "No departments; load a dataset first")
+            return False
+        department = departments[0]["id"]
+
+        results = {"routes": {}, "memory": {"before": read_memory_kb(self.server_pid)}}
+        previous = self.baseline.get(label, {}).get("routes", {})
+        routes, created, bulk_dates = self.routes(size, department)
+        all_passed = True
+
+        for name, factory in routes:
+            test_name = f"[{label}] {name}"
+            try:
+                stats = self.measure(factory, created)
+            except Exception as e:
+                self.log_test(test_name, False, f"Request failed: {str(e)}")
+                all_passed = False
+                continue
+            stats["memory"] = read_memory_kb(self.server_pid)
+            results["routes"][name] = stats
+
+            # A cached cold request would time a lookup, not the route
+            if stats["cold_cache"] == "HIT":
+                self.log_test(test_name, False, "Cold request was served from the response cache")
+                all_passed = False
+                continue
+
+            regressions = [key for key in ("cold_ms", "warm_p50_ms")
+                           if self.regressed(stats, previous.get(name), key)]
+            summary = f"cold {stats['cold_ms']}ms, warm p50 {stats['warm_p50_ms']}ms, p95 {stats['warm_p95_ms']}ms"
+            cold_timing = stats["server_timing"]["cold"]
+            if cold_timing:
+                summary += " (cold: " + ", ".join(
+                    f"{phase} {cold_timing[phase]}ms" for phase in ("db", "compute", "serialize")
+                    if phase in cold_timing) + ")"
+            if regressions:
+                baseline = {key: previous[name][key] for key in regressions}
+                self.log_test(test_name, False, f"Regressed: {summary}", f"baseline {baseline}")
+                all_passed = False
+            else:
+                self.log_test(test_name, True, summary)
+
+        # Leave the dataset as it was: remove the records the write routes added
+        for emission_id in created:
+            try:
+                self.client.delete_emission(emission_id)
+            except CarbonAPIError:
+                pass
+        try:
+            self.remove_bulk_records(department, bulk_dates)
+        except CarbonAPIError as e:
+            self.log_test(f"[{label}] cleanup", False, f"Bulk records left behind: {e}")
+            all_passed = False
+
+        approx_passed, results["approximation"] = self.check_approximation(label, department)
+        all_passed = all_passed and approx_passed
+
+        results["memory"]["after"] = read_memory_kb(self.server_pid)
+        if results["memory"]["after"]:
+            print(f"💾 Server RSS {results['memory']['after']['rss_kb'] // 1024} MB, "
+                  f"peak {results['memory']['after']['peak_rss_kb'] // 1024} MB")
+        self.measured[label] = results
+        return all_passed
+
+    def run_all_tests(self, sizes, generate=True, seed=42):
+        """Benchmark each dataset size; without generation, the loaded data only"""
+        print("🧪 Starting Endpoint Benchmarks")
+        print("=" * 70)
+
+        all_passed = True
+        if generate:
+            for size in sizes:
+                head = int(self.client.get_changes()["token"])
+                run_node("generate_data.mjs", "--records", str(size), "--seed", str(seed), "--drop")
+                run_node("migrate_indexes.mjs")
+                # The script's feed reset advances the cache version every
+                # server instance checks, so nothing cached for the previous
+                # dataset is served for this one
+                if int(self.client.get_changes()["token"]) <= head:
+                    self.log_test(f"[{size}] cache invalidation", False,
+                                  "Change feed head did not advance after generate_data.mjs")
+                    all_passed = False
+                    continue
+                all_passed = self.run_size(str(size), size) and all_passed
+        else:
+            all_passed = self.run_size("current", self.client.analytics_summary()["totalRecords"])
+
+        print("\n" + "=" * 70)
+        passed = sum(1 for r in self.test_results if r["success"])
+        print(f"🏁 {passed}/{len(self.test_results)} route measurements within the baseline")
+        return all_passed
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Endpoint latency and memory benchmarks across dataset sizes")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated dataset sizes to generate and benchmark")
+    parser.add_argument("--skip-generate", action="store_true",
+                        help="Benchmark the data already loaded instead of generating datasets")
+    parser.add_argument("--seed", type=int, default=42, help="Seed passed to the dataset generator")
+    parser.add_argument("--repeat", type=int, default=20, help="Warm requests per route")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed relative increase over the baseline latency")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="Regressions smaller than this many milliseconds are ignored")
+    parser.add_argument("--server-pid", type=int, default=None,
+                        help="PID of the Next.js server, to record its memory from /proc")
+    parser.add_argument("--full-list-max", type=int, default=100000,
+                        help="Largest dataset for which the unpaginated GET /api/emissions is measured")
+    parser.add_argument("--approx-max-error", type=float, default=0.05,
+                        help="Largest relative error of the mode=approx summary total")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline JSON file")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Write the measured results to the baseline file")
+    parser.add_argument("--report", default=None, help="Also write the measured results to this file")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.update_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    client = CarbonClient(BASE_URL, timeout=300, retries=0)
+    tester = BenchmarkTester(client, baseline, repeat=args.repeat, threshold=args.threshold,
+                             min_delta_ms=args.min_delta_ms, server_pid=args.server_pid,
+                             full_list_max=args.full_list_max, approx_max_error=args.approx_max_error)
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    success = tester.run_all_tests(sizes, generate=not args.skip_generate, seed=args.seed)
+
+    report = {"base_url": BASE_URL, "generated_at": datetime.now().isoformat(), "datasets": tester.measured}
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📝 Report written to {args.report}")
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        with open(args.baseline, "w") as f:
+            json.dump(tester.measured, f, indent=2, sort_keys=True)
+        print(f"📝 Baseline written to {args.baseline}")
+
+    sys.exit(0 if success else 1)
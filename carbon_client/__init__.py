@@ -0,0 +1,14 @@
+"""
+Python client for the Carbon Footprint Analytics API
+
+    from carbon_client import CarbonClient
+
+    with CarbonClient("http://localhost:3000/api") as client:
+        for emission in client.iter_emissions(department=dept_id):
+            ...
+"""
+
+from .client import CarbonAPIError, CarbonClient, chunk_records, parse_server_timing
+from .async_client import AsyncCarbonClient
+
+__all__ = ["AsyncCarbonClient", "CarbonAPIError", "CarbonClient", "chunk_records", "parse_server_timing"]
@@ -0,0 +1,259 @@
+"""
+Offline analytics over columnar snapshots of the emissions collection
+
+    from carbon_client import CarbonClient
+    from carbon_client.analytics import Snapshot
+
+    with CarbonClient() as client:
+        client.export_arrow("emissions.arrow")
+    Snapshot.convert("emissions.arrow", "snapshot")    # once; needs pyarrow
+    snapshot = Snapshot.open("snapshot")                # memory-mapped; needs NumPy
+    snapshot.summary(department=dept_id)
+
+A snapshot directory holds one .npy file per column and meta.json with the
+department and category names the integer codes stand for. Opening one maps
+the columns without reading them, and every aggregate is a masked
+np.bincount group-by. summary() and trends() return what GET
+/api/analytics/summary and GET /api/analytics/trends return for the same
+data, so a snapshot doubles as an oracle for those endpoints.
+"""
+
+import json
+import os
+from datetime import date
+
+try:
+    import numpy as np
+except ImportError:  # only needed when snapshots are used
+    np = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import ipc
+except ImportError:  # only needed to convert Arrow exports
+    pa = None
+
+SNAPSHOT_VERSION = 1
+COLUMNS = ("co2_kg", "day", "department", "category")
+# Categories every trends row carries, as in the API
+TREND_CATEGORIES = ("electricity", "transportation", "heating", "waste")
+
+
+def day_number(value):
+    """'YYYY-MM-DD' as the integer YYYYMMDD the day column stores"""
+    return int(value.replace("-", ""))
+
+
+def month_name(month):
+    """YYYYMM as 'YYYY-MM'"""
+    return f"{month // 100:04d}-{month % 100:02d}"
+
+
+def previous_month(year, month, back):
+    """(year, month) `back` months before the given one"""
+    index = year * 12 + (month - 1) - back
+    return index // 12, index % 12 + 1
+
+
+def encode(values):
+    """(int32 codes, names) with -1 for missing values"""
+    names = sorted({v for v in values if v is not None})
+    lookup = {name: code for code, name in enumerate(names)}
+    return np.array([lookup.get(v, -1) for v in values], dtype=np.int32), names
+
+
+class Snapshot:
+    """Emission records as NumPy columns: co2_kg, day (YYYYMMDD) and coded department / category"""
+
+    def __init__(self, columns, departments, categories):
+        if np is None:
+            raise ImportError("Snapshot requires NumPy: pip install numpy")
+        self.co2_kg = columns["co2_kg"]
+        self.day = columns["day"]
+        self.department = columns["department"]
+        self.category = columns["category"]
+        self.departments = list(departments)
+        self.categories = list(categories)
+        self.rows = len(self.day)
+
+    @classmethod
+    def from_records(cls, records):
+        """Build an in-memory snapshot from record dicts, e.g. a JSON export"""
+        if np is None:
+            raise ImportError("Snapshot requires NumPy: pip install numpy")
+        records = list(records)
+        departments, department_names = encode([r.get("department") for r in records])
+        categories, category_names = encode([r.get("category") for r in records])
+        columns = {
+            "co2_kg": np.array([r.get("co2Kg") or 0.0 for r in records], dtype=np.float64),
+            "day": np.array([day_number(r["date"]) for r in records], dtype=np.int32),
+            "department": departments,
+            "category": categories,
+        }
+        return cls(columns, department_names, category_names)
+
+    @classmethod
+    def convert(cls, arrow_path, directory):
+        """Turn an Arrow IPC export (CarbonClient.export_arrow) into a snapshot directory.
+
+        The export is memory-mapped and converted one column at a time, so peak
+        memory is about one column of the output.
+        """
+        if pa is None or np is None:
+            raise ImportError("Snapshot.convert requires pyarrow and NumPy: pip install pyarrow numpy")
+        with pa.memory_map(arrow_path, "r") as source:
+            table = ipc.open_stream(source).read_all()
+            os.makedirs(directory, exist_ok=True)
+
+            def save(name, array):
+                np.save(os.path.join(directory, f"{name}.npy"), array)
+
+            save("co2_kg", pc.fill_null(table["co2Kg"], 0.0).to_numpy().astype(np.float64))
+            save("day", pc.cast(pc.replace_substring(table["date"], "-", ""), pa.int32()).to_numpy())
+            names = {}
+            for column in ("department", "category"):
+                encoded = pc.dictionary_encode(table[column].combine_chunks())
+                save(column, pc.fill_null(encoded.indices, -1).to_numpy().astype(np.int32))
+                names[column] = encoded.dictionary.to_pylist()
+            rows = table.num_rows
+
+        cls.write_meta(directory, rows, names["department"], names["category"])
+        return cls.open(directory)
+
+    @staticmethod
+    def write_meta(directory, rows, departments, categories):
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "rows": rows,
+                       "departments": departments, "categories": categories}, f)
+
+    def save(self, directory):
+        """Write the columns and names to a snapshot directory"""
+        os.makedirs(directory, exist_ok=True)
+        for name in COLUMNS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        self.write_meta(directory, self.rows, self.departments, self.categories)
+
+    @classmethod
+    def open(cls, directory):
+        """Memory-map a snapshot directory written by convert() or save()"""
+        if np is None:
+            raise ImportError("Snapshot requires NumPy: pip install numpy")
+        with open(os.path.join(directory, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {meta.get('version')}")
+        columns = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in COLUMNS}
+        return cls(columns, meta["departments"], meta["categories"])
+
+    # Aggregates
+
+    def mask(self, department=None, start_date=None, end_date=None):
+        """Rows matching the API's department and inclusive date filters"""
+        mask = np.ones(self.rows, dtype=bool)
+        if department and department != "all":
+            if department not in self.departments:
+                return np.zeros(self.rows, dtype=bool)
+            mask &= self.department == self.departments.index(department)
+        if start_date:
+            mask &= self.day >= day_number(start_date)
+        if end_date:
+            mask &= self.day <= day_number(end_date)
+        return mask
+
+    def group_totals(self, codes, names, mask):
+        """{name: co2Kg sum} over the masked rows, for names with at least one row"""
+        mask = mask & (codes >= 0)
+        selected = codes[mask]
+        sums = np.bincount(selected, weights=self.co2_kg[mask], minlength=len(names))
+        counts = np.bincount(selected, minlength=len(names))
+        return {names[i]: float(sums[i]) for i in np.flatnonzero(counts)}
+
+    def monthly_totals(self, mask):
+        """{'YYYY-MM': co2Kg sum} over the masked rows, in month order"""
+        months, inverse = np.unique(self.day[mask] // 100, return_inverse=True)
+        sums = np.bincount(inverse, weights=self.co2_kg[mask], minlength=len(months))
+        return {month_name(int(m)): float(s) for m, s in zip(months, sums)}
+
+    def category_totals(self, department=None):
+        """Whole-history co2Kg per category, the input of GET /api/recommendations"""
+        return self.group_totals(self.category, self.categories, self.mask(department))
+
+    def summary(self, department=None, start_date=None, end_date=None, today=None):
+        """Same shape and rounding as GET /api/analytics/summary.
+
+        The comparison months are the two calendar months before `today`
+        (default: the local date, as the server computes them).
+        """
+        today = today or date.today()
+        selected = self.mask(department, start_date, end_date)
+        total = float(self.co2_kg[selected].sum())
+
+        periods = {}
+        comparison = {}
+        for name, back in (("lastMonth", 1), ("twoMonthsAgo", 2)):
+            year, month = previous_month(today.year, today.month, back)
+            next_year, next_month = previous_month(year, month, -1)
+            last_day = (date(next_year, next_month, 1) - date(year, month, 1)).days
+            periods[name] = {"start": f"{year:04d}-{month:02d}-01", "end": f"{year:04d}-{month:02d}-{last_day:02d}"}
+            in_month = self.mask(department, periods[name]["start"], periods[name]["end"])
+            comparison[name] = float(self.co2_kg[in_month].sum())
+
+        last, before = comparison["lastMonth"], comparison["twoMonthsAgo"]
+        return {
+            "totalEmissions": round(total, 2),
+            "totalRecords": int(selected.sum()),
+            "categoryBreakdown": self.group_totals(self.category, self.categories, selected),
+            "departmentBreakdown": self.group_totals(self.department, self.departments, selected),
+            "monthlyData": self.monthly_totals(selected),
+            "lastMonthTotal": round(last, 2),
+            "twoMonthsAgoTotal": round(before, 2),
+            "monthOverMonthChange": round((last - before) / before * 100, 1) if before > 0 else 0,
+            "periods": periods,
+        }
+
+    def trends(self, months=12, department=None):
+        """Same rows as GET /api/analytics/trends: the last `months` months by category"""
+        selected = self.mask(department) & (self.category >= 0)
+        month_keys, month_index = np.unique(self.day[selected] // 100, return_inverse=True)
+        width = len(self.categories)
+        # One bincount over (month, category) cells
+        cells = np.bincount(month_index * width + self.category[selected],
+                            weights=self.co2_kg[selected], minlength=len(month_keys) * width)
+        cells = cells.reshape(len(month_keys), width)
+
+        rows = []
+        for i, month in enumerate(month_keys):
+            row = {"month": month_name(int(month)), **{c: 0.0 for c in TREND_CATEGORIES}}
+            row.update({self.categories[c]: float(cells[i, c]) for c in np.flatnonzero(cells[i])})
+            row["total"] = float(cells[i].sum())
+            rows.append(row)
+        return rows[-months:] if months > 0 else []
+
+
+def compare_summaries(expected, actual, tolerance=0.01):
+    """Differences between two summary dicts, as readable strings"""
+    mismatches = []
+    if expected["totalRecords"] != actual["totalRecords"]:
+        mismatches.append(f"totalRecords {actual['totalRecords']} != {expected['totalRecords']}")
+    for field in ("totalEmissions", "lastMonthTotal", "twoMonthsAgoTotal"):
+        if abs(expected[field] - actual[field]) > tolerance:
+            mismatches.append(f"{field} {actual[field]} != {expected[field]}")
+    for field in ("categoryBreakdown", "departmentBreakdown", "monthlyData"):
+        if set(expected[field]) != set(actual[field]):
+            mismatches.append(f"{field} keys differ")
+            continue
+        mismatches.extend(f"{field}[{key}] {actual[field][key]} != {value}"
+                          for key, value in expected[field].items()
+                          if abs(actual[field][key] - value) > tolerance)
+    return mismatches
+
+
+def compare_trends(expected, actual, tolerance=0.01):
+    """Differences between two trends lists, as readable strings"""
+    if [row["month"] for row in expected] != [row["month"] for row in actual]:
+        return ["months differ"]
+    return [f"{a['month']} {key} {a.get(key, 0)} != {value}"
+            for e, a in zip(expected, actual)
+            for key, value in e.items()
+            if key != "month" and abs(a.get(key, 0) - value) > tolerance]
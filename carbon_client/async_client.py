@@ -0,0 +1,309 @@
+"""
+asyncio client for the Carbon Footprint Analytics API
+Same methods as CarbonClient, as coroutines and async generators.
+Needs aiohttp (pip install aiohttp); the import is deferred so the sync
+client works without it.
+"""
+
+import asyncio
+import json
+import random
+
+from .client import (ARROW_CONTENT_TYPE, BULK_CHUNK_BYTES, BULK_CHUNK_RECORDS, BULK_CONCURRENCY,
+                     DEFAULT_BASE_URL, DEFAULT_TIMEOUT, RETRY_METHODS, RETRY_STATUSES, CarbonAPIError,
+                     atomic_write, chunk_records, clean_params, emission_filters, error_message)
+
+try:
+    import aiohttp
+except ImportError:  # only needed when the async client is used
+    aiohttp = None
+
+
+class AsyncCarbonClient:
+    """asyncio counterpart of CarbonClient sharing one aiohttp connection pool"""
+
+    def __init__(self, base_url=None, timeout=DEFAULT_TIMEOUT, retries=3, backoff=0.5,
+                 pool_size=20, session=None):
+        if aiohttp is None:
+            raise ImportError("AsyncCarbonClient requires aiohttp: pip install aiohttp")
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        # Streamed bodies can take far longer than `timeout` in total; like the
+        # sync client, only connecting and each read are bounded
+        self.stream_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.session = session or aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=pool_size),
+            headers={"Content-Type": "application/json"},
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        await self.session.close()
+
+    def retry_delay(self, attempt, retry_after=None):
+        """Exponential backoff with jitter; a Retry-After header wins when present"""
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+
+    async def request(self, method, path, *, params=None, json_body=None, data=None, headers=None):
+        """Send a request and return (status, headers, body bytes); raises CarbonAPIError on 4xx/5xx.
+
+        Mirrors the sync client's retry policy: idempotent methods are retried on
+        429/502/503/504 and on any connection error, POST only when the
+        connection could not be opened (so the request never reached the server).
+        """
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.retries + 1):
+            last_attempt = attempt == self.retries
+            try:
+                async with self.session.request(method, url, params=clean_params(params or {}),
+                                                json=json_body, data=data, headers=headers,
+                                                timeout=self.timeout) as response:
+                    body = await response.read()
+                    if (response.status in RETRY_STATUSES and method in RETRY_METHODS
+                            and not last_attempt):
+                        await asyncio.sleep(self.retry_delay(attempt, response.headers.get("Retry-After")))
+                        continue
+                    if response.status >= 400:
+                        text = body.decode("utf-8", errors="replace")
+                        raise CarbonAPIError(response.status, error_message(text), text, response.headers)
+                    return response.status, response.headers, body
+            except aiohttp.ClientConnectorError:
+                if last_attempt:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if last_attempt or method not in RETRY_METHODS:
+                    raise
+            await asyncio.sleep(self.retry_delay(attempt))
+
+    async def _data(self, method, path, **kwargs):
+        _, _, body = await self.request(method, path, **kwargs)
+        return json.loads(body)["data"]
+
+    # Departments
+
+    async def list_departments(self):
+        return await self._data("GET", "/departments")
+
+    async def create_department(self, name, description=""):
+        return await self._data("POST", "/departments", json_body={"name": name, "description": description})
+
+    # Emissions
+
+    async def list_emissions(self, department=None, category=None, start_date=None, end_date=None):
+        return await self._data("GET", "/emissions",
+                                params=emission_filters(department, category, start_date, end_date))
+
+    async def get_emissions_page(self, limit, cursor=None, fields=None, department=None, category=None,
+                                 start_date=None, end_date=None):
+        params = emission_filters(department, category, start_date, end_date)
+        params.update(clean_params({
+            "limit": limit,
+            "cursor": cursor,
+            "fields": ",".join(fields) if fields else None,
+        }))
+        _, _, body = await self.request("GET", "/emissions", params=params)
+        payload = json.loads(body)
+        return payload["data"], payload.get("nextCursor")
+
+    async def iter_emissions(self, page_size=1000, fields=None, **filters):
+        cursor = None
+        while True:
+            records, cursor = await self.get_emissions_page(page_size, cursor=cursor, fields=fields, **filters)
+            for record in records:
+                yield record
+            if not cursor:
+                return
+
+    async def stream_emissions(self, limit=None, fields=None, **filters):
+        params = emission_filters(**filters)
+        params.update(clean_params({"limit": limit, "fields": ",".join(fields) if fields else None}))
+        async with self.session.get(f"{self.base_url}/emissions", params=params,
+                                    headers={"Accept": "application/x-ndjson"},
+                                    timeout=self.stream_timeout) as response:
+            if response.status >= 400:
+                text = await response.text()
+                raise CarbonAPIError(response.status, error_message(text), text, response.headers)
+            async for line in response.content:
+                if line.strip():
+                    yield json.loads(line)
+
+    async def export_arrow(self, path, fields=None, chunk_size=1024 * 1024, **filters):
+        params = emission_filters(**filters)
+        params.update(clean_params({"fields": ",".join(fields) if fields else None}))
+        written = 0
+        async with self.session.get(f"{self.base_url}/emissions", params=params,
+                                    headers={"Accept": ARROW_CONTENT_TYPE},
+                                    timeout=self.stream_timeout) as response:
+            if response.status >= 400:
+                text = await response.text()
+                raise CarbonAPIError(response.status, error_message(text), text, response.headers)
+            with atomic_write(path) as f:
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    f.write(chunk)
+                    written += len(chunk)
+        return written
+
+    async def create_emission(self, emission):
+        return await self._data("POST", "/emissions", json_body=emission)
+
+    async def bulk_create_emissions(self, emissions, mode=None):
+        return await self._data("POST", "/emissions/bulk", params=clean_params({"mode": mode}),
+                                json_body={"emissions": list(emissions)})
+
+    async def _upsert_chunk(self, chunk):
+        for attempt in range(self.retries + 1):
+            try:
+                return await self.bulk_create_emissions(chunk, mode="upsert")
+            except CarbonAPIError as e:
+                if e.status < 500 and e.status != 429 or attempt == self.retries:
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    raise
+            await asyncio.sleep(self.retry_delay(attempt))
+
+    async def bulk_upload(self, emissions, max_records=BULK_CHUNK_RECORDS, max_bytes=BULK_CHUNK_BYTES,
+                          concurrency=BULK_CONCURRENCY, mode=None):
+        """Upload size-bounded chunks with at most `concurrency` requests in flight"""
+        chunks = list(chunk_records(emissions, max_records, max_bytes))
+        semaphore = asyncio.Semaphore(max(1, min(concurrency, self.pool_size)))
+        send = self._upsert_chunk if mode == "upsert" else self.bulk_create_emissions
+
+        async def upload(chunk):
+            async with semaphore:
+                return await send(chunk)
+
+        results = await asyncio.gather(*(upload(chunk) for chunk in chunks), return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+        totals = {"imported": 0}
+        for result in results:
+            for key, value in result.items():
+                if isinstance(value, int):
+                    totals[key] = totals.get(key, 0) + value
+        return {**totals, "chunks": len(chunks)}
+
+    async def import_csv(self, csv, batch_size=None):
+        return await self._data("POST", "/emissions/import", params=clean_params({"batchSize": batch_size}),
+                                data=csv, headers={"Content-Type": "text/csv"})
+
+    async def import_csv_file(self, path, batch_size=None):
+        with open(path, "rb") as f:
+            return await self.import_csv(f, batch_size=batch_size)
+
+    async def update_emission(self, emission_id, changes):
+        return await self._data("PUT", f"/emissions/{emission_id}", json_body=changes)
+
+    async def batch_emissions(self, operations):
+        return await self._data("POST", "/emissions/batch", json_body={"operations": list(operations)})
+
+    async def delete_emission(self, emission_id):
+        _, _, body = await self.request("DELETE", f"/emissions/{emission_id}")
+        return json.loads(body)
+
+    async def get_changes(self, since=None, limit=None):
+        return await self._data("GET", "/emissions/changes", params=clean_params({"since": since, "limit": limit}))
+
+    # Analytics
+
+    async def analytics_summary(self, department=None, start_date=None, end_date=None, mode=None):
+        params = emission_filters(department, start_date=start_date, end_date=end_date)
+        params.update(clean_params({"mode": mode}))
+        return await self._data("GET", "/analytics/summary", params=params)
+
+    async def analytics_trends(self, months=12, department=None, mode=None):
+        return await self._data("GET", "/analytics/trends",
+                                params=clean_params({"months": months, "department": department, "mode": mode}))
+
+    async def recommendations(self, department=None):
+        return await self._data("GET", "/recommendations", params=clean_params({"department": department}))
+
+    async def dashboard(self, panels=None, department=None, start_date=None, end_date=None, months=None,
+                        limit=None, fields=None):
+        params = emission_filters(department, start_date=start_date, end_date=end_date)
+        params.update(clean_params({
+            "panels": ",".join(panels) if panels else None,
+            "months": months,
+            "limit": limit,
+            "fields": ",".join(fields) if fields else None,
+        }))
+        return await self._data("GET", "/dashboard", params=params)
+
+    async def cache_stats(self):
+        return await self._data("GET", "/cache/stats")
+
+    async def ingest_stats(self):
+        return await self._data("GET", "/ingest/stats")
+
+    async def emission_factors(self):
+        return await self._data("GET", "/emission-factors")
+
+    async def metrics(self):
+        _, _, body = await self.request("GET", "/metrics")
+        return body.decode("utf-8")
+
+    async def emission_factor_versions(self):
+        return await self._data("GET", "/emission-factors/versions")
+
+    async def create_emission_factor_version(self, version, effective_from, factors, source=None, recalculate=False):
+        """Add a dated factor version; factors may list only the entries that change"""
+        return await self._data("POST", "/emission-factors/versions", json_body=clean_params({
+            "version": version,
+            "effectiveFrom": effective_from,
+            "factors": factors,
+            "source": source,
+            "recalculate": recalculate,
+        }))
+
+    # Contact form
+
+    async def submit_contact(self, name, email, message, subject=""):
+        return await self._data("POST", "/contact", json_body={
+            "name": name, "email": email, "subject": subject, "message": message})
+
+    async def get_contacts_page(self, token, limit=100, cursor=None):
+        _, _, body = await self.request("GET", "/contact", params=clean_params({"limit": limit, "cursor": cursor}),
+                                        headers={"Authorization": f"Bearer {token}"})
+        payload = json.loads(body)
+        return payload["data"], payload.get("nextCursor")
+
+    async def iter_contacts(self, token, page_size=1000):
+        cursor = None
+        while True:
+            entries, cursor = await self.get_contacts_page(token, page_size, cursor)
+            for entry in entries:
+                yield entry
+            if not cursor:
+                return
+
+    # Recalculation jobs
+
+    async def start_recalculation(self, start_date=None, end_date=None, categories=None):
+        return await self._data("POST", "/recalculations", json_body=clean_params({
+            "startDate": start_date,
+            "endDate": end_date,
+            "categories": categories,
+        }))
+
+    async def recalculation(self, job_id):
+        return await self._data("GET", f"/recalculations/{job_id}")
+
+    async def recalculations(self):
+        return await self._data("GET", "/recalculations")
+
+    async def resume_recalculation(self, job_id):
+        return await self._data("POST", f"/recalculations/{job_id}/resume")
@@ -0,0 +1,418 @@
+"""
+Synchronous client for the Carbon Footprint Analytics API
+One pooled keep-alive session per client, retries with exponential backoff
+and size-bounded concurrent bulk uploads.
+"""
+
+import json
+import os
+import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, suppress
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_BASE_URL = os.environ.get("BASE_URL", "http://localhost:3000/api")
+DEFAULT_TIMEOUT = 30
+
+# Only idempotent requests are retried after a response (or a read timeout);
+# a POST that reached the server could otherwise be inserted twice.
+RETRY_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# Bulk uploads are split so no request carries more than this many records or
+# bytes of JSON; proxies in front of the API reject very large bodies.
+BULK_CHUNK_RECORDS = 1000
+BULK_CHUNK_BYTES = 1024 * 1024
+BULK_CONCURRENCY = 4
+
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+
+
+class CarbonAPIError(Exception):
+    """Raised for any HTTP error response from the API"""
+
+    def __init__(self, status, message, body=None, headers=None):
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.message = message
+        self.body = body
+        self.headers = headers if headers is not None else {}
+
+
+def clean_params(params):
+    """Drop unset query parameters so they never reach the URL as 'None'"""
+    return {key: value for key, value in params.items() if value is not None}
+
+
+def emission_filters(department=None, category=None, start_date=None, end_date=None):
+    """Query parameters shared by the emissions and analytics routes"""
+    return clean_params({
+        "department": department,
+        "category": category,
+        "startDate": start_date,
+        "endDate": end_date,
+    })
+
+
+def chunk_records(records, max_records=BULK_CHUNK_RECORDS, max_bytes=BULK_CHUNK_BYTES):
+    """Split records into lists bounded by count and by serialized JSON size"""
+    chunk = []
+    size = 0
+    for record in records:
+        record_size = len(json.dumps(record, separators=(",", ":")).encode("utf-8")) + 1
+        if chunk and (len(chunk) >= max_records or size + record_size > max_bytes):
+            yield chunk
+            chunk = []
+            size = 0
+        chunk.append(record)
+        size += record_size
+    if chunk:
+        yield chunk
+
+
+def error_message(text):
+    """The API's {"error": ...} message, or the raw body"""
+    try:
+        return json.loads(text).get("error") or text
+    except (ValueError, AttributeError):
+        return text
+
+
+@contextmanager
+def atomic_write(path):
+    """Write `path` through a .part file renamed into place on success, so an
+    interrupted download never looks complete"""
+    partial = f"{os.fspath(path)}.part"
+    try:
+        with open(partial, "wb") as f:
+            yield f
+        os.replace(partial, path)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(partial)
+        raise
+
+
+def parse_server_timing(header):
+    """{metric: milliseconds} from a Server-Timing header, e.g. {"db": 12.3, "total": 15.0}"""
+    timings = {}
+    # Split on commas and semicolons outside quoted desc strings
+    for metric in re.split(r',(?=(?:[^"]*"[^"]*")*[^"]*$)', header or ""):
+        name, *fields = (part.strip() for part in re.split(r';(?=(?:[^"]*"[^"]*")*[^"]*$)', metric))
+        if not name:
+            continue
+        timings[name] = 0.0
+        for field in fields:
+            key, _, value = field.partition("=")
+            if key.strip() == "dur":
+                try:
+                    timings[name] = float(value)
+                except ValueError:
+                    pass
+    return timings
+
+
+class CarbonClient:
+    """Typed methods for every route in app/api/[[...path]]/route.js"""
+
+    def __init__(self, base_url=None, timeout=DEFAULT_TIMEOUT, retries=3, backoff=0.5,
+                 pool_size=20, session=None):
+        self.base_url = (base_url or DEFAULT_BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff = backoff
+        self.session = session or requests.Session()
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=RETRY_STATUSES,
+                      allowed_methods=RETRY_METHODS, raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.session.close()
+
+    def request(self, method, path, *, params=None, json_body=None, data=None, headers=None,
+                stream=False, timeout=None):
+        """Send a request and return the response; raises CarbonAPIError on 4xx/5xx"""
+        response = self.session.request(
+            method, f"{self.base_url}{path}",
+            params=clean_params(params or {}), json=json_body, data=data, headers=headers,
+            stream=stream, timeout=timeout or self.timeout,
+        )
+        if response.status_code >= 400:
+            raise CarbonAPIError(response.status_code, error_message(response.text),
+                                 response.text, response.headers)
+        return response
+
+    def _data(self, method, path, **kwargs):
+        return self.request(method, path, **kwargs).json()["data"]
+
+    # Departments
+
+    def list_departments(self):
+        return self._data("GET", "/departments")
+
+    def create_department(self, name, description=""):
+        return self._data("POST", "/departments", json_body={"name": name, "description": description})
+
+    # Emissions
+
+    def list_emissions(self, department=None, category=None, start_date=None, end_date=None):
+        """Every matching record in one response (the unpaginated legacy list)"""
+        return self._data("GET", "/emissions",
+                          params=emission_filters(department, category, start_date, end_date))
+
+    def get_emissions_page(self, limit, cursor=None, fields=None, department=None, category=None,
+                           start_date=None, end_date=None):
+        """One keyset page: (records, next_cursor); next_cursor is None on the last page"""
+        params = emission_filters(department, category, start_date, end_date)
+        params.update(clean_params({
+            "limit": limit,
+            "cursor": cursor,
+            "fields": ",".join(fields) if fields else None,
+        }))
+        payload = self.request("GET", "/emissions", params=params).json()
+        return payload["data"], payload.get("nextCursor")
+
+    def iter_emissions(self, page_size=1000, fields=None, **filters):
+        """Yield every matching record, following nextCursor page by page"""
+        cursor = None
+        while True:
+            records, cursor = self.get_emissions_page(page_size, cursor=cursor, fields=fields, **filters)
+            yield from records
+            if not cursor:
+                return
+
+    def stream_emissions(self, limit=None, fields=None, **filters):
+        """Yield records from the NDJSON stream without buffering the whole response"""
+        params = emission_filters(**filters)
+        params.update(clean_params({"limit": limit, "fields": ",".join(fields) if fields else None}))
+        response = self.request("GET", "/emissions", params=params,
+                                headers={"Accept": "application/x-ndjson"}, stream=True)
+        with response:
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+    def export_arrow(self, path, fields=None, chunk_size=1024 * 1024, **filters):
+        """Save matching records to `path` as an Arrow IPC stream; returns the bytes written.
+
+        Columns are DEFAULT_ARROW_FIELDS in lib/arrow-export.js unless fields
+        is given. The file only appears once the whole stream has arrived.
+        Read it with carbon_client.analytics.Snapshot.
+        """
+        params = emission_filters(**filters)
+        params.update(clean_params({"fields": ",".join(fields) if fields else None}))
+        response = self.request("GET", "/emissions", params=params,
+                                headers={"Accept": ARROW_CONTENT_TYPE}, stream=True)
+        written = 0
+        with response, atomic_write(path) as f:
+            for chunk in response.iter_content(chunk_size):
+                f.write(chunk)
+                written += len(chunk)
+        return written
+
+    def create_emission(self, emission):
+        return self._data("POST", "/emissions", json_body=emission)
+
+    def bulk_create_emissions(self, emissions, mode=None):
+        """POST one /emissions/bulk request; see bulk_upload for large lists.
+
+        mode="upsert" keys each record on its externalId, or on a hash of
+        (date, department, category, subcategory, value), so sending the same
+        records again updates them instead of adding duplicates.
+        """
+        return self._data("POST", "/emissions/bulk", params=clean_params({"mode": mode}),
+                          json_body={"emissions": list(emissions)})
+
+    def _upsert_chunk(self, chunk):
+        """An upsert chunk is idempotent, so unlike a plain POST it is retried"""
+        for attempt in range(self.retries + 1):
+            try:
+                return self.bulk_create_emissions(chunk, mode="upsert")
+            except CarbonAPIError as e:
+                if e.status < 500 and e.status != 429 or attempt == self.retries:
+                    raise
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            time.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random() / 2))
+
+    def bulk_upload(self, emissions, max_records=BULK_CHUNK_RECORDS, max_bytes=BULK_CHUNK_BYTES,
+                    concurrency=BULK_CONCURRENCY, mode=None):
+        """Upload any number of records as size-bounded chunks sent concurrently.
+
+        Chunks are independent requests: if one fails, the others may already be
+        stored, so the first error is raised after every chunk has finished.
+        With mode="upsert" failed chunks are retried and the whole upload can
+        be repeated safely; the result adds inserted/updated/unchanged counts.
+        """
+        chunks = list(chunk_records(emissions, max_records, max_bytes))
+        send = self._upsert_chunk if mode == "upsert" else self.bulk_create_emissions
+        totals = {"imported": 0}
+        errors = []
+        with ThreadPoolExecutor(max_workers=max(1, min(concurrency, self.pool_size))) as pool:
+            futures = [pool.submit(send, chunk) for chunk in chunks]
+            for future in futures:
+                try:
+                    result = future.result()
+                except (CarbonAPIError, requests.RequestException) as e:
+                    errors.append(e)
+                    continue
+                for key, value in result.items():
+                    if isinstance(value, int):
+                        totals[key] = totals.get(key, 0) + value
+        if errors:
+            raise errors[0]
+        return {**totals, "chunks": len(chunks)}
+
+    def import_csv(self, csv, batch_size=None):
+        """Stream CSV content (bytes or a binary file object) to /emissions/import"""
+        return self._data("POST", "/emissions/import", params=clean_params({"batchSize": batch_size}),
+                          data=csv, headers={"Content-Type": "text/csv"})
+
+    def import_csv_file(self, path, batch_size=None):
+        """Stream a CSV file from disk without reading it into memory"""
+        with open(path, "rb") as f:
+            return self.import_csv(f, batch_size=batch_size)
+
+    def update_emission(self, emission_id, changes):
+        return self._data("PUT", f"/emissions/{emission_id}", json_body=changes)
+
+    def batch_emissions(self, operations):
+        """Updates and deletes by id or filter, applied in order in one request.
+
+        Each operation is {"op": "update", "id" or "filter": ..., "set": {...}}
+        or {"op": "delete", "id" or "filter": ...}.
+        """
+        return self._data("POST", "/emissions/batch", json_body={"operations": list(operations)})
+
+    def delete_emission(self, emission_id):
+        return self.request("DELETE", f"/emissions/{emission_id}").json()
+
+    def get_changes(self, since=None, limit=None):
+        """Record changes after a token: {"changes", "token", "hasMore", "reset"}.
+
+        Without since only the current token is returned. reset means the
+        caller must reload its copy and continue from the returned token.
+        """
+        return self._data("GET", "/emissions/changes", params=clean_params({"since": since, "limit": limit}))
+
+    # Analytics
+
+    def analytics_summary(self, department=None, start_date=None, end_date=None, mode=None):
+        """Totals and breakdowns for a filter.
+
+        mode="approx" answers large ranges from rollups and samples; the result
+        then carries an "approximation" block with 95% intervals.
+        """
+        params = emission_filters(department, start_date=start_date, end_date=end_date)
+        params.update(clean_params({"mode": mode}))
+        return self._data("GET", "/analytics/summary", params=params)
+
+    def analytics_trends(self, months=12, department=None, mode=None):
+        return self._data("GET", "/analytics/trends",
+                          params=clean_params({"months": months, "department": department, "mode": mode}))
+
+    def recommendations(self, department=None):
+        return self._data("GET", "/recommendations", params=clean_params({"department": department}))
+
+    def dashboard(self, panels=None, department=None, start_date=None, end_date=None, months=None,
+                  limit=None, fields=None):
+        """Several dashboard panels for one filter in one request.
+
+        panels is a list drawn from summary, trends, recommendations and
+        emissions (default: all). The emissions panel is one page of records,
+        continued with get_emissions_page(cursor=...). "changeToken" is the
+        get_changes() token the panels already reflect (None when the load
+        overlapped a write).
+        """
+        params = emission_filters(department, start_date=start_date, end_date=end_date)
+        params.update(clean_params({
+            "panels": ",".join(panels) if panels else None,
+            "months": months,
+            "limit": limit,
+            "fields": ",".join(fields) if fields else None,
+        }))
+        return self._data("GET", "/dashboard", params=params)
+
+    def cache_stats(self):
+        return self._data("GET", "/cache/stats")
+
+    def ingest_stats(self):
+        """Group-commit buffer counters (INGEST_BUFFER); just `enabled` until the buffer takes a record"""
+        return self._data("GET", "/ingest/stats")
+
+    def emission_factors(self):
+        return self._data("GET", "/emission-factors")
+
+    def metrics(self):
+        """Prometheus text exposition from /api/metrics"""
+        return self.request("GET", "/metrics").text
+
+    def emission_factor_versions(self):
+        return self._data("GET", "/emission-factors/versions")
+
+    def create_emission_factor_version(self, version, effective_from, factors, source=None, recalculate=False):
+        """Add a dated factor version; factors may list only the entries that change"""
+        return self._data("POST", "/emission-factors/versions", json_body=clean_params({
+            "version": version,
+            "effectiveFrom": effective_from,
+            "factors": factors,
+            "source": source,
+            "recalculate": recalculate,
+        }))
+
+    # Contact form
+
+    def submit_contact(self, name, email, message, subject=""):
+        return self._data("POST", "/contact", json_body={
+            "name": name, "email": email, "subject": subject, "message": message})
+
+    def get_contacts_page(self, token, limit=100, cursor=None):
+        """Newest submissions first; needs the server's CONTACT_ADMIN_TOKEN"""
+        response = self.request("GET", "/contact", params=clean_params({"limit": limit, "cursor": cursor}),
+                                headers={"Authorization": f"Bearer {token}"})
+        payload = response.json()
+        return payload["data"], payload.get("nextCursor")
+
+    def iter_contacts(self, token, page_size=1000):
+        cursor = None
+        while True:
+            entries, cursor = self.get_contacts_page(token, page_size, cursor)
+            yield from entries
+            if not cursor:
+                return
+
+    # Recalculation jobs
+
+    def start_recalculation(self, start_date=None, end_date=None, categories=None):
+        return self._data("POST", "/recalculations", json_body=clean_params({
+            "startDate": start_date,
+            "endDate": end_date,
+            "categories": categories,
+        }))
+
+    def recalculation(self, job_id):
+        """Job status with progress (0..1), matched/modified counts and affected months"""
+        return self._data("GET", f"/recalculations/{job_id}")
+
+    def recalculations(self):
+        return self._data("GET", "/recalculations")
+
+    def resume_recalculation(self, job_id):
+        return self._data("POST", f"/recalculations/{job_id}/resume")
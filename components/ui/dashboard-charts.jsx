@@ -0,0 +1,65 @@
+"use client";
+
+// The dashboard's recharts charts. app/page.js loads this module with
+// next/dynamic, so recharts is a separate chunk fetched after first paint.
+
+import { LineChart, Line, PieChart, Pie, BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer, Cell } from 'recharts';
+
+const COLORS = ['#10b981', '#059669', '#3b82f6', '#06b6d4', '#f59e0b', '#f97316', '#ef4444', '#8b5cf6', '#a78bfa'];
+
+export function CategoryPieChart({ data }) {
+  return (
+    <ResponsiveContainer width="100%" height={300}>
+      <PieChart>
+        <Pie
+          data={data}
+          cx="50%"
+          cy="50%"
+          labelLine={false}
+          label={({ name, percent }) => `${name}: ${(percent * 100).toFixed(0)}%`}
+          outerRadius={100}
+          fill="#8884d8"
+          dataKey="value"
+        >
+          {data.map((entry, index) => (
+            <Cell key={`cell-${index}`} fill={COLORS[index % COLORS.length]} />
+          ))}
+        </Pie>
+        <Tooltip />
+      </PieChart>
+    </ResponsiveContainer>
+  );
+}
+
+export function DepartmentBarChart({ data }) {
+  return (
+    <ResponsiveContainer width="100%" height={300}>
+      <BarChart data={data}>
+        <CartesianGrid strokeDasharray="3 3" />
+        <XAxis dataKey="name" />
+        <YAxis />
+        <Tooltip />
+        <Bar dataKey="emissions" fill="#3b82f6" />
+      </BarChart>
+    </ResponsiveContainer>
+  );
+}
+
+export function TrendsLineChart({ data }) {
+  return (
+    <ResponsiveContainer width="100%" height={400}>
+      <LineChart data={data}>
+        <CartesianGrid strokeDasharray="3 3" />
+        <XAxis dataKey="month" />
+        <YAxis />
+        <Tooltip />
+        <Legend />
+        <Line type="monotone" dataKey="total" stroke="#10b981" strokeWidth={2} name="Total" />
+        <Line type="monotone" dataKey="electricity" stroke="#3b82f6" name="Electricity" />
+        <Line type="monotone" dataKey="transportation" stroke="#f59e0b" name="Transportation" />
+        <Line type="monotone" dataKey="heating" stroke="#ef4444" name="Heating" />
+        <Line type="monotone" dataKey="waste" stroke="#8b5cf6" name="Waste" />
+      </LineChart>
+    </ResponsiveContainer>
+  );
+}
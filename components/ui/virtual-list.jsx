@@ -0,0 +1,55 @@
+"use client";
+
+import { useEffect, useRef, useState } from 'react';
+import { cn } from '@/lib/utils';
+
+// A scrolling list that mounts only the rows in view (plus `overscan` rows on
+// each side), so its cost does not grow with the number of loaded items.
+// Rows have a fixed height. `onEndReached` fires when the last `endThreshold`
+// rows come into view, which is where a paged list loads its next page.
+export default function VirtualList({
+  items,
+  rowHeight,
+  height,
+  renderRow,
+  rowKey = item => item.id,
+  overscan = 6,
+  endThreshold = 10,
+  onEndReached,
+  className
+}) {
+  const [scrollTop, setScrollTop] = useState(0);
+  const frame = useRef(null);
+
+  const viewport = Math.min(height, items.length * rowHeight);
+  const first = Math.max(0, Math.floor(scrollTop / rowHeight) - overscan);
+  const last = Math.min(items.length, Math.ceil((scrollTop + viewport) / rowHeight) + overscan);
+
+  useEffect(() => {
+    if (onEndReached && items.length > 0 && last >= items.length - endThreshold) onEndReached();
+  }, [last, items.length, onEndReached, endThreshold]);
+
+  useEffect(() => () => cancelAnimationFrame(frame.current), []);
+
+  // One state update per animation frame however often scroll fires
+  const handleScroll = event => {
+    const top = event.currentTarget.scrollTop;
+    cancelAnimationFrame(frame.current);
+    frame.current = requestAnimationFrame(() => setScrollTop(top));
+  };
+
+  return (
+    <div className={cn('overflow-y-auto', className)} style={{ height: viewport }} onScroll={handleScroll}>
+      <div style={{ height: items.length * rowHeight, position: 'relative' }}>
+        {items.slice(first, last).map((item, offset) => (
+          <div
+            key={rowKey(item)}
+            style={{ position: 'absolute', top: (first + offset) * rowHeight, left: 0, right: 0, height: rowHeight }}
+          >
+            {renderRow(item, first + offset)}
+          </div>
+        ))}
+      </div>
+    </div>
+  );
+}
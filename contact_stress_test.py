@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Carbon Footprint Analytics Contact Log Stress Test
+Fires concurrent POST /api/contact submissions and reads the log back through
+GET /api/contact to check that every submission was stored exactly once.
+The server must run with CONTACT_ADMIN_TOKEN set to the same value as here;
+set CONTACT_LOG_MAX_SEGMENT_BYTES low (e.g. 65536) to exercise rotation.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from carbon_client import CarbonAPIError, CarbonClient
+
+# Configuration
+BASE_URL = os.environ.get("BASE_URL", "http://localhost:3000/api")
+ADMIN_TOKEN = os.environ.get("CONTACT_ADMIN_TOKEN", "")
+
+
+class ContactStressTester:
+    def __init__(self, client, token, submissions=2000, workers=50):
+        self.client = client
+        self.token = token
+        self.submissions = submissions
+        self.workers = workers
+        self.run_id = uuid.uuid4().hex[:12]
+        self.acknowledged = {}
+        self.test_results = []
+
+    def log_test(self, test_name, success, message, details=None):
+        """Log test results"""
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status} {test_name}: {message}")
+        if details:
+            print(f"   Details: {details}")
+
+        self.test_results.append({
+            "test": test_name,
+            "success": success,
+            "message": message,
+            "details": details
+        })
+
+    def submit(self, index):
+        """One submission; returns (latency ms, id, error message or None)"""
+        started = time.perf_counter()
+        try:
+            data = self.client.submit_contact(
+                name=f"Stress {index}",
+                email=f"stress{index}@example.com",
+                subject=f"stress {self.run_id} {index}",
+                message=f"Concurrent submission {index} of run {self.run_id}"
+            )
+            return (time.perf_counter() - started) * 1000, data["id"], None
+        except (CarbonAPIError, OSError) as e:
+            return (time.perf_counter() - started) * 1000, None, str(e)
+
+    def test_concurrent_submissions(self):
+        """Every concurrent submission is acknowledged"""
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(self.submit, range(self.submissions)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(r[0] for r in results)
+        errors = [r[2] for r in results if r[2]]
+        self.acknowledged = {r[1]: i for i, r in enumerate(results) if r[1]}
+        p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+        summary = (f"{len(self.acknowledged)}/{self.submissions} acknowledged in {elapsed:.1f}s "
+                   f"({self.submissions / elapsed:.0f}/s), p50 {statistics.median(latencies):.1f}ms, p95 {p95:.1f}ms")
+        if errors:
+            self.log_test("Concurrent submissions", False, summary, f"first error: {errors[0]}")
+            return False
+        if len(self.acknowledged) != self.submissions:
+            self.log_test("Concurrent submissions", False, summary, "duplicate ids returned")
+            return False
+        self.log_test("Concurrent submissions", True, summary)
+        return True
+
+    def test_no_lost_entries(self):
+        """Reading the log back finds each acknowledged submission exactly once"""
+        if not self.token:
+            self.log_test("Readback", False, "Set CONTACT_ADMIN_TOKEN to read the log back")
+            return False
+        try:
+            started = time.perf_counter()
+            stored = [entry for entry in self.client.iter_contacts(self.token)
+                      if entry.get("subject", "").startswith(f"stress {self.run_id} ")]
+            elapsed = time.perf_counter() - started
+        except CarbonAPIError as e:
+            self.log_test("Readback", False, f"GET /api/contact failed: {str(e)}")
+            return False
+
+        counts = {}
+        for entry in stored:
+            counts[entry["id"]] = counts.get(entry["id"], 0) + 1
+        missing = [i for i in self.acknowledged if i not in counts]
+        duplicated = [i for i, n in counts.items() if n > 1]
+        unexpected = [i for i in counts if i not in self.acknowledged]
+
+        if missing or duplicated or unexpected:
+            self.log_test("Readback", False,
+                          f"{len(missing)} missing, {len(duplicated)} duplicated, {len(unexpected)} unexpected",
+                          f"missing: {missing[:5]}")
+            return False
+        self.log_test("Readback", True, f"All {len(counts)} submissions stored exactly once (read in {elapsed:.1f}s)")
+        return True
+
+    def test_entries_intact(self):
+        """Stored entries keep the submitted fields"""
+        if not self.token:
+            return False
+        entries, _ = self.client.get_contacts_page(self.token, limit=50)
+        broken = [e for e in entries if e.get("subject", "").startswith(f"stress {self.run_id} ")
+                  and (not e.get("createdAt") or not e.get("email", "").startswith("stress")
+                       or self.run_id not in e.get("message", ""))]
+        if broken:
+            self.log_test("Entry contents", False, f"{len(broken)} entries with missing fields", broken[0])
+            return False
+        self.log_test("Entry contents", True, "Latest entries have id, createdAt and the submitted fields")
+        return True
+
+    def test_validation(self):
+        """A submission without the required fields is rejected"""
+        try:
+            self.client.request("POST", "/contact", json_body={"name": "No email"})
+            self.log_test("Validation", False, "Submission without email/message was accepted")
+            return False
+        except CarbonAPIError as e:
+            if e.status == 400:
+                self.log_test("Validation", True, "Missing fields rejected with 400")
+                return True
+            self.log_test("Validation", False, f"Expected 400, got {e.status}")
+            return False
+
+    def run_all_tests(self):
+        print("🧪 Starting Contact Log Stress Test")
+        print(f"📍 {self.submissions} submissions over {self.workers} workers (run {self.run_id})")
+        print("=" * 70)
+
+        results = [self.test_validation(), self.test_concurrent_submissions()]
+        if results[-1]:
+            results.append(self.test_no_lost_entries())
+            results.append(self.test_entries_intact())
+
+        print("\n" + "=" * 70)
+        passed = sum(1 for r in self.test_results if r["success"])
+        print(f"🏁 {passed}/{len(self.test_results)} checks passed")
+        return all(results)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Concurrent contact form submissions with a lossless readback check")
+    parser.add_argument("--submissions", type=int, default=2000, help="Total submissions")
+    parser.add_argument("--workers", type=int, default=50, help="Concurrent submitters")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    client = CarbonClient(BASE_URL, timeout=60, retries=0, pool_size=args.workers)
+    tester = ContactStressTester(client, ADMIN_TOKEN, submissions=args.submissions, workers=args.workers)
+    sys.exit(0 if tester.run_all_tests() else 1)
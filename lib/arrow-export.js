@@ -0,0 +1,250 @@
+// Columnar export of emission records as an Arrow IPC stream.
+//
+// The records are read from a Mongo cursor and written in record batches of
+// up to DEFAULT_BATCH_ROWS rows, so memory stays at about one batch however
+// many records match. Numeric fields become float64 columns and everything
+// else utf8; missing values are nulls. pyarrow (and so carbon_client.analytics)
+// reads the stream directly, or memory-maps it once saved to disk.
+//
+// The stream is encoded here rather than with the apache-arrow package: an
+// export only needs a schema message, record batches of two column types and
+// the end-of-stream marker. Each message is
+//
+//   0xFFFFFFFF, int32 metadata length, FlatBuffers Message, body buffers
+//
+// with the metadata and every body buffer padded to 8 bytes
+// (https://arrow.apache.org/docs/format/Columnar.html#serialization-and-interprocess-communication-ipc).
+
+export const ARROW_CONTENT_TYPE = 'application/vnd.apache.arrow.stream';
+
+// Columns exported when the request names no ?fields=
+export const DEFAULT_ARROW_FIELDS = [
+  'id', 'date', 'department', 'category', 'subcategory', 'value', 'unit', 'co2Kg', 'co2Lbs'
+];
+
+const NUMERIC_FIELDS = new Set(['value', 'co2Lbs', 'co2Kg', 'emissionFactor']);
+const DEFAULT_BATCH_ROWS = 65536;
+// 0xFFFFFFFF continuation marker followed by a zero metadata length
+const END_OF_STREAM = new Uint8Array([0xff, 0xff, 0xff, 0xff, 0, 0, 0, 0]);
+
+// Enum values from the Arrow format's Schema.fbs and Message.fbs
+const METADATA_V5 = 4;
+const HEADER_SCHEMA = 1;
+const HEADER_RECORD_BATCH = 3;
+const TYPE_FLOATING_POINT = 3;
+const TYPE_UTF8 = 5;
+const PRECISION_DOUBLE = 2;
+const ENDIANNESS_LITTLE = 0;
+
+const encoder = new TextEncoder();
+const padded = length => Math.ceil(length / 8) * 8;
+
+// FlatBuffers values. A table lists its fields by field id, undefined when
+// absent; a struct vector holds FieldNode or Buffer structs, both two int64s.
+const scalar = (size, set) => value => ({ size, set: (view, at) => set(view, at, value) });
+const uint8 = scalar(1, (view, at, value) => view.setUint8(at, value));
+const int16 = scalar(2, (view, at, value) => view.setInt16(at, value, true));
+const int64 = scalar(8, (view, at, value) => view.setBigInt64(at, BigInt(value), true));
+const table = fields => ({ kind: 'table', fields });
+const string = value => ({ kind: 'string', value });
+const tableVector = items => ({ kind: 'tables', items });
+const structVector = items => ({ kind: 'structs', items });
+
+// Lays objects out front to back, each table followed by what it references,
+// so every offset points forward as FlatBuffers requires
+class FlatBuilder {
+  constructor() {
+    this.bytes = new Uint8Array(1024);
+    this.view = new DataView(this.bytes.buffer);
+    this.length = 0;
+  }
+
+  alloc(size, align = 1) {
+    const at = Math.ceil(this.length / align) * align;
+    this.length = at + size;
+    if (this.length > this.bytes.length) {
+      const bytes = new Uint8Array(Math.max(this.length, 2 * this.bytes.length));
+      bytes.set(this.bytes);
+      this.bytes = bytes;
+      this.view = new DataView(bytes.buffer);
+    }
+    return at;
+  }
+
+  point(slot, target) {
+    this.view.setUint32(slot, target - slot, true);
+  }
+
+  finish(root) {
+    const slot = this.alloc(4);
+    this.point(slot, this.write(root));
+    return this.bytes.subarray(0, this.length);
+  }
+
+  write(node) {
+    if (node.kind === 'table') return this.writeTable(node.fields);
+    if (node.kind === 'string') {
+      const bytes = encoder.encode(node.value);
+      const at = this.alloc(4 + bytes.length + 1, 4);
+      this.view.setUint32(at, bytes.length, true);
+      this.bytes.set(bytes, at + 4);
+      return at;
+    }
+    if (node.kind === 'tables') {
+      const at = this.alloc(4 + 4 * node.items.length, 4);
+      this.view.setUint32(at, node.items.length, true);
+      node.items.forEach((item, index) => this.point(at + 4 + 4 * index, this.write(item)));
+      return at;
+    }
+    // Struct vector: the elements start 8-aligned, right after the length
+    this.length = Math.ceil(this.length / 4) * 4;
+    if ((this.length + 4) % 8 !== 0) this.length += 4;
+    const at = this.alloc(4 + 16 * node.items.length);
+    this.view.setUint32(at, node.items.length, true);
+    node.items.forEach(([a, b], index) => {
+      this.view.setBigInt64(at + 4 + 16 * index, BigInt(a), true);
+      this.view.setBigInt64(at + 12 + 16 * index, BigInt(b), true);
+    });
+    return at;
+  }
+
+  writeTable(fields) {
+    // Inline layout: the offset to the vtable, then fields largest first.
+    // References are 4-byte offsets to objects written after the table.
+    const slots = fields
+      .map((field, id) => field && { id, field, size: field.kind ? 4 : field.size })
+      .filter(Boolean)
+      .sort((a, b) => b.size - a.size);
+    let inline = 4;
+    slots.forEach(slot => {
+      slot.offset = Math.ceil(inline / slot.size) * slot.size;
+      inline = slot.offset + slot.size;
+    });
+
+    const vtableSize = 4 + 2 * fields.length;
+    const vtableAt = this.alloc(vtableSize, 2);
+    const tableAt = this.alloc(inline, 8);
+    this.view.setUint16(vtableAt, vtableSize, true);
+    this.view.setUint16(vtableAt + 2, inline, true);
+    slots.forEach(slot => this.view.setUint16(vtableAt + 4 + 2 * slot.id, slot.offset, true));
+    this.view.setInt32(tableAt, tableAt - vtableAt, true);
+
+    slots.filter(slot => !slot.field.kind).forEach(slot => slot.field.set(this.view, tableAt + slot.offset));
+    slots.filter(slot => slot.field.kind).forEach(slot => this.point(tableAt + slot.offset, this.write(slot.field)));
+    return tableAt;
+  }
+}
+
+function ipcMessage(header, headerType, bodyLength, body = []) {
+  const metadata = new FlatBuilder().finish(
+    table([int16(METADATA_V5), uint8(headerType), header, int64(bodyLength)])
+  );
+  const metadataLength = padded(metadata.length);
+  const bytes = new Uint8Array(8 + metadataLength + bodyLength);
+  const view = new DataView(bytes.buffer);
+  view.setUint32(0, 0xffffffff, true);
+  view.setInt32(4, metadataLength, true);
+  bytes.set(metadata, 8);
+  body.forEach(({ offset, data }) => bytes.set(data, 8 + metadataLength + offset));
+  return bytes;
+}
+
+function schemaMessage(fields) {
+  const columns = fields.map(field => table(NUMERIC_FIELDS.has(field)
+    ? [string(field), uint8(1), uint8(TYPE_FLOATING_POINT), table([int16(PRECISION_DOUBLE)])]
+    : [string(field), uint8(1), uint8(TYPE_UTF8), table([])]));
+  return ipcMessage(table([int16(ENDIANNESS_LITTLE), tableVector(columns)]), HEADER_SCHEMA, 0);
+}
+
+function text(value) {
+  if (value === undefined || value === null) return null;
+  return value instanceof Date ? value.toISOString() : String(value);
+}
+
+// Validity bitmap, null count and data buffers of one column
+function columnBuffers(docs, field) {
+  const validity = new Uint8Array(Math.ceil(docs.length / 8));
+  let nullCount = 0;
+  const valid = index => {
+    validity[index >> 3] |= 1 << (index & 7);
+  };
+
+  if (NUMERIC_FIELDS.has(field)) {
+    const values = new Float64Array(docs.length);
+    docs.forEach((doc, index) => {
+      if (typeof doc[field] === 'number') {
+        values[index] = doc[field];
+        valid(index);
+      } else {
+        nullCount += 1;
+      }
+    });
+    return { nullCount, buffers: [validity, new Uint8Array(values.buffer)] };
+  }
+
+  const strings = docs.map(doc => text(doc[field]));
+  const encoded = strings.map(value => (value === null ? null : encoder.encode(value)));
+  const offsets = new Int32Array(docs.length + 1);
+  encoded.forEach((bytes, index) => {
+    if (bytes) valid(index);
+    else nullCount += 1;
+    offsets[index + 1] = offsets[index] + (bytes ? bytes.length : 0);
+  });
+  const data = new Uint8Array(offsets[docs.length]);
+  encoded.forEach((bytes, index) => bytes && data.set(bytes, offsets[index]));
+  return { nullCount, buffers: [validity, new Uint8Array(offsets.buffer), data] };
+}
+
+function recordBatchMessage(docs, fields) {
+  const nodes = [];
+  const buffers = [];
+  const body = [];
+  let bodyLength = 0;
+  fields.forEach(field => {
+    const column = columnBuffers(docs, field);
+    nodes.push([docs.length, column.nullCount]);
+    column.buffers.forEach((data, index) => {
+      // An all-valid column may omit its bitmap
+      const bytes = index === 0 && column.nullCount === 0 ? new Uint8Array(0) : data;
+      buffers.push([bodyLength, bytes.length]);
+      body.push({ offset: bodyLength, data: bytes });
+      bodyLength += padded(bytes.length);
+    });
+  });
+  const header = table([int64(docs.length), structVector(nodes), structVector(buffers)]);
+  return ipcMessage(header, HEADER_RECORD_BATCH, bodyLength, body);
+}
+
+export function arrowResponse(cursor, fields = DEFAULT_ARROW_FIELDS, { batchRows = DEFAULT_BATCH_ROWS } = {}) {
+  let started = false;
+  const stream = new ReadableStream({
+    async pull(controller) {
+      try {
+        if (!started) {
+          // An empty export still carries its schema
+          controller.enqueue(schemaMessage(fields));
+          started = true;
+        }
+        const docs = [];
+        while (docs.length < batchRows) {
+          const doc = await cursor.next();
+          if (doc === null) break;
+          docs.push(doc);
+        }
+        if (docs.length > 0) controller.enqueue(recordBatchMessage(docs, fields));
+        if (docs.length < batchRows) {
+          controller.enqueue(END_OF_STREAM);
+          controller.close();
+        }
+      } catch (error) {
+        controller.error(error);
+        await cursor.close();
+      }
+    },
+    async cancel() {
+      await cursor.close();
+    }
+  });
+
+  return new Response(stream, { headers: { 'Content-Type': ARROW_CONTENT_TYPE } });
+}
@@ -0,0 +1,126 @@
+import { createHash } from 'crypto';
+import { changeHead } from './change-feed.js';
+
+// In-process response cache for the analytics endpoints.
+//
+// Entries are tagged with the data version current when they were computed.
+// The version is the head of the change feed (lib/change-feed.js), which is
+// kept in MongoDB and advanced by every API write, rollup rebuild,
+// recalculation and data script, in this process or any other. A lookup
+// reads it first, so any change turns all older entries into misses without
+// having to know which ones it touched. State lives on globalThis so every
+// route bundle in the server process (and hot reloads in dev) sees the same
+// cache.
+
+const state = globalThis.__carbonResponseCache || (globalThis.__carbonResponseCache = {
+  dataVersion: 0,
+  cache: null
+});
+
+// The version last read by syncDataVersion()
+export function getDataVersion() {
+  return state.dataVersion;
+}
+
+// Read the current version; call before a lookup
+export async function syncDataVersion(db) {
+  state.dataVersion = await changeHead(db);
+  return state.dataVersion;
+}
+
+export class ResponseCache {
+  constructor({ maxEntries = 500, maxBytes = 50 * 1024 * 1024, ttlMs = 5 * 60 * 1000 } = {}) {
+    this.maxEntries = maxEntries;
+    this.maxBytes = maxBytes;
+    this.ttlMs = ttlMs;
+    this.entries = new Map(); // insertion order doubles as LRU order
+    this.bytes = 0;
+    this.counters = { hits: 0, misses: 0, notModified: 0, evictions: 0, invalidations: 0 };
+  }
+
+  delete(key) {
+    const entry = this.entries.get(key);
+    if (!entry) return;
+    this.entries.delete(key);
+    this.bytes -= entry.body.length;
+  }
+
+  // Returns the entry for `key` if it is fresh and computed at the current
+  // data version, otherwise null. Hits move to the most-recently-used end.
+  get(key) {
+    const entry = this.entries.get(key);
+    if (!entry) {
+      this.counters.misses += 1;
+      return null;
+    }
+    if (entry.version !== getDataVersion() || Date.now() - entry.storedAt > this.ttlMs) {
+      this.delete(key);
+      this.counters.invalidations += 1;
+      this.counters.misses += 1;
+      return null;
+    }
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    this.counters.hits += 1;
+    return entry;
+  }
+
+  set(key, entry) {
+    if (this.ttlMs <= 0 || entry.body.length > this.maxBytes) return;
+    // A write landed while this was being computed; the result may be stale
+    if (entry.version !== getDataVersion()) return;
+
+    this.delete(key);
+    this.entries.set(key, { ...entry, storedAt: Date.now() });
+    this.bytes += entry.body.length;
+
+    while (this.entries.size > this.maxEntries || this.bytes > this.maxBytes) {
+      const oldest = this.entries.keys().next().value;
+      this.delete(oldest);
+      this.counters.evictions += 1;
+    }
+  }
+
+  stats() {
+    const lookups = this.counters.hits + this.counters.misses;
+    return {
+      ...this.counters,
+      hitRate: lookups > 0 ? Math.round((this.counters.hits / lookups) * 1000) / 1000 : 0,
+      entries: this.entries.size,
+      bytes: this.bytes,
+      maxEntries: this.maxEntries,
+      maxBytes: this.maxBytes,
+      ttlMs: this.ttlMs,
+      dataVersion: getDataVersion()
+    };
+  }
+}
+
+if (!state.cache) {
+  state.cache = new ResponseCache({
+    maxEntries: parseInt(process.env.RESPONSE_CACHE_MAX_ENTRIES || '500'),
+    maxBytes: parseInt(process.env.RESPONSE_CACHE_MAX_BYTES || String(50 * 1024 * 1024)),
+    ttlMs: parseInt(process.env.RESPONSE_CACHE_TTL_MS || String(5 * 60 * 1000))
+  });
+}
+
+export const responseCache = state.cache;
+
+// Route plus sorted query params; empty values and department=all/category=all
+// are dropped because the handlers treat them the same as an absent param.
+export function cacheKey(path, searchParams) {
+  const params = [...searchParams.entries()]
+    .filter(([, value]) => value !== '' && value !== 'all')
+    .sort(([a, av], [b, bv]) => (a === b ? av.localeCompare(bv) : a.localeCompare(b)));
+  return `${path.replace(/\/$/, '')}?${new URLSearchParams(params)}`;
+}
+
+export function strongEtag(body) {
+  return `"${createHash('sha1').update(body).digest('base64url')}"`;
+}
+
+// If-None-Match may list several tags; weak tags never match a strong ETag
+export function etagMatches(ifNoneMatch, etag) {
+  if (!ifNoneMatch) return false;
+  return ifNoneMatch.split(',').map(tag => tag.trim()).some(tag => tag === etag || tag === '*');
+}
@@ -0,0 +1,203 @@
+// Change feed of emission records, for clients that keep a local copy.
+//
+// Every write through the API appends one entry per record to
+// emission_changes under a sequence number from the counters collection:
+//
+//   { seq, op: 'put', id, before, after, at }    insert (before null) or update
+//   { seq, op: 'delete', id, before, at }        tombstone
+//   { seq, op: 'reset', at }                     changes the feed cannot describe
+//                                                record by record (a rollup
+//                                                rebuild or a recalculation job)
+//
+// `before` lets a client move totals without holding the record itself. A
+// client remembers the last seq it applied and asks for what follows. Entries
+// older than the retention window are pruned, and the pruned-through seq is
+// kept as the feed's floor: a client behind the floor (or ahead of the head,
+// after a database reset) is told to reload instead of receiving a gap.
+//
+// A full load must know which entries it already reflects, or a client would
+// apply a write twice: once in the load and again from the feed. Writers
+// bracket their data writes with beginWrite() and the entries they record,
+// which the counter tracks as `writes` (started) and `inflight`.
+// readSnapshot() runs a read while no write is in flight and none starts,
+// so its result reflects exactly the entries up to the head it returns.
+
+import { randomUUID } from 'crypto';
+
+export const CHANGES_COLLECTION = 'emission_changes';
+const COUNTERS_COLLECTION = 'counters';
+const COUNTER_ID = 'emission_changes';
+
+export const DEFAULT_CHANGES_LIMIT = 1000;
+export const MAX_CHANGES_LIMIT = 5000;
+// Sequence numbers are reserved before their entries are inserted, so a
+// reader can briefly see seq n + 1 without n. Stop at such a gap unless it is
+// older than this (the writer failed and n will never appear).
+const GAP_GRACE_MS = 30 * 1000;
+const PRUNE_INTERVAL_MS = 60 * 60 * 1000;
+const DEFAULT_RETENTION_DAYS = 7;
+const SNAPSHOT_ATTEMPTS = 3;
+const SNAPSHOT_RETRY_MS = 50;
+
+const state = globalThis.__carbonChangeFeed || (globalThis.__carbonChangeFeed = { lastPrunedAt: 0 });
+
+function retentionDays() {
+  return parseFloat(process.env.CHANGE_FEED_RETENTION_DAYS || String(DEFAULT_RETENTION_DAYS));
+}
+
+function record(doc) {
+  if (!doc) return null;
+  const { _id, ...fields } = doc;
+  return fields;
+}
+
+// Reserve `count` consecutive sequence numbers, ending `write` in the same
+// update; returns the first
+async function reserve(db, count, write) {
+  const update = { $inc: { seq: count } };
+  if (write) {
+    update.$pull = { inflight: { id: write.id } };
+    write.ended = true;
+  }
+  const counter = await db.collection(COUNTERS_COLLECTION).findOneAndUpdate(
+    { _id: COUNTER_ID },
+    update,
+    { upsert: true, returnDocument: 'after' }
+  );
+  return counter.seq - count + 1;
+}
+
+async function append(db, entries, write) {
+  if (entries.length === 0) {
+    await endWrite(db, write);
+    return;
+  }
+  const first = await reserve(db, entries.length, write);
+  const at = new Date();
+  await db.collection(CHANGES_COLLECTION).insertMany(
+    entries.map((entry, index) => ({ seq: first + index, ...entry, at })),
+    { ordered: false }
+  );
+  if (Date.now() - state.lastPrunedAt > PRUNE_INTERVAL_MS) {
+    state.lastPrunedAt = Date.now();
+    pruneChanges(db).catch(error => console.error('Change feed pruning failed:', error));
+  }
+}
+
+// Mark a write to emission records as started, before it touches any data.
+// The returned handle ends the write when passed to recordChanges() or
+// recordReset(), or to endWrite() when the write records nothing.
+export async function beginWrite(db) {
+  const write = { id: randomUUID(), ended: false };
+  await db.collection(COUNTERS_COLLECTION).updateOne(
+    { _id: COUNTER_ID },
+    { $inc: { writes: 1 }, $push: { inflight: { id: write.id, at: new Date() } } },
+    { upsert: true }
+  );
+  return write;
+}
+
+export async function endWrite(db, write) {
+  if (!write || write.ended) return;
+  write.ended = true;
+  await db.collection(COUNTERS_COLLECTION).updateOne({ _id: COUNTER_ID }, { $pull: { inflight: { id: write.id } } });
+}
+
+// `updated` entries are { before, after } pairs, as for applyRollupDeltas
+export async function recordChanges(db, { inserted = [], updated = [], deleted = [] }, write) {
+  await append(db, [
+    ...inserted.map(after => ({ op: 'put', id: after.id, before: null, after: record(after) })),
+    ...updated.map(({ before, after }) => ({ op: 'put', id: after.id, before: record(before), after: record(after) })),
+    ...deleted.map(before => ({ op: 'delete', id: before.id, before: record(before) }))
+  ], write);
+}
+
+export async function recordReset(db, reason, write) {
+  await append(db, [{ op: 'reset', reason }], write);
+}
+
+// Drop entries older than the retention window and raise the floor past them
+export async function pruneChanges(db, { retainDays = retentionDays() } = {}) {
+  const cutoff = new Date(Date.now() - retainDays * 24 * 60 * 60 * 1000);
+  const newest = await db.collection(CHANGES_COLLECTION)
+    .find({ at: { $lt: cutoff } }, { projection: { seq: 1 } })
+    .sort({ seq: -1 })
+    .limit(1)
+    .next();
+  if (!newest) return { pruned: 0, floor: null };
+  // Raise the floor first: a reader must never see a pruned gap without it.
+  // Writes left in flight by a process that died are dropped here too.
+  await db.collection(COUNTERS_COLLECTION).updateOne(
+    { _id: COUNTER_ID },
+    { $max: { floor: newest.seq }, $pull: { inflight: { at: { $lt: new Date(Date.now() - GAP_GRACE_MS) } } } }
+  );
+  const { deletedCount } = await db.collection(CHANGES_COLLECTION).deleteMany({ seq: { $lte: newest.seq } });
+  return { pruned: deletedCount, floor: newest.seq };
+}
+
+async function counter(db) {
+  const doc = await db.collection(COUNTERS_COLLECTION).findOne({ _id: COUNTER_ID });
+  // A write in flight for longer than the gap grace belongs to a writer that failed
+  const cutoff = Date.now() - GAP_GRACE_MS;
+  return {
+    head: doc?.seq || 0,
+    floor: doc?.floor || 0,
+    writes: doc?.writes || 0,
+    busy: (doc?.inflight || []).some(write => write.at.getTime() > cutoff)
+  };
+}
+
+// The current head of the feed
+export async function changeHead(db) {
+  return (await counter(db)).head;
+}
+
+// Run `read` between two writes and return { value, token }: `token` is the
+// head whose entries `value` already reflects. After SNAPSHOT_ATTEMPTS reads
+// that overlapped a write, `token` is null and the caller cannot continue
+// from the feed without reloading.
+export async function readSnapshot(db, read, { attempts = SNAPSHOT_ATTEMPTS } = {}) {
+  let value;
+  for (let attempt = 1; attempt <= attempts; attempt += 1) {
+    const before = await counter(db);
+    if (!before.busy || attempt === attempts) {
+      value = await read();
+      const after = await counter(db);
+      if (!before.busy && after.writes === before.writes) return { value, token: before.head };
+    }
+    if (attempt < attempts) await new Promise(resolve => setTimeout(resolve, SNAPSHOT_RETRY_MS));
+  }
+  return { value, token: null };
+}
+
+// Entries after `since`, oldest first, stopping at an unfilled gap.
+// `token` is the seq to ask from next time. `reset` means the client must
+// reload everything and continue from `token`.
+export async function readChanges(db, since, { limit = DEFAULT_CHANGES_LIMIT } = {}) {
+  const { head, floor } = await counter(db);
+  if (since > head || since < floor) {
+    return { changes: [], token: head, hasMore: false, reset: true };
+  }
+  if (since === head) return { changes: [], token: head, hasMore: false, reset: false };
+
+  const entries = await db.collection(CHANGES_COLLECTION)
+    .find({ seq: { $gt: since } }, { projection: { _id: 0 } })
+    .sort({ seq: 1 })
+    .limit(limit + 1)
+    .toArray();
+
+  const changes = [];
+  let token = since;
+  let hasMore = false;
+  for (const entry of entries) {
+    if (entry.seq !== token + 1 && Date.now() - entry.at.getTime() < GAP_GRACE_MS) break;
+    if (entry.op === 'reset') return { changes: [], token: head, hasMore: false, reset: true };
+    if (changes.length === limit) {
+      hasMore = true;
+      break;
+    }
+    changes.push(entry);
+    token = entry.seq;
+  }
+  return { changes, token, hasMore, reset: false };
+}
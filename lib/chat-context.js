@@ -0,0 +1,127 @@
+import { syncDataVersion } from './cache.js';
+import { ROLLUP_COLLECTION } from './rollups.js';
+
+// Compact data summary the chatbot sends to the model instead of raw records.
+//
+// Built from the monthly rollups, so its cost depends on the number of
+// departments and months rather than on the number of emissions. The snapshot
+// is rebuilt lazily when a write has bumped the data version or when it is
+// older than CHAT_CONTEXT_TTL_MS.
+
+const CONTEXT_TTL_MS = parseInt(process.env.CHAT_CONTEXT_TTL_MS || String(10 * 60 * 1000));
+const MAX_DEPARTMENTS = 15;
+const RECENT_MONTHS = 3;
+
+const state = globalThis.__carbonChatContext || (globalThis.__carbonChatContext = {
+  snapshot: null,
+  version: -1,
+  builtAt: 0,
+  pending: null
+});
+
+const round = value => Math.round(value);
+
+// rows: [{ month, department, category, co2Kg, count }]
+export function summarizeRows(departments, rows) {
+  const names = new Map(departments.map(d => [d.id, d.name]));
+  const byDepartment = new Map();
+  const byCategory = {};
+  const byMonth = new Map();
+  let totalCo2Kg = 0;
+  let records = 0;
+
+  rows.forEach(({ month, department, category, co2Kg, count }) => {
+    totalCo2Kg += co2Kg;
+    records += count;
+    byCategory[category] = (byCategory[category] || 0) + co2Kg;
+    byMonth.set(month, (byMonth.get(month) || 0) + co2Kg);
+
+    const dept = byDepartment.get(department) || { co2Kg: 0, records: 0 };
+    dept.co2Kg += co2Kg;
+    dept.records += count;
+    byDepartment.set(department, dept);
+  });
+
+  const ranked = [...byDepartment.entries()].sort(([, a], [, b]) => b.co2Kg - a.co2Kg);
+  const departmentSummary = ranked.slice(0, MAX_DEPARTMENTS).map(([id, d]) => ({
+    name: names.get(id) || id,
+    co2Kg: round(d.co2Kg),
+    records: d.records
+  }));
+  const rest = ranked.slice(MAX_DEPARTMENTS);
+  if (rest.length > 0) {
+    departmentSummary.push({
+      name: `Other (${rest.length} departments)`,
+      co2Kg: round(rest.reduce((sum, [, d]) => sum + d.co2Kg, 0)),
+      records: rest.reduce((sum, [, d]) => sum + d.records, 0)
+    });
+  }
+
+  const months = [...byMonth.keys()].sort();
+  const recentMonths = months.slice(-RECENT_MONTHS).map(month => {
+    const previous = byMonth.get(months[months.indexOf(month) - 1]);
+    const co2Kg = byMonth.get(month);
+    return {
+      month,
+      co2Kg: round(co2Kg),
+      changePct: previous ? Math.round(((co2Kg - previous) / previous) * 1000) / 10 : null
+    };
+  });
+
+  return {
+    records,
+    totalCo2Kg: round(totalCo2Kg),
+    firstMonth: months[0] || null,
+    lastMonth: months[months.length - 1] || null,
+    categories: Object.fromEntries(Object.entries(byCategory).map(([k, v]) => [k, round(v)])),
+    departments: departmentSummary,
+    recentMonths
+  };
+}
+
+async function buildSnapshot(db) {
+  const [departments, rows] = await Promise.all([
+    db.collection('departments').find({}, { projection: { _id: 0, id: 1, name: 1 } }).toArray(),
+    db.collection(ROLLUP_COLLECTION).aggregate([
+      { $match: { count: { $gt: 0 } } },
+      {
+        $group: {
+          _id: { month: '$month', department: '$department', category: '$category' },
+          co2Kg: { $sum: '$co2Kg' },
+          count: { $sum: '$count' }
+        }
+      },
+      {
+        $project: {
+          _id: 0,
+          month: '$_id.month',
+          department: '$_id.department',
+          category: '$_id.category',
+          co2Kg: 1,
+          count: 1
+        }
+      }
+    ]).toArray()
+  ]);
+  return summarizeRows(departments, rows);
+}
+
+export async function getChatContext(db) {
+  const version = await syncDataVersion(db);
+  if (state.snapshot && state.version === version && Date.now() - state.builtAt < CONTEXT_TTL_MS) {
+    return state.snapshot;
+  }
+
+  // Concurrent messages share one rebuild
+  if (!state.pending) {
+    state.pending = buildSnapshot(db)
+      .then(snapshot => {
+        Object.assign(state, { snapshot, version, builtAt: Date.now() });
+        return snapshot;
+      })
+      .finally(() => {
+        state.pending = null;
+      });
+  }
+  return state.pending;
+}
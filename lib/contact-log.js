@@ -0,0 +1,331 @@
+import fs from 'fs';
+import path from 'path';
+import { v4 as uuidv4 } from 'uuid';
+
+// Append-only store for contact form submissions.
+//
+// Entries are JSON lines in <dir>/contacts.jsonl. Submissions are queued and
+// a single writer appends each queued batch with one write and one fdatasync,
+// so a submission costs the same however large the log is, and concurrent
+// submissions are never lost to a read-modify-write race. When the active
+// file passes maxSegmentBytes it is renamed to contacts-<ms>-<seq>.jsonl and a
+// new one is started. Rotated segments are immutable until compaction merges
+// them. One writer per directory: run a single server process against it.
+
+const DEFAULT_DIR = path.join(process.cwd(), 'contacts');
+const DEFAULT_MAX_SEGMENT_BYTES = 8 * 1024 * 1024;
+const DEFAULT_MAX_BATCH = 500;
+
+export const ACTIVE_SEGMENT = 'contacts.jsonl';
+const SEGMENT_PATTERN = /^contacts-\d{13}-\d{4}\.jsonl$/;
+
+export function contactLogDir() {
+  return process.env.CONTACT_LOG_DIR || DEFAULT_DIR;
+}
+
+function segmentName(ms, seq) {
+  return `contacts-${String(ms).padStart(13, '0')}-${String(seq).padStart(4, '0')}.jsonl`;
+}
+
+// Rotated segment names, oldest first (names sort chronologically)
+export async function listSegments(dir = contactLogDir()) {
+  try {
+    return (await fs.promises.readdir(dir)).filter(name => SEGMENT_PATTERN.test(name)).sort();
+  } catch (error) {
+    if (error.code === 'ENOENT') return [];
+    throw error;
+  }
+}
+
+// A free segment name at or after `ms`
+async function nextSegmentName(dir, ms) {
+  const taken = new Set(await listSegments(dir));
+  let seq = 0;
+  while (taken.has(segmentName(ms, seq))) seq += 1;
+  return segmentName(ms, seq);
+}
+
+async function readLines(file) {
+  try {
+    const raw = await fs.promises.readFile(file, 'utf8');
+    return raw.split('\n').filter(line => line.trim());
+  } catch (error) {
+    // A segment may disappear under a concurrent compaction
+    if (error.code === 'ENOENT') return [];
+    throw error;
+  }
+}
+
+function parseLine(line) {
+  try {
+    return JSON.parse(line);
+  } catch {
+    // A torn final line after a crash; everything before it is intact
+    return null;
+  }
+}
+
+export class ContactLog {
+  constructor({ dir = contactLogDir(), maxSegmentBytes = DEFAULT_MAX_SEGMENT_BYTES, maxBatch = DEFAULT_MAX_BATCH } = {}) {
+    this.dir = dir;
+    this.maxSegmentBytes = maxSegmentBytes;
+    this.maxBatch = maxBatch;
+    this.queue = [];
+    this.writing = null;
+    this.handle = null;
+    this.size = 0;
+    this.stats = { appended: 0, batches: 0, rotations: 0 };
+  }
+
+  // Queue an entry; resolves with the stored entry once it is on disk
+  append(fields) {
+    const entry = { id: uuidv4(), ...fields, createdAt: new Date().toISOString() };
+    return new Promise((resolve, reject) => {
+      this.queue.push({ entry, resolve, reject });
+      if (!this.writing) {
+        this.writing = this.drain().finally(() => {
+          this.writing = null;
+        });
+      }
+    });
+  }
+
+  async open() {
+    await fs.promises.mkdir(this.dir, { recursive: true });
+    this.handle = await fs.promises.open(path.join(this.dir, ACTIVE_SEGMENT), 'a');
+    this.size = (await this.handle.stat()).size;
+  }
+
+  async rotate() {
+    await this.handle.close();
+    this.handle = null;
+    const name = await nextSegmentName(this.dir, Date.now());
+    await fs.promises.rename(path.join(this.dir, ACTIVE_SEGMENT), path.join(this.dir, name));
+    this.stats.rotations += 1;
+    await this.open();
+  }
+
+  // Write queued entries in batches until the queue is empty. Entries queued
+  // while a batch is on disk form the next batch.
+  async drain() {
+    while (this.queue.length > 0) {
+      const batch = this.queue.splice(0, this.maxBatch);
+      try {
+        if (!this.handle) await this.open();
+        const data = Buffer.from(batch.map(({ entry }) => `${JSON.stringify(entry)}\n`).join(''), 'utf8');
+        await this.handle.write(data);
+        await this.handle.datasync();
+        this.size += data.length;
+        this.stats.appended += batch.length;
+        this.stats.batches += 1;
+        batch.forEach(({ entry, resolve }) => resolve(entry));
+      } catch (error) {
+        batch.forEach(({ reject }) => reject(error));
+        // Reopen on the next batch in case the handle is what failed
+        await this.handle?.close().catch(() => {});
+        this.handle = null;
+        continue;
+      }
+      if (this.size >= this.maxSegmentBytes) {
+        await this.rotate().catch(error => {
+          console.warn('Could not rotate contact log:', error.message);
+        });
+      }
+    }
+  }
+}
+
+export function getContactLog() {
+  if (!globalThis.__carbonContactLog) {
+    globalThis.__carbonContactLog = new ContactLog({
+      maxSegmentBytes: parseInt(process.env.CONTACT_LOG_MAX_SEGMENT_BYTES || String(DEFAULT_MAX_SEGMENT_BYTES))
+    });
+  }
+  return globalThis.__carbonContactLog;
+}
+
+function encodeCursor(segment, line, ino) {
+  return Buffer.from(JSON.stringify([segment, line, ino])).toString('base64url');
+}
+
+function decodeCursor(cursor) {
+  try {
+    const [segment, line, ino] = JSON.parse(Buffer.from(cursor, 'base64url').toString('utf8'));
+    if (typeof segment === 'string' && Number.isInteger(line)) return { segment, line, ino };
+  } catch {
+    // fall through
+  }
+  return null;
+}
+
+async function inode(file) {
+  try {
+    return (await fs.promises.stat(file)).ino;
+  } catch (error) {
+    if (error.code === 'ENOENT') return null;
+    throw error;
+  }
+}
+
+// Lines and inode of one open of the active file
+async function readActive(dir) {
+  let handle;
+  try {
+    handle = await fs.promises.open(path.join(dir, ACTIVE_SEGMENT), 'r');
+  } catch (error) {
+    if (error.code === 'ENOENT') return { lines: [], ino: null };
+    throw error;
+  }
+  try {
+    const { ino } = await handle.stat();
+    const raw = await handle.readFile('utf8');
+    return { lines: raw.split('\n').filter(line => line.trim()), ino };
+  } finally {
+    await handle.close();
+  }
+}
+
+// Newest entries first. The cursor names a segment and a line in it; lines are
+// only ever appended, so a cursor stays valid while the server keeps writing.
+// Rotation renames the active file without changing its inode, which is how a
+// cursor into it (and a read racing a rotation) finds it again. Only the
+// segments a page touches are read.
+export async function readContacts({ dir = contactLogDir(), limit = 100, cursor } = {}) {
+  const position = cursor ? decodeCursor(cursor) : null;
+  if (cursor && !position) throw new Error('Invalid cursor');
+
+  // Read the active file before listing segments, so a rotation in between
+  // shows up as a rotated segment with the inode just read
+  let active = !position || position.segment === ACTIVE_SEGMENT ? await readActive(dir) : null;
+  const rotated = (await listSegments(dir)).reverse();
+  const inodes = new Map();
+  const inodeOf = async name => {
+    if (!inodes.has(name)) inodes.set(name, await inode(path.join(dir, name)));
+    return inodes.get(name);
+  };
+
+  if (position?.segment === ACTIVE_SEGMENT && position.ino !== active.ino) {
+    // The file the cursor points into has been rotated since the previous page
+    active = null;
+    position.segment = null;
+    for (const name of rotated) {
+      if (await inodeOf(name) === position.ino) {
+        position.segment = name;
+        break;
+      }
+    }
+  }
+  if (active?.ino && rotated.length > 0 && await inodeOf(rotated[0]) === active.ino) rotated.shift();
+
+  const segments = [...(active ? [ACTIVE_SEGMENT] : []), ...rotated];
+  let start = 0;
+  if (position?.segment) {
+    start = segments.indexOf(position.segment);
+    // A compacted-away segment: continue with the next older one that still exists
+    if (start < 0) start = segments.findIndex(name => name !== ACTIVE_SEGMENT && name < position.segment);
+    if (start < 0) return { entries: [], nextCursor: null };
+  }
+
+  const entries = [];
+  for (let index = start; index < segments.length; index += 1) {
+    const name = segments[index];
+    const lines = name === ACTIVE_SEGMENT ? active.lines : await readLines(path.join(dir, name));
+    let line = index === start && position?.segment === name ? Math.min(position.line, lines.length) : lines.length;
+    while (line > 0) {
+      line -= 1;
+      const entry = parseLine(lines[line]);
+      if (entry) entries.push(entry);
+      if (entries.length === limit) {
+        if (line === 0 && index === segments.length - 1) return { entries, nextCursor: null };
+        return { entries, nextCursor: encodeCursor(name, line, name === ACTIVE_SEGMENT ? active.ino : undefined) };
+      }
+    }
+  }
+  return { entries, nextCursor: null };
+}
+
+// Merge rotated segments into as few files of up to maxSegmentBytes as
+// possible, dropping duplicate ids and (optionally) entries older than
+// retainDays. A legacy contacts.json array in the working directory is folded
+// in first. The active segment is never touched, so a running server can keep
+// appending; segments rotated during compaction are left for the next run.
+export async function compactContacts({
+  dir = contactLogDir(),
+  maxSegmentBytes = DEFAULT_MAX_SEGMENT_BYTES,
+  retainDays,
+  legacyFile = path.join(process.cwd(), 'contacts.json')
+} = {}) {
+  await fs.promises.mkdir(dir, { recursive: true });
+  const segments = await listSegments(dir);
+  let legacy = [];
+  try {
+    legacy = JSON.parse(await fs.promises.readFile(legacyFile, 'utf8') || '[]')
+      .map(entry => ({ ...entry, id: String(entry.id) }));
+  } catch (error) {
+    if (error.code !== 'ENOENT') throw error;
+  }
+
+  const cutoff = retainDays ? new Date(Date.now() - retainDays * 24 * 60 * 60 * 1000).toISOString() : null;
+  const seen = new Set();
+  const kept = [];
+  let read = legacy.length;
+  for (const entry of legacy) {
+    if (!seen.has(entry.id)) {
+      seen.add(entry.id);
+      kept.push(entry);
+    }
+  }
+  for (const segment of segments) {
+    for (const line of await readLines(path.join(dir, segment))) {
+      const entry = parseLine(line);
+      read += 1;
+      if (!entry || seen.has(entry.id)) continue;
+      seen.add(entry.id);
+      kept.push(entry);
+    }
+  }
+  const retained = cutoff ? kept.filter(entry => entry.createdAt >= cutoff) : kept;
+  retained.sort((a, b) => (a.createdAt < b.createdAt ? -1 : a.createdAt > b.createdAt ? 1 : 0));
+
+  // Write the new segments under temporary names and rename them into place
+  // before the inputs are removed, so a crash leaves duplicates (dropped by
+  // the next run) rather than gaps. Names keep the oldest input's timestamp so
+  // they sort before anything rotated while compaction ran.
+  const baseMs = segments.length > 0 ? parseInt(segments[0].split('-')[1]) : Date.now();
+  const taken = new Set(segments);
+  let seq = 0;
+  const outputs = [];
+  let lines = [];
+  let bytes = 0;
+  const flush = async () => {
+    if (lines.length === 0) return;
+    while (taken.has(segmentName(baseMs, seq))) seq += 1;
+    const name = segmentName(baseMs, seq);
+    taken.add(name);
+    await fs.promises.writeFile(path.join(dir, `${name}.tmp`), lines.join(''), 'utf8');
+    outputs.push(name);
+    lines = [];
+    bytes = 0;
+  };
+  for (const entry of retained) {
+    const line = `${JSON.stringify(entry)}\n`;
+    if (bytes > 0 && bytes + Buffer.byteLength(line) > maxSegmentBytes) await flush();
+    lines.push(line);
+    bytes += Buffer.byteLength(line);
+  }
+  await flush();
+
+  for (const name of outputs) await fs.promises.rename(path.join(dir, `${name}.tmp`), path.join(dir, name));
+  for (const segment of segments) await fs.promises.unlink(path.join(dir, segment));
+  if (legacy.length > 0) await fs.promises.rename(legacyFile, `${legacyFile}.imported`);
+
+  return {
+    segmentsBefore: segments.length,
+    segmentsAfter: outputs.length,
+    entriesRead: read,
+    entriesKept: retained.length,
+    duplicatesDropped: read - kept.length,
+    expired: kept.length - retained.length,
+    legacyImported: legacy.length
+  };
+}
@@ -0,0 +1,108 @@
+// Incremental RFC 4180 CSV parser.
+//
+// Text can arrive in arbitrary chunks (a quoted field may be split across
+// network reads), so the parser keeps its state between push() calls and only
+// returns records that are complete.
+
+export class CsvParser {
+  constructor() {
+    this.field = '';
+    this.record = [];
+    this.inQuotes = false;
+    this.quoteInQuotes = false; // saw `"` inside quotes; next char decides
+    this.skipLineFeed = false; // saw `\r`; swallow a following `\n`
+    this.started = false;
+  }
+
+  endField() {
+    this.record.push(this.field);
+    this.field = '';
+  }
+
+  endRecord(records) {
+    this.endField();
+    // Blank lines produce a single empty field; they carry no data
+    if (!(this.record.length === 1 && this.record[0] === '')) {
+      records.push(this.record);
+    }
+    this.record = [];
+  }
+
+  push(text) {
+    const records = [];
+    let i = 0;
+
+    if (!this.started && text.length > 0) {
+      this.started = true;
+      if (text.charCodeAt(0) === 0xfeff) i = 1; // byte order mark
+    }
+
+    for (; i < text.length; i++) {
+      const ch = text[i];
+
+      if (this.skipLineFeed) {
+        this.skipLineFeed = false;
+        if (ch === '\n') continue;
+      }
+
+      if (this.inQuotes) {
+        if (this.quoteInQuotes) {
+          this.quoteInQuotes = false;
+          if (ch === '"') {
+            this.field += '"';
+            continue;
+          }
+          this.inQuotes = false;
+          // fall through: the closing quote is followed by a delimiter
+        } else if (ch === '"') {
+          this.quoteInQuotes = true;
+          continue;
+        } else {
+          this.field += ch;
+          continue;
+        }
+      }
+
+      if (ch === '"' && this.field === '') {
+        this.inQuotes = true;
+      } else if (ch === ',') {
+        this.endField();
+      } else if (ch === '\n') {
+        this.endRecord(records);
+      } else if (ch === '\r') {
+        this.endRecord(records);
+        this.skipLineFeed = true;
+      } else {
+        this.field += ch;
+      }
+    }
+
+    return records;
+  }
+
+  // Flush the last record when the input does not end with a newline
+  end() {
+    const records = [];
+    if (this.quoteInQuotes) {
+      this.quoteInQuotes = false;
+      this.inQuotes = false;
+    }
+    if (this.field !== '' || this.record.length > 0) {
+      this.endRecord(records);
+    }
+    return records;
+  }
+}
+
+// Parse a stream of bytes (a web ReadableStream or any async iterable of
+// Uint8Array chunks) and yield one array of fields per record.
+export async function* parseCsvStream(stream) {
+  const parser = new CsvParser();
+  const decoder = new TextDecoder();
+
+  for await (const chunk of stream) {
+    yield* parser.push(decoder.decode(chunk, { stream: true }));
+  }
+  yield* parser.push(decoder.decode());
+  yield* parser.end();
+}
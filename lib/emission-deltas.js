@@ -0,0 +1,106 @@
+// Apply change feed entries (lib/change-feed.js) to state a client already
+// holds: a page of table rows, an analytics summary and the monthly trends.
+// Pure functions with no server dependencies, so the dashboard can use them.
+//
+// `filters` are the ones the state was loaded with: { department, startDate,
+// endDate }, where department 'all' (or empty) means every department.
+
+const round2 = x => Math.round(x * 100) / 100;
+
+function inDepartment(record, { department }) {
+  return !department || department === 'all' || record.department === department;
+}
+
+function inRange(record, { startDate, endDate }) {
+  return (!startDate || record.date >= startDate) && (!endDate || record.date <= endDate);
+}
+
+export function matchesFilters(record, filters) {
+  return inDepartment(record, filters) && inRange(record, filters);
+}
+
+// Table order: newest date first, then id descending
+function compareRows(a, b) {
+  if (a.date !== b.date) return a.date < b.date ? 1 : -1;
+  return a.id < b.id ? 1 : a.id > b.id ? -1 : 0;
+}
+
+function pick(record, fields) {
+  return fields ? Object.fromEntries(fields.filter(f => record[f] !== undefined).map(f => [f, record[f]])) : record;
+}
+
+// `complete` is true when every matching row is loaded (no next page); a new
+// row that sorts after the last loaded one is otherwise left for that page
+export function applyChangesToRows(rows, changes, filters, { fields, complete = false } = {}) {
+  let next = rows;
+  for (const change of changes) {
+    next = next.filter(row => row.id !== change.id);
+    if (change.op !== 'put' || !matchesFilters(change.after, filters)) continue;
+    const last = next[next.length - 1];
+    if (!complete && last && compareRows(change.after, last) > 0) continue;
+    const index = next.findIndex(row => compareRows(change.after, row) < 0);
+    const row = pick(change.after, fields);
+    next = index < 0 ? [...next, row] : [...next.slice(0, index), row, ...next.slice(index)];
+  }
+  return next;
+}
+
+// A key whose total reaches zero is dropped, as the server omits it once its
+// last record is gone
+function addTo(map, key, amount) {
+  const { [key]: current = 0, ...rest } = map;
+  const total = round2(current + amount);
+  return total === 0 ? rest : { ...rest, [key]: total };
+}
+
+function within(record, period) {
+  return period && record.date >= period.start && record.date <= period.end;
+}
+
+export function applyChangesToSummary(summary, changes, filters) {
+  const next = { ...summary };
+  const apply = (record, sign) => {
+    if (!record || !inDepartment(record, filters)) return;
+    const co2Kg = sign * (record.co2Kg || 0);
+    if (inRange(record, filters)) {
+      next.totalEmissions = round2(next.totalEmissions + co2Kg);
+      next.totalRecords += sign;
+      next.categoryBreakdown = addTo(next.categoryBreakdown, record.category, co2Kg);
+      next.departmentBreakdown = addTo(next.departmentBreakdown, record.department, co2Kg);
+      next.monthlyData = addTo(next.monthlyData, record.date.substring(0, 7), co2Kg);
+    }
+    if (within(record, next.periods?.lastMonth)) next.lastMonthTotal = round2(next.lastMonthTotal + co2Kg);
+    if (within(record, next.periods?.twoMonthsAgo)) next.twoMonthsAgoTotal = round2(next.twoMonthsAgoTotal + co2Kg);
+  };
+
+  for (const change of changes) {
+    apply(change.before, -1);
+    if (change.op === 'put') apply(change.after, 1);
+  }
+  if (next.periods) {
+    next.monthOverMonthChange = next.twoMonthsAgoTotal > 0
+      ? parseFloat(((next.lastMonthTotal - next.twoMonthsAgoTotal) / next.twoMonthsAgoTotal * 100).toFixed(1))
+      : 0;
+  }
+  return next;
+}
+
+// Trends rows are { month, <category>: kg, ..., total } for the last `months`
+export function applyChangesToTrends(trends, changes, { department, months = 12 } = {}) {
+  const byMonth = new Map(trends.map(row => [row.month, { ...row }]));
+  const apply = (record, sign) => {
+    if (!record || !inDepartment(record, { department })) return;
+    const month = record.date.substring(0, 7);
+    const row = byMonth.get(month) || { month, electricity: 0, transportation: 0, heating: 0, waste: 0, total: 0 };
+    const co2Kg = sign * (record.co2Kg || 0);
+    row[record.category] = (row[record.category] || 0) + co2Kg;
+    row.total += co2Kg;
+    byMonth.set(month, row);
+  };
+
+  for (const change of changes) {
+    apply(change.before, -1);
+    if (change.op === 'put') apply(change.after, 1);
+  }
+  return [...byMonth.values()].sort((a, b) => a.month.localeCompare(b.month)).slice(-months);
+}
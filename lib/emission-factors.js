@@ -0,0 +1,43 @@
+// EPA Emission Factors (lbs CO2 per unit)
+export const EMISSION_FACTORS = {
+  electricity: {
+    grid: { factor: 0.92, unit: 'kWh', name: 'Grid Electricity' },
+    solar: { factor: 0, unit: 'kWh', name: 'Solar Energy' },
+    wind: { factor: 0, unit: 'kWh', name: 'Wind Energy' }
+  },
+  transportation: {
+    gasoline: { factor: 19.6, unit: 'gallon', name: 'Gasoline Vehicle' },
+    diesel: { factor: 22.4, unit: 'gallon', name: 'Diesel Vehicle' },
+    electric: { factor: 0.36, unit: 'mile', name: 'Electric Vehicle' },
+    hybrid: { factor: 0.5, unit: 'mile', name: 'Hybrid Vehicle' },
+    publicTransit: { factor: 0.14, unit: 'mile', name: 'Public Transit' },
+    flight: { factor: 0.4, unit: 'mile', name: 'Air Travel' }
+  },
+  heating: {
+    naturalGas: { factor: 117, unit: 'therm', name: 'Natural Gas' },
+    heatingOil: { factor: 22.4, unit: 'gallon', name: 'Heating Oil' },
+    propane: { factor: 12.7, unit: 'gallon', name: 'Propane' },
+    electric: { factor: 3.412, unit: 'kWh', name: 'Electric Heating' }
+  },
+  waste: {
+    landfill: { factor: 2072, unit: 'ton', name: 'Landfill Waste' },
+    recycled: { factor: 0, unit: 'ton', name: 'Recycled' },
+    composted: { factor: 0, unit: 'ton', name: 'Composted' }
+  }
+};
+
+export const LBS_TO_KG = 0.453592;
+
+// `factors` defaults to the built-in table; pass a stored version's factors to
+// calculate with the table in effect on the record's date.
+export function calculateEmissions(category, subcategory, value, factors = EMISSION_FACTORS) {
+  const factor = factors[category]?.[subcategory]?.factor || 0;
+  const co2Lbs = value * factor;
+  const co2Kg = co2Lbs * LBS_TO_KG; // Convert lbs to kg
+  return {
+    co2Lbs: Math.round(co2Lbs * 100) / 100,
+    co2Kg: Math.round(co2Kg * 100) / 100,
+    factor,
+    unit: factors[category]?.[subcategory]?.unit || ''
+  };
+}
@@ -0,0 +1,165 @@
+// Stratified samples of the emissions collection, for approximate analytics.
+//
+// One document per (month, department, category) stratum:
+//
+//   { month, department, category, threshold, samples: [{ id, date, co2Kg, h }] }
+//
+// `h` is a hash of the record id, uniform in [0, 1). A stratum's samples are
+// exactly its records with h below `threshold`, at most SAMPLE_SIZE of them;
+// a threshold of 1 means the stratum is sampled completely. Every record is
+// therefore sampled independently with probability `threshold`, and a sample
+// sum scaled by 1 / threshold estimates the stratum sum (Horvitz-Thompson),
+// with a variance that is itself estimated from the sample.
+//
+// Write handlers keep samples in step like the rollups: a removed record is
+// pulled, an added one is pushed when it hashes below the threshold, and a
+// stratum that overflows drops its highest hashes and lowers its threshold to
+// the lowest one it dropped. rebuildSamples() recomputes them from raw emissions.
+
+import { createHash } from 'crypto';
+import { emissionStore } from './emission-store.js';
+import { monthsMatch } from './rollups.js';
+
+export const SAMPLES_COLLECTION = 'emission_samples';
+
+const DEFAULT_SAMPLE_SIZE = 200;
+// Two-sided 95% normal quantile
+const Z_95 = 1.959964;
+
+export function sampleSize() {
+  return parseInt(process.env.APPROX_SAMPLE_SIZE || String(DEFAULT_SAMPLE_SIZE));
+}
+
+// Stable per id, so every writer agrees on whether a record is sampled
+export function sampleHash(id) {
+  return createHash('sha1').update(String(id)).digest().readUIntBE(0, 6) / 2 ** 48;
+}
+
+function stratumKey(emission) {
+  return {
+    month: emission.date.substring(0, 7), // YYYY-MM
+    department: emission.department,
+    category: emission.category
+  };
+}
+
+function sampleEntry(emission) {
+  return { id: emission.id, date: emission.date, co2Kg: emission.co2Kg || 0, h: sampleHash(emission.id) };
+}
+
+// Server-side merge of new entries into a stratum, keeping the invariant that
+// samples are every record below the threshold
+function mergePipeline(entries, size) {
+  const threshold = { $ifNull: ['$threshold', 1] };
+  return [
+    {
+      $set: {
+        pool: {
+          $sortArray: {
+            input: {
+              $concatArrays: [
+                { $ifNull: ['$samples', []] },
+                { $filter: { input: { $literal: entries }, cond: { $lt: ['$$this.h', threshold] } } }
+              ]
+            },
+            sortBy: { h: 1 }
+          }
+        }
+      }
+    },
+    {
+      $set: {
+        samples: { $slice: ['$pool', size] },
+        threshold: { $cond: [{ $gt: [{ $size: '$pool' }, size] }, { $arrayElemAt: ['$pool.h', size] }, threshold] }
+      }
+    },
+    { $unset: 'pool' }
+  ];
+}
+
+// Apply the effect of added and removed emission documents, as for
+// applyRollupDeltas. Removals run first, so an update that stays in its
+// stratum swaps its entry.
+export async function applySampleDeltas(db, { added = [], removed = [] }, { size = sampleSize() } = {}) {
+  const byStratum = new Map();
+  added.forEach(emission => {
+    const key = stratumKey(emission);
+    const mapKey = JSON.stringify(key);
+    if (!byStratum.has(mapKey)) byStratum.set(mapKey, { key, entries: [] });
+    byStratum.get(mapKey).entries.push(sampleEntry(emission));
+  });
+
+  const operations = [
+    ...removed.map(emission => ({
+      updateOne: { filter: stratumKey(emission), update: { $pull: { samples: { id: emission.id } } } }
+    })),
+    ...[...byStratum.values()].map(({ key, entries }) => ({
+      updateOne: { filter: key, update: mergePipeline(entries, size), upsert: true }
+    }))
+  ];
+  if (operations.length === 0) return;
+  await db.collection(SAMPLES_COLLECTION).bulkWrite(operations, { ordered: true });
+}
+
+// Recompute samples from the raw emissions, for every month or just `months`.
+// Records stream through once; each stratum keeps its size + 1 lowest hashes,
+// the extra one becoming the threshold.
+export async function rebuildSamples(db, { months, size = sampleSize() } = {}) {
+  if (months && months.length === 0) return;
+  const strata = new Map();
+  const trim = stratum => {
+    stratum.samples.sort((a, b) => a.h - b.h);
+    stratum.samples.length = Math.min(stratum.samples.length, size + 1);
+  };
+
+  const cursor = emissionStore(db).find(months ? monthsMatch(months) : {}, {
+    projection: { _id: 0, id: 1, date: 1, department: 1, category: 1, co2Kg: 1 }
+  });
+  for await (const emission of cursor) {
+    const key = stratumKey(emission);
+    const mapKey = JSON.stringify(key);
+    let stratum = strata.get(mapKey);
+    if (!stratum) {
+      stratum = { ...key, samples: [] };
+      strata.set(mapKey, stratum);
+    }
+    stratum.samples.push(sampleEntry(emission));
+    if (stratum.samples.length > 4 * size) trim(stratum);
+  }
+
+  const docs = [...strata.values()].map(stratum => {
+    trim(stratum);
+    const threshold = stratum.samples.length > size ? stratum.samples[size].h : 1;
+    return { ...stratum, threshold, samples: stratum.samples.slice(0, size) };
+  });
+
+  const samples = db.collection(SAMPLES_COLLECTION);
+  await samples.deleteMany(months ? { month: { $in: months } } : {});
+  if (docs.length > 0) await samples.insertMany(docs, { ordered: false });
+}
+
+// Horvitz-Thompson estimates of the co2Kg sum and record count of each
+// stratum's records dated within [startDate, endDate], with their variances
+export function estimateStrata(strata, { startDate, endDate } = {}) {
+  return strata.map(({ month, department, category, threshold = 1, samples = [] }) => {
+    const inRange = samples.filter(s => (!startDate || s.date >= startDate) && (!endDate || s.date <= endDate));
+    const scale = 1 / threshold;
+    const spread = (1 - threshold) / (threshold * threshold);
+    return {
+      month,
+      department,
+      category,
+      co2Kg: inRange.reduce((sum, s) => sum + s.co2Kg, 0) * scale,
+      co2KgVariance: inRange.reduce((sum, s) => sum + s.co2Kg * s.co2Kg, 0) * spread,
+      count: inRange.length * scale,
+      countVariance: inRange.length * spread,
+      sampleSize: inRange.length
+    };
+  });
+}
+
+// 95% interval around an estimate, never below zero
+export function confidenceInterval(value, variance) {
+  const margin = Z_95 * Math.sqrt(variance);
+  return [Math.max(0, Math.round((value - margin) * 100) / 100), Math.round((value + margin) * 100) / 100];
+}
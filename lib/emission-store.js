@@ -0,0 +1,221 @@
+// Storage layouts for emission records.
+//
+// EMISSIONS_STORAGE=documents (the default) keeps one plain document per
+// record in `emissions`. EMISSIONS_STORAGE=timeseries keeps them in the
+// MongoDB time-series collection `emissions_ts`:
+//
+//   { ts: Date, meta: { department, category, subcategory }, id, value, ... }
+//
+// MongoDB groups a time-series collection into buckets per meta value and
+// time span and compresses them column-wise, and a range on ts skips whole
+// buckets. Multi-year histories take a fraction of the space and month-range
+// scans read far fewer documents.
+//
+// Callers always see the logical record shape ({ date: 'YYYY-MM-DD',
+// department, category, subcategory, ... }); the time-series store translates
+// queries, sorts and $set updates on the way in and reshapes documents on the
+// way out. Time-series collections cannot enforce unique indexes and need
+// MongoDB 8.0+ for updates and deletes on arbitrary fields, which the write
+// paths here rely on.
+
+export const EMISSIONS_COLLECTION = 'emissions';
+export const TIMESERIES_COLLECTION = 'emissions_ts';
+
+export const TIMESERIES_OPTIONS = {
+  timeseries: { timeField: 'ts', metaField: 'meta', granularity: 'hours' }
+};
+
+const META_FIELDS = ['department', 'category', 'subcategory'];
+
+export function storageMode() {
+  return process.env.EMISSIONS_STORAGE === 'timeseries' ? 'timeseries' : 'documents';
+}
+
+export function emissionStore(db, mode = storageMode()) {
+  return mode === 'timeseries' ? new TimeSeriesStore(db) : new DocumentStore(db);
+}
+
+// The plain-document layout: every call maps directly onto the collection
+class DocumentStore {
+  constructor(db) {
+    this.db = db;
+    this.mode = 'documents';
+    this.timeseries = false;
+    this.collection = db.collection(EMISSIONS_COLLECTION);
+  }
+
+  find(query = {}, { projection, sort, limit } = {}) {
+    const cursor = this.collection.find(query, projection ? { projection } : {});
+    if (sort) cursor.sort(sort);
+    if (limit) cursor.limit(limit);
+    return cursor;
+  }
+
+  aggregate(pipeline, options) {
+    return this.collection.aggregate(pipeline, options);
+  }
+
+  insertOne(doc) {
+    return this.collection.insertOne(doc);
+  }
+
+  insertMany(docs, options) {
+    return this.collection.insertMany(docs, options);
+  }
+
+  // Apply a pipeline update to one record; returns the record as it was
+  updateById(id, pipeline) {
+    return this.collection.findOneAndUpdate({ id }, pipeline, { returnDocument: 'before' });
+  }
+
+  deleteById(id) {
+    return this.collection.findOneAndDelete({ id });
+  }
+
+  // updateOne ($set), deleteOne and upsert operations on logical fields
+  bulkWrite(operations, options) {
+    return this.collection.bulkWrite(operations, options);
+  }
+
+  deleteMany(filter) {
+    return this.collection.deleteMany(filter);
+  }
+}
+
+function toDate(value) {
+  return typeof value === 'string' ? new Date(`${value}T00:00:00Z`) : value;
+}
+
+// Translate a logical filter: date becomes a ts range and the meta fields move
+// under meta, so MongoDB can prune buckets by both
+export function timeseriesQuery(query) {
+  if (Array.isArray(query)) return query.map(timeseriesQuery);
+  if (!query || typeof query !== 'object') return query;
+
+  const translated = {};
+  for (const [key, value] of Object.entries(query)) {
+    if (key === '$or' || key === '$and' || key === '$nor') {
+      translated[key] = value.map(timeseriesQuery);
+    } else if (key === 'date') {
+      translated.ts = value && typeof value === 'object' && !(value instanceof Date)
+        ? Object.fromEntries(Object.entries(value).map(([op, v]) => [op, Array.isArray(v) ? v.map(toDate) : toDate(v)]))
+        : toDate(value);
+    } else if (META_FIELDS.includes(key)) {
+      translated[`meta.${key}`] = value;
+    } else {
+      translated[key] = value;
+    }
+  }
+  return translated;
+}
+
+function timeseriesSort(sort) {
+  return Object.fromEntries(Object.entries(sort).map(([key, direction]) => [
+    key === 'date' ? 'ts' : META_FIELDS.includes(key) ? `meta.${key}` : key,
+    direction
+  ]));
+}
+
+// A logical record as stored in the time-series collection
+export function toTimeseries(doc) {
+  const { date, department, category, subcategory, ...measurements } = doc;
+  return { ...measurements, ts: toDate(date), meta: { department, category, subcategory } };
+}
+
+// Stages that turn stored time-series documents back into logical records
+export const LOGICAL_STAGES = [
+  {
+    $set: {
+      date: { $dateToString: { format: '%Y-%m-%d', date: '$ts' } },
+      department: '$meta.department',
+      category: '$meta.category',
+      subcategory: '$meta.subcategory'
+    }
+  },
+  { $unset: ['ts', 'meta'] }
+];
+
+function timeseriesSet(fields) {
+  const set = {};
+  for (const [key, value] of Object.entries(fields)) {
+    if (key === 'date') set.ts = toDate(value);
+    else if (META_FIELDS.includes(key)) set[`meta.${key}`] = value;
+    else set[key] = value;
+  }
+  return set;
+}
+
+class TimeSeriesStore {
+  constructor(db) {
+    this.db = db;
+    this.mode = 'timeseries';
+    this.timeseries = true;
+    this.collection = db.collection(TIMESERIES_COLLECTION);
+  }
+
+  // Filter, sort and limit on stored fields (so indexes and bucket bounds
+  // apply), then reshape only the documents that are returned
+  find(query = {}, { projection, sort, limit } = {}) {
+    const pipeline = [{ $match: timeseriesQuery(query) }];
+    if (sort) pipeline.push({ $sort: timeseriesSort(sort) });
+    if (limit) pipeline.push({ $limit: limit });
+    pipeline.push(...LOGICAL_STAGES);
+    if (projection) pipeline.push({ $project: projection });
+    return this.collection.aggregate(pipeline);
+  }
+
+  // A leading $match is translated and kept in front; everything after it
+  // sees logical records
+  aggregate(pipeline, options) {
+    const [first, ...rest] = pipeline;
+    const stages = first?.$match
+      ? [{ $match: timeseriesQuery(first.$match) }, ...LOGICAL_STAGES, ...rest]
+      : [...LOGICAL_STAGES, ...pipeline];
+    return this.collection.aggregate(stages, options);
+  }
+
+  async insertOne(doc) {
+    return this.collection.insertOne(toTimeseries(doc));
+  }
+
+  insertMany(docs, options) {
+    return this.collection.insertMany(docs.map(toTimeseries), options);
+  }
+
+  // Pipeline updates are not supported on time-series collections: read the
+  // record, apply `after` in JS and $set the result
+  async updateById(id, pipeline, after) {
+    const [before] = await this.find({ id }, { limit: 1 }).toArray();
+    if (!before) return null;
+    const { _id, id: _, createdAt, ...fields } = after(before);
+    await this.collection.updateOne({ _id }, { $set: timeseriesSet(fields) });
+    return before;
+  }
+
+  async deleteById(id) {
+    const [before] = await this.find({ id }, { limit: 1 }).toArray();
+    if (!before) return null;
+    await this.collection.deleteOne({ _id: before._id });
+    return before;
+  }
+
+  bulkWrite(operations, options) {
+    return this.collection.bulkWrite(operations.map(operation => {
+      if (operation.deleteOne) {
+        return { deleteOne: { filter: timeseriesQuery(operation.deleteOne.filter) } };
+      }
+      if (operation.insertOne) {
+        return { insertOne: { document: toTimeseries(operation.insertOne.document) } };
+      }
+      const { filter, update } = operation.updateOne;
+      if (Array.isArray(update) || operation.updateOne.upsert || Object.keys(update).some(op => op !== '$set')) {
+        throw new Error('Time-series storage supports only $set updates without upsert');
+      }
+      return { updateOne: { filter: timeseriesQuery(filter), update: { $set: timeseriesSet(update.$set) } } };
+    }), options);
+  }
+
+  deleteMany(filter) {
+    return this.collection.deleteMany(timeseriesQuery(filter));
+  }
+}
@@ -0,0 +1,415 @@
+import { createHash } from 'crypto';
+import { v4 as uuidv4 } from 'uuid';
+import { EMISSION_FACTORS, LBS_TO_KG } from './emission-factors.js';
+import { emissionStore } from './emission-store.js';
+import { calculateForDate, factorExpression, round2 } from './factor-versions.js';
+
+// Updates, deletes and upserts of stored emission records.
+//
+// Any change to value, category, subcategory or date restates co2Lbs, co2Kg,
+// emissionFactor and factorVersion from the record as it is after the change,
+// so a value-only correction uses the record's stored category and date.
+
+export const MAX_BATCH_OPERATIONS = 1000;
+// Documents a single batch may touch across all of its operations
+export const MAX_BATCH_DOCUMENTS = 10000;
+
+const DATE_PATTERN = /^\d{4}-\d{2}-\d{2}$/;
+const STRING_FIELDS = ['date', 'category', 'subcategory', 'unit', 'department', 'notes'];
+const RECALCULATED_BY = ['value', 'category', 'subcategory', 'date'];
+const FILTER_FIELDS = ['department', 'category', 'subcategory', 'startDate', 'endDate'];
+
+// A category or subcategory change that does not name a known pair once
+// applied to the stored record
+export class InvalidEmissionChangeError extends Error {}
+
+// A record's value as every write route reads it: a JSON number or a numeric
+// string (form fields and CSV cells), NaN otherwise
+export function parseEmissionValue(value) {
+  return typeof value === 'number' ? value : parseFloat(value);
+}
+
+// The fields a PUT body or batch `set` changes. Empty strings leave a field
+// alone, as the PUT route always has; notes may be cleared.
+export function emissionChanges(body) {
+  const changes = {};
+  for (const field of STRING_FIELDS) {
+    const value = body?.[field];
+    if (value === undefined || value === null) continue;
+    if (field !== 'notes' && value === '') continue;
+    changes[field] = String(value);
+  }
+  if (body?.value !== undefined && body.value !== null && body.value !== '') {
+    changes.value = parseEmissionValue(body.value);
+  }
+  return changes;
+}
+
+export function validateEmissionChanges(changes) {
+  if (changes.date !== undefined && !DATE_PATTERN.test(changes.date)) {
+    return `Invalid date "${changes.date}", expected YYYY-MM-DD`;
+  }
+  if (changes.value !== undefined && !Number.isFinite(changes.value)) return 'value must be a number or a numeric string';
+  if (changes.category !== undefined && !EMISSION_FACTORS[changes.category]) {
+    return `Unknown category "${changes.category}"`;
+  }
+  // With only one of the two, the pair is checked against the stored record
+  // by applyEmissionChanges()
+  if (changes.category !== undefined && changes.subcategory !== undefined
+    && !EMISSION_FACTORS[changes.category][changes.subcategory]) {
+    return `Unknown category/subcategory "${changes.category}/${changes.subcategory}"`;
+  }
+  return null;
+}
+
+function needsRecalculation(changes) {
+  return RECALCULATED_BY.some(field => changes[field] !== undefined);
+}
+
+// The record after `changes`, computed in JS. Throws
+// InvalidEmissionChangeError when a changed category or subcategory does not
+// pair with the other as stored.
+export function applyEmissionChanges(versions, doc, changes, updatedAt) {
+  const after = { ...doc, ...changes, updatedAt };
+  const pairChanged = changes.category !== undefined || changes.subcategory !== undefined;
+  if (pairChanged && !EMISSION_FACTORS[after.category]?.[after.subcategory]) {
+    throw new InvalidEmissionChangeError(`Unknown category/subcategory "${after.category}/${after.subcategory}"`);
+  }
+  if (needsRecalculation(changes)) {
+    const calculation = calculateForDate(versions, after);
+    after.co2Lbs = calculation.co2Lbs;
+    after.co2Kg = calculation.co2Kg;
+    after.emissionFactor = calculation.factor;
+    after.factorVersion = calculation.version;
+    if (changes.unit === undefined && pairChanged) after.unit = calculation.unit;
+  }
+  return after;
+}
+
+// The same change as a pipeline update, for a findOneAndUpdate that needs no
+// prior read of the record. Matches applyEmissionChanges() exactly.
+export function emissionUpdatePipeline(versions, changes, updatedAt) {
+  const set = { updatedAt };
+  for (const [field, value] of Object.entries(changes)) set[field] = { $literal: value };
+  const pipeline = [{ $set: set }];
+
+  if (needsRecalculation(changes)) {
+    const co2Lbs = { $multiply: [{ $ifNull: ['$value', 0] }, '$__factor.factor'] };
+    const pairChanged = changes.category !== undefined || changes.subcategory !== undefined;
+    pipeline.push(
+      { $set: { __factor: factorExpression(versions) } },
+      {
+        $set: {
+          co2Lbs: round2(co2Lbs),
+          co2Kg: round2({ $multiply: [co2Lbs, LBS_TO_KG] }),
+          emissionFactor: '$__factor.factor',
+          factorVersion: '$__factor.version',
+          ...(changes.unit === undefined && pairChanged ? { unit: '$__factor.unit' } : {})
+        }
+      },
+      { $unset: '__factor' }
+    );
+  }
+  return pipeline;
+}
+
+function filterError(filter) {
+  if (!filter || typeof filter !== 'object' || Array.isArray(filter)) return 'filter must be an object';
+  const keys = Object.keys(filter);
+  const unknown = keys.filter(key => !FILTER_FIELDS.includes(key));
+  if (unknown.length > 0) return `Unknown filter fields: ${unknown.join(', ')}`;
+  if (!keys.some(key => filter[key])) return `filter needs at least one of ${FILTER_FIELDS.join(', ')}`;
+  if (keys.some(key => typeof filter[key] !== 'string')) return 'filter values must be strings';
+  for (const key of ['startDate', 'endDate']) {
+    if (filter[key] && !DATE_PATTERN.test(filter[key])) return `filter.${key} must be a YYYY-MM-DD date`;
+  }
+  return null;
+}
+
+// Validate a POST /api/emissions/batch body and normalize its operations
+export function parseBatchOperations(body) {
+  const operations = body?.operations;
+  if (!Array.isArray(operations) || operations.length === 0) {
+    return { error: 'operations array is required and must not be empty' };
+  }
+  if (operations.length > MAX_BATCH_OPERATIONS) {
+    return { error: `A batch holds at most ${MAX_BATCH_OPERATIONS} operations` };
+  }
+
+  const parsed = [];
+  for (const [index, operation] of operations.entries()) {
+    const fail = error => ({ error: `operations[${index}]: ${error}` });
+    const { op, id, filter, set } = operation || {};
+    if (op !== 'update' && op !== 'delete') return fail('op must be "update" or "delete"');
+    if ((id === undefined) === (filter === undefined)) return fail('give exactly one of id or filter');
+    if (id !== undefined && (typeof id !== 'string' || !id)) return fail('id must be a non-empty string');
+    if (filter !== undefined) {
+      const error = filterError(filter);
+      if (error) return fail(error);
+    }
+
+    let changes;
+    if (op === 'update') {
+      changes = emissionChanges(set);
+      if (Object.keys(changes).length === 0) return fail('set must change at least one field');
+      const error = validateEmissionChanges(changes);
+      if (error) return fail(error);
+    }
+    parsed.push({ op, id, filter, changes });
+  }
+  return { operations: parsed };
+}
+
+function operationQuery({ id, filter }) {
+  if (id !== undefined) return { id };
+  const query = {};
+  if (filter.department) query.department = filter.department;
+  if (filter.category) query.category = filter.category;
+  if (filter.subcategory) query.subcategory = filter.subcategory;
+  if (filter.startDate || filter.endDate) {
+    query.date = {};
+    if (filter.startDate) query.date.$gte = filter.startDate;
+    if (filter.endDate) query.date.$lte = filter.endDate;
+  }
+  return query;
+}
+
+// operationQuery() evaluated against a document in memory
+function matchesOperation(doc, { id, filter }) {
+  if (id !== undefined) return doc.id === id;
+  return (!filter.department || doc.department === filter.department)
+    && (!filter.category || doc.category === filter.category)
+    && (!filter.subcategory || doc.subcategory === filter.subcategory)
+    && (!filter.startDate || doc.date >= filter.startDate)
+    && (!filter.endDate || doc.date <= filter.endDate);
+}
+
+// Run a batch of parsed operations with the semantics of applying them one
+// after another, in one read and one write:
+//
+//   1. one find fetches every record any operation can touch;
+//   2. the operations are applied in order to those records in memory, so a
+//      later operation sees earlier changes (and skips deleted records);
+//   3. each touched record's final state is written with one unordered
+//      bulkWrite, one write per record, guarded by the updatedAt that was read.
+//
+// Returns per-operation results, the { before, after } pairs and deleted
+// records that were written, and the number of records that changed between
+// the read and the write (their guarded writes match nothing and are skipped).
+// Each result's ids and matched count only records that were written; the
+// skipped ones are listed in its `conflicts`.
+export async function runEmissionBatch(db, versions, operations) {
+  const emissions = emissionStore(db);
+  const ids = [...new Set(operations.filter(o => o.id !== undefined).map(o => o.id))];
+  const clauses = [
+    ...(ids.length > 0 ? [{ id: { $in: ids } }] : []),
+    ...operations.filter(o => o.filter).map(operationQuery)
+  ];
+  const docs = await emissions
+    .find(clauses.length === 1 ? clauses[0] : { $or: clauses }, { projection: { _id: 0 }, limit: MAX_BATCH_DOCUMENTS + 1 })
+    .toArray();
+  if (docs.length > MAX_BATCH_DOCUMENTS) {
+    return { error: `The batch touches more than ${MAX_BATCH_DOCUMENTS} records; split it into smaller batches` };
+  }
+
+  const before = new Map(docs.map(doc => [doc.id, doc]));
+  const current = new Map(before);
+  const updatedAt = new Date().toISOString();
+  const results = [];
+  for (const [index, operation] of operations.entries()) {
+    const matched = [...current.values()].filter(doc => doc && matchesOperation(doc, operation));
+    for (const doc of matched) {
+      try {
+        current.set(doc.id, operation.op === 'delete' ? null : applyEmissionChanges(versions, doc, operation.changes, updatedAt));
+      } catch (error) {
+        if (!(error instanceof InvalidEmissionChangeError)) throw error;
+        // Nothing is written yet, so the whole batch is refused
+        return { error: `operations[${index}]: ${error.message} for record ${doc.id}` };
+      }
+    }
+    const result = { index, op: operation.op, matched: matched.length, ids: matched.map(doc => doc.id) };
+    if (operation.id !== undefined && matched.length === 0) result.error = 'Emission record not found';
+    results.push(result);
+  }
+
+  const touched = [...current.entries()].filter(([id, doc]) => doc !== before.get(id));
+  const writes = touched.map(([id, doc]) => {
+    const filter = { id, updatedAt: before.get(id).updatedAt ?? null };
+    if (doc === null) return { deleteOne: { filter } };
+    const { id: _, createdAt, ...fields } = doc;
+    return { updateOne: { filter, update: { $set: fields } } };
+  });
+
+  const failed = new Map();
+  let written = { matchedCount: 0, deletedCount: 0 };
+  if (writes.length > 0) {
+    try {
+      written = await emissions.bulkWrite(writes, { ordered: false });
+    } catch (error) {
+      if (!error.writeErrors) throw error;
+      const writeErrors = Array.isArray(error.writeErrors) ? error.writeErrors : [error.writeErrors];
+      writeErrors.forEach(e => failed.set(touched[e.index][0], e.errmsg || 'Write failed'));
+      written = error.result;
+    }
+  }
+
+  // A guarded write that matched nothing was skipped because the record
+  // changed after the read. Re-read what was written to find those records.
+  const attempted = touched.filter(([id]) => !failed.has(id));
+  const skipped = attempted.length - (written.matchedCount + written.deletedCount);
+  const conflicted = skipped > 0 ? await conflictingIds(emissions, attempted, updatedAt) : new Set();
+  const succeeded = attempted.filter(([id]) => !conflicted.has(id));
+
+  results.forEach(result => {
+    const errors = result.ids.filter(id => failed.has(id)).map(id => ({ id, error: failed.get(id) }));
+    if (errors.length > 0) result.writeErrors = errors;
+    result.conflicts = result.ids.filter(id => conflicted.has(id));
+    result.ids = result.ids.filter(id => !conflicted.has(id));
+    result.matched = result.ids.length;
+  });
+
+  return {
+    results,
+    updated: succeeded.filter(([, doc]) => doc !== null).map(([id, doc]) => ({ before: before.get(id), after: doc })),
+    deleted: succeeded.filter(([, doc]) => doc === null).map(([id]) => before.get(id)),
+    conflicts: conflicted.size,
+    // False when the re-read does not account for every skipped write (a
+    // record changed again after the write); the caller must rebuild
+    exact: conflicted.size === skipped
+  };
+}
+
+// Ids among `attempted` ([id, doc] pairs, doc null for a delete) whose write
+// did not apply: an update whose record does not carry this batch's
+// updatedAt, or a delete whose record is still there
+async function conflictingIds(emissions, attempted, updatedAt) {
+  const stored = await emissions
+    .find({ id: { $in: attempted.map(([id]) => id) } }, { projection: { _id: 0, id: 1, updatedAt: 1 } })
+    .toArray();
+  const storedAt = new Map(stored.map(doc => [doc.id, doc.updatedAt]));
+  return new Set(attempted
+    .filter(([id, doc]) => (doc === null ? storedAt.has(id) : storedAt.get(id) !== updatedAt))
+    .map(([id]) => id));
+}
+
+// Fields an upsert writes; `unchanged` means all of them already match
+const UPSERT_FIELDS = [
+  'date', 'category', 'subcategory', 'value', 'unit', 'department', 'notes',
+  'co2Lbs', 'co2Kg', 'emissionFactor', 'factorVersion', 'externalId'
+];
+const MAX_REPORTED_UPSERT_ERRORS = 100;
+
+// Identity of an upserted record: the client's externalId when given,
+// otherwise a hash of (date, department, category, subcategory, value). Two
+// identical readings without an externalId are therefore one record.
+export function dedupeKey(record) {
+  if (record.externalId !== undefined && record.externalId !== null && record.externalId !== '') {
+    return `ext:${record.externalId}`;
+  }
+  const identity = [record.date, record.department, record.category, record.subcategory, record.value];
+  return `sha1:${createHash('sha1').update(JSON.stringify(identity)).digest('hex')}`;
+}
+
+function upsertOperation(doc, id, now) {
+  const fields = UPSERT_FIELDS.filter(field => doc[field] !== undefined);
+  const set = Object.fromEntries(fields.map(field => [field, { $literal: doc[field] }]));
+  return {
+    updateOne: {
+      filter: { dedupeKey: doc.dedupeKey },
+      // A pipeline so the record is only modified (and updatedAt only moves)
+      // when a field actually differs; new records get an id and createdAt
+      update: [
+        { $set: { __changed: { $or: fields.map(field => ({ $ne: [`$${field}`, { $literal: doc[field] }] })) } } },
+        {
+          $set: {
+            ...set,
+            id: { $ifNull: ['$id', { $literal: id }] },
+            createdAt: { $ifNull: ['$createdAt', now] },
+            updatedAt: {
+              $cond: [{ $and: ['$__changed', { $ne: [{ $type: '$createdAt' }, 'missing'] }] }, now, '$updatedAt']
+            }
+          }
+        },
+        { $unset: '__changed' }
+      ],
+      upsert: true
+    }
+  };
+}
+
+function sameFields(a, b) {
+  return UPSERT_FIELDS.every(field => a[field] === b[field]);
+}
+
+// Upsert processed emission documents (without id/createdAt) on their
+// dedupeKey in one unordered bulkWrite. Within the payload the last record
+// for a key wins. Retrying a payload therefore leaves the collection as one
+// successful attempt would.
+//
+// The stored versions of the keys are read first so rollups can move by
+// delta; `exact` is false when the write counts disagree with that read (a
+// concurrent writer got in between) and the caller must rebuild instead.
+//
+// Time-series storage has neither upserts nor unique indexes, so there the
+// read decides between an insert and a $set, and two concurrent uploads of a
+// new key can both insert it.
+export async function runEmissionUpsert(db, docs) {
+  const emissions = emissionStore(db);
+  const byKey = new Map();
+  docs.forEach(doc => byKey.set(doc.dedupeKey, doc));
+  const unique = [...byKey.values()];
+
+  const stored = await emissions
+    .find({ dedupeKey: { $in: [...byKey.keys()] } }, { projection: { _id: 0 } })
+    .toArray();
+  const before = new Map(stored.map(doc => [doc.dedupeKey, doc]));
+
+  const now = new Date().toISOString();
+  const ids = new Map(unique.map(doc => [doc.dedupeKey, uuidv4()]));
+  const keys = [];
+  const operations = [];
+  for (const doc of unique) {
+    const existing = before.get(doc.dedupeKey);
+    if (!emissions.timeseries) {
+      operations.push(upsertOperation(doc, ids.get(doc.dedupeKey), now));
+    } else if (!existing) {
+      operations.push({ insertOne: { document: { ...doc, id: ids.get(doc.dedupeKey), createdAt: now } } });
+    } else if (!sameFields(existing, doc)) {
+      operations.push({ updateOne: { filter: { dedupeKey: doc.dedupeKey }, update: { $set: { ...doc, updatedAt: now } } } });
+    } else {
+      continue;
+    }
+    keys.push(doc.dedupeKey);
+  }
+
+  let result = { insertedCount: 0, upsertedCount: 0, matchedCount: 0, modifiedCount: 0 };
+  const failed = new Map();
+  try {
+    if (operations.length > 0) result = await emissions.bulkWrite(operations, { ordered: false });
+  } catch (error) {
+    if (!error.writeErrors) throw error;
+    const writeErrors = Array.isArray(error.writeErrors) ? error.writeErrors : [error.writeErrors];
+    writeErrors.forEach(e => failed.set(keys[e.index], e.errmsg || 'Write failed'));
+    result = error.result;
+  }
+  const insertedCount = emissions.timeseries ? result.insertedCount : result.upsertedCount;
+
+  const written = unique.filter(doc => !failed.has(doc.dedupeKey));
+  const inserted = written
+    .filter(doc => !before.has(doc.dedupeKey))
+    .map(doc => ({ ...doc, id: ids.get(doc.dedupeKey), createdAt: now }));
+  const updated = written
+    .filter(doc => before.has(doc.dedupeKey) && !sameFields(before.get(doc.dedupeKey), doc))
+    .map(doc => ({ before: before.get(doc.dedupeKey), after: { ...before.get(doc.dedupeKey), ...doc, updatedAt: now } }));
+
+  return {
+    inserted: insertedCount,
+    updated: result.modifiedCount,
+    unchanged: written.length - insertedCount - result.modifiedCount,
+    duplicates: docs.length - unique.length,
+    failed: failed.size,
+    errors: [...failed.entries()].slice(0, MAX_REPORTED_UPSERT_ERRORS).map(([key, error]) => ({ dedupeKey: key, error })),
+    changes: { inserted, updated },
+    exact: insertedCount === inserted.length && result.modifiedCount === updated.length
+  };
+}
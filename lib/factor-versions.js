@@ -0,0 +1,175 @@
+import { EMISSION_FACTORS, calculateEmissions } from './emission-factors.js';
+
+// Dated versions of the emission factor table.
+//
+// Each version holds a complete factor table and applies to records dated on
+// or after its effectiveFrom, until the next version starts. The built-in
+// EMISSION_FACTORS table is stored as the 'default' version effective from the
+// beginning of time, so existing records keep their factors until a newer
+// version is added and a recalculation job restates them.
+
+export const FACTOR_VERSIONS_COLLECTION = 'emission_factor_versions';
+export const DEFAULT_FACTOR_VERSION = 'default';
+
+// Other server instances may add versions; re-read them at most this often
+const VERSIONS_TTL_MS = 60 * 1000;
+
+const state = globalThis.__carbonFactorVersions || (globalThis.__carbonFactorVersions = {
+  versions: null,
+  loadedAt: 0,
+  pending: null
+});
+
+const DATE_PATTERN = /^\d{4}-\d{2}-\d{2}$/;
+
+async function readVersions(db) {
+  const collection = db.collection(FACTOR_VERSIONS_COLLECTION);
+  await collection.updateOne(
+    { version: DEFAULT_FACTOR_VERSION },
+    {
+      $setOnInsert: {
+        version: DEFAULT_FACTOR_VERSION,
+        effectiveFrom: '0000-01-01',
+        factors: EMISSION_FACTORS,
+        createdAt: new Date().toISOString()
+      }
+    },
+    { upsert: true }
+  );
+  return collection
+    .find({}, { projection: { _id: 0 } })
+    .sort({ effectiveFrom: 1 })
+    .toArray();
+}
+
+// All versions sorted by effectiveFrom, cached per process
+export async function loadFactorVersions(db) {
+  if (state.versions && Date.now() - state.loadedAt < VERSIONS_TTL_MS) {
+    return state.versions;
+  }
+  if (!state.pending) {
+    state.pending = readVersions(db)
+      .then(versions => {
+        Object.assign(state, { versions, loadedAt: Date.now() });
+        return versions;
+      })
+      .finally(() => {
+        state.pending = null;
+      });
+  }
+  return state.pending;
+}
+
+export function invalidateFactorVersions() {
+  state.versions = null;
+}
+
+// The version in effect on `date` (YYYY-MM-DD); versions must be sorted
+export function versionForDate(versions, date) {
+  let current = versions[0];
+  for (const version of versions) {
+    if (version.effectiveFrom > date) break;
+    current = version;
+  }
+  return current;
+}
+
+// calculateEmissions with the factors in effect on the record's date
+export function calculateForDate(versions, { category, subcategory, value, date }) {
+  const version = versionForDate(versions, date || '');
+  return {
+    ...calculateEmissions(category, subcategory, value, version.factors),
+    version: version.version
+  };
+}
+
+// Math.round(x * 100) / 100 as an aggregation expression, so values computed
+// by the server are identical to what calculateEmissions() stores on insert
+export function round2(expression) {
+  return { $divide: [{ $floor: { $add: [{ $multiply: [expression, 100] }, 0.5] } }, 100] };
+}
+
+// calculateForDate as an aggregation expression over a document's own
+// category, subcategory and date: evaluates to { factor, unit, version }.
+// Unknown pairs get factor 0 under the version in effect, as in
+// calculateEmissions().
+export function factorExpression(versions) {
+  const branches = [];
+  const versionBranches = [];
+  versions.forEach((version, index) => {
+    const next = versions[index + 1];
+    const inRange = next
+      ? { $and: [{ $gte: ['$date', version.effectiveFrom] }, { $lt: ['$date', next.effectiveFrom] }] }
+      : { $gte: ['$date', version.effectiveFrom] };
+    versionBranches.push({ case: inRange, then: { $literal: version.version } });
+    for (const [category, subcategories] of Object.entries(version.factors)) {
+      for (const [subcategory, entry] of Object.entries(subcategories)) {
+        branches.push({
+          case: { $and: [{ $eq: ['$category', category] }, { $eq: ['$subcategory', subcategory] }, inRange] },
+          then: { factor: entry.factor || 0, unit: { $literal: entry.unit || '' }, version: { $literal: version.version } }
+        });
+      }
+    }
+  });
+  return {
+    $switch: {
+      branches,
+      default: {
+        factor: 0,
+        unit: '',
+        version: { $switch: { branches: versionBranches, default: { $literal: versions[0].version } } }
+      }
+    }
+  };
+}
+
+// Validate a POST /api/emission-factors/versions body. `factors` may list only
+// the entries that change; they are merged over the version it supersedes.
+export function validateFactorVersion(body, versions) {
+  const { version, effectiveFrom, factors } = body || {};
+  if (!version || typeof version !== 'string') return 'version is required';
+  if (versions.some(v => v.version === version)) return `Version "${version}" already exists`;
+  if (!DATE_PATTERN.test(effectiveFrom || '')) return 'effectiveFrom must be a YYYY-MM-DD date';
+  if (versions.some(v => v.effectiveFrom === effectiveFrom)) {
+    return `A version already takes effect on ${effectiveFrom}`;
+  }
+  if (!factors || typeof factors !== 'object') return 'factors is required';
+
+  for (const [category, subcategories] of Object.entries(factors)) {
+    if (!subcategories || typeof subcategories !== 'object') {
+      return `factors.${category} must map subcategories to factors`;
+    }
+    for (const [subcategory, entry] of Object.entries(subcategories)) {
+      if (!Number.isFinite(entry?.factor) || entry.factor < 0) {
+        return `factors.${category}.${subcategory}.factor must be a non-negative number`;
+      }
+    }
+  }
+  return null;
+}
+
+export async function createFactorVersion(db, { version, effectiveFrom, factors, source }) {
+  const versions = await loadFactorVersions(db);
+  const base = versionForDate(versions, effectiveFrom).factors;
+
+  const merged = {};
+  for (const category of new Set([...Object.keys(base), ...Object.keys(factors)])) {
+    merged[category] = { ...base[category] };
+    for (const [subcategory, entry] of Object.entries(factors[category] || {})) {
+      merged[category][subcategory] = { ...base[category]?.[subcategory], ...entry };
+    }
+  }
+
+  const doc = {
+    version,
+    effectiveFrom,
+    factors: merged,
+    source: source || '',
+    createdAt: new Date().toISOString()
+  };
+  await db.collection(FACTOR_VERSIONS_COLLECTION).insertOne(doc);
+  invalidateFactorVersions();
+
+  const { _id, ...created } = doc;
+  return created;
+}
@@ -0,0 +1,132 @@
+// Index definitions for every collection the API queries.
+//
+// Each emissions index matches a query shape in app/api/[[...path]]/route.js:
+// the equality filters (department, category) come first, then the string
+// date range, then id so keyset pages sort on (date, id) without a SORT stage.
+
+import { TIMESERIES_COLLECTION, TIMESERIES_OPTIONS, storageMode } from './emission-store.js';
+
+export const INDEX_SPECS = {
+  emissions: [
+    { key: { id: 1 }, name: 'id_unique', unique: true },
+    { key: { date: -1, id: -1 }, name: 'date_id' },
+    { key: { department: 1, date: -1, id: -1 }, name: 'department_date_id' },
+    { key: { category: 1, date: -1, id: -1 }, name: 'category_date_id' },
+    { key: { department: 1, category: 1, date: -1, id: -1 }, name: 'department_category_date_id' },
+    // Only records written by bulk upserts carry a dedupeKey
+    { key: { dedupeKey: 1 }, name: 'dedupe_key_unique', unique: true, sparse: true }
+  ],
+  emission_rollups: [
+    { key: { month: 1, department: 1, category: 1, subcategory: 1 }, name: 'rollup_key_unique', unique: true },
+    { key: { department: 1, month: 1 }, name: 'department_month' }
+  ],
+  departments: [
+    { key: { id: 1 }, name: 'id_unique', unique: true }
+  ],
+  emission_factor_versions: [
+    { key: { version: 1 }, name: 'version_unique', unique: true },
+    { key: { effectiveFrom: 1 }, name: 'effective_from_unique', unique: true }
+  ],
+  emission_samples: [
+    { key: { month: 1, department: 1, category: 1 }, name: 'stratum_unique', unique: true }
+  ],
+  emission_changes: [
+    { key: { seq: 1 }, name: 'seq_unique', unique: true },
+    { key: { at: 1 }, name: 'at' }
+  ],
+  recalculation_jobs: [
+    { key: { id: 1 }, name: 'id_unique', unique: true },
+    { key: { createdAt: -1 }, name: 'created_at' }
+  ]
+};
+
+// The time-series layout (lib/emission-store.js) of the emissions indexes.
+// Time-series collections cannot enforce uniqueness, so id and dedupeKey are
+// plain lookups there and the write paths pre-read instead.
+export const TIMESERIES_INDEX_SPECS = {
+  [TIMESERIES_COLLECTION]: [
+    { key: { id: 1 }, name: 'id' },
+    { key: { ts: -1, id: -1 }, name: 'ts_id' },
+    { key: { 'meta.department': 1, ts: -1, id: -1 }, name: 'department_ts_id' },
+    { key: { 'meta.category': 1, ts: -1, id: -1 }, name: 'category_ts_id' },
+    { key: { dedupeKey: 1 }, name: 'dedupe_key' }
+  ]
+};
+
+// Options for collections that must be created explicitly before indexing
+const COLLECTION_OPTIONS = {
+  [TIMESERIES_COLLECTION]: TIMESERIES_OPTIONS
+};
+
+// Specs for the configured storage mode. The plain emissions collection keeps
+// its indexes in both modes, since it is the migration source.
+export function indexSpecs(mode = storageMode()) {
+  return mode === 'timeseries' ? { ...INDEX_SPECS, ...TIMESERIES_INDEX_SPECS } : INDEX_SPECS;
+}
+
+function sameKey(a, b) {
+  return JSON.stringify(Object.entries(a)) === JSON.stringify(Object.entries(b));
+}
+
+// Compare the indexes that exist with indexSpecs(). An index is mismatched when
+// one with the same name exists but its key order, uniqueness or sparseness
+// differs.
+export async function verifyIndexes(db, mode = storageMode()) {
+  const missing = [];
+  const mismatched = [];
+
+  for (const [collection, specs] of Object.entries(indexSpecs(mode))) {
+    let existing = [];
+    try {
+      existing = await db.collection(collection).listIndexes().toArray();
+    } catch (error) {
+      // NamespaceNotFound: the collection has not been created yet
+      if (error.code !== 26) throw error;
+    }
+    const byName = new Map(existing.map(index => [index.name, index]));
+
+    for (const spec of specs) {
+      const index = byName.get(spec.name);
+      if (!index) {
+        missing.push({ collection, name: spec.name });
+      } else if (!sameKey(index.key, spec.key) || Boolean(index.unique) !== Boolean(spec.unique)
+        || Boolean(index.sparse) !== Boolean(spec.sparse)) {
+        mismatched.push({ collection, name: spec.name, expected: spec.key, actual: index.key });
+      }
+    }
+  }
+
+  return { ok: missing.length === 0 && mismatched.length === 0, missing, mismatched };
+}
+
+// Create a collection that needs options (a time-series collection cannot be
+// converted after the fact) unless it already exists
+export async function ensureCollection(db, name) {
+  const options = COLLECTION_OPTIONS[name];
+  if (!options) return;
+  const [existing] = await db.listCollections({ name }, { nameOnly: true }).toArray();
+  if (existing) return;
+  try {
+    await db.createCollection(name, options);
+  } catch (error) {
+    // NamespaceExists: created concurrently
+    if (error.code !== 48) throw error;
+  }
+}
+
+// Create any missing indexes, then verify. createIndexes is a no-op for
+// indexes that already exist with the same definition.
+export async function ensureIndexes(db, mode = storageMode()) {
+  for (const [collection, specs] of Object.entries(indexSpecs(mode))) {
+    await ensureCollection(db, collection);
+    await db.collection(collection).createIndexes(
+      specs.map(({ key, name, unique, sparse }) => ({
+        key,
+        name,
+        ...(unique ? { unique } : {}),
+        ...(sparse ? { sparse } : {})
+      }))
+    );
+  }
+  return verifyIndexes(db, mode);
+}
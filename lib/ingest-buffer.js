@@ -0,0 +1,154 @@
+// Group commit for single-record emission writes.
+//
+// With INGEST_BUFFER=on, POST /api/emissions hands its record to the
+// process's IngestBuffer instead of writing it alone. Records queue until
+// INGEST_MAX_BATCH are waiting or the oldest has waited INGEST_MAX_DELAY_MS,
+// then go to MongoDB as one insertMany and one derived-data update. Each
+// caller's promise settles only when its batch is written with the durable
+// write concern (w: majority, j: true unless INGEST_WRITE_CONCERN says
+// otherwise), so a 201 still means the record is committed.
+//
+// One batch is in flight at a time. Records arriving meanwhile form the next
+// batch, which is written as soon as the current one finishes, so batches grow
+// with the arrival rate instead of the round trips. When INGEST_MAX_PENDING
+// records are queued, add() throws IngestBufferFullError and the route
+// answers 503 with a Retry-After estimated from recent batch times.
+//
+// The buffer lives on globalThis so every route bundle shares one queue.
+
+const state = globalThis.__carbonIngestBuffer || (globalThis.__carbonIngestBuffer = { buffer: null });
+
+const DEFAULT_MAX_BATCH = 500;
+const DEFAULT_MAX_DELAY_MS = 5;
+const DEFAULT_MAX_PENDING = 10000;
+// Weight of the newest batch in the moving average of write times
+const FLUSH_TIME_WEIGHT = 0.2;
+
+export function ingestBufferEnabled() {
+  return ['on', 'true', '1'].includes((process.env.INGEST_BUFFER || '').toLowerCase());
+}
+
+export function ingestOptions() {
+  return {
+    maxBatch: parseInt(process.env.INGEST_MAX_BATCH || String(DEFAULT_MAX_BATCH)),
+    maxDelayMs: parseInt(process.env.INGEST_MAX_DELAY_MS || String(DEFAULT_MAX_DELAY_MS)),
+    maxPending: parseInt(process.env.INGEST_MAX_PENDING || String(DEFAULT_MAX_PENDING))
+  };
+}
+
+// The write concern of buffered inserts; numeric values are node counts
+export function ingestWriteConcern() {
+  const w = process.env.INGEST_WRITE_CONCERN || 'majority';
+  return { w: /^\d+$/.test(w) ? parseInt(w) : w, j: true };
+}
+
+export class IngestBufferFullError extends Error {
+  constructor(retryAfterSeconds) {
+    super('Ingest buffer is full; retry later');
+    this.retryAfterSeconds = retryAfterSeconds;
+  }
+}
+
+export class IngestBuffer {
+  // `write(docs)` stores one batch and resolves to a Map of failed index ->
+  // message; it rejects when the whole batch failed
+  constructor(write, { maxBatch = DEFAULT_MAX_BATCH, maxDelayMs = DEFAULT_MAX_DELAY_MS, maxPending = DEFAULT_MAX_PENDING } = {}) {
+    this.write = write;
+    this.maxBatch = maxBatch;
+    this.maxDelayMs = maxDelayMs;
+    this.maxPending = maxPending;
+    this.queue = []; // { doc, resolve, reject }
+    this.timer = null;
+    this.inFlight = null;
+    this.counters = { batches: 0, records: 0, failed: 0, rejected: 0, flushMs: 0 };
+  }
+
+  // Queue a record; resolves with it once its batch is durable
+  add(doc) {
+    if (this.queue.length >= this.maxPending) {
+      this.counters.rejected += 1;
+      throw new IngestBufferFullError(this.retryAfterSeconds());
+    }
+    return new Promise((resolve, reject) => {
+      this.queue.push({ doc, resolve, reject });
+      if (this.queue.length >= this.maxBatch) {
+        this.flush();
+      } else if (!this.timer) {
+        this.timer = setTimeout(() => this.flush(), this.maxDelayMs);
+      }
+    });
+  }
+
+  flush() {
+    clearTimeout(this.timer);
+    this.timer = null;
+    // A busy buffer flushes again when the batch in flight finishes
+    if (this.inFlight || this.queue.length === 0) return;
+
+    const entries = this.queue.splice(0, this.maxBatch);
+    this.inFlight = this.commit(entries).finally(() => {
+      this.inFlight = null;
+      if (this.queue.length > 0) this.flush();
+    });
+  }
+
+  async commit(entries) {
+    const startedAt = performance.now();
+    let failures;
+    try {
+      failures = await this.write(entries.map(entry => entry.doc));
+    } catch (error) {
+      this.counters.failed += entries.length;
+      entries.forEach(entry => entry.reject(error));
+      return;
+    } finally {
+      const elapsed = performance.now() - startedAt;
+      const { flushMs } = this.counters;
+      this.counters.flushMs = flushMs === 0 ? elapsed : flushMs + FLUSH_TIME_WEIGHT * (elapsed - flushMs);
+      this.counters.batches += 1;
+    }
+
+    entries.forEach((entry, index) => {
+      if (failures?.has(index)) {
+        this.counters.failed += 1;
+        entry.reject(new Error(failures.get(index)));
+      } else {
+        this.counters.records += 1;
+        entry.resolve(entry.doc);
+      }
+    });
+  }
+
+  // Time to write out the current queue at the recent batch rate
+  retryAfterSeconds() {
+    const batches = Math.ceil(this.queue.length / this.maxBatch);
+    return Math.max(1, Math.ceil((batches * (this.counters.flushMs || this.maxDelayMs)) / 1000));
+  }
+
+  stats() {
+    const { batches, records, failed, rejected, flushMs } = this.counters;
+    return {
+      pending: this.queue.length,
+      inFlight: this.inFlight !== null,
+      batches,
+      records,
+      failed,
+      rejected,
+      meanBatchSize: batches > 0 ? Math.round(((records + failed) / batches) * 10) / 10 : 0,
+      flushMs: Math.round(flushMs * 10) / 10,
+      maxBatch: this.maxBatch,
+      maxDelayMs: this.maxDelayMs,
+      maxPending: this.maxPending
+    };
+  }
+}
+
+// The process's buffer, created with `write` on first use
+export function sharedIngestBuffer(write) {
+  if (!state.buffer) state.buffer = new IngestBuffer(write, ingestOptions());
+  return state.buffer;
+}
+
+export function ingestStats() {
+  return state.buffer ? state.buffer.stats() : null;
+}
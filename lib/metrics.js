@@ -0,0 +1,230 @@
+import { AsyncLocalStorage } from 'async_hooks';
+
+// Request timings and Prometheus-style metrics for the API routes.
+//
+// withMetrics() runs a route handler inside an AsyncLocalStorage context. The
+// MongoDB command listeners attached by instrumentMongoClient() add their time
+// and document counts to whichever request issued the command, and handlers
+// mark serialization with measureSync('serialize', ...). Each response then
+// carries a Server-Timing header:
+//
+//   db         wall-clock time with at least one MongoDB command in flight
+//   serialize  JSON encoding of the response body
+//   compute    everything else in the handler (JS aggregation, validation)
+//
+// Registries live on globalThis so every route bundle reports into one set.
+
+const LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10];
+
+const storage = globalThis.__carbonMetricsStorage || (globalThis.__carbonMetricsStorage = new AsyncLocalStorage());
+
+const registry = globalThis.__carbonMetrics || (globalThis.__carbonMetrics = {
+  counters: new Map(),
+  histograms: new Map(),
+  pool: { open: 0, inUse: 0, pending: 0 }
+});
+
+function labelKey(name, labels) {
+  return JSON.stringify([name, Object.entries(labels).sort(([a], [b]) => a.localeCompare(b))]);
+}
+
+function inc(name, labels, amount = 1) {
+  const key = labelKey(name, labels);
+  const counter = registry.counters.get(key) || { name, labels, value: 0 };
+  counter.value += amount;
+  registry.counters.set(key, counter);
+}
+
+function observe(name, labels, value) {
+  const key = labelKey(name, labels);
+  let histogram = registry.histograms.get(key);
+  if (!histogram) {
+    histogram = { name, labels, buckets: LATENCY_BUCKETS.map(() => 0), sum: 0, count: 0 };
+    registry.histograms.set(key, histogram);
+  }
+  LATENCY_BUCKETS.forEach((bound, index) => {
+    if (value <= bound) histogram.buckets[index] += 1;
+  });
+  histogram.sum += value;
+  histogram.count += 1;
+}
+
+// Collapse ids so every record shares one label, e.g. emissions/:id
+export function routeLabel(path) {
+  return path
+    .replace(/\/$/, '')
+    .split('/')
+    .map(segment => (/^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$/i.test(segment) ? ':id' : segment))
+    .join('/');
+}
+
+export function measureSync(phase, fn) {
+  const store = storage.getStore();
+  const startedAt = performance.now();
+  try {
+    return fn();
+  } finally {
+    if (store) store.phases[phase] = (store.phases[phase] || 0) + performance.now() - startedAt;
+  }
+}
+
+function serverTiming(store, totalMs) {
+  const db = store.phases.db || 0;
+  const serialize = store.phases.serialize || 0;
+  const compute = Math.max(0, totalMs - db - serialize);
+  return [
+    `db;desc="MongoDB: ${store.commands} commands / ${store.documents} docs";dur=${db.toFixed(1)}`,
+    `compute;dur=${compute.toFixed(1)}`,
+    `serialize;dur=${serialize.toFixed(1)}`,
+    `total;dur=${totalMs.toFixed(1)}`
+  ].join(', ');
+}
+
+// Wrap a route handler: time it, add Server-Timing and record per-route metrics
+export function withMetrics(method, handler) {
+  return async function instrumented(request, context) {
+    const store = { phases: {}, commands: 0, documents: 0, inFlight: 0, dbSince: 0 };
+    const startedAt = performance.now();
+    let status = 500;
+    let response;
+    try {
+      response = await storage.run(store, () => handler(request, context));
+      status = response.status;
+      return response;
+    } finally {
+      const totalMs = performance.now() - startedAt;
+      const route = routeLabel(new URL(request.url).pathname.replace('/api/', ''));
+      // A 404 is a missing record only on :id routes; any other unknown path
+      // shares one label so probes cannot create a series each
+      const label = status === 404 && !route.includes(':id') ? 'unmatched' : route;
+
+      inc('carbon_http_requests_total', { route: label, method, status: String(status) });
+      observe('carbon_http_request_duration_seconds', { route: label, method }, totalMs / 1000);
+      inc('carbon_db_documents_returned_total', { route: label, method }, store.documents);
+      inc('carbon_db_commands_total', { route: label, method }, store.commands);
+      for (const phase of ['db', 'serialize']) {
+        inc('carbon_http_phase_seconds_total', { route: label, method, phase }, (store.phases[phase] || 0) / 1000);
+      }
+
+      if (response) {
+        try {
+          response.headers.set('Server-Timing', serverTiming(store, totalMs));
+        } catch {
+          // Immutable headers (e.g. a redirect); the metrics are still recorded
+        }
+      }
+    }
+  };
+}
+
+// Documents a command returned (reads) or affected (writes)
+function documentCount(reply) {
+  if (!reply) return 0;
+  if (reply.cursor) return (reply.cursor.firstBatch || reply.cursor.nextBatch || []).length;
+  return typeof reply.n === 'number' ? reply.n : 0;
+}
+
+// Attach pool and command listeners; the client must be created with
+// monitorCommands: true for the command events to fire.
+export function instrumentMongoClient(client) {
+  const pool = registry.pool;
+
+  client.on('connectionCreated', () => {
+    pool.open += 1;
+    inc('carbon_mongodb_connections_created_total', {});
+  });
+  client.on('connectionClosed', () => {
+    pool.open = Math.max(0, pool.open - 1);
+  });
+  client.on('connectionCheckOutStarted', () => {
+    pool.pending += 1;
+  });
+  client.on('connectionCheckedOut', () => {
+    pool.pending = Math.max(0, pool.pending - 1);
+    pool.inUse += 1;
+    inc('carbon_mongodb_pool_checkouts_total', {});
+  });
+  client.on('connectionCheckOutFailed', event => {
+    pool.pending = Math.max(0, pool.pending - 1);
+    inc('carbon_mongodb_pool_checkout_failures_total', { reason: String(event.reason) });
+  });
+  client.on('connectionCheckedIn', () => {
+    pool.inUse = Math.max(0, pool.inUse - 1);
+  });
+  client.on('connectionPoolCleared', () => {
+    inc('carbon_mongodb_pool_cleared_total', {});
+  });
+
+  client.on('commandStarted', () => {
+    const store = storage.getStore();
+    if (store && store.inFlight++ === 0) store.dbSince = performance.now();
+  });
+  const finished = (event, reply) => {
+    observe('carbon_mongodb_command_duration_seconds', { command: event.commandName }, event.duration / 1000);
+    const store = storage.getStore();
+    if (!store || store.inFlight === 0) return;
+    store.commands += 1;
+    store.documents += documentCount(reply);
+    if (--store.inFlight === 0) {
+      store.phases.db = (store.phases.db || 0) + performance.now() - store.dbSince;
+    }
+  };
+  client.on('commandSucceeded', event => finished(event, event.reply));
+  client.on('commandFailed', event => finished(event, null));
+}
+
+function formatLabels(labels) {
+  const entries = Object.entries(labels);
+  if (entries.length === 0) return '';
+  const escape = value => String(value).replace(/\\/g, '\\\\').replace(/"/g, '\\"').replace(/\n/g, '\\n');
+  return `{${entries.map(([k, v]) => `${k}="${escape(v)}"`).join(',')}}`;
+}
+
+// Prometheus text exposition format (version 0.0.4). `extra` adds gauges as
+// [name, help, value] triples.
+export function renderMetrics(extra = []) {
+  const lines = [];
+  const typed = new Set();
+  const header = (name, type, help) => {
+    if (typed.has(name)) return;
+    typed.add(name);
+    if (help) lines.push(`# HELP ${name} ${help}`);
+    lines.push(`# TYPE ${name} ${type}`);
+  };
+
+  const counters = [...registry.counters.values()].sort((a, b) => a.name.localeCompare(b.name));
+  for (const { name, labels, value } of counters) {
+    header(name, 'counter');
+    lines.push(`${name}${formatLabels(labels)} ${value}`);
+  }
+
+  const histograms = [...registry.histograms.values()].sort((a, b) => a.name.localeCompare(b.name));
+  for (const { name, labels, buckets, sum, count } of histograms) {
+    header(name, 'histogram');
+    LATENCY_BUCKETS.forEach((bound, index) => {
+      lines.push(`${name}_bucket${formatLabels({ ...labels, le: String(bound) })} ${buckets[index]}`);
+    });
+    lines.push(`${name}_bucket${formatLabels({ ...labels, le: '+Inf' })} ${count}`);
+    lines.push(`${name}_sum${formatLabels(labels)} ${sum}`);
+    lines.push(`${name}_count${formatLabels(labels)} ${count}`);
+  }
+
+  const { open, inUse, pending } = registry.pool;
+  header('carbon_mongodb_pool_connections', 'gauge', 'Connections in the MongoDB pool by state');
+  lines.push(`carbon_mongodb_pool_connections{state="open"} ${open}`);
+  lines.push(`carbon_mongodb_pool_connections{state="in_use"} ${inUse}`);
+  lines.push(`carbon_mongodb_pool_connections{state="pending"} ${pending}`);
+
+  const memory = process.memoryUsage();
+  const gauges = [
+    ['process_resident_memory_bytes', 'Resident memory size in bytes', memory.rss],
+    ['nodejs_heap_used_bytes', 'V8 heap in use in bytes', memory.heapUsed],
+    ...extra
+  ];
+  for (const [name, help, value] of gauges) {
+    header(name, 'gauge', help);
+    lines.push(`${name} ${value}`);
+  }
+
+  return `${lines.join('\n')}\n`;
+}
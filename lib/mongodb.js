@@ -0,0 +1,72 @@
+import { MongoClient } from 'mongodb';
+import { recordReset } from './change-feed.js';
+import { SAMPLES_COLLECTION, rebuildSamples } from './emission-samples.js';
+import { TIMESERIES_COLLECTION, emissionStore, storageMode } from './emission-store.js';
+import { ensureCollection, ensureIndexes } from './indexes.js';
+import { instrumentMongoClient } from './metrics.js';
+import { ROLLUP_COLLECTION, rebuildRollups } from './rollups.js';
+
+const MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
+const DB_NAME = process.env.DB_NAME || 'carbon_footprint_db';
+
+// One client (and so one connection pool) per server process, shared by every
+// route. Kept on globalThis so separate route bundles and dev hot reloads reuse
+// it instead of opening new pools.
+const state = globalThis.__carbonMongo || (globalThis.__carbonMongo = { promise: null });
+
+async function isEmpty(cursor) {
+  return (await cursor.toArray()).length === 0;
+}
+
+// A database upgraded from a version without rollups or samples has emissions
+// but neither collection, and the analytics routes would report zeros until
+// a rebuild. Build whichever is missing from the stored emissions.
+async function rebuildMissingDerivedData(db) {
+  if (await isEmpty(emissionStore(db).find({}, { projection: { _id: 1 }, limit: 1 }))) return;
+  const [noRollups, noSamples] = await Promise.all([
+    isEmpty(db.collection(ROLLUP_COLLECTION).find({}, { projection: { _id: 1 } }).limit(1)),
+    isEmpty(db.collection(SAMPLES_COLLECTION).find({}, { projection: { _id: 1 } }).limit(1))
+  ]);
+  if (!noRollups && !noSamples) return;
+
+  const startedAt = Date.now();
+  await Promise.all([noRollups && rebuildRollups(db), noSamples && rebuildSamples(db)]);
+  // Anything cached or loaded from the empty collections is stale now
+  await recordReset(db, 'rollups');
+  console.log(`Rebuilt missing ${[noRollups && 'rollups', noSamples && 'samples'].filter(Boolean).join(' and ')} in ${Date.now() - startedAt}ms`);
+}
+
+export async function connectToDatabase() {
+  if (!state.promise) {
+    // Command monitoring feeds the per-request db timings and /api/metrics
+    const client = new MongoClient(MONGO_URL, { monitorCommands: true });
+    instrumentMongoClient(client);
+
+    state.promise = client.connect()
+      .then(async () => {
+        const db = client.db(DB_NAME);
+
+        // An insert into a missing collection would create a plain one, so the
+        // time-series collection must exist before the first request writes
+        if (storageMode() === 'timeseries') await ensureCollection(db, TIMESERIES_COLLECTION);
+
+        // Build missing indexes in the background; requests keep working (as
+        // collection scans) until they are ready.
+        ensureIndexes(db)
+          .then(({ ok, missing, mismatched }) => {
+            if (!ok) console.error('Index verification failed:', { missing, mismatched });
+          })
+          .catch(error => console.error('Index creation failed:', error));
+        rebuildMissingDerivedData(db)
+          .catch(error => console.error('Rebuilding rollups and samples failed:', error));
+
+        return { client, db };
+      })
+      .catch(error => {
+        // Let the next request retry instead of caching the failure
+        state.promise = null;
+        throw error;
+      });
+  }
+  return state.promise;
+}
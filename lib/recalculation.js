@@ -0,0 +1,258 @@
+import { v4 as uuidv4 } from 'uuid';
+import { LBS_TO_KG, calculateEmissions } from './emission-factors.js';
+import { rebuildSamples } from './emission-samples.js';
+import { emissionStore } from './emission-store.js';
+import { invalidateFactorVersions, loadFactorVersions, round2 } from './factor-versions.js';
+import { rebuildRollups } from './rollups.js';
+
+// Restate stored co2Lbs / co2Kg / emissionFactor after factor versions change.
+//
+// A job covers a date range and optionally a list of categories. It is planned
+// up front as chunks of one (category, subcategory, month) under a single
+// factor version, and every chunk is one server-side pipeline updateMany, so
+// no emission document travels to the application (time-series storage reads
+// the chunk and writes it back in one bulkWrite instead). Progress is checkpointed
+// after each wave of chunks; chunks are idempotent, so an interrupted job
+// resumes from its checkpoint and at worst repeats the last wave.
+
+export const RECALCULATION_JOBS_COLLECTION = 'recalculation_jobs';
+
+const DEFAULT_CONCURRENCY = 4;
+// A running job whose heartbeat is older than this is treated as abandoned
+const STALE_AFTER_MS = 60 * 1000;
+const DATE_PATTERN = /^\d{4}-\d{2}-\d{2}$/;
+
+function shiftDate(date, { days = 0, months = 0 }) {
+  const d = new Date(`${date}T00:00:00Z`);
+  if (months) d.setUTCDate(1);
+  d.setUTCMonth(d.getUTCMonth() + months);
+  d.setUTCDate(d.getUTCDate() + days);
+  return d.toISOString().substring(0, 10);
+}
+
+const minDate = (a, b) => (a < b ? a : b);
+const maxDate = (a, b) => (a > b ? a : b);
+
+// 'electricity' selects every subcategory, 'electricity/grid' just one
+function selectedPairs(factors, categories) {
+  const pairs = [];
+  for (const [category, subcategories] of Object.entries(factors)) {
+    for (const [subcategory, entry] of Object.entries(subcategories)) {
+      if (!categories || categories.includes(category) || categories.includes(`${category}/${subcategory}`)) {
+        pairs.push({ category, subcategory, factor: entry.factor || 0 });
+      }
+    }
+  }
+  return pairs;
+}
+
+// Split [startDate, endDate] (inclusive) into chunks that each fall under one
+// factor version and one calendar month
+export function planChunks(versions, { startDate, endDate, categories }) {
+  const endExclusive = shiftDate(endDate, { days: 1 });
+  const chunks = [];
+
+  versions.forEach((version, index) => {
+    const from = maxDate(startDate, version.effectiveFrom);
+    const to = minDate(endExclusive, versions[index + 1]?.effectiveFrom || '9999-12-31');
+    if (from >= to) return;
+
+    const pairs = selectedPairs(version.factors, categories);
+    for (let monthFrom = from; monthFrom < to; monthFrom = shiftDate(monthFrom, { months: 1 })) {
+      const monthTo = minDate(shiftDate(monthFrom, { months: 1 }), to);
+      pairs.forEach(pair => chunks.push({ ...pair, from: monthFrom, to: monthTo, version: version.version }));
+    }
+  });
+
+  return chunks;
+}
+
+// Date range a version applies to, for restating just that version
+export function versionScope(versions, name) {
+  const index = versions.findIndex(v => v.version === name);
+  if (index < 0) return null;
+  const next = versions[index + 1];
+  return {
+    startDate: versions[index].effectiveFrom,
+    endDate: next ? shiftDate(next.effectiveFrom, { days: -1 }) : undefined
+  };
+}
+
+// Time-series collections take no pipeline updates: read the chunk's values
+// and write the restated fields back by _id in one bulkWrite
+async function restateTimeseriesChunk(store, filter, chunk) {
+  const docs = await store.find(filter, { projection: { _id: 1, value: 1 } }).toArray();
+  if (docs.length === 0) return { matched: 0, modified: 0 };
+  const factors = { [chunk.category]: { [chunk.subcategory]: { factor: chunk.factor } } };
+  const result = await store.bulkWrite(docs.map(doc => {
+    const { co2Lbs, co2Kg } = calculateEmissions(chunk.category, chunk.subcategory, doc.value || 0, factors);
+    return {
+      updateOne: {
+        filter: { _id: doc._id },
+        update: { $set: { co2Lbs, co2Kg, emissionFactor: chunk.factor, factorVersion: chunk.version } }
+      }
+    };
+  }), { ordered: false });
+  return { matched: result.matchedCount, modified: result.modifiedCount };
+}
+
+async function restateChunk(db, chunk) {
+  const store = emissionStore(db);
+  const filter = {
+    category: chunk.category,
+    date: { $gte: chunk.from, $lt: chunk.to },
+    subcategory: chunk.subcategory,
+    // Skip documents that are already restated (e.g. when resuming)
+    $or: [{ emissionFactor: { $ne: chunk.factor } }, { factorVersion: { $ne: chunk.version } }]
+  };
+  if (store.timeseries) return restateTimeseriesChunk(store, filter, chunk);
+
+  const co2Lbs = { $multiply: [{ $ifNull: ['$value', 0] }, chunk.factor] };
+  const result = await store.collection.updateMany(
+    filter,
+    [
+      {
+        $set: {
+          co2Lbs: round2(co2Lbs),
+          co2Kg: round2({ $multiply: [co2Lbs, LBS_TO_KG] }),
+          emissionFactor: chunk.factor,
+          factorVersion: chunk.version
+        }
+      }
+    ]
+  );
+  return { matched: result.matchedCount, modified: result.modifiedCount };
+}
+
+// The job document without its chunk plan
+function jobSummary(job) {
+  if (!job) return null;
+  const { _id, chunks, ...summary } = job;
+  return {
+    ...summary,
+    progress: summary.totalChunks > 0 ? Math.round((summary.nextChunk / summary.totalChunks) * 1000) / 1000 : 1
+  };
+}
+
+export function validateRecalculationScope({ startDate, endDate, categories } = {}) {
+  if (startDate && !DATE_PATTERN.test(startDate)) return 'startDate must be a YYYY-MM-DD date';
+  if (endDate && !DATE_PATTERN.test(endDate)) return 'endDate must be a YYYY-MM-DD date';
+  if (startDate && endDate && startDate > endDate) return 'startDate must not be after endDate';
+  if (categories !== undefined && categories !== null
+    && (!Array.isArray(categories) || categories.some(c => typeof c !== 'string'))) {
+    return 'categories must be an array of "category" or "category/subcategory" strings';
+  }
+  return null;
+}
+
+export async function createRecalculationJob(db, { startDate, endDate, categories } = {}) {
+  // Plan against the versions as stored now, not a cached copy
+  invalidateFactorVersions();
+  const versions = await loadFactorVersions(db);
+
+  // Clip the range to the stored data so open-ended scopes plan no empty months
+  const emissions = emissionStore(db);
+  const [oldest, newest] = await Promise.all([
+    emissions.find({}, { projection: { date: 1 }, sort: { date: 1 }, limit: 1 }).next(),
+    emissions.find({}, { projection: { date: 1 }, sort: { date: -1 }, limit: 1 }).next()
+  ]);
+  const scope = {
+    startDate: oldest ? maxDate(startDate || oldest.date, oldest.date) : startDate,
+    endDate: newest ? minDate(endDate || newest.date, newest.date) : endDate,
+    categories: categories || null
+  };
+
+  const chunks = oldest && scope.startDate <= scope.endDate ? planChunks(versions, scope) : [];
+  const now = new Date().toISOString();
+  const job = {
+    id: uuidv4(),
+    status: 'pending',
+    scope,
+    chunks,
+    totalChunks: chunks.length,
+    nextChunk: 0,
+    matched: 0,
+    modified: 0,
+    affectedMonths: [],
+    error: null,
+    createdAt: now,
+    updatedAt: now,
+    heartbeatAt: null,
+    finishedAt: null
+  };
+  await db.collection(RECALCULATION_JOBS_COLLECTION).insertOne(job);
+  return jobSummary(job);
+}
+
+// Run (or resume) a job. Returns null when the job does not exist or another
+// runner holds it; otherwise the finished job summary.
+export async function runRecalculationJob(db, id, { concurrency = DEFAULT_CONCURRENCY, onProgress } = {}) {
+  const jobs = db.collection(RECALCULATION_JOBS_COLLECTION);
+  const now = new Date();
+  const job = await jobs.findOneAndUpdate(
+    {
+      id,
+      $or: [
+        { status: { $in: ['pending', 'failed'] } },
+        { status: 'running', heartbeatAt: { $lt: new Date(now - STALE_AFTER_MS).toISOString() } }
+      ]
+    },
+    { $set: { status: 'running', heartbeatAt: now.toISOString(), updatedAt: now.toISOString(), error: null } },
+    { returnDocument: 'after' }
+  );
+  if (!job) return null;
+
+  try {
+    for (let start = job.nextChunk; start < job.chunks.length; start += concurrency) {
+      const wave = job.chunks.slice(start, start + concurrency);
+      const results = await Promise.all(wave.map(chunk => restateChunk(db, chunk)));
+      const months = [...new Set(wave
+        .filter((_, index) => results[index].modified > 0)
+        .map(chunk => chunk.from.substring(0, 7)))];
+      const at = new Date().toISOString();
+
+      const progress = await jobs.findOneAndUpdate(
+        { id },
+        {
+          $set: { nextChunk: start + wave.length, heartbeatAt: at, updatedAt: at },
+          $inc: {
+            matched: results.reduce((sum, r) => sum + r.matched, 0),
+            modified: results.reduce((sum, r) => sum + r.modified, 0)
+          },
+          $addToSet: { affectedMonths: { $each: months } }
+        },
+        { returnDocument: 'after', projection: { chunks: 0 } }
+      );
+      onProgress?.(jobSummary(progress));
+    }
+
+    const { affectedMonths } = await jobs.findOne({ id }, { projection: { affectedMonths: 1 } });
+    affectedMonths.sort();
+    await Promise.all([rebuildRollups(db, { months: affectedMonths }), rebuildSamples(db, { months: affectedMonths })]);
+
+    const at = new Date().toISOString();
+    await jobs.updateOne({ id }, { $set: { status: 'completed', finishedAt: at, updatedAt: at } });
+  } catch (error) {
+    await jobs.updateOne(
+      { id },
+      { $set: { status: 'failed', error: error.message, updatedAt: new Date().toISOString() } }
+    );
+    throw error;
+  }
+
+  return getRecalculationJob(db, id);
+}
+
+export async function getRecalculationJob(db, id) {
+  const job = await db.collection(RECALCULATION_JOBS_COLLECTION).findOne({ id }, { projection: { chunks: 0 } });
+  return jobSummary(job);
+}
+
+export async function listRecalculationJobs(db, limit = 20) {
+  const jobs = await db.collection(RECALCULATION_JOBS_COLLECTION)
+    .find({}, { projection: { chunks: 0 } })
+    .sort({ createdAt: -1 })
+    .limit(limit)
+    .toArray();
+  return jobs.map(jobSummary);
+}
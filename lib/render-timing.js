@@ -0,0 +1,57 @@
+// Client render timings for the dashboard.
+//
+// recordRender() is the onRender callback of the <Profiler>s in app/page.js.
+// Each commit becomes a performance.measure entry ("render:<id>", visible in
+// the browser's performance panel) and a sample on
+// window.__carbonRenderTimings, whose summary() gives count, p50, p95 and max
+// milliseconds per profiler id:
+//
+//   window.__carbonRenderTimings.summary()
+//   // { dashboard: { count: 4, p50: 3.1, p95: 12.8, max: 12.8 }, ... }
+//
+// React only calls onRender in development and in profiling builds
+// (next build --profile).
+
+const MAX_SAMPLES = 500;
+
+function quantile(sorted, q) {
+  return sorted[Math.min(sorted.length - 1, Math.floor(q * sorted.length))];
+}
+
+function timings() {
+  if (!window.__carbonRenderTimings) {
+    const samples = {};
+    window.__carbonRenderTimings = {
+      samples,
+      summary() {
+        return Object.fromEntries(Object.entries(samples).map(([id, durations]) => {
+          const sorted = durations.map(d => d.duration).sort((a, b) => a - b);
+          const round = ms => Math.round(ms * 10) / 10;
+          return [id, {
+            count: sorted.length,
+            p50: round(quantile(sorted, 0.5)),
+            p95: round(quantile(sorted, 0.95)),
+            max: round(sorted[sorted.length - 1])
+          }];
+        }));
+      },
+      clear() {
+        Object.keys(samples).forEach(id => delete samples[id]);
+      }
+    };
+  }
+  return window.__carbonRenderTimings;
+}
+
+export function recordRender(id, phase, actualDuration, baseDuration, startTime) {
+  if (typeof window === 'undefined') return;
+  const { samples } = timings();
+  const durations = samples[id] || (samples[id] = []);
+  durations.push({ phase, duration: actualDuration, base: baseDuration });
+  if (durations.length > MAX_SAMPLES) durations.shift();
+  try {
+    performance.measure(`render:${id}`, { start: startTime, duration: actualDuration, detail: { phase } });
+  } catch {
+    // performance.measure without the options form (older browsers)
+  }
+}
@@ -0,0 +1,174 @@
+// Monthly rollups of the emissions collection.
+//
+// One document per (month, department, category, subcategory) holding the
+// summed co2Kg / co2Lbs / value and the record count. Write handlers keep it in
+// step with $inc deltas; rebuildRollups() recomputes it from raw emissions.
+
+import { emissionStore } from './emission-store.js';
+
+export const ROLLUP_COLLECTION = 'emission_rollups';
+
+export const ROLLUP_KEY_FIELDS = ['month', 'department', 'category', 'subcategory'];
+
+function rollupKey(emission) {
+  return {
+    month: emission.date.substring(0, 7), // YYYY-MM
+    department: emission.department,
+    category: emission.category,
+    subcategory: emission.subcategory
+  };
+}
+
+// Apply the effect of added and removed emission documents. An update is a
+// removal of the old document plus an addition of the new one; both land in a
+// single unordered bulkWrite and cancel out when the key did not change.
+export async function applyRollupDeltas(db, { added = [], removed = [] }) {
+  const deltas = new Map();
+
+  const accumulate = (emission, sign) => {
+    const key = rollupKey(emission);
+    const mapKey = JSON.stringify(key);
+    let delta = deltas.get(mapKey);
+    if (!delta) {
+      delta = { key, co2Kg: 0, co2Lbs: 0, value: 0, count: 0 };
+      deltas.set(mapKey, delta);
+    }
+    delta.co2Kg += sign * (emission.co2Kg || 0);
+    delta.co2Lbs += sign * (emission.co2Lbs || 0);
+    delta.value += sign * (emission.value || 0);
+    delta.count += sign;
+  };
+
+  added.forEach(e => accumulate(e, 1));
+  removed.forEach(e => accumulate(e, -1));
+
+  const operations = [...deltas.values()]
+    .filter(d => d.count !== 0 || d.co2Kg !== 0 || d.co2Lbs !== 0 || d.value !== 0)
+    .map(d => ({
+      updateOne: {
+        filter: d.key,
+        update: { $inc: { co2Kg: d.co2Kg, co2Lbs: d.co2Lbs, value: d.value, count: d.count } },
+        upsert: true
+      }
+    }));
+
+  if (operations.length === 0) return;
+
+  await db.collection(ROLLUP_COLLECTION).bulkWrite(operations, { ordered: false });
+
+  if (removed.length > 0) {
+    await db.collection(ROLLUP_COLLECTION).deleteMany({ count: { $lte: 0 } });
+  }
+}
+
+function rollupPipeline(match) {
+  return [
+    { $match: match },
+    {
+      $group: {
+        _id: {
+          month: { $substrCP: ['$date', 0, 7] },
+          department: '$department',
+          category: '$category',
+          subcategory: '$subcategory'
+        },
+        co2Kg: { $sum: { $ifNull: ['$co2Kg', 0] } },
+        co2Lbs: { $sum: { $ifNull: ['$co2Lbs', 0] } },
+        value: { $sum: { $ifNull: ['$value', 0] } },
+        count: { $sum: 1 }
+      }
+    },
+    {
+      $project: {
+        _id: 0,
+        month: '$_id.month',
+        department: '$_id.department',
+        category: '$_id.category',
+        subcategory: '$_id.subcategory',
+        co2Kg: 1,
+        co2Lbs: 1,
+        value: 1,
+        count: 1
+      }
+    }
+  ];
+}
+
+function nextMonth(month) {
+  const [year, m] = month.split('-').map(Number);
+  return m === 12 ? `${year + 1}-01` : `${year}-${String(m + 1).padStart(2, '0')}`;
+}
+
+// Half-open ranges, so the bounds are real dates in either storage layout
+export function monthsMatch(months) {
+  return {
+    $or: months.map(month => ({ date: { $gte: `${month}-01`, $lt: `${nextMonth(month)}-01` } }))
+  };
+}
+
+// Recompute rollups from the raw emissions. Without `months` the whole
+// collection is replaced with $out; with `months` only those months are
+// deleted and re-merged, which is what repairs after a partial restatement use.
+export async function rebuildRollups(db, { months } = {}) {
+  const rollups = db.collection(ROLLUP_COLLECTION);
+  await rollups.createIndex(
+    { month: 1, department: 1, category: 1, subcategory: 1 },
+    { unique: true, name: 'rollup_key_unique' }
+  );
+
+  if (!months) {
+    await emissionStore(db)
+      .aggregate([...rollupPipeline({}), { $out: ROLLUP_COLLECTION }], { allowDiskUse: true })
+      .toArray();
+    return;
+  }
+
+  if (months.length === 0) return;
+  await rollups.deleteMany({ month: { $in: months } });
+  await emissionStore(db)
+    .aggregate([
+      ...rollupPipeline(monthsMatch(months)),
+      {
+        $merge: {
+          into: ROLLUP_COLLECTION,
+          on: ROLLUP_KEY_FIELDS,
+          whenMatched: 'replace',
+          whenNotMatched: 'insert'
+        }
+      }
+    ], { allowDiskUse: true })
+    .toArray();
+}
+
+// Compare stored rollups with a fresh aggregation without writing anything.
+// Returns the keys whose count differs or whose sums drifted past `tolerance`.
+export async function verifyRollups(db, { tolerance = 0.01 } = {}) {
+  const expected = await emissionStore(db)
+    .aggregate(rollupPipeline({}), { allowDiskUse: true })
+    .toArray();
+  const stored = await db.collection(ROLLUP_COLLECTION)
+    .find({}, { projection: { _id: 0 } })
+    .toArray();
+
+  const keyOf = row => JSON.stringify(ROLLUP_KEY_FIELDS.map(f => row[f]));
+  const storedByKey = new Map(stored.map(row => [keyOf(row), row]));
+  const mismatches = [];
+
+  for (const row of expected) {
+    const key = keyOf(row);
+    const actual = storedByKey.get(key);
+    storedByKey.delete(key);
+    if (!actual
+      || actual.count !== row.count
+      || Math.abs(actual.co2Kg - row.co2Kg) > tolerance
+      || Math.abs(actual.co2Lbs - row.co2Lbs) > tolerance
+      || Math.abs(actual.value - row.value) > tolerance) {
+      mismatches.push({ expected: row, actual: actual || null });
+    }
+  }
+  for (const orphan of storedByKey.values()) {
+    mismatches.push({ expected: null, actual: orphan });
+  }
+
+  return { checked: expected.length, mismatches };
+}
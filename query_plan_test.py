@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Carbon Footprint Analytics Query Plan Regression Tests
+Runs explain() on every query shape used by app/api/[[...path]]/route.js and
+fails when a shape falls back to COLLSCAN or examines more documents per
+returned document than the recorded baseline.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from datetime import date, timedelta
+
+try:
+    from pymongo import MongoClient
+except ImportError:  # only needed when the suite actually runs
+    MongoClient = None
+
+# Configuration
+MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = os.environ.get("DB_NAME", "carbon_footprint_db")
+ROOT = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(ROOT, "query_plan_baseline.json")
+EMISSIONS_SORT = {"date": -1, "id": -1}
+
+
+def month_bounds(today, months_back):
+    """First and last day (YYYY-MM-DD) of the month `months_back` before today"""
+    first = date(today.year, today.month, 1)
+    for _ in range(months_back):
+        first = (first - timedelta(days=1)).replace(day=1)
+    last = (first.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
+    return first.isoformat(), last.isoformat()
+
+
+def plan_stages(node):
+    """All stage names under any winningPlan in an explain document"""
+    stages = []
+
+    def walk(value, in_plan):
+        if isinstance(value, dict):
+            if in_plan and "stage" in value:
+                stages.append(value["stage"])
+            for key, child in value.items():
+                walk(child, in_plan or key in ("winningPlan", "queryPlan"))
+        elif isinstance(value, list):
+            for child in value:
+                walk(child, in_plan)
+
+    walk(node, False)
+    return stages
+
+
+def execution_stats(node):
+    """First executionStats block in an explain document"""
+    if isinstance(node, dict):
+        if "executionStats" in node and isinstance(node["executionStats"], dict):
+            return node["executionStats"]
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return None
+    for child in children:
+        stats = execution_stats(child)
+        if stats:
+            return stats
+    return None
+
+
+class QueryPlanTester:
+    def __init__(self, db, baseline, tolerance):
+        self.db = db
+        self.baseline = baseline
+        self.tolerance = tolerance
+        self.test_results = []
+        self.measured = {}
+
+    def log_test(self, test_name, success, message, details=None):
+        """Log test results"""
+        status = "✅ PASS" if success else "❌ FAIL"
+        print(f"{status} {test_name}: {message}")
+        if details:
+            print(f"   Details: {details}")
+
+        self.test_results.append({
+            "test": test_name,
+            "success": success,
+            "message": message,
+            "details": details
+        })
+
+    def sample_values(self):
+        """Pick filter values that exist in the current dataset"""
+        emissions = self.db["emissions"]
+        newest = emissions.find_one({}, sort=[("date", -1), ("id", -1)])
+        if not newest:
+            raise RuntimeError("The emissions collection is empty; run with --generate N")
+        end = date.fromisoformat(newest["date"])
+        return {
+            "department": newest["department"],
+            "category": newest["category"],
+            "subcategory": newest["subcategory"],
+            "id": newest["id"],
+            "cursor": (newest["date"], newest["id"]),
+            "start_date": (end - timedelta(days=90)).isoformat(),
+            "end_date": end.isoformat()
+        }
+
+    def query_shapes(self, sample):
+        """(name, collection, command, allow_collscan) for each route query"""
+        department = sample["department"]
+        date_range = {"$gte": sample["start_date"], "$lte": sample["end_date"]}
+        cursor_date, cursor_id = sample["cursor"]
+        keyset = {"$or": [{"date": {"$lt": cursor_date}}, {"date": cursor_date, "id": {"$lt": cursor_id}}]}
+
+        def find(filter_, limit=101):
+            command = {"find": "emissions", "filter": filter_, "sort": EMISSIONS_SORT}
+            if limit:
+                command["limit"] = limit
+            return command
+
+        today = date.today()
+        last_month = dict(zip(("$gte", "$lte"), month_bounds(today, 1)))
+        two_months_ago = dict(zip(("$gte", "$lte"), month_bounds(today, 2)))
+
+        def summary(match):
+            return {"aggregate": "emissions", "cursor": {}, "pipeline": [
+                {"$match": match},
+                {"$facet": {"totals": [{"$group": {"_id": None, "n": {"$sum": 1}}}]}}
+            ]}
+
+        def rollups(match):
+            return {"aggregate": "emission_rollups", "cursor": {}, "pipeline": [
+                {"$match": {"count": {"$gt": 0}, **match}},
+                {"$group": {"_id": {"month": "$month", "category": "$category"}, "co2Kg": {"$sum": "$co2Kg"}}}
+            ]}
+
+        summary_dates = {"$or": [{"date": date_range}, {"date": last_month}, {"date": two_months_ago}]}
+
+        return [
+            ("GET /api/emissions (first page)", find({}), False),
+            ("GET /api/emissions (full list)", find({}, limit=None), False),
+            ("GET /api/emissions?department", find({"department": department}), False),
+            ("GET /api/emissions?category", find({"category": sample["category"]}), False),
+            ("GET /api/emissions?department&category",
+             find({"department": department, "category": sample["category"]}), False),
+            ("GET /api/emissions?startDate&endDate", find({"date": date_range}), False),
+            ("GET /api/emissions?department&startDate&endDate",
+             find({"department": department, "date": date_range}), False),
+            ("GET /api/emissions?cursor", find(keyset), False),
+            ("GET /api/emissions?department&cursor", find({"department": department, **keyset}), False),
+            ("GET /api/analytics/summary?startDate&endDate", summary(summary_dates), False),
+            ("GET /api/analytics/summary?department&startDate&endDate",
+             summary({"department": department, **summary_dates}), False),
+            ("GET /api/analytics/summary?department", summary({"department": department}), False),
+            # Whole-collection aggregations read every document by design
+            ("GET /api/analytics/summary", summary({}), True),
+            ("GET /api/analytics/trends?department", rollups({"department": department}), False),
+            ("GET /api/analytics/trends", rollups({}), True),
+            ("Recalculation chunk (category, subcategory, month)",
+             {"find": "emissions", "filter": {"category": sample["category"],
+                                              "subcategory": sample["subcategory"],
+                                              "date": {"$gte": sample["end_date"][:8] + "01",
+                                                       "$lt": sample["end_date"]}}}, False),
+            ("PUT/DELETE /api/emissions/:id", {"find": "emissions", "filter": {"id": sample["id"]}, "limit": 1}, False),
+            ("POST /api/emissions/bulk?mode=upsert (dedupe key lookup)",
+             {"find": "emissions", "filter": {"dedupeKey": {"$in": ["sha1:none"]}}}, False),
+            ("POST /api/emissions/batch (pre-read by id and filter)",
+             {"find": "emissions", "filter": {"$or": [{"id": {"$in": [sample["id"]]}},
+                                                      {"department": department, "date": date_range}]}}, False),
+        ]
+
+    def check_shape(self, name, command, allow_collscan):
+        """Explain one query shape and compare it with the baseline"""
+        try:
+            explain = self.db.command({"explain": command, "verbosity": "executionStats"})
+        except Exception as e:
+            self.log_test(name, False, f"explain failed: {str(e)}")
+            return False
+
+        stages = plan_stages(explain)
+        stats = execution_stats(explain) or {}
+        examined = stats.get("totalDocsExamined", 0)
+        returned = max(stats.get("nReturned", 0), 1)
+        ratio = round(examined / returned, 3)
+        self.measured[name] = {"stages": sorted(set(stages)), "docs_examined_ratio": ratio}
+
+        if "COLLSCAN" in stages and not allow_collscan:
+            self.log_test(name, False, "Falls back to COLLSCAN", " -> ".join(stages))
+            return False
+
+        previous = self.baseline.get(name)
+        if previous and ratio > previous["docs_examined_ratio"] * (1 + self.tolerance) + 0.01:
+            self.log_test(name, False,
+                        f"Docs examined per returned doc regressed: {previous['docs_examined_ratio']} -> {ratio}",
+                        " -> ".join(stages))
+            return False
+
+        self.log_test(name, True, f"{'/'.join(sorted(set(stages)))}, {ratio} docs examined per result")
+        return True
+
+    def run_all_tests(self):
+        """Explain every query shape"""
+        print("🧪 Starting Query Plan Regression Tests")
+        print("=" * 70)
+
+        sample = self.sample_values()
+        shapes = self.query_shapes(sample)
+        passed = sum(1 for name, command, allow in shapes if self.check_shape(name, command, allow))
+
+        print("\n" + "=" * 70)
+        print(f"🏁 {passed}/{len(shapes)} query shapes passed")
+        return passed == len(shapes)
+
+
+def run_node(script, *args):
+    """Run one of the Node maintenance scripts from the repo root"""
+    subprocess.run(["node", os.path.join(ROOT, "scripts", script), *args], cwd=ROOT, check=True)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Query plan regression tests for the emissions collection")
+    parser.add_argument("--generate", type=int, default=None,
+                        help="Regenerate a synthetic dataset with this many records first")
+    parser.add_argument("--seed", type=int, default=42, help="Seed passed to the dataset generator")
+    parser.add_argument("--skip-migrate", action="store_true",
+                        help="Do not run the index migration before explaining")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed relative increase of the docs-examined ratio over the baseline")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Write the measured ratios to query_plan_baseline.json")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if MongoClient is None:
+        print("❌ pymongo is required: pip install pymongo")
+        sys.exit(1)
+
+    if args.generate:
+        run_node("generate_data.mjs", "--records", str(args.generate), "--seed", str(args.seed), "--drop")
+    if not args.skip_migrate:
+        run_node("migrate_indexes.mjs")
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH) and not args.update_baseline:
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    client = MongoClient(MONGO_URL)
+    tester = QueryPlanTester(client[DB_NAME], baseline, args.tolerance)
+    success = tester.run_all_tests()
+
+    if args.update_baseline or not os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH, "w") as f:
+            json.dump(tester.measured, f, indent=2, sort_keys=True)
+        print(f"📝 Baseline written to {BASELINE_PATH}")
+
+    sys.exit(0 if success else 1)
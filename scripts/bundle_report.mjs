@@ -0,0 +1,108 @@
+// Report the JavaScript the dashboard page loads, from a finished `next build`.
+//
+// First-load JS is every chunk the prerendered page references with a
+// <script> tag (.next/server/app/index.html), falling back to
+// .next/app-build-manifest.json when the page was not prerendered. Every other
+// chunk under .next/static/chunks is loaded on demand: the charts, three.js,
+// the chatbot and the report exporters.
+//
+// Usage:
+//   npm run build:report                                  # build, then report
+//   node scripts/bundle_report.mjs                        # report an existing build
+//   node scripts/bundle_report.mjs --top 15 --budget-kb 250   # exit 1 when first-load gzip exceeds 250 KB
+//   node scripts/bundle_report.mjs --json
+import fs from 'fs';
+import path from 'path';
+import { gzipSync } from 'zlib';
+
+const NEXT_DIR = path.resolve(process.env.NEXT_DIR || '.next');
+const CHUNKS_DIR = path.join(NEXT_DIR, 'static', 'chunks');
+
+function option(argv, name, fallback) {
+  const index = argv.indexOf(name);
+  return index >= 0 ? argv[index + 1] : fallback;
+}
+
+function listChunks(dir) {
+  return fs.readdirSync(dir, { withFileTypes: true }).flatMap(entry => {
+    const file = path.join(dir, entry.name);
+    if (entry.isDirectory()) return listChunks(file);
+    return entry.name.endsWith('.js') ? [file] : [];
+  });
+}
+
+// Chunk paths relative to .next/, e.g. static/chunks/app/page-1a2b.js
+function firstLoadChunks() {
+  const html = path.join(NEXT_DIR, 'server', 'app', 'index.html');
+  if (fs.existsSync(html)) {
+    const scripts = [...fs.readFileSync(html, 'utf8').matchAll(/<script[^>]+src="\/_next\/([^"?]+\.js)[^"]*"/g)];
+    return [...new Set(scripts.map(match => decodeURIComponent(match[1])))];
+  }
+  const manifestPath = path.join(NEXT_DIR, 'app-build-manifest.json');
+  if (fs.existsSync(manifestPath)) {
+    const { pages } = JSON.parse(fs.readFileSync(manifestPath, 'utf8'));
+    const files = [...(pages['/layout'] || []), ...(pages['/page'] || [])];
+    return [...new Set(files.filter(file => file.endsWith('.js')))];
+  }
+  throw new Error(`No prerendered page or app-build-manifest.json in ${NEXT_DIR}; run next build first`);
+}
+
+function measure(file) {
+  const bytes = fs.readFileSync(path.join(NEXT_DIR, file));
+  return { file, bytes: bytes.length, gzip: gzipSync(bytes).length };
+}
+
+function total(chunks, key) {
+  return chunks.reduce((sum, chunk) => sum + chunk[key], 0);
+}
+
+const kb = bytes => `${(bytes / 1024).toFixed(1)} KB`;
+
+function printChunks(title, chunks, top) {
+  console.log(`${title}: ${chunks.length} chunks, ${kb(total(chunks, 'bytes'))} raw, ${kb(total(chunks, 'gzip'))} gzip`);
+  [...chunks].sort((a, b) => b.gzip - a.gzip).slice(0, top).forEach(chunk => {
+    console.log(`  ${kb(chunk.gzip).padStart(10)} gzip  ${kb(chunk.bytes).padStart(10)} raw  ${chunk.file}`);
+  });
+}
+
+async function main(argv) {
+  const top = parseInt(option(argv, '--top', '10'));
+  const budgetKb = option(argv, '--budget-kb');
+
+  if (!fs.existsSync(CHUNKS_DIR)) {
+    console.error(`❌ ${CHUNKS_DIR} not found; run next build first`);
+    return 1;
+  }
+
+  const initialFiles = new Set(firstLoadChunks());
+  const initial = [...initialFiles].map(measure);
+  const lazy = listChunks(CHUNKS_DIR)
+    .map(file => path.relative(NEXT_DIR, file).split(path.sep).join('/'))
+    .filter(file => !initialFiles.has(file))
+    .map(measure);
+
+  if (argv.includes('--json')) {
+    console.log(JSON.stringify({
+      firstLoad: { bytes: total(initial, 'bytes'), gzip: total(initial, 'gzip'), chunks: initial },
+      lazy: { bytes: total(lazy, 'bytes'), gzip: total(lazy, 'gzip'), chunks: lazy }
+    }, null, 2));
+  } else {
+    printChunks('First-load JS for /', initial, top);
+    printChunks('Loaded on demand', lazy, top);
+  }
+
+  if (budgetKb !== undefined) {
+    const firstLoadGzip = total(initial, 'gzip');
+    if (firstLoadGzip > parseFloat(budgetKb) * 1024) {
+      console.error(`❌ First-load JS is ${kb(firstLoadGzip)} gzip, over the ${budgetKb} KB budget`);
+      return 1;
+    }
+    console.log(`✅ First-load JS is within the ${budgetKb} KB budget`);
+  }
+  return 0;
+}
+
+main(process.argv.slice(2)).then(code => process.exit(code)).catch(err => {
+  console.error(err);
+  process.exit(1);
+});
@@ -0,0 +1,43 @@
+// Compact the contact log written by POST /api/contact: merge rotated
+// segments, drop duplicate ids and fold in a legacy contacts.json.
+//
+// Usage:
+//   node scripts/compact_contacts.mjs                      # CONTACT_LOG_DIR or ./contacts
+//   node scripts/compact_contacts.mjs --retain-days 365    # also drop older entries
+//   node scripts/compact_contacts.mjs --dir /var/lib/carbon/contacts --max-segment-bytes 16777216
+import 'dotenv/config';
+import { compactContacts, contactLogDir } from '../lib/contact-log.js';
+
+function option(argv, name) {
+  const index = argv.indexOf(name);
+  return index >= 0 ? argv[index + 1] : undefined;
+}
+
+async function main(argv) {
+  const dir = option(argv, '--dir') || contactLogDir();
+  const retainDays = option(argv, '--retain-days');
+  const maxSegmentBytes = option(argv, '--max-segment-bytes');
+
+  if (retainDays !== undefined && !(parseFloat(retainDays) > 0)) {
+    console.error('❌ --retain-days must be a positive number');
+    return 1;
+  }
+
+  const startedAt = Date.now();
+  const result = await compactContacts({
+    dir,
+    retainDays: retainDays ? parseFloat(retainDays) : undefined,
+    ...(maxSegmentBytes ? { maxSegmentBytes: parseInt(maxSegmentBytes) } : {})
+  });
+  console.log(`✅ Compacted ${result.segmentsBefore} segments into ${result.segmentsAfter} in ${Date.now() - startedAt}ms: `
+    + `${result.entriesKept} entries kept, ${result.duplicatesDropped} duplicates and ${result.expired} expired dropped`);
+  if (result.legacyImported > 0) {
+    console.log(`   Imported ${result.legacyImported} entries from contacts.json (renamed to contacts.json.imported)`);
+  }
+  return 0;
+}
+
+main(process.argv.slice(2)).then(code => process.exit(code)).catch(err => {
+  console.error(err);
+  process.exit(1);
+});
@@ -0,0 +1,246 @@
+// Synthetic emissions generator for benchmarking.
+//
+// Streams records in the same schema as POST /api/emissions into MongoDB in
+// unordered insertMany batches. Output is fully determined by the arguments
+// (including --seed and --end-date), so two runs with the same flags produce
+// byte-identical collections.
+//
+// Usage:
+//   node scripts/generate_data.mjs --records 1000000 --departments 25 --years 3 --skew 1.1 --seed 42 --drop
+import 'dotenv/config';
+import { MongoClient } from 'mongodb';
+import { EMISSION_FACTORS, calculateEmissions } from '../lib/emission-factors.js';
+import { TIMESERIES_COLLECTION, emissionStore } from '../lib/emission-store.js';
+import { ensureCollection } from '../lib/indexes.js';
+import { recordReset } from '../lib/change-feed.js';
+import { rebuildSamples } from '../lib/emission-samples.js';
+import { rebuildRollups } from '../lib/rollups.js';
+
+const MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
+const DB_NAME = process.env.DB_NAME || 'carbon_footprint_db';
+
+const DEFAULTS = {
+  records: 1000000,
+  departments: 20,
+  years: 3,
+  skew: 1.1,
+  seed: 42,
+  batchSize: 10000,
+  concurrency: 2,
+  endDate: '2025-12-31',
+  drop: false
+};
+
+// Share of records per category; subcategories are picked uniformly.
+const CATEGORY_WEIGHTS = {
+  electricity: 0.4,
+  transportation: 0.3,
+  heating: 0.2,
+  waste: 0.1
+};
+
+// Realistic value ranges per unit, mirroring seed_data.js
+const VALUE_RANGES = {
+  kWh: [200, 2500],
+  gallon: [50, 250],
+  mile: [100, 600],
+  therm: [20, 100],
+  ton: [0.1, 1]
+};
+
+function parseArgs(argv) {
+  const options = { ...DEFAULTS };
+  for (let i = 0; i < argv.length; i++) {
+    const arg = argv[i];
+    if (!arg.startsWith('--')) continue;
+    const key = arg.slice(2).replace(/-([a-z])/g, (_, c) => c.toUpperCase());
+    if (!(key in DEFAULTS)) {
+      throw new Error(`Unknown option ${arg}`);
+    }
+    if (typeof DEFAULTS[key] === 'boolean') {
+      options[key] = true;
+    } else {
+      const raw = argv[++i];
+      options[key] = typeof DEFAULTS[key] === 'number' ? Number(raw) : raw;
+    }
+  }
+  return options;
+}
+
+// mulberry32: small, fast, seedable 32-bit PRNG
+function createRandom(seed) {
+  let state = seed >>> 0;
+  return function random() {
+    state = (state + 0x6D2B79F5) >>> 0;
+    let t = state;
+    t = Math.imul(t ^ (t >>> 15), t | 1);
+    t ^= t + Math.imul(t ^ (t >>> 7), t | 61);
+    return ((t ^ (t >>> 14)) >>> 0) / 4294967296;
+  };
+}
+
+// RFC 4122 v4-shaped id drawn from the seeded PRNG instead of crypto
+function seededUuid(random) {
+  const bytes = new Array(16);
+  for (let i = 0; i < 16; i++) bytes[i] = Math.floor(random() * 256);
+  bytes[6] = (bytes[6] & 0x0f) | 0x40;
+  bytes[8] = (bytes[8] & 0x3f) | 0x80;
+  const hex = bytes.map(b => b.toString(16).padStart(2, '0')).join('');
+  return `${hex.slice(0, 8)}-${hex.slice(8, 12)}-${hex.slice(12, 16)}-${hex.slice(16, 20)}-${hex.slice(20)}`;
+}
+
+// Weighted picker over a fixed list using a cumulative table and binary search
+function createPicker(items, weights, random) {
+  const cumulative = [];
+  let total = 0;
+  for (const w of weights) {
+    total += w;
+    cumulative.push(total);
+  }
+  return function pick() {
+    const r = random() * total;
+    let lo = 0;
+    let hi = cumulative.length - 1;
+    while (lo < hi) {
+      const mid = (lo + hi) >> 1;
+      if (cumulative[mid] > r) hi = mid;
+      else lo = mid + 1;
+    }
+    return items[lo];
+  };
+}
+
+function generateDepartments(count, random) {
+  const departments = [];
+  for (let i = 0; i < count; i++) {
+    departments.push({
+      id: seededUuid(random),
+      name: `Department ${String(i + 1).padStart(3, '0')}`,
+      description: 'Synthetic benchmark department',
+      createdAt: '2000-01-01T00:00:00.000Z'
+    });
+  }
+  return departments;
+}
+
+// Yields emission records one at a time; callers decide how many to buffer.
+function* generateEmissions(options, departments, random) {
+  const end = new Date(`${options.endDate}T00:00:00Z`);
+  const start = new Date(end);
+  start.setUTCFullYear(start.getUTCFullYear() - options.years);
+  const startMs = start.getTime();
+  const spanDays = Math.max(1, Math.round((end.getTime() - startMs) / 86400000));
+
+  // Zipf-like department skew: weight of rank r is 1 / r^skew (skew 0 = uniform)
+  const pickDepartment = createPicker(
+    departments,
+    departments.map((_, rank) => 1 / Math.pow(rank + 1, options.skew)),
+    random
+  );
+  const categories = Object.keys(CATEGORY_WEIGHTS);
+  const pickCategory = createPicker(categories, categories.map(c => CATEGORY_WEIGHTS[c]), random);
+
+  for (let i = 0; i < options.records; i++) {
+    const category = pickCategory();
+    const subcategories = Object.keys(EMISSION_FACTORS[category]);
+    const subcategory = subcategories[Math.floor(random() * subcategories.length)];
+    const department = pickDepartment();
+    const unit = EMISSION_FACTORS[category][subcategory].unit;
+    const [min, max] = VALUE_RANGES[unit];
+    const value = Math.round((min + random() * (max - min)) * 100) / 100;
+    const day = new Date(startMs + Math.floor(random() * (spanDays + 1)) * 86400000);
+    const date = day.toISOString().split('T')[0];
+    const calculation = calculateEmissions(category, subcategory, value);
+
+    yield {
+      id: seededUuid(random),
+      date,
+      category,
+      subcategory,
+      value,
+      unit: calculation.unit,
+      department: department.id,
+      notes: '',
+      co2Lbs: calculation.co2Lbs,
+      co2Kg: calculation.co2Kg,
+      emissionFactor: calculation.factor,
+      createdAt: `${date}T12:00:00.000Z`
+    };
+  }
+}
+
+async function generate(options) {
+  const client = await MongoClient.connect(MONGO_URL);
+  const db = client.db(DB_NAME);
+  const random = createRandom(options.seed);
+  // EMISSIONS_STORAGE=timeseries writes straight into the time-series collection
+  const emissions = emissionStore(db);
+  if (emissions.timeseries) await ensureCollection(db, TIMESERIES_COLLECTION);
+
+  console.log(`🌱 Generating ${options.records.toLocaleString()} emissions ` +
+    `(${options.departments} departments, ${options.years} years, skew ${options.skew}, seed ${options.seed})`);
+
+  if (options.drop) {
+    await db.collection('departments').deleteMany({});
+    await emissions.deleteMany({});
+  }
+
+  const departments = generateDepartments(options.departments, random);
+  await db.collection('departments').bulkWrite(
+    departments.map(d => ({ replaceOne: { filter: { id: d.id }, replacement: d, upsert: true } })),
+    { ordered: false }
+  );
+  console.log(`✅ Upserted ${departments.length} departments`);
+
+  // At most `concurrency` batches exist at a time: one being filled and the
+  // rest in flight, which keeps memory flat regardless of --records.
+  const inFlight = new Set();
+  let batch = [];
+  let written = 0;
+  const startedAt = Date.now();
+
+  const flush = async (docs) => {
+    const task = emissions
+      .insertMany(docs, { ordered: false })
+      .then(() => {
+        written += docs.length;
+        if (written % (options.batchSize * 10) === 0 || written === options.records) {
+          const seconds = (Date.now() - startedAt) / 1000;
+          console.log(`   ${written.toLocaleString()} / ${options.records.toLocaleString()} ` +
+            `(${Math.round(written / seconds).toLocaleString()} docs/s)`);
+        }
+      })
+      .finally(() => inFlight.delete(task));
+    inFlight.add(task);
+    if (inFlight.size >= options.concurrency) {
+      await Promise.race(inFlight);
+    }
+  };
+
+  for (const emission of generateEmissions(options, departments, random)) {
+    batch.push(emission);
+    if (batch.length >= options.batchSize) {
+      await flush(batch);
+      batch = [];
+    }
+  }
+  if (batch.length > 0) await flush(batch);
+  await Promise.all(inFlight);
+
+  const seconds = (Date.now() - startedAt) / 1000;
+  console.log(`🎉 Inserted ${written.toLocaleString()} emissions in ${seconds.toFixed(1)}s`);
+
+  await rebuildRollups(db);
+  console.log('✅ Rebuilt monthly rollups');
+  await rebuildSamples(db);
+  console.log('✅ Rebuilt analytics samples');
+  // Open dashboards reload instead of applying millions of deltas
+  await recordReset(db, 'generate');
+
+  await client.close();
+}
+
+generate(parseArgs(process.argv.slice(2))).catch(err => {
+  console.error(err);
+  process.exit(1);
+});
@@ -0,0 +1,37 @@
+// Create and verify the indexes in lib/indexes.js.
+//
+// Usage:
+//   node scripts/migrate_indexes.mjs            # create missing indexes, then verify
+//   node scripts/migrate_indexes.mjs --verify   # only verify; exit 1 on drift
+import 'dotenv/config';
+import { MongoClient } from 'mongodb';
+import { ensureIndexes, verifyIndexes } from '../lib/indexes.js';
+
+const MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
+const DB_NAME = process.env.DB_NAME || 'carbon_footprint_db';
+
+async function main(argv) {
+  const verifyOnly = argv.includes('--verify');
+  const client = await MongoClient.connect(MONGO_URL);
+  const db = client.db(DB_NAME);
+
+  try {
+    const startedAt = Date.now();
+    const { ok, missing, mismatched } = verifyOnly ? await verifyIndexes(db) : await ensureIndexes(db);
+    if (ok) {
+      console.log(`✅ Indexes ${verifyOnly ? 'verified' : 'created and verified'} in ${Date.now() - startedAt}ms`);
+      return 0;
+    }
+    missing.forEach(m => console.log(`❌ Missing ${m.collection}.${m.name}`));
+    mismatched.forEach(m => console.log(`❌ ${m.collection}.${m.name} is ${JSON.stringify(m.actual)}, ` +
+      `expected ${JSON.stringify(m.expected)} (drop it and rerun)`));
+    return 1;
+  } finally {
+    await client.close();
+  }
+}
+
+main(process.argv.slice(2)).then(code => process.exit(code)).catch(err => {
+  console.error(err);
+  process.exit(1);
+});
@@ -0,0 +1,163 @@
+// Copy the emissions collection into the time-series collection used by
+// EMISSIONS_STORAGE=timeseries (lib/emission-store.js), verify the copy and
+// compare storage size and a month-range scan on both layouts.
+//
+// The copy walks emissions in (date, id) order with ordered insertMany
+// batches, so an interrupted run resumes after the last record it wrote. The
+// source collection is left untouched; switch the API over by setting
+// EMISSIONS_STORAGE=timeseries and restarting it. Requires MongoDB 8.0+.
+//
+// Usage:
+//   node scripts/migrate_timeseries.mjs                  # copy (or resume), verify, report
+//   node scripts/migrate_timeseries.mjs --drop-target    # start over from an empty target
+//   node scripts/migrate_timeseries.mjs --stats          # only verify and report
+//   node scripts/migrate_timeseries.mjs --batch-size 5000 --month 2025-06
+import 'dotenv/config';
+import { MongoClient } from 'mongodb';
+import { EMISSIONS_COLLECTION, TIMESERIES_COLLECTION, emissionStore } from '../lib/emission-store.js';
+import { ensureCollection, ensureIndexes } from '../lib/indexes.js';
+
+const MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
+const DB_NAME = process.env.DB_NAME || 'carbon_footprint_db';
+
+const DEFAULT_BATCH_SIZE = 10000;
+const SCAN_RUNS = 3;
+
+function option(argv, name) {
+  const index = argv.indexOf(name);
+  return index >= 0 ? argv[index + 1] : undefined;
+}
+
+function nextMonth(month) {
+  const [year, m] = month.split('-').map(Number);
+  return m === 12 ? `${year + 1}-01` : `${year}-${String(m + 1).padStart(2, '0')}`;
+}
+
+async function copy(db, batchSize) {
+  const source = emissionStore(db, 'documents');
+  const target = emissionStore(db, 'timeseries');
+
+  // Resume after the newest (date, id) already in the target
+  const last = await target.find({}, { projection: { date: 1, id: 1 }, sort: { date: -1, id: -1 }, limit: 1 }).next();
+  const query = last ? { $or: [{ date: { $gt: last.date } }, { date: last.date, id: { $gt: last.id } }] } : {};
+  if (last) console.log(`↪️  Resuming after ${last.date} ${last.id}`);
+
+  const cursor = source.find(query, { projection: { _id: 0 }, sort: { date: 1, id: 1 } }).batchSize(batchSize);
+  const startedAt = Date.now();
+  let batch = [];
+  let copied = 0;
+  const flush = async () => {
+    await target.insertMany(batch, { ordered: true });
+    copied += batch.length;
+    const seconds = (Date.now() - startedAt) / 1000;
+    console.log(`   ${copied.toLocaleString()} copied (${Math.round(copied / seconds).toLocaleString()} docs/s)`);
+    batch = [];
+  };
+  for await (const doc of cursor) {
+    batch.push(doc);
+    if (batch.length >= batchSize) await flush();
+  }
+  if (batch.length > 0) await flush();
+  return copied;
+}
+
+async function totals(store) {
+  const [row] = await store.aggregate([
+    { $match: {} },
+    { $group: { _id: null, count: { $sum: 1 }, co2Kg: { $sum: { $ifNull: ['$co2Kg', 0] } } } }
+  ], { allowDiskUse: true }).toArray();
+  return { count: row?.count || 0, co2Kg: row?.co2Kg || 0 };
+}
+
+async function storageBytes(db, name) {
+  const [stats] = await db.collection(name).aggregate([{ $collStats: { storageStats: {} } }]).toArray();
+  const { storageSize = 0, totalIndexSize = 0 } = stats?.storageStats || {};
+  return { storageSize, totalIndexSize };
+}
+
+// Best of a few runs of one month's CO2 total, in ms
+async function monthScanMs(store, month) {
+  let best = Infinity;
+  for (let run = 0; run < SCAN_RUNS; run += 1) {
+    const startedAt = process.hrtime.bigint();
+    await store.aggregate([
+      { $match: { date: { $gte: `${month}-01`, $lt: `${nextMonth(month)}-01` } } },
+      { $group: { _id: '$department', co2Kg: { $sum: '$co2Kg' } } }
+    ]).toArray();
+    best = Math.min(best, Number(process.hrtime.bigint() - startedAt) / 1e6);
+  }
+  return best;
+}
+
+const mb = bytes => `${(bytes / 1024 / 1024).toFixed(1)} MB`;
+
+async function main(argv) {
+  const statsOnly = argv.includes('--stats');
+  const batchSize = parseInt(option(argv, '--batch-size') || String(DEFAULT_BATCH_SIZE));
+  if (!Number.isInteger(batchSize) || batchSize < 1) {
+    console.error('❌ --batch-size must be a positive integer');
+    return 1;
+  }
+  const month = option(argv, '--month');
+  if (month !== undefined && !/^\d{4}-\d{2}$/.test(month)) {
+    console.error('❌ --month must be YYYY-MM');
+    return 1;
+  }
+
+  const client = await MongoClient.connect(MONGO_URL);
+  const db = client.db(DB_NAME);
+
+  try {
+    if (!statsOnly) {
+      if (argv.includes('--drop-target')) {
+        await db.collection(TIMESERIES_COLLECTION).drop().catch(error => {
+          // NamespaceNotFound: nothing to drop
+          if (error.code !== 26) throw error;
+        });
+        console.log(`🗑️  Dropped ${TIMESERIES_COLLECTION}`);
+      }
+      await ensureCollection(db, TIMESERIES_COLLECTION);
+      const startedAt = Date.now();
+      const copied = await copy(db, batchSize);
+      console.log(`✅ Copied ${copied.toLocaleString()} records in ${((Date.now() - startedAt) / 1000).toFixed(1)}s`);
+
+      const { ok, missing } = await ensureIndexes(db, 'timeseries');
+      if (!ok) {
+        missing.forEach(m => console.log(`❌ Missing ${m.collection}.${m.name}`));
+        return 1;
+      }
+      console.log('✅ Indexes created');
+    }
+
+    const source = emissionStore(db, 'documents');
+    const target = emissionStore(db, 'timeseries');
+    const [before, after] = await Promise.all([totals(source), totals(target)]);
+    const ok = before.count === after.count && Math.abs(before.co2Kg - after.co2Kg) <= 1e-6 * Math.max(1, before.co2Kg);
+    console.log(`${ok ? '✅' : '❌'} ${EMISSIONS_COLLECTION}: ${before.count.toLocaleString()} records, ` +
+      `${before.co2Kg.toFixed(2)} kg CO2; ${TIMESERIES_COLLECTION}: ${after.count.toLocaleString()} records, ` +
+      `${after.co2Kg.toFixed(2)} kg CO2`);
+
+    for (const name of [EMISSIONS_COLLECTION, TIMESERIES_COLLECTION]) {
+      const { storageSize, totalIndexSize } = await storageBytes(db, name);
+      console.log(`📦 ${name}: ${mb(storageSize)} data + ${mb(totalIndexSize)} indexes`);
+    }
+
+    const newest = await source.find({}, { projection: { date: 1 }, sort: { date: -1 }, limit: 1 }).next();
+    const scanMonth = month || newest?.date.substring(0, 7);
+    if (scanMonth) {
+      const [documentsMs, timeseriesMs] = [await monthScanMs(source, scanMonth), await monthScanMs(target, scanMonth)];
+      console.log(`⏱️  ${scanMonth} totals by department: ${EMISSIONS_COLLECTION} ${documentsMs.toFixed(1)}ms, ` +
+        `${TIMESERIES_COLLECTION} ${timeseriesMs.toFixed(1)}ms`);
+    }
+
+    if (ok && !statsOnly) console.log('👉 Set EMISSIONS_STORAGE=timeseries and restart the API to serve from the copy');
+    return ok ? 0 : 1;
+  } finally {
+    await client.close();
+  }
+}
+
+main(process.argv.slice(2)).then(code => process.exit(code)).catch(err => {
+  console.error(err);
+  process.exit(1);
+});
@@ -0,0 +1,52 @@
+// Rebuild or verify the monthly emission rollups. A rebuild also recomputes
+// the approximate-analytics samples (lib/emission-samples.js) of the same months.
+//
+// Usage:
+//   node scripts/rebuild_rollups.mjs                    # recompute everything
+//   node scripts/rebuild_rollups.mjs --months 2024-01,2024-02
+//   node scripts/rebuild_rollups.mjs --verify           # report drift, exit 1 if any
+import 'dotenv/config';
+import { MongoClient } from 'mongodb';
+import { recordReset } from '../lib/change-feed.js';
+import { rebuildSamples } from '../lib/emission-samples.js';
+import { rebuildRollups, verifyRollups } from '../lib/rollups.js';
+
+const MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
+const DB_NAME = process.env.DB_NAME || 'carbon_footprint_db';
+
+async function main(argv) {
+  const verify = argv.includes('--verify');
+  const monthsIndex = argv.indexOf('--months');
+  const months = monthsIndex >= 0 ? argv[monthsIndex + 1].split(',').map(m => m.trim()) : undefined;
+
+  const client = await MongoClient.connect(MONGO_URL);
+  const db = client.db(DB_NAME);
+
+  try {
+    if (verify) {
+      const { checked, mismatches } = await verifyRollups(db);
+      if (mismatches.length === 0) {
+        console.log(`✅ ${checked} rollup rows match the emissions collection`);
+        return 0;
+      }
+      console.log(`❌ ${mismatches.length} of ${checked} rollup rows drifted:`);
+      mismatches.slice(0, 20).forEach(m => console.log('  ', JSON.stringify(m)));
+      return 1;
+    }
+
+    const startedAt = Date.now();
+    await rebuildRollups(db, { months });
+    await rebuildSamples(db, { months });
+    // Emissions changed outside the API; change feed readers must reload
+    await recordReset(db, 'rollups');
+    console.log(`✅ Rebuilt rollups and samples${months ? ` for ${months.join(', ')}` : ''} in ${Date.now() - startedAt}ms`);
+    return 0;
+  } finally {
+    await client.close();
+  }
+}
+
+main(process.argv.slice(2)).then(code => process.exit(code)).catch(err => {
+  console.error(err);
+  process.exit(1);
+});
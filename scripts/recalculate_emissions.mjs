@@ -0,0 +1,90 @@
+// Restate stored CO2 values with the emission factor versions in effect for
+// each record's date, printing progress as chunks complete.
+//
+// Usage:
+//   node scripts/recalculate_emissions.mjs                          # every record
+//   node scripts/recalculate_emissions.mjs --start 2024-01-01 --end 2024-12-31 --categories electricity,heating/naturalGas
+//   node scripts/recalculate_emissions.mjs --resume <jobId>         # continue an interrupted job
+//   node scripts/recalculate_emissions.mjs --list
+import 'dotenv/config';
+import { MongoClient } from 'mongodb';
+import { recordReset } from '../lib/change-feed.js';
+import {
+  createRecalculationJob,
+  getRecalculationJob,
+  listRecalculationJobs,
+  runRecalculationJob,
+  validateRecalculationScope
+} from '../lib/recalculation.js';
+
+const MONGO_URL = process.env.MONGO_URL || 'mongodb://localhost:27017';
+const DB_NAME = process.env.DB_NAME || 'carbon_footprint_db';
+
+function option(argv, name) {
+  const index = argv.indexOf(name);
+  return index >= 0 ? argv[index + 1] : undefined;
+}
+
+async function main(argv) {
+  const scope = {
+    startDate: option(argv, '--start'),
+    endDate: option(argv, '--end'),
+    categories: option(argv, '--categories')?.split(',').map(c => c.trim())
+  };
+  const concurrency = parseInt(option(argv, '--concurrency') || '4');
+  const resume = option(argv, '--resume');
+
+  const error = validateRecalculationScope(scope);
+  if (error) {
+    console.error(`❌ ${error}`);
+    return 1;
+  }
+
+  const client = await MongoClient.connect(MONGO_URL);
+  const db = client.db(DB_NAME);
+
+  try {
+    if (argv.includes('--list')) {
+      for (const job of await listRecalculationJobs(db)) {
+        console.log(`${job.id}  ${job.status.padEnd(9)}  ${job.nextChunk}/${job.totalChunks} chunks  `
+          + `${job.modified} modified  ${job.createdAt}`);
+      }
+      return 0;
+    }
+
+    const job = resume ? await getRecalculationJob(db, resume) : await createRecalculationJob(db, scope);
+    if (!job) {
+      console.error(`❌ Recalculation job ${resume} not found`);
+      return 1;
+    }
+    console.log(`🔁 Job ${job.id}: ${job.totalChunks} chunks, ${job.scope.startDate} to ${job.scope.endDate}`);
+
+    const startedAt = Date.now();
+    const finished = await runRecalculationJob(db, job.id, {
+      concurrency,
+      onProgress: progress => {
+        const seconds = (Date.now() - startedAt) / 1000;
+        process.stdout.write(`\r   ${progress.nextChunk}/${progress.totalChunks} chunks, `
+          + `${progress.modified} records restated (${Math.round(progress.modified / Math.max(seconds, 0.001))}/s)`);
+      }
+    });
+    process.stdout.write('\n');
+
+    if (!finished) {
+      console.error(`❌ Job ${job.id} is already running or completed`);
+      return 1;
+    }
+    // Running servers drop their cached analytics and dashboards reload
+    await recordReset(db, 'recalculation');
+    console.log(`✅ Restated ${finished.modified} of ${finished.matched} matched records in ${Date.now() - startedAt}ms; `
+      + `rollups rebuilt for ${finished.affectedMonths.length} months`);
+    return 0;
+  } finally {
+    await client.close();
+  }
+}
+
+main(process.argv.slice(2)).then(code => process.exit(code)).catch(err => {
+  console.error(err);
+  process.exit(1);
+});
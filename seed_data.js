@@ -8,12 +8,17 @@ const DB_NAME = process.env.DB_NAME || 'carbon_footprint_db';
 async function seedData() {
   const client = await MongoClient.connect(MONGO_URL);
   const db = client.db(DB_NAME);
+  // Honors EMISSIONS_STORAGE=timeseries (see lib/emission-store.js)
+  const { TIMESERIES_COLLECTION, emissionStore } = await import('./lib/emission-store.js');
+  const { ensureCollection } = await import('./lib/indexes.js');
+  const store = emissionStore(db);
+  if (store.timeseries) await ensureCollection(db, TIMESERIES_COLLECTION);
 
   console.log('🌱 Seeding database...');
 
   // Clear existing data
   await db.collection('departments').deleteMany({});
-  await db.collection('emissions').deleteMany({});
+  await store.deleteMany({});
 
   // Create departments
   const departments = [
@@ -111,7 +116,7 @@ async function seedData() {
     }
   }
 
-  await db.collection('emissions').insertMany(emissions);
+  await store.insertMany(emissions);
   console.log(`✅ Created ${emissions.length} emission records`);
 
   console.log('🎉 Database seeded successfully!');
@@ -0,0 +1,68 @@
+"""
+Unit tests for carbon_client.analytics against hand-computed aggregates
+"""
+
+from datetime import date
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from carbon_client.analytics import Snapshot, compare_summaries, compare_trends  # noqa: E402
+
+RECORDS = [
+    {"date": "2024-05-03", "department": "ops", "category": "electricity", "co2Kg": 10.0},
+    {"date": "2024-05-20", "department": "it", "category": "waste", "co2Kg": 2.5},
+    {"date": "2024-06-01", "department": "ops", "category": "heating", "co2Kg": 4.0},
+    {"date": "2024-06-30", "department": "ops", "category": "electricity", "co2Kg": 1.0},
+    {"date": "2024-07-15", "department": "it", "category": "electricity", "co2Kg": None},
+]
+TODAY = date(2024, 7, 10)
+
+
+@pytest.fixture
+def snapshot():
+    return Snapshot.from_records(RECORDS)
+
+
+def test_summary_filters_and_breakdowns(snapshot):
+    summary = snapshot.summary(department="ops", start_date="2024-05-10", end_date="2024-06-30", today=TODAY)
+    assert summary["totalEmissions"] == 5.0 and summary["totalRecords"] == 2
+    assert summary["categoryBreakdown"] == {"electricity": 1.0, "heating": 4.0}
+    assert summary["departmentBreakdown"] == {"ops": 5.0}
+    assert summary["monthlyData"] == {"2024-06": 5.0}
+    # Comparison months ignore the date range but keep the department
+    assert summary["lastMonthTotal"] == 5.0 and summary["twoMonthsAgoTotal"] == 10.0
+    assert summary["monthOverMonthChange"] == -50.0
+    assert summary["periods"]["twoMonthsAgo"] == {"start": "2024-05-01", "end": "2024-05-31"}
+
+
+def test_unknown_department_matches_nothing(snapshot):
+    summary = snapshot.summary(department="nope", today=TODAY)
+    assert summary["totalRecords"] == 0 and summary["categoryBreakdown"] == {}
+
+
+def test_trends_group_by_month_and_category(snapshot):
+    trends = snapshot.trends(months=2)
+    assert [row["month"] for row in trends] == ["2024-06", "2024-07"]
+    assert trends[0] == {"month": "2024-06", "electricity": 1.0, "transportation": 0.0,
+                         "heating": 4.0, "waste": 0.0, "total": 5.0}
+    assert snapshot.category_totals("it") == {"electricity": 0.0, "waste": 2.5}
+
+
+def test_saved_snapshot_is_memory_mapped(snapshot, tmp_path):
+    snapshot.save(tmp_path)
+    opened = Snapshot.open(tmp_path)
+    assert isinstance(opened.co2_kg, np.memmap)
+    assert compare_summaries(snapshot.summary(today=TODAY), opened.summary(today=TODAY)) == []
+    assert compare_trends(snapshot.trends(), opened.trends()) == []
+
+
+def test_compare_reports_differences(snapshot):
+    expected = snapshot.summary(today=TODAY)
+    actual = {**expected, "totalEmissions": expected["totalEmissions"] + 1,
+              "categoryBreakdown": {**expected["categoryBreakdown"], "waste": 0.0}}
+    assert compare_summaries(expected, actual) == [
+        f"totalEmissions {actual['totalEmissions']} != {expected['totalEmissions']}",
+        "categoryBreakdown[waste] 0.0 != 2.5",
+    ]
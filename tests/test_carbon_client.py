@@ -0,0 +1,171 @@
+"""
+Unit tests for carbon_client against an in-process fake of the API
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+import requests
+
+from carbon_client import CarbonAPIError, CarbonClient, chunk_records, parse_server_timing
+from carbon_client.client import ARROW_CONTENT_TYPE
+
+RECORDS = [{"id": f"e{i:02d}", "date": f"2024-01-{i + 1:02d}"} for i in range(5)]
+
+
+class FakeAPI(BaseHTTPRequestHandler):
+    calls = []
+    failures = {}  # path -> number of 503s to return before succeeding
+
+    def log_message(self, *args):
+        pass
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length)) if length else None
+        FakeAPI.calls.append((self.command, url.path, body))
+
+        if FakeAPI.failures.get(url.path, 0) > 0:
+            FakeAPI.failures[url.path] -= 1
+            return self.reply(503, {"error": "busy"})
+
+        if url.path == "/api/emissions" and self.headers.get("Accept") == ARROW_CONTENT_TYPE:
+            body = b"\xff" * 100000
+            self.send_response(200)
+            self.send_header("Content-Type", ARROW_CONTENT_TYPE)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            # department=cut drops the connection partway through the body
+            if parse_qs(url.query).get("department") == ["cut"]:
+                self.wfile.write(body[:1000])
+                self.close_connection = True
+                return
+            self.wfile.write(body)
+            return
+        if url.path == "/api/emissions":
+            query = parse_qs(url.query)
+            limit = int(query["limit"][0])
+            start = int(query.get("cursor", ["0"])[0])
+            page = RECORDS[start:start + limit]
+            next_cursor = str(start + limit) if start + limit < len(RECORDS) else None
+            return self.reply(200, {"success": True, "data": page, "nextCursor": next_cursor})
+        if url.path == "/api/emissions/bulk":
+            if parse_qs(url.query).get("mode") == ["upsert"]:
+                count = len(body["emissions"])
+                return self.reply(200, {"success": True, "data": {
+                    "imported": count, "inserted": 0, "updated": 0, "unchanged": count,
+                    "duplicates": 0, "failed": 0, "errors": []}})
+            return self.reply(201, {"success": True, "data": {"imported": len(body["emissions"])}})
+        return self.reply(404, {"error": "Endpoint not found"})
+
+    do_GET = do_POST = do_PUT = do_DELETE = handle_request
+
+
+@pytest.fixture
+def client():
+    FakeAPI.calls = []
+    FakeAPI.failures = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeAPI)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    with CarbonClient(f"http://127.0.0.1:{server.server_port}/api", timeout=5, backoff=0) as c:
+        yield c
+    server.shutdown()
+
+
+def test_chunk_records_bounds_count_and_bytes():
+    records = [{"value": i, "notes": "x" * 100} for i in range(50)]
+    by_count = list(chunk_records(records, max_records=20))
+    assert [len(c) for c in by_count] == [20, 20, 10]
+
+    by_bytes = list(chunk_records(records, max_records=1000, max_bytes=1000))
+    assert sum(len(c) for c in by_bytes) == 50
+    assert all(len(json.dumps(c, separators=(",", ":"))) <= 1000 for c in by_bytes)
+
+
+def test_iter_emissions_follows_cursor(client):
+    assert [r["id"] for r in client.iter_emissions(page_size=2)] == [r["id"] for r in RECORDS]
+    assert len([c for c in FakeAPI.calls if c[1] == "/api/emissions"]) == 3
+
+
+def test_bulk_upload_sends_every_chunk(client):
+    result = client.bulk_upload([{"value": i} for i in range(25)], max_records=10, concurrency=3)
+    assert result == {"imported": 25, "chunks": 3}
+    assert sorted(len(body["emissions"]) for _, path, body in FakeAPI.calls) == [5, 10, 10]
+
+
+def test_upsert_chunks_are_retried_on_503(client):
+    FakeAPI.failures["/api/emissions/bulk"] = 1
+    result = client.bulk_upload([{"value": i} for i in range(15)], max_records=10, concurrency=1, mode="upsert")
+    assert result["imported"] == 15 and result["unchanged"] == 15 and result["chunks"] == 2
+    assert len(FakeAPI.calls) == 3
+
+
+def test_get_is_retried_on_503(client):
+    FakeAPI.failures["/api/emissions"] = 2
+    records, _ = client.get_emissions_page(2)
+    assert len(records) == 2
+    assert len(FakeAPI.calls) == 3
+
+
+def test_post_is_not_retried_on_503(client):
+    FakeAPI.failures["/api/emissions/bulk"] = 1
+    with pytest.raises(CarbonAPIError) as excinfo:
+        client.bulk_create_emissions([{"value": 1}])
+    assert excinfo.value.status == 503
+    assert len(FakeAPI.calls) == 1
+
+
+def test_error_carries_api_message(client):
+    with pytest.raises(CarbonAPIError) as excinfo:
+        client.cache_stats()
+    assert excinfo.value.status == 404
+    assert excinfo.value.message == "Endpoint not found"
+
+
+def test_parse_server_timing():
+    header = 'db;desc="MongoDB (2 commands, 40 docs)";dur=12.5, compute;dur=3.1, serialize;dur=0.4, total;dur=16.0'
+    assert parse_server_timing(header) == {"db": 12.5, "compute": 3.1, "serialize": 0.4, "total": 16.0}
+    assert parse_server_timing(None) == {}
+
+
+def test_export_arrow_saves_the_stream(client, tmp_path):
+    path = tmp_path / "emissions.arrow"
+    assert client.export_arrow(path, chunk_size=4096, department="ops") == 100000
+    assert path.read_bytes() == b"\xff" * 100000
+    assert list(tmp_path.iterdir()) == [path]
+
+
+def test_interrupted_export_leaves_no_file(client, tmp_path):
+    path = tmp_path / "emissions.arrow"
+    with pytest.raises(requests.RequestException):
+        client.export_arrow(path, chunk_size=4096, department="cut")
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_async_export_arrow(client, tmp_path):
+    aiohttp = pytest.importorskip("aiohttp")
+    from carbon_client import AsyncCarbonClient
+
+    async def export(department):
+        async with AsyncCarbonClient(client.base_url, timeout=5) as async_client:
+            assert async_client.stream_timeout.total is None
+            return await async_client.export_arrow(tmp_path / department, department=department)
+
+    assert asyncio.run(export("ops")) == 100000
+    with pytest.raises(aiohttp.ClientError):
+        asyncio.run(export("cut"))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["ops"]